@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
-from .models import User, UserProfile, Permission, RolePermission
+from .models import User, UserProfile, Permission, RolePermission, APIKey
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -43,4 +43,16 @@ class RolePermissionAdmin(admin.ModelAdmin):
     search_fields = ('permission__name', 'permission__codename')
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('permission')
\ No newline at end of file
+        return super().get_queryset(request).select_related('permission')
+
+@admin.register(APIKey)
+class APIKeyAdmin(admin.ModelAdmin):
+    """Keys are created with the create_api_key command; here they can be revoked"""
+    list_display = ('name', 'prefix', 'user', 'is_active', 'created_at', 'last_used_at')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'prefix', 'user__username')
+    fields = ('name', 'user', 'prefix', 'is_active', 'created_at', 'last_used_at')
+    readonly_fields = ('user', 'prefix', 'created_at', 'last_used_at')
+
+    def has_add_permission(self, request):
+        return False
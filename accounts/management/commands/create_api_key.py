@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import APIKey
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Create an API key for an integration; the key is printed once and only its hash is stored'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='User the integration acts as (its role decides what it may do)')
+        parser.add_argument('--name', required=True, help='What the key is for, e.g. "Accounting sync"')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["username"]}" does not exist')
+        if not user.is_active:
+            raise CommandError(f'User "{user.username}" is not active')
+
+        api_key, key = APIKey.generate(user, options['name'])
+        self.stdout.write(self.style.SUCCESS(f'Created API key "{api_key.name}" for {user.username}'))
+        self.stdout.write(key)
+        self.stdout.write('Send it as "Authorization: Bearer <key>" or "X-API-Key: <key>". It is not shown again.')
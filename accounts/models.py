@@ -1,6 +1,11 @@
+import hashlib
+import secrets
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
+from django.utils import timezone
 
 class User(AbstractUser):
     """Extended User model with additional fields"""
@@ -78,4 +83,50 @@ class RolePermission(models.Model):
         db_table = 'role_permissions'
         unique_together = ['role', 'permission']
         verbose_name = 'Role Permission'
-        verbose_name_plural = 'Role Permissions'
\ No newline at end of file
+        verbose_name_plural = 'Role Permissions'
+
+class APIKey(models.Model):
+    """Key an integration uses to call the JSON API as `user`; only its hash is stored"""
+    # last_used_at is written at most this often per key
+    USAGE_WRITE_INTERVAL = timedelta(minutes=5)
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_keys')
+    name = models.CharField(max_length=100)
+    prefix = models.CharField(max_length=8)  # First characters of the key, to tell keys apart
+    key_hash = models.CharField(max_length=64, unique=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.prefix}...) - {self.user.username}"
+
+    @staticmethod
+    def hash_key(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @classmethod
+    def generate(cls, user, name):
+        """Create a key for `user`; returns (api_key, key). The key cannot be shown again."""
+        key = secrets.token_urlsafe(32)
+        api_key = cls.objects.create(user=user, name=name, prefix=key[:8], key_hash=cls.hash_key(key))
+        return api_key, key
+
+    @classmethod
+    def authenticate(cls, key):
+        """The active key matching `key` of an active user, or None"""
+        api_key = (
+            cls.objects.select_related('user')
+            .filter(key_hash=cls.hash_key(key), is_active=True, user__is_active=True)
+            .first()
+        )
+        if api_key is not None:
+            now = timezone.now()
+            if api_key.last_used_at is None or api_key.last_used_at < now - cls.USAGE_WRITE_INTERVAL:
+                cls.objects.filter(pk=api_key.pk).update(last_used_at=now)
+        return api_key
+
+    class Meta:
+        db_table = 'api_keys'
+        verbose_name = 'API Key'
+        verbose_name_plural = 'API Keys'
@@ -0,0 +1,657 @@
+"""
+JSON API for integrations.
+
+    GET   /api/v1/<resource>/              list (cursor pagination)
+    POST  /api/v1/<resource>/              bulk create (object or list)
+    PATCH /api/v1/<resource>/              bulk update (list of objects with "id")
+    GET   /api/v1/<resource>/<id>/         detail
+    PATCH /api/v1/<resource>/<id>/         update
+
+Resources: products, customers, suppliers, product-suppliers (the
+supplier catalog used for replenishment; read/write) and sales, purchases,
+stock-movements (read only; sales are written through
+`sales:sale_batch_submit`, stock only moves through documents).
+
+List parameters:
+    fields=id,name,brand_name   sparse fieldset; joins and prefetches are
+                                planned from the requested fields only
+    cursor=<token>&limit=50     keyset pagination by id
+    updated_since=<ISO date>    rows changed since
+    plus the per-resource filters listed in RESOURCES
+
+GET responses carry ETag and Last-Modified and answer If-None-Match /
+If-Modified-Since with 304.
+
+Authentication: an API key (`Authorization: Bearer <key>` or `X-API-Key`,
+created with the create_api_key command) acts as its user and needs no CSRF
+token; otherwise the browser session is used and writes are CSRF-checked as
+in the rest of the site. Either way the user's role decides what it may do.
+"""
+import base64
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Prefetch
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date, quote_etag
+from django.utils import timezone
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from accounts.models import APIKey
+from accounts.views import has_permission
+from dashboard import events
+from inventory import alerts, pricing
+from inventory.models import Customer, Product, ProductSupplier, StockMovement, Supplier
+from inventory.signals import refresh_product_indexes
+from purchases.models import Purchase, PurchaseItem
+from sales.models import Sale, SaleItem
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_BULK_SIZE = 500
+
+
+class Nested:
+    """A to-many relation serialized as a list, loaded with one prefetch query"""
+
+    def __init__(self, relation, model, fields):
+        self.relation = relation
+        self.model = model
+        self.fields = fields
+
+
+def _products_written(objects, previous, user):
+    """
+    Product writes skip the model signals: re-sync the indexes, re-evaluate
+    changed alerts and record selling price changes in the price history.
+    """
+    product_ids = [obj.pk for obj in objects]
+    refresh_product_indexes(product_ids)
+    pricing.record([
+        (obj.pk, previous[obj.pk]['selling_price'], obj.selling_price) for obj in objects if obj.pk in previous
+    ], 'api', user)
+    events.stock_changed([
+        obj.pk for obj in objects
+        if obj.pk not in previous
+        or any(previous[obj.pk][field] != getattr(obj, field) for field in alerts.PRODUCT_FIELDS)
+    ], 'thresholds')
+
+
+class Resource:
+    def __init__(self, model, fields, default_fields=None, filters=None, last_modified='updated_at',
+                 writable=None, view_permission='view_products', add_permission=None,
+                 change_permission=None, after_write=None):
+        self.model = model
+        # name -> dotted attribute path ("brand.name") or Nested
+        self.fields = fields
+        self.default_fields = default_fields or [name for name, source in fields.items()
+                                                 if not isinstance(source, Nested)]
+        # query parameter -> ORM lookup
+        self.filters = filters or {}
+        self.last_modified = last_modified
+        # name -> model field name, for create/update
+        self.writable = writable or {}
+        self.view_permission = view_permission
+        self.add_permission = add_permission
+        self.change_permission = change_permission
+        # after_write(objects, previous, user) inside the write transaction;
+        # `previous` maps the pk of each updated row to its old writable values
+        self.after_write = after_write
+
+    def plan(self, queryset, field_names):
+        """select_related/prefetch_related for exactly the requested fields"""
+        related = set()
+        prefetches = []
+        for name in field_names:
+            source = self.fields[name]
+            if isinstance(source, Nested):
+                nested_related = {
+                    '__'.join(path.split('.')[:-1]) for path in source.fields.values() if '.' in path
+                }
+                prefetches.append(Prefetch(
+                    source.relation, queryset=source.model.objects.select_related(*nested_related)
+                ))
+            elif '.' in source:
+                related.add('__'.join(source.split('.')[:-1]))
+        if related:
+            queryset = queryset.select_related(*related)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset
+
+
+def _resolve(obj, path):
+    for attr in path.split('.'):
+        obj = getattr(obj, attr)
+        if obj is None:
+            return None
+    return obj
+
+
+def serialize(obj, fields, field_names):
+    data = {}
+    for name in field_names:
+        source = fields[name]
+        if isinstance(source, Nested):
+            data[name] = [
+                serialize(child, source.fields, list(source.fields))
+                for child in getattr(obj, source.relation).all()
+            ]
+        else:
+            data[name] = _resolve(obj, source)
+    return data
+
+
+RESOURCES = {
+    'products': Resource(
+        Product,
+        fields={
+            'id': 'id', 'name': 'name', 'sku': 'sku', 'barcode': 'barcode',
+            'part_number': 'part_number', 'oem_number': 'oem_number', 'description': 'description',
+            'category': 'category_id', 'category_name': 'category.name',
+            'brand': 'brand_id', 'brand_name': 'brand.name',
+            'unit': 'unit_id', 'unit_name': 'unit.name_arabic',
+            'cost_price': 'cost_price', 'selling_price': 'selling_price',
+            'wholesale_price': 'wholesale_price', 'current_stock': 'current_stock',
+            'minimum_stock': 'minimum_stock', 'maximum_stock': 'maximum_stock',
+            'reorder_level': 'reorder_level', 'is_active': 'is_active',
+            'abc_class': 'abc_class', 'xyz_class': 'xyz_class',
+            'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        default_fields=[
+            'id', 'name', 'sku', 'barcode', 'part_number', 'category', 'brand', 'unit',
+            'cost_price', 'selling_price', 'current_stock', 'is_active', 'updated_at',
+        ],
+        filters={
+            'sku': 'sku', 'barcode': 'barcode', 'category': 'category_id',
+            'brand': 'brand_id', 'is_active': 'is_active',
+            'abc_class': 'abc_class', 'xyz_class': 'xyz_class',
+        },
+        writable={
+            'name': 'name', 'sku': 'sku', 'barcode': 'barcode', 'part_number': 'part_number',
+            'oem_number': 'oem_number', 'description': 'description',
+            'category': 'category_id', 'brand': 'brand_id', 'unit': 'unit_id',
+            'cost_price': 'cost_price', 'selling_price': 'selling_price',
+            'wholesale_price': 'wholesale_price', 'minimum_stock': 'minimum_stock',
+            'maximum_stock': 'maximum_stock', 'reorder_level': 'reorder_level',
+            'is_active': 'is_active',
+        },
+        view_permission='view_products', add_permission='add_products', change_permission='edit_products',
+        after_write=_products_written,
+    ),
+    'customers': Resource(
+        Customer,
+        fields={
+            'id': 'id', 'name': 'name', 'customer_type': 'customer_type', 'email': 'email',
+            'phone': 'phone', 'address': 'address', 'city': 'city', 'tax_number': 'tax_number',
+            'credit_limit': 'credit_limit', 'current_balance': 'current_balance',
+            'discount_percentage': 'discount_percentage', 'is_active': 'is_active',
+            'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        filters={'phone': 'phone', 'customer_type': 'customer_type', 'is_active': 'is_active'},
+        writable={
+            'name': 'name', 'customer_type': 'customer_type', 'email': 'email', 'phone': 'phone',
+            'address': 'address', 'city': 'city', 'tax_number': 'tax_number',
+            'credit_limit': 'credit_limit', 'discount_percentage': 'discount_percentage',
+            'is_active': 'is_active',
+        },
+        view_permission='view_products', add_permission='add_products', change_permission='edit_products',
+    ),
+    'suppliers': Resource(
+        Supplier,
+        fields={
+            'id': 'id', 'name': 'name', 'contact_person': 'contact_person', 'email': 'email',
+            'phone': 'phone', 'address': 'address', 'city': 'city', 'tax_number': 'tax_number',
+            'payment_terms': 'payment_terms', 'credit_limit': 'credit_limit',
+            'current_balance': 'current_balance', 'is_active': 'is_active',
+            'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        filters={'phone': 'phone', 'is_active': 'is_active'},
+        writable={
+            'name': 'name', 'contact_person': 'contact_person', 'email': 'email', 'phone': 'phone',
+            'address': 'address', 'city': 'city', 'tax_number': 'tax_number',
+            'payment_terms': 'payment_terms', 'credit_limit': 'credit_limit', 'is_active': 'is_active',
+        },
+        view_permission='view_products', add_permission='add_products', change_permission='edit_products',
+    ),
+    'product-suppliers': Resource(
+        ProductSupplier,
+        fields={
+            'id': 'id', 'product': 'product_id', 'product_name': 'product.name',
+            'supplier': 'supplier_id', 'supplier_name': 'supplier.name',
+            'supplier_sku': 'supplier_sku', 'is_preferred': 'is_preferred',
+            'last_unit_cost': 'last_unit_cost', 'lead_time_days': 'lead_time_days',
+            'min_order_qty': 'min_order_qty', 'pack_size': 'pack_size',
+            'last_purchased_at': 'last_purchased_at',
+            'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        default_fields=[
+            'id', 'product', 'supplier', 'supplier_sku', 'is_preferred', 'last_unit_cost',
+            'lead_time_days', 'min_order_qty', 'pack_size', 'updated_at',
+        ],
+        filters={'product': 'product_id', 'supplier': 'supplier_id', 'is_preferred': 'is_preferred'},
+        writable={
+            'product': 'product_id', 'supplier': 'supplier_id', 'supplier_sku': 'supplier_sku',
+            'is_preferred': 'is_preferred', 'last_unit_cost': 'last_unit_cost',
+            'lead_time_days': 'lead_time_days', 'min_order_qty': 'min_order_qty', 'pack_size': 'pack_size',
+        },
+        view_permission='view_products', add_permission='add_products', change_permission='edit_products',
+    ),
+    'sales': Resource(
+        Sale,
+        fields={
+            'id': 'id', 'sale_number': 'sale_number', 'customer': 'customer_id',
+            'customer_name': 'customer.name', 'sale_type': 'sale_type', 'status': 'status',
+            'payment_status': 'payment_status', 'subtotal': 'subtotal', 'tax_amount': 'tax_amount',
+            'discount_amount': 'discount_amount', 'total_amount': 'total_amount',
+            'paid_amount': 'paid_amount', 'balance_amount': 'balance_amount',
+            'sale_date': 'sale_date', 'due_date': 'due_date', 'created_by': 'created_by.username',
+            'created_at': 'created_at', 'updated_at': 'updated_at',
+            'items': Nested('items', SaleItem, {
+                'product': 'product_id', 'product_name': 'product.name', 'quantity': 'quantity',
+                'unit_price': 'unit_price', 'discount_percentage': 'discount_percentage',
+                'total_price': 'total_price', 'cost_price': 'cost_price',
+            }),
+        },
+        filters={
+            'customer': 'customer_id', 'status': 'status', 'payment_status': 'payment_status',
+            'sale_type': 'sale_type', 'sale_number': 'sale_number',
+        },
+        view_permission='view_sales',
+    ),
+    'purchases': Resource(
+        Purchase,
+        fields={
+            'id': 'id', 'purchase_number': 'purchase_number', 'supplier': 'supplier_id',
+            'supplier_name': 'supplier.name', 'status': 'status', 'payment_status': 'payment_status',
+            'subtotal': 'subtotal', 'tax_amount': 'tax_amount', 'discount_amount': 'discount_amount',
+            'shipping_cost': 'shipping_cost', 'total_amount': 'total_amount',
+            'paid_amount': 'paid_amount', 'balance_amount': 'balance_amount',
+            'order_date': 'order_date', 'expected_delivery_date': 'expected_delivery_date',
+            'actual_delivery_date': 'actual_delivery_date', 'payment_due_date': 'payment_due_date',
+            'supplier_invoice_number': 'supplier_invoice_number', 'created_by': 'created_by.username',
+            'created_at': 'created_at', 'updated_at': 'updated_at',
+            'items': Nested('items', PurchaseItem, {
+                'product': 'product_id', 'product_name': 'product.name',
+                'quantity_ordered': 'quantity_ordered', 'quantity_received': 'quantity_received',
+                'unit_cost': 'unit_cost', 'discount_percentage': 'discount_percentage',
+                'total_cost': 'total_cost',
+            }),
+        },
+        filters={
+            'supplier': 'supplier_id', 'status': 'status', 'payment_status': 'payment_status',
+            'purchase_number': 'purchase_number',
+        },
+        view_permission='view_purchases',
+    ),
+    'stock-movements': Resource(
+        StockMovement,
+        fields={
+            'id': 'id', 'product': 'product_id', 'product_name': 'product.name',
+            'product_sku': 'product.sku', 'movement_type': 'movement_type', 'quantity': 'quantity',
+            'unit_cost': 'unit_cost', 'reference_number': 'reference_number',
+            'reference_model': 'reference_model', 'reference_id': 'reference_id', 'notes': 'notes',
+            'created_by': 'created_by.username', 'created_at': 'created_at',
+        },
+        filters={
+            'product': 'product_id', 'movement_type': 'movement_type',
+            'reference_number': 'reference_number',
+        },
+        last_modified='created_at',
+        view_permission='view_products',
+    ),
+}
+
+
+class APIError(Exception):
+    def __init__(self, message, status=400, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.errors = errors
+
+
+def _error(message, status=400, errors=None):
+    data = {'success': False, 'error': message}
+    if errors:
+        data['errors'] = errors
+    return JsonResponse(data, status=status)
+
+
+def _api_key(request):
+    """Key sent in the Authorization (Bearer) or X-API-Key header, or None"""
+    authorization = request.headers.get('Authorization', '')
+    if authorization.lower().startswith('bearer '):
+        return authorization[7:].strip()
+    return request.headers.get('X-API-Key', '').strip() or None
+
+
+def _authenticate(request):
+    """Set request.user from an API key, or check the session; returns an error response or None"""
+    key = _api_key(request)
+    if key is not None:
+        api_key = APIKey.authenticate(key)
+        if api_key is None:
+            return _error('Invalid API key', status=401)
+        request.user = api_key.user
+        return None
+    if not request.user.is_authenticated:
+        return _error('Authentication required', status=401)
+    # The views are csrf_exempt for key clients; session writes still need the token
+    if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+        if CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {}) is not None:
+            return _error('CSRF verification failed', status=403)
+    return None
+
+
+def api_view(view_func):
+    """Resolve the resource and answer auth/permission/validation failures as JSON"""
+    @csrf_exempt
+    def _wrapped_view(request, resource, *args, **kwargs):
+        response = _authenticate(request)
+        if response is not None:
+            return response
+        config = RESOURCES.get(resource)
+        if config is None:
+            return _error(f'Unknown resource: {resource}', status=404)
+        try:
+            return view_func(request, config, *args, **kwargs)
+        except APIError as e:
+            return _error(str(e), status=e.status, errors=e.errors)
+    return _wrapped_view
+
+
+def _check_permission(request, codename):
+    if not codename or not has_permission(request.user, codename):
+        raise APIError('You do not have permission to perform this action', status=403)
+
+
+def _field_names(request, config):
+    requested = request.GET.get('fields')
+    if not requested:
+        return config.default_fields
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in config.fields]
+    if unknown:
+        raise APIError(f"Unknown fields: {', '.join(unknown)}")
+    if 'id' not in names:
+        names.insert(0, 'id')
+    return names
+
+
+def _encode_cursor(last_id):
+    return base64.urlsafe_b64encode(json.dumps({'id': last_id}).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded.encode()))['id'])
+    except (ValueError, KeyError, TypeError):
+        raise APIError('Invalid cursor')
+
+
+def _filtered_queryset(request, config):
+    queryset = config.model.objects.all()
+    for param, lookup in config.filters.items():
+        value = request.GET.get(param)
+        if value is None or value == '':
+            continue
+        if lookup in ('is_active', 'is_preferred'):
+            value = value.lower() in ('1', 'true', 'yes')
+        try:
+            queryset = queryset.filter(**{lookup: value})
+        except (ValueError, ValidationError):
+            raise APIError(f'Invalid value for {param}: {value}')
+
+    updated_since = request.GET.get('updated_since')
+    if updated_since:
+        since = parse_datetime(updated_since) or parse_date(updated_since)
+        if since is None:
+            raise APIError('Invalid updated_since')
+        lookup = f'{config.last_modified}__gte' if hasattr(since, 'hour') else f'{config.last_modified}__date__gte'
+        queryset = queryset.filter(**{lookup: since})
+    return queryset
+
+
+def _conditional(request, etag, last_modified, build_response):
+    """Answer conditional GETs with 304, otherwise build the response and tag it"""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    etag = quote_etag(hashlib.md5(etag.encode()).hexdigest())
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build_response()
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def _list(request, config):
+    _check_permission(request, config.view_permission)
+    field_names = _field_names(request, config)
+    queryset = _filtered_queryset(request, config)
+
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        raise APIError('Invalid limit')
+    cursor = request.GET.get('cursor')
+
+    # Validator over the whole filtered set: latest change and row count
+    state = queryset.aggregate(latest=Max(config.last_modified), count=Count('id'))
+    etag = f"{request.get_full_path()}|{state['latest']}|{state['count']}"
+
+    def build_response():
+        page = config.plan(queryset, field_names).order_by('id')
+        if cursor:
+            page = page.filter(id__gt=_decode_cursor(cursor))
+        rows = list(page[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return JsonResponse({
+            'success': True,
+            'count': state['count'],
+            'results': [serialize(obj, config.fields, field_names) for obj in rows],
+            'next_cursor': _encode_cursor(rows[-1].id) if has_more else None,
+        })
+
+    return _conditional(request, etag, state['latest'], build_response)
+
+
+def _detail(request, config, pk):
+    _check_permission(request, config.view_permission)
+    field_names = _field_names(request, config)
+    obj = config.plan(config.model.objects.filter(pk=pk), field_names).first()
+    if obj is None:
+        raise APIError('Not found', status=404)
+    last_modified = getattr(obj, config.last_modified)
+    etag = f"{request.get_full_path()}|{last_modified}"
+    return _conditional(
+        request, etag, last_modified,
+        lambda: JsonResponse({'success': True, 'result': serialize(obj, config.fields, field_names)})
+    )
+
+
+def _read_body(request):
+    try:
+        return json.loads(request.body or b'null')
+    except ValueError:
+        raise APIError('Invalid JSON body')
+
+
+def _assign(obj, config, data):
+    """Copy writable fields from `data` onto `obj`; returns the model fields touched"""
+    unknown = [name for name in data if name != 'id' and name not in config.writable]
+    if unknown:
+        raise ValidationError(f"Unknown or read-only fields: {', '.join(unknown)}")
+    touched = []
+    for name, value in data.items():
+        if name == 'id':
+            continue
+        field_name = config.writable[name]
+        field = config.model._meta.get_field(field_name[:-3] if field_name.endswith('_id') else field_name)
+        if value is not None and field.get_internal_type() == 'DecimalField':
+            try:
+                value = Decimal(str(value))
+            except InvalidOperation:
+                raise ValidationError({name: 'Enter a number.'})
+        setattr(obj, field_name, value)
+        touched.append(field.name)
+    return touched
+
+
+def _validation_errors(e):
+    return e.message_dict if hasattr(e, 'error_dict') else {'__all__': e.messages}
+
+
+def _batch_conflicts(model, objects, labels):
+    """
+    Rows of one request that collide with an earlier row on a unique field or
+    unique_together set; full_clean() only checks each row against the database.
+    """
+    keys = [(field.name,) for field in model._meta.fields if field.unique and not field.primary_key]
+    keys += [tuple(names) for names in model._meta.unique_together]
+    errors = {}
+    for key in keys:
+        attnames = [model._meta.get_field(name).attname for name in key]
+        seen = {}
+        for label, obj in zip(labels, objects):
+            value = tuple(getattr(obj, attname) for attname in attnames)
+            if None in value:
+                # NULLs never collide
+                continue
+            if value in seen:
+                errors.setdefault(label, {})['__all__' if len(key) > 1 else key[0]] = [
+                    f"Same {'/'.join(key)} as row {seen[value]} of this request."
+                ]
+            else:
+                seen[value] = label
+    return errors
+
+
+def _save_conflict(e):
+    """APIError for a write that hit a unique constraint after validation (a concurrent write)"""
+    return APIError(f'Conflicting write; nothing was saved: {e}', status=409)
+
+
+def _bulk_create(request, config):
+    _check_permission(request, config.add_permission)
+    payload = _read_body(request)
+    rows = payload if isinstance(payload, list) else [payload]
+    if not rows or not all(isinstance(row, dict) for row in rows):
+        raise APIError('Body must be an object or a list of objects')
+    if len(rows) > MAX_BULK_SIZE:
+        raise APIError(f'At most {MAX_BULK_SIZE} rows per request')
+
+    objects = []
+    errors = {}
+    for index, row in enumerate(rows):
+        obj = config.model()
+        try:
+            _assign(obj, config, row)
+            obj.full_clean()
+        except ValidationError as e:
+            errors[index] = _validation_errors(e)
+        objects.append(obj)
+    for index, conflicts in _batch_conflicts(config.model, objects, range(len(objects))).items():
+        errors.setdefault(index, {}).update(conflicts)
+    if errors:
+        raise APIError('Validation failed; nothing was created', errors=errors)
+
+    try:
+        with transaction.atomic():
+            config.model.objects.bulk_create(objects, batch_size=500)
+            if any(obj.pk is None for obj in objects):
+                raise APIError('Bulk create is not supported on this database backend', status=501)
+            if config.after_write:
+                config.after_write(objects, {}, request.user)
+    except IntegrityError as e:
+        raise _save_conflict(e)
+
+    # Echo the default fields that need no join
+    field_names = [name for name in config.default_fields if '.' not in config.fields[name]]
+    return JsonResponse({
+        'success': True,
+        'results': [serialize(obj, config.fields, field_names) for obj in objects],
+    }, status=201)
+
+
+def _bulk_update(request, config, pk=None):
+    _check_permission(request, config.change_permission)
+    payload = _read_body(request)
+    if pk is not None:
+        if not isinstance(payload, dict):
+            raise APIError('Body must be an object')
+        payload = [dict(payload, id=pk)]
+    if not isinstance(payload, list) or not payload or not all(isinstance(row, dict) for row in payload):
+        raise APIError('Body must be a list of objects with an id')
+    if len(payload) > MAX_BULK_SIZE:
+        raise APIError(f'At most {MAX_BULK_SIZE} rows per request')
+
+    ids = [row.get('id') for row in payload]
+    if not all(isinstance(row_id, int) for row_id in ids) or len(set(ids)) != len(ids):
+        raise APIError('Every row needs a unique integer id')
+    existing = config.model.objects.in_bulk(ids)
+    missing = [row_id for row_id in ids if row_id not in existing]
+    if missing:
+        raise APIError(f'Not found: {missing}', status=404)
+
+    touched = set()
+    errors = {}
+    previous = {}
+    for row in payload:
+        obj = existing[row['id']]
+        previous[obj.pk] = {field: getattr(obj, field) for field in config.writable.values()}
+        try:
+            touched.update(_assign(obj, config, row))
+            obj.full_clean()
+        except ValidationError as e:
+            errors[row['id']] = _validation_errors(e)
+    for row_id, conflicts in _batch_conflicts(config.model, [existing[row_id] for row_id in ids], ids).items():
+        errors.setdefault(row_id, {}).update(conflicts)
+    if errors:
+        raise APIError('Validation failed; nothing was updated', errors=errors)
+
+    try:
+        with transaction.atomic():
+            if touched:
+                # bulk_update does not apply auto_now
+                if any(field.name == 'updated_at' for field in config.model._meta.fields):
+                    now = timezone.now()
+                    for obj in existing.values():
+                        obj.updated_at = now
+                    touched.add('updated_at')
+                config.model.objects.bulk_update(list(existing.values()), sorted(touched), batch_size=500)
+                if config.after_write:
+                    config.after_write([existing[row_id] for row_id in ids], previous, request.user)
+    except IntegrityError as e:
+        raise _save_conflict(e)
+
+    return JsonResponse({'success': True, 'updated': len(ids)})
+
+
+@api_view
+@require_http_methods(["GET", "HEAD", "POST", "PATCH"])
+def collection(request, config):
+    """List, bulk create or bulk update a resource"""
+    if request.method == 'POST':
+        return _bulk_create(request, config)
+    if request.method == 'PATCH':
+        return _bulk_update(request, config)
+    return _list(request, config)
+
+
+@api_view
+@require_http_methods(["GET", "HEAD", "PATCH"])
+def detail(request, config, pk):
+    """Read or update one row"""
+    if request.method == 'PATCH':
+        return _bulk_update(request, config, pk=pk)
+    return _detail(request, config, pk)
@@ -0,0 +1,28 @@
+"""Outbox consumers owned by the dashboard app (see dashboard.events)"""
+from django.contrib.contenttypes.models import ContentType
+from django.urls import reverse
+
+from . import events
+from .models import Notification
+
+
+@events.consumer('notifications', event_types=['purchase_received'])
+def notify_purchase_received(batch):
+    """Tell whoever ordered a purchase that its goods arrived"""
+    from purchases.models import Purchase
+
+    purchase_ids = {event.aggregate_id for event in batch}
+    purchases = Purchase.objects.filter(id__in=purchase_ids).only('id', 'purchase_number', 'created_by_id')
+    content_type = ContentType.objects.get_for_model(Purchase)
+    Notification.objects.bulk_create([
+        Notification(
+            user_id=purchase.created_by_id,
+            title=f'تم استلام أمر الشراء {purchase.purchase_number}',
+            message=f'تم استلام بضائع أمر الشراء {purchase.purchase_number}.',
+            notification_type='info',
+            action_url=reverse('purchases:purchase_detail', args=[purchase.id]),
+            content_type=content_type,
+            object_id=purchase.id,
+        )
+        for purchase in purchases
+    ])
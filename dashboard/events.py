@@ -0,0 +1,212 @@
+"""
+Transactional outbox of domain events.
+
+Business writes call `publish()` inside their own `transaction.atomic()`
+block, so an `OutboxEvent` row exists exactly when the change it describes
+was committed. Derived data (caches, alerts, rollups, notifications) is
+maintained by consumers that read the outbox in id order:
+
+    @events.consumer('low_stock', event_types=['stock_changed'])
+    def handle(batch):
+        ...
+
+Consumers live in a `consumers` module of any installed app; they are
+discovered when the dashboard app is ready. `python manage.py process_events`
+runs them. Each consumer has an `EventCheckpoint`; a batch is handled and the
+checkpoint advanced in one transaction, so a failing handler leaves the
+checkpoint where it was and the batch is retried on the next run. Handlers
+must therefore be idempotent for the rare retry after a partial external
+side effect.
+
+A transaction can take an event id and commit after a transaction that
+took a higher one, so the checkpoint is gap-aware: ids skipped below
+`last_event_id` are remembered in `pending_gaps` and read again on every
+run until the event shows up. A late event is handed to the handler in a
+later batch than higher ids. Gaps older than `GAP_TIMEOUT` are dropped
+(their transaction rolled back, or the id was never used).
+"""
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+DEFAULT_BATCH_SIZE = 500
+
+# How long a skipped event id is waited for; no transaction that publishes
+# events stays open this long
+GAP_TIMEOUT = timedelta(minutes=10)
+# Upper bound on the gaps remembered per consumer
+MAX_PENDING_GAPS = 1000
+
+# Events older than this and seen by every consumer may be deleted
+RETENTION_DAYS = 14
+
+_consumers = {}
+
+
+class Consumer:
+    def __init__(self, name, handler, event_types=None):
+        self.name = name
+        self.handler = handler
+        self.event_types = frozenset(event_types) if event_types else None
+
+    def wants(self, event):
+        return self.event_types is None or event.event_type in self.event_types
+
+
+def consumer(name, event_types=None):
+    """Register the decorated function as the handler of consumer `name`"""
+    def register(handler):
+        _consumers[name] = Consumer(name, handler, event_types)
+        return handler
+    return register
+
+
+def registered_consumers():
+    return dict(_consumers)
+
+
+def _aggregate(instance):
+    if instance is None:
+        return '', None
+    return instance._meta.model_name, instance.pk
+
+
+def publish(event_type, payload=None, aggregate=None):
+    """Record one event; call inside the transaction of the change it describes"""
+    from .models import OutboxEvent
+    aggregate_type, aggregate_id = _aggregate(aggregate)
+    return OutboxEvent.objects.create(
+        event_type=event_type, payload=payload or {},
+        aggregate_type=aggregate_type, aggregate_id=aggregate_id,
+    )
+
+
+def publish_many(events):
+    """Record several `(event_type, payload, aggregate)` events with one INSERT"""
+    from .models import OutboxEvent
+    rows = []
+    for event_type, payload, aggregate in events:
+        aggregate_type, aggregate_id = _aggregate(aggregate)
+        rows.append(OutboxEvent(
+            event_type=event_type, payload=payload or {},
+            aggregate_type=aggregate_type, aggregate_id=aggregate_id,
+        ))
+    return OutboxEvent.objects.bulk_create(rows, batch_size=500)
+
+
+def stock_changed(product_ids, reason, reference=None):
+    """Shortcut for the `stock_changed` event of one business transaction"""
+    product_ids = sorted({int(pk) for pk in product_ids})
+    if not product_ids:
+        return None
+    payload = {'product_ids': product_ids, 'reason': reason}
+    if reference is not None:
+        payload['reference'] = reference
+    return publish('stock_changed', payload)
+
+
+def _next_batch(checkpoint, batch_size):
+    """
+    Events for the consumer after `checkpoint`: late arrivals in its gaps
+    plus up to `batch_size` new events, in id order. Moves the checkpoint
+    (not saved) past them; returns the events and whether new events were
+    limited by `batch_size`.
+    """
+    from .models import OutboxEvent
+
+    now = time.time()
+    timeout = GAP_TIMEOUT.total_seconds()
+    gaps = {int(pk): noticed for pk, noticed in checkpoint.pending_gaps.items()}
+    late = list(OutboxEvent.objects.filter(id__in=list(gaps)).order_by('id')) if gaps else []
+    new = list(OutboxEvent.objects.filter(id__gt=checkpoint.last_event_id).order_by('id')[:batch_size])
+
+    for event in late:
+        del gaps[event.id]
+    expected = checkpoint.last_event_id + 1
+    for event in new:
+        # Ids missing below a recent event may belong to transactions still
+        # open; below an old one they were pruned or rolled back long ago
+        noticed = event.created_at.timestamp()
+        if now - noticed < timeout:
+            for pk in range(expected, event.id):
+                if len(gaps) >= MAX_PENDING_GAPS:
+                    break
+                gaps[pk] = noticed
+        expected = event.id + 1
+    if new:
+        checkpoint.last_event_id = new[-1].id
+    checkpoint.pending_gaps = {
+        str(pk): noticed for pk, noticed in sorted(gaps.items()) if now - noticed < timeout
+    }
+    return sorted(late + new, key=lambda event: event.id), len(new) == batch_size
+
+
+def run_consumer(name, batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """
+    Feed pending events to consumer `name` batch by batch.
+
+    Returns `{'processed': n, 'batches': n, 'error': str or None}`; stops at
+    the first handler error, which is also stored on the checkpoint.
+    """
+    from .models import EventCheckpoint
+    registered = _consumers[name]
+    stats = {'processed': 0, 'batches': 0, 'error': None}
+    EventCheckpoint.objects.get_or_create(consumer=name)
+
+    while max_batches is None or stats['batches'] < max_batches:
+        try:
+            with transaction.atomic():
+                # Row lock keeps two runners of the same consumer from overlapping
+                checkpoint = EventCheckpoint.objects.select_for_update().get(consumer=name)
+                gaps_before = checkpoint.pending_gaps
+                batch, more = _next_batch(checkpoint, batch_size)
+                if not batch:
+                    if checkpoint.pending_gaps != gaps_before:
+                        # Only expired gaps changed
+                        checkpoint.save(update_fields=['pending_gaps', 'updated_at'])
+                    break
+                relevant = [event for event in batch if registered.wants(event)]
+                if relevant:
+                    registered.handler(relevant)
+                checkpoint.processed_count += len(relevant)
+                checkpoint.failures = 0
+                checkpoint.last_error = ''
+                checkpoint.save()
+        except Exception as e:
+            stats['error'] = f'{type(e).__name__}: {e}'
+            EventCheckpoint.objects.filter(consumer=name).update(
+                failures=F('failures') + 1, last_error=stats['error'][:2000],
+                updated_at=timezone.now(),
+            )
+            break
+        stats['processed'] += len(relevant)
+        stats['batches'] += 1
+        if not more:
+            break
+    return stats
+
+
+def run_all(batch_size=DEFAULT_BATCH_SIZE, names=None):
+    """Run every registered consumer (or those in `names`); returns {name: stats}"""
+    return {
+        name: run_consumer(name, batch_size=batch_size)
+        for name in sorted(_consumers) if names is None or name in names
+    }
+
+
+def prune(days=RETENTION_DAYS):
+    """Delete old events every registered consumer has processed; returns the count"""
+    from .models import EventCheckpoint, OutboxEvent
+    cutoff = timezone.now() - timedelta(days=days)
+    events = OutboxEvent.objects.filter(created_at__lt=cutoff)
+    if _consumers:
+        checkpoints = EventCheckpoint.objects.filter(consumer__in=list(_consumers))
+        if checkpoints.count() < len(_consumers):
+            # A consumer that never ran still needs everything
+            return 0
+        events = events.filter(id__lte=checkpoints.aggregate(low=Min('last_event_id'))['low'])
+    deleted, _ = events.delete()
+    return deleted
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from dashboard import events
+
+
+class Command(BaseCommand):
+    help = 'Feed pending outbox events to the registered consumers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--consumer',
+            action='append',
+            dest='consumers',
+            help='Run only this consumer (repeatable)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=events.DEFAULT_BATCH_SIZE,
+            help='Number of events read per batch',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling instead of exiting when the outbox is drained',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep between polls with --loop',
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help=f'Delete processed events older than {events.RETENTION_DAYS} days afterwards',
+        )
+
+    def handle(self, *args, **options):
+        registered = events.registered_consumers()
+        names = options['consumers']
+        if names:
+            unknown = set(names) - set(registered)
+            if unknown:
+                raise CommandError(f"Unknown consumers: {', '.join(sorted(unknown))}")
+        if not registered:
+            self.stdout.write(self.style.WARNING('No consumers registered'))
+            return
+
+        while True:
+            results = events.run_all(batch_size=options['batch_size'], names=names)
+            for name, stats in results.items():
+                if stats['error']:
+                    self.stderr.write(self.style.ERROR(f"{name}: {stats['error']}"))
+                elif stats['processed'] or not options['loop']:
+                    self.stdout.write(f"{name}: {stats['processed']} events in {stats['batches']} batches")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        if options['prune']:
+            deleted = events.prune()
+            self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} processed events'))
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumer', models.CharField(max_length=100, unique=True)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('processed_count', models.PositiveBigIntegerField(default=0)),
+                ('failures', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Event Checkpoint',
+                'verbose_name_plural': 'Event Checkpoints',
+                'db_table': 'event_checkpoints',
+                'ordering': ['consumer'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('sale_created', 'Sale Created'), ('sale_completed', 'Sale Completed'), ('sale_updated', 'Sale Updated'), ('payment_posted', 'Payment Posted'), ('purchase_received', 'Purchase Received'), ('purchase_payment_posted', 'Purchase Payment Posted'), ('stock_changed', 'Stock Changed')], max_length=50)),
+                ('aggregate_type', models.CharField(blank=True, max_length=50)),
+                ('aggregate_id', models.BigIntegerField(blank=True, null=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Outbox Event',
+                'verbose_name_plural': 'Outbox Events',
+                'db_table': 'outbox_events',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_outbox_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventcheckpoint',
+            name='pending_gaps',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_event_checkpoint_gaps'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboxevent',
+            name='event_type',
+            field=models.CharField(choices=[('sale_created', 'Sale Created'), ('sale_completed', 'Sale Completed'), ('sale_updated', 'Sale Updated'), ('payment_posted', 'Payment Posted'), ('purchase_received', 'Purchase Received'), ('purchase_payment_posted', 'Purchase Payment Posted'), ('stock_changed', 'Stock Changed'), ('alerts_refresh_requested', 'Alerts Refresh Requested'), ('prices_changed', 'Prices Changed')], max_length=50),
+        ),
+    ]
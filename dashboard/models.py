@@ -278,4 +278,55 @@ class ActivityLog(models.Model):
             models.Index(fields=['user', 'timestamp']),
             models.Index(fields=['action', 'timestamp']),
             models.Index(fields=['content_type', 'object_id']),
-        ]
\ No newline at end of file
+        ]
+
+class OutboxEvent(models.Model):
+    """Domain event written in the same transaction as the change it describes"""
+    EVENT_TYPE_CHOICES = [
+        ('sale_created', 'Sale Created'),
+        ('sale_completed', 'Sale Completed'),
+        ('sale_updated', 'Sale Updated'),
+        ('payment_posted', 'Payment Posted'),
+        ('purchase_received', 'Purchase Received'),
+        ('purchase_payment_posted', 'Purchase Payment Posted'),
+        ('stock_changed', 'Stock Changed'),
+        ('alerts_refresh_requested', 'Alerts Refresh Requested'),
+        ('prices_changed', 'Prices Changed'),
+    ]
+
+    event_type = models.CharField(max_length=50, choices=EVENT_TYPE_CHOICES)
+    aggregate_type = models.CharField(max_length=50, blank=True)
+    aggregate_id = models.BigIntegerField(blank=True, null=True)
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"#{self.pk} {self.event_type} {self.aggregate_type}:{self.aggregate_id}"
+
+    class Meta:
+        db_table = 'outbox_events'
+        verbose_name = 'Outbox Event'
+        verbose_name_plural = 'Outbox Events'
+        ordering = ['id']
+
+
+class EventCheckpoint(models.Model):
+    """Position of one outbox consumer"""
+    consumer = models.CharField(max_length=100, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    # Ids below last_event_id not seen yet (their transaction had not
+    # committed), with the Unix time they were noticed; see dashboard.events
+    pending_gaps = models.JSONField(default=dict, blank=True)
+    processed_count = models.PositiveBigIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.consumer} @ {self.last_event_id}"
+
+    class Meta:
+        db_table = 'event_checkpoints'
+        verbose_name = 'Event Checkpoint'
+        verbose_name_plural = 'Event Checkpoints'
+        ordering = ['consumer']
@@ -1,3 +1,118 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+
+from . import events
+from .models import EventCheckpoint, OutboxEvent
+
+
+class OutboxConsumerTests(TestCase):
+    def setUp(self):
+        self.seen = []
+        self.fail = False
+        saved = dict(events._consumers)
+        self.addCleanup(lambda: (events._consumers.clear(), events._consumers.update(saved)))
+        events._consumers.clear()
+
+        @events.consumer('test', event_types=['stock_changed'])
+        def handle(batch):
+            if self.fail:
+                raise RuntimeError('handler down')
+            self.seen.extend(event.id for event in batch)
+
+    def publish(self, count, event_type='stock_changed'):
+        return [events.publish(event_type, {'n': n}).id for n in range(count)]
+
+    def checkpoint(self):
+        return EventCheckpoint.objects.get(consumer='test')
+
+    def test_advances_in_batches_and_skips_unwanted_types(self):
+        wanted = self.publish(3)
+        other = self.publish(1, event_type='sale_completed')
+        wanted += self.publish(2)
+
+        stats = events.run_consumer('test', batch_size=2)
+
+        self.assertEqual(stats, {'processed': 5, 'batches': 3, 'error': None})
+        self.assertEqual(self.seen, wanted)
+        checkpoint = self.checkpoint()
+        self.assertEqual(checkpoint.last_event_id, wanted[-1])
+        self.assertEqual(checkpoint.processed_count, 5)
+        self.assertEqual(checkpoint.pending_gaps, {})
+        self.assertLess(other[0], wanted[-1])
+
+        # Nothing new: a second run is a no-op
+        self.assertEqual(events.run_consumer('test')['processed'], 0)
+        self.assertEqual(self.seen, wanted)
+
+    def test_failed_batch_is_replayed(self):
+        ids = self.publish(2)
+        self.fail = True
+
+        stats = events.run_consumer('test')
+
+        self.assertEqual(stats['error'], 'RuntimeError: handler down')
+        checkpoint = self.checkpoint()
+        self.assertEqual((checkpoint.last_event_id, checkpoint.failures), (0, 1))
+        self.assertIn('handler down', checkpoint.last_error)
+
+        self.fail = False
+        self.assertEqual(events.run_consumer('test')['processed'], 2)
+        self.assertEqual(self.seen, ids)
+        checkpoint = self.checkpoint()
+        self.assertEqual((checkpoint.last_event_id, checkpoint.failures, checkpoint.last_error), (ids[-1], 0, ''))
+
+    def test_event_committed_late_is_not_skipped(self):
+        first, late, last = self.publish(3)
+        # The middle id was taken by a transaction that has not committed yet
+        OutboxEvent.objects.filter(id=late).delete()
+
+        events.run_consumer('test')
+
+        self.assertEqual(self.seen, [first, last])
+        checkpoint = self.checkpoint()
+        self.assertEqual(checkpoint.last_event_id, last)
+        self.assertEqual(list(checkpoint.pending_gaps), [str(late)])
+
+        # It commits after the checkpoint moved past its id
+        OutboxEvent.objects.create(id=late, event_type='stock_changed', payload={'n': 1})
+        stats = events.run_consumer('test')
+
+        self.assertEqual(stats['processed'], 1)
+        self.assertEqual(self.seen, [first, last, late])
+        self.assertEqual(self.checkpoint().pending_gaps, {})
+
+    def test_stale_gaps_are_dropped(self):
+        first, missing, last = self.publish(3)
+        OutboxEvent.objects.filter(id=missing).delete()
+        # Ids missing below an old event were pruned or rolled back long ago
+        OutboxEvent.objects.filter(id=last).update(created_at=timezone.now() - events.GAP_TIMEOUT * 2)
+
+        events.run_consumer('test')
+        self.assertEqual(self.checkpoint().pending_gaps, {})
+
+        # A remembered gap that never fills expires
+        EventCheckpoint.objects.filter(consumer='test').update(pending_gaps={
+            str(missing): (timezone.now() - events.GAP_TIMEOUT - timedelta(seconds=1)).timestamp(),
+        })
+        events.run_consumer('test')
+        self.assertEqual(self.checkpoint().pending_gaps, {})
+        self.assertEqual(self.seen, [first, last])
+
+    def test_prune_keeps_events_a_consumer_still_needs(self):
+        ids = self.publish(2)
+        OutboxEvent.objects.update(created_at=timezone.now() - timedelta(days=events.RETENTION_DAYS + 1))
+
+        # The consumer has not run yet
+        self.assertEqual(events.prune(), 0)
+
+        events.run_consumer('test')
+        self.assertEqual(events.prune(), 2)
+        self.assertFalse(OutboxEvent.objects.filter(id__in=ids).exists())
 
-# Create your tests here.
+    def test_published_event_types_are_valid_choices(self):
+        for event_type in ('stock_changed', 'alerts_refresh_requested', 'prices_changed'):
+            event = events.publish(event_type, {'n': 0})
+            event.full_clean()
+            self.assertNotEqual(event.get_event_type_display(), event_type)
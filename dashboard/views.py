@@ -10,7 +10,8 @@ from .models import Notification, SystemAlert, UserPreference, ActivityLog
 from sales.models import Sale, Payment
 from purchases.models import Purchase
 from expenses.models import Expense
-from inventory.models import Product, InventoryAlert
+from inventory.models import Product
+from inventory import alerts as alert_service
 from accounts.models import User
 
 @login_required
@@ -77,7 +78,7 @@ def home(request):
     if request.user.is_superuser or request.user.role in ['admin', 'manager']:
         pending_items = {
             'pending_expenses': Expense.objects.filter(status='pending', requires_approval=True).count(),
-            'low_stock_alerts': InventoryAlert.objects.filter(status='active', alert_type='low_stock').count(),
+            'low_stock_alerts': alert_service.summary()['counts']['low_stock'],
             'overdue_payments': Sale.objects.filter(payment_status='overdue').count(),
         }
     
@@ -162,6 +162,10 @@ class Expense(models.Model):
         verbose_name = 'مصروف'
         verbose_name_plural = 'المصروفات'
         ordering = ['-expense_date', '-created_at']
+        indexes = [
+            # Keyset cursor of the accounting change feed
+            models.Index(fields=['updated_at', 'id'], name='expense_updated_id_idx'),
+        ]
 
 class RecurringExpense(models.Model):
     """Template for recurring expenses"""
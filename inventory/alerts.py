@@ -0,0 +1,297 @@
+"""
+Stock level alert evaluation.
+
+`evaluate_products()` applies the reorder thresholds to a batch of products
+and creates, updates or resolves their open (active or acknowledged)
+`InventoryAlert` rows with a fixed number of queries per batch. It is used by:
+
+* the `inventory_alerts` outbox consumer (`inventory.consumers`), which
+  evaluates exactly the products named in committed `stock_changed` events, and
+* `reconcile_all()`, the full reconciliation scan run by the
+  `check_inventory_alerts` command and, for the alerts dashboard's refresh
+  button, by the same consumer on an `alerts_refresh_requested` event.
+
+`summary()` is the cached aggregate view of open alerts shared by the alerts
+dashboard, the alerts list and the main dashboard; `priority_order()` ranks
+alerts by severity and the product's ABC class.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, CharField, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+ALERT_BATCH_SIZE = 500
+
+SUMMARY_CACHE_KEY = 'inventory_alert_summary'
+# Alert writes invalidate the summary; the timeout bounds drift from
+# price/stock edits that do not touch an alert
+SUMMARY_CACHE_TIMEOUT = 5 * 60
+
+SEVERITY_ORDER = ['out_of_stock', 'low_stock', 'reorder', 'overstock']
+
+# Alerts not resolved yet; an acknowledged alert stays open until the stock recovers
+OPEN_STATUSES = ('active', 'acknowledged')
+
+# Product fields the alerts depend on besides current_stock; writes that change
+# them publish `stock_changed` with reason 'thresholds'
+PRODUCT_FIELDS = ('minimum_stock', 'maximum_stock', 'reorder_level', 'is_active')
+
+# (key, label, maximum age in days or None)
+AGE_BUCKETS = [
+    ('1d', 'Today', 1),
+    ('7d', '1-7 days', 7),
+    ('30d', '7-30 days', 30),
+    ('older', 'Older than 30 days', None),
+]
+
+
+def classify(product):
+    """(alert_type, message, recommended_action) for a product's stock level, or None when normal"""
+    if product.current_stock <= 0:
+        return (
+            'out_of_stock',
+            f'{product.name} is out of stock',
+            f'Urgent: Reorder {product.name} immediately. Current stock: {product.current_stock}',
+        )
+
+    if product.current_stock <= product.reorder_level:
+        if product.current_stock <= product.minimum_stock:
+            alert_type = 'low_stock'
+            priority = 'High'
+            message = f'{product.name} has critically low stock'
+        else:
+            alert_type = 'reorder'
+            # Class A products carry most of the sales value
+            priority = 'High' if product.abc_class == 'A' else 'Medium'
+            message = f'{product.name} has reached إعادة ترتيب المستوى'
+
+        recommended_quantity = max(
+            product.maximum_stock - product.current_stock,
+            product.reorder_level * 2
+        )
+        return (
+            alert_type,
+            message,
+            f'{priority} Priority: Reorder {recommended_quantity} units of {product.name}. '
+            f'Current stock: {product.current_stock}, Minimum: {product.minimum_stock}, '
+            f'إعادة ترتيب المستوى: {product.reorder_level}',
+        )
+
+    if product.current_stock > product.maximum_stock:
+        return (
+            'overstock',
+            f'{product.name} is overstocked',
+            f'Consider promotions or discounts for {product.name}. '
+            f'Current stock: {product.current_stock}, Maximum: {product.maximum_stock}',
+        )
+
+    return None
+
+
+def evaluate_products(products):
+    """
+    Bring the open alerts of `products` in line with their stock.
+
+    An open alert of the right type is kept (and updated) whether or not it
+    was acknowledged, so acknowledging never leads to a duplicate. Inactive
+    products and products back within their thresholds have their open
+    alerts resolved, as do alerts of a type the product no longer qualifies
+    for (e.g. `out_of_stock` once it is only `low_stock`), and any duplicates.
+    Returns `{'created': n, 'updated': n, 'resolved': n}`.
+    """
+    from .models import InventoryAlert
+
+    products = list(products)
+    stats = {'created': 0, 'updated': 0, 'resolved': 0}
+    if not products:
+        return stats
+
+    open_alerts = {}
+    duplicates = []
+    for alert in InventoryAlert.objects.filter(
+        product_id__in=[product.id for product in products], status__in=OPEN_STATUSES
+    ).order_by('id'):
+        if open_alerts.setdefault((alert.product_id, alert.alert_type), alert) is not alert:
+            duplicates.append(alert.id)
+
+    to_create = []
+    to_update = []
+    keep = set()
+    for product in products:
+        result = classify(product) if product.is_active else None
+        if result is None:
+            continue
+        alert_type, message, recommended_action = result
+        keep.add((product.id, alert_type))
+        alert = open_alerts.get((product.id, alert_type))
+        if alert is None:
+            to_create.append(InventoryAlert(
+                product=product,
+                alert_type=alert_type,
+                message=message,
+                current_stock=product.current_stock,
+                recommended_action=recommended_action,
+                status='active',
+            ))
+        elif (alert.message, alert.current_stock, alert.recommended_action) != (
+            message, product.current_stock, recommended_action
+        ):
+            alert.message = message
+            alert.current_stock = product.current_stock
+            alert.recommended_action = recommended_action
+            to_update.append(alert)
+
+    stale = [alert.id for key, alert in open_alerts.items() if key not in keep] + duplicates
+    if to_create:
+        InventoryAlert.objects.bulk_create(to_create, batch_size=ALERT_BATCH_SIZE)
+    if to_update:
+        InventoryAlert.objects.bulk_update(
+            to_update, ['message', 'current_stock', 'recommended_action'], batch_size=ALERT_BATCH_SIZE
+        )
+    if stale:
+        InventoryAlert.objects.filter(id__in=stale).update(status='resolved')
+
+    stats.update(created=len(to_create), updated=len(to_update), resolved=len(stale))
+    if to_create or to_update or stale:
+        invalidate_summary()
+    return stats
+
+
+def evaluate_product_ids(product_ids):
+    """Evaluate alerts for the given product ids, in batches"""
+    from .models import Product
+
+    product_ids = sorted(set(product_ids))
+    stats = {'created': 0, 'updated': 0, 'resolved': 0}
+    for start in range(0, len(product_ids), ALERT_BATCH_SIZE):
+        products = Product.objects.filter(id__in=product_ids[start:start + ALERT_BATCH_SIZE]).only(
+            'id', 'name', 'is_active', 'current_stock', 'minimum_stock', 'maximum_stock', 'reorder_level',
+            'abc_class',
+        )
+        for key, value in evaluate_products(products).items():
+            stats[key] += value
+    return stats
+
+
+def reconcile_all():
+    """Evaluate every active product, plus inactive ones that still have alerts to resolve"""
+    from .models import Product
+
+    product_ids = (
+        Product.objects.filter(Q(is_active=True) | Q(alerts__status__in=OPEN_STATUSES))
+        .values_list('id', flat=True).distinct()
+    )
+    return evaluate_product_ids(product_ids)
+
+
+def priority_order():
+    """
+    Ordering for alert querysets, most important first: by severity, then by
+    the product's ABC class (unclassified last), then newest first.
+    """
+    abc_rank = Case(
+        *[When(product__abc_class=abc_class, then=Value(rank)) for rank, abc_class in enumerate('ABC')],
+        default=Value(3), output_field=IntegerField(),
+    )
+    severity = Case(
+        *[When(alert_type=alert_type, then=Value(rank)) for rank, alert_type in enumerate(SEVERITY_ORDER)],
+        default=Value(len(SEVERITY_ORDER)), output_field=IntegerField(),
+    )
+    return [severity.asc(), abc_rank.asc(), F('created_at').desc()]
+
+
+def clear_old_resolved(days=30):
+    """Delete resolved alerts acknowledged more than `days` ago; returns the count"""
+    from .models import InventoryAlert
+    cutoff = timezone.now() - timezone.timedelta(days=days)
+    return InventoryAlert.objects.filter(status='resolved', acknowledged_at__lt=cutoff).delete()[0]
+
+
+def invalidate_summary():
+    """Drop the cached summary once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(SUMMARY_CACHE_KEY))
+
+
+def _age_bucket(now):
+    whens = [
+        When(created_at__gte=now - timedelta(days=days), then=Value(key))
+        for key, label, days in AGE_BUCKETS if days is not None
+    ]
+    return Case(*whens, default=Value(AGE_BUCKETS[-1][0]), output_field=CharField())
+
+
+def _build_summary():
+    from .models import InventoryAlert
+
+    now = timezone.now()
+    value = Sum(
+        F('product__current_stock') * F('product__cost_price'),
+        output_field=DecimalField(max_digits=18, decimal_places=2),
+    )
+    open_alerts = InventoryAlert.objects.filter(status__in=OPEN_STATUSES)
+
+    counts = {alert_type: 0 for alert_type, label in InventoryAlert.ALERT_TYPE_CHOICES}
+    status_counts = {'active': 0, 'acknowledged': 0}
+    ages = {key: 0 for key, label, days in AGE_BUCKETS}
+    affected_value = 0
+    # Query 1: open alerts by status, type and age bucket
+    for row in (
+        open_alerts.annotate(age=_age_bucket(now))
+        .values('status', 'alert_type', 'age').annotate(count=Count('id'), value=value).order_by()
+    ):
+        status_counts[row['status']] += row['count']
+        if row['status'] != 'active':
+            continue
+        counts[row['alert_type']] = counts.get(row['alert_type'], 0) + row['count']
+        ages[row['age']] += row['count']
+        affected_value += row['value'] or 0
+
+    # Query 2: active alerts by category and brand
+    categories = {}
+    brands = {}
+    for row in (
+        open_alerts.filter(status='active')
+        .values('product__category_id', 'product__category__name', 'product__brand_id', 'product__brand__name')
+        .annotate(count=Count('id'), value=value).order_by()
+    ):
+        for groups, key, name in (
+            (categories, row['product__category_id'], row['product__category__name']),
+            (brands, row['product__brand_id'], row['product__brand__name']),
+        ):
+            if key is None:
+                continue
+            group = groups.setdefault(key, {'id': key, 'name': name, 'count': 0, 'value': 0})
+            group['count'] += row['count']
+            group['value'] += row['value'] or 0
+
+    def ranked(groups):
+        return sorted(groups.values(), key=lambda group: (-group['count'], group['name']))
+
+    return {
+        'counts': counts,
+        'total': sum(counts.values()),
+        'critical': counts.get('out_of_stock', 0) + counts.get('low_stock', 0),
+        'status_counts': status_counts,
+        'affected_value': affected_value,
+        'categories': ranked(categories),
+        'brands': ranked(brands),
+        'age_distribution': [
+            {'key': key, 'label': label, 'count': ages[key]} for key, label, days in AGE_BUCKETS
+        ],
+        'generated_at': now,
+    }
+
+
+def summary():
+    """
+    Open alert analytics: active counts by type, affected inventory value,
+    affected categories and brands, age distribution and counts by status.
+    Two grouped queries, cached until alerts change.
+    """
+    data = cache.get(SUMMARY_CACHE_KEY)
+    if data is None:
+        data = _build_summary()
+        cache.set(SUMMARY_CACHE_KEY, data, SUMMARY_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,175 @@
+"""
+As-of-date stock balances.
+
+`StockCheckpoint` rows hold each product's quantity and value at a period
+end (`as_of`, exclusive: movements created before it). Checkpoints are taken
+for the whole catalog at once, period after period, by
+`take_stock_checkpoints`; each one is the previous checkpoint plus one
+grouped query over the movements in between, so no period is ever replayed
+twice. Products with nothing on hand and no value have no row.
+
+`balances_as_of()` answers "stock and value at time T" from the latest
+checkpoint at or before T plus the movements after it.
+
+Values use the periodic weighted average: the value carried in plus the
+cost of the period's receipts, divided by the quantity carried in plus the
+quantity received, gives the unit cost of the closing quantity. Values
+therefore follow the checkpoint periods (an as-of value before a period is
+checkpointed averages over everything since the previous checkpoint);
+quantities do not depend on them. Movement directions follow
+`inventory.costing`.
+"""
+from datetime import datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Max, Q, Sum
+from django.db.models.functions import Abs
+from django.utils import timezone
+
+from .costing import INBOUND_TYPES, signed_quantity_expression
+
+CHECKPOINT_BATCH_SIZE = 500
+
+PERIODS = ('month', 'quarter', 'year')
+
+CENT = Decimal('0.01')
+UNIT_COST = Decimal('0.0001')
+
+
+def boundary(day):
+    """Exclusive as-of boundary for the end of `day` (local midnight after it)"""
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def period_ends(start, end, period):
+    """Last days of the periods (month, quarter or year) ending between `start` and `end`"""
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period {period!r}; choose from {', '.join(PERIODS)}")
+    months = {'month': 1, 'quarter': 3, 'year': 12}[period]
+    year, month = start.year, start.month
+    ends = []
+    while True:
+        # Advance to the last month of the period containing (year, month)
+        last_month = ((month - 1) // months + 1) * months
+        next_start = datetime(year + last_month // 12, last_month % 12 + 1, 1).date()
+        day = next_start - timedelta(days=1)
+        if day > end:
+            return ends
+        if day >= start:
+            ends.append(day)
+        year, month = next_start.year, next_start.month
+
+
+def _movement_totals(start, end, product_ids=None):
+    """{product_id: (net quantity, received quantity, received value)} for movements in [start, end)"""
+    from .models import StockMovement
+
+    quantity = Abs('quantity')
+    inbound = Q(movement_type__in=INBOUND_TYPES) | Q(movement_type='adjustment', quantity__gt=0)
+    movements = StockMovement.objects.filter(created_at__lt=end)
+    if start is not None:
+        movements = movements.filter(created_at__gte=start)
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+    return {
+        row['product_id']: (row['net'] or 0, row['received'] or 0, row['received_value'] or Decimal(0))
+        for row in movements.values('product_id').annotate(
+            net=Sum(signed_quantity_expression()),
+            received=Sum(quantity, filter=inbound),
+            received_value=Sum(
+                quantity * F('unit_cost'), filter=inbound,
+                output_field=DecimalField(max_digits=18, decimal_places=4),
+            ),
+        ).order_by()
+    }
+
+
+def _checkpoint_rows(as_of, product_ids=None):
+    """{product_id: (quantity, value)} of the checkpoint at `as_of`"""
+    from .models import StockCheckpoint
+
+    checkpoints = StockCheckpoint.objects.filter(as_of=as_of)
+    if product_ids is not None:
+        checkpoints = checkpoints.filter(product_id__in=product_ids)
+    return {
+        product_id: (quantity, value)
+        for product_id, quantity, value in checkpoints.values_list('product_id', 'quantity', 'value')
+    }
+
+
+def _roll_forward(opening, totals):
+    """Closing {product_id: (quantity, unit_cost, value)} from opening balances and period totals"""
+    closing = {}
+    for product_id in set(opening) | set(totals):
+        quantity, value = opening.get(product_id, (0, Decimal(0)))
+        net, received, received_value = totals.get(product_id, (0, 0, Decimal(0)))
+        available = max(quantity, 0) + received
+        unit_cost = (
+            (max(value, Decimal(0)) + received_value) / available if available > 0 else Decimal(0)
+        ).quantize(UNIT_COST, rounding=ROUND_HALF_UP)
+        quantity += net
+        value = (max(quantity, 0) * unit_cost).quantize(CENT, rounding=ROUND_HALF_UP)
+        closing[product_id] = (quantity, unit_cost, value)
+    return closing
+
+
+def latest_checkpoint(before=None):
+    """`as_of` of the latest checkpoint (at or before `before`), or None"""
+    from .models import StockCheckpoint
+
+    checkpoints = StockCheckpoint.objects.all()
+    if before is not None:
+        checkpoints = checkpoints.filter(as_of__lte=before)
+    return checkpoints.aggregate(latest=Max('as_of'))['latest']
+
+
+def take_checkpoint(as_of):
+    """
+    Store the checkpoint at `as_of` (an aware datetime) for the whole
+    catalog, rolled forward from the previous one. Checkpoints must be taken
+    in order; returns the number of rows written.
+    """
+    from .models import StockCheckpoint
+
+    if StockCheckpoint.objects.filter(as_of__gte=as_of).exists():
+        raise ValueError(f'A checkpoint at or after {as_of:%Y-%m-%d %H:%M} already exists')
+
+    previous = latest_checkpoint()
+    opening = _checkpoint_rows(previous) if previous else {}
+    closing = _roll_forward(opening, _movement_totals(previous, as_of))
+    rows = [
+        StockCheckpoint(product_id=product_id, as_of=as_of, quantity=quantity, unit_cost=unit_cost, value=value)
+        for product_id, (quantity, unit_cost, value) in sorted(closing.items())
+        if quantity or value
+    ]
+    with transaction.atomic():
+        StockCheckpoint.objects.bulk_create(rows, batch_size=CHECKPOINT_BATCH_SIZE)
+    return len(rows)
+
+
+def delete_checkpoints(after=None):
+    """Delete checkpoints (at or after `after`), e.g. after back-dated corrections; returns the count"""
+    from .models import StockCheckpoint
+
+    checkpoints = StockCheckpoint.objects.all()
+    if after is not None:
+        checkpoints = checkpoints.filter(as_of__gte=after)
+    return checkpoints.delete()[0]
+
+
+def balances_as_of(when, product_ids=None):
+    """
+    `{product_id: {'quantity', 'unit_cost', 'value'}}` at `when` (movements
+    created before it): the latest checkpoint at or before `when` plus one
+    grouped query over the movements since. Products with nothing on hand
+    and no value are left out.
+    """
+    checkpoint = latest_checkpoint(before=when)
+    opening = _checkpoint_rows(checkpoint, product_ids) if checkpoint else {}
+    closing = _roll_forward(opening, _movement_totals(checkpoint, when, product_ids))
+    return {
+        product_id: {'quantity': quantity, 'unit_cost': unit_cost, 'value': value}
+        for product_id, (quantity, unit_cost, value) in closing.items()
+        if quantity or value
+    }
@@ -0,0 +1,137 @@
+"""
+Offline product catalog for POS clients.
+
+A counter downloads a full `snapshot()` once, then polls `delta(since)` with
+the version it holds. The version is the latest `Product.updated_at` or
+`ProductTombstone.deleted_at`, encoded as integer microseconds since the
+epoch, so computing it is two indexed MAX() lookups and an unchanged poll
+costs nothing more (see the ETag handling in `sales.views`).
+
+`updated_at` is stamped before the writing transaction commits, so a row
+can become visible after a later-stamped one was already served. The
+version handed to clients therefore lags the clock by `SETTLE_SECONDS` (as
+in `reports.feed`): rows changed within that window are sent again on the
+next poll, which is harmless for an upsert, instead of being skipped.
+
+Bulk `QuerySet.update()` calls do not touch `updated_at`; set it explicitly
+in such updates if the change has to reach offline clients.
+"""
+import calendar
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+# Deltas older than this cannot be served; the client must take a new snapshot
+TOMBSTONE_RETENTION_DAYS = 30
+
+# Changes this recent are served again on the next poll; see the module docstring
+SETTLE_SECONDS = 5
+
+SNAPSHOT_CACHE_KEY = 'offline_catalog_snapshot:{version}'
+SNAPSHOT_CACHE_TIMEOUT = 60 * 60
+
+CATALOG_FIELDS = (
+    'id', 'name', 'sku', 'barcode', 'part_number', 'selling_price', 'wholesale_price',
+    'current_stock', 'is_active', 'category_id', 'brand__name', 'unit__name_arabic',
+)
+
+
+def encode_version(value):
+    """datetime -> integer microseconds since the epoch (0 for an empty catalog)"""
+    if value is None:
+        return 0
+    return calendar.timegm(value.utctimetuple()) * 1000000 + value.microsecond
+
+
+def decode_version(version):
+    """Inverse of `encode_version`; raises ValueError for a version no datetime can hold"""
+    version = int(version)
+    try:
+        return datetime.fromtimestamp(version // 1000000, tz=dt_timezone.utc).replace(
+            microsecond=version % 1000000
+        )
+    except (OverflowError, OSError) as e:
+        raise ValueError(f'Catalog version out of range: {version}') from e
+
+
+def current_version():
+    """Version of the catalog as it is now"""
+    from .models import Product, ProductTombstone
+    latest_change = Product.objects.aggregate(latest=Max('updated_at'))['latest']
+    latest_delete = ProductTombstone.objects.aggregate(latest=Max('deleted_at'))['latest']
+    return max(encode_version(latest_change), encode_version(latest_delete))
+
+
+def settled_version(version):
+    """`version` capped to `SETTLE_SECONDS` ago: the version clients are told to resume from"""
+    return min(version, encode_version(timezone.now() - timedelta(seconds=SETTLE_SECONDS)))
+
+
+def _entry(row):
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'sku': row['sku'],
+        'barcode': row['barcode'],
+        'part_number': row['part_number'],
+        'price': str(row['selling_price']),
+        'wholesale_price': str(row['wholesale_price']) if row['wholesale_price'] is not None else None,
+        'stock': row['current_stock'],
+        'is_active': row['is_active'],
+        'category_id': row['category_id'],
+        'brand': row['brand__name'] or '',
+        'unit': row['unit__name_arabic'],
+    }
+
+
+def snapshot(version=None):
+    """Full catalog of active products, cached per version"""
+    from .models import Product
+    if version is None:
+        version = current_version()
+    key = SNAPSHOT_CACHE_KEY.format(version=version)
+    data = cache.get(key)
+    if data is None:
+        rows = Product.objects.filter(is_active=True).order_by('id').values(*CATALOG_FIELDS)
+        data = {
+            'version': settled_version(version),
+            'products': [_entry(row) for row in rows.iterator(chunk_size=2000)],
+        }
+        cache.set(key, data, SNAPSHOT_CACHE_TIMEOUT)
+    return data
+
+
+def delta(since, version=None):
+    """
+    Products changed and deleted since `since`.
+
+    Returns None when `since` predates the tombstone retention window and a
+    fresh snapshot is needed. Changed rows include inactive products (with
+    `is_active` false) so clients can drop them; rows changed exactly at
+    `since` are sent again, which is harmless for an upsert.
+    """
+    from .models import Product, ProductTombstone
+    if version is None:
+        version = current_version()
+    since_at = decode_version(since)
+    if since_at < timezone.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        return None
+
+    rows = Product.objects.filter(updated_at__gte=since_at).order_by('id').values(*CATALOG_FIELDS)
+    deleted = ProductTombstone.objects.filter(deleted_at__gte=since_at).values_list('product_id', flat=True)
+    return {
+        'version': settled_version(version),
+        'since': int(since),
+        'products': [_entry(row) for row in rows],
+        'deleted': sorted(set(deleted)),
+    }
+
+
+def prune_tombstones(days=TOMBSTONE_RETENTION_DAYS):
+    """Delete tombstones older than the retention window; returns the count"""
+    from .models import ProductTombstone
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = ProductTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,146 @@
+"""
+ABC/XYZ classification of the catalog.
+
+ABC ranks products by their share of sales revenue (or gross margin) over
+the history window: the products making up the first `a_share` of the
+cumulative total are A, up to `b_share` B, the rest C. XYZ grades demand
+variability by the coefficient of variation of weekly demand: up to `x_cv`
+X, up to `y_cv` Y, above that (or no demand) Z.
+
+The inputs are columnar extracts - one grouped query for the value totals
+and the daily demand matrices of `inventory.forecasting` - processed with
+NumPy. Classes are stored on `Product.abc_class` / `Product.xyz_class` so
+reports, the product list filters and alert prioritization read them
+without recomputing; the `classify_inventory` command refreshes them, and
+products whose ABC class changed are published as `stock_changed` so their
+alerts are re-prioritized.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.utils import timezone
+
+from .forecasting import FORECAST_BATCH_SIZE, demand_matrix
+
+BASES = ('revenue', 'margin')
+DEFAULT_HISTORY_DAYS = 365
+DEFAULT_A_SHARE = 0.8
+DEFAULT_B_SHARE = 0.95
+DEFAULT_X_CV = 0.5
+DEFAULT_Y_CV = 1.0
+
+
+def _values(product_ids, start, basis):
+    from sales.models import Sale, SaleItem
+
+    if basis == 'revenue':
+        value = Sum('total_price')
+    else:
+        value = Sum(ExpressionWrapper(
+            F('total_price') - F('cost_price') * F('quantity'),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        ))
+    totals = dict(
+        SaleItem.objects.filter(sale__sale_date__date__gte=start)
+        .exclude(sale__status__in=Sale.VOID_STATUSES)
+        .values('product_id').annotate(value=value).order_by()
+        .values_list('product_id', 'value')
+    )
+    return np.array([float(totals.get(product_id) or 0) for product_id in product_ids])
+
+
+def abc_classes(values, a_share=DEFAULT_A_SHARE, b_share=DEFAULT_B_SHARE):
+    """ABC class per value; a product is A if the cumulative share before it is below `a_share`"""
+    values = np.clip(values, 0, None)
+    classes = np.full(values.shape, 'C', dtype='<U1')
+    total = values.sum()
+    if total <= 0:
+        return classes
+    order = np.argsort(-values, kind='stable')
+    share_before = (np.cumsum(values[order]) - values[order]) / total
+    ranked = np.where(share_before < a_share, 'A', np.where(share_before < b_share, 'B', 'C'))
+    # Products without any sales value are always C
+    ranked[values[order] <= 0] = 'C'
+    classes[order] = ranked
+    return classes
+
+
+def xyz_classes(demand, x_cv=DEFAULT_X_CV, y_cv=DEFAULT_Y_CV):
+    """XYZ class per row of a products x weeks demand matrix"""
+    mean = demand.mean(axis=1)
+    std = demand.std(axis=1)
+    cv = np.divide(std, mean, out=np.full(mean.shape, np.inf), where=mean > 0)
+    return np.where(cv <= x_cv, 'X', np.where(cv <= y_cv, 'Y', 'Z'))
+
+
+def classify(history_days=DEFAULT_HISTORY_DAYS, basis='revenue', a_share=DEFAULT_A_SHARE,
+             b_share=DEFAULT_B_SHARE, x_cv=DEFAULT_X_CV, y_cv=DEFAULT_Y_CV):
+    """
+    `{product_id: (abc_class, xyz_class)}` for every active product.
+
+    ABC is ranked over the whole catalog at once; XYZ is computed in batches
+    of product rows over whole weeks of history.
+    """
+    from .models import Product
+
+    if basis not in BASES:
+        raise ValueError(f"Unknown basis {basis!r}; choose from {', '.join(BASES)}")
+    if not 0 < a_share < b_share <= 1:
+        raise ValueError('Shares must satisfy 0 < A share < B share <= 1')
+
+    weeks = max(history_days // 7, 1)
+    start = timezone.localdate() - timedelta(days=weeks * 7)
+    product_ids = list(Product.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+    if not product_ids:
+        return {}
+
+    abc = abc_classes(_values(product_ids, start, basis), a_share, b_share)
+    xyz = np.empty(len(product_ids), dtype='<U1')
+    for offset in range(0, len(product_ids), FORECAST_BATCH_SIZE):
+        ids = product_ids[offset:offset + FORECAST_BATCH_SIZE]
+        weekly = demand_matrix(ids, start, weeks * 7).reshape(len(ids), weeks, 7).sum(axis=2)
+        xyz[offset:offset + len(ids)] = xyz_classes(weekly, x_cv, y_cv)
+
+    return {
+        product_id: (str(abc[row]), str(xyz[row]))
+        for row, product_id in enumerate(product_ids)
+    }
+
+
+def store(classes):
+    """
+    Write `classes` (as returned by `classify()`) to the products whose class
+    changed; inactive products lose their class. Returns the number updated.
+    """
+    from dashboard import events
+    from .models import Product
+
+    now = timezone.now()
+    product_ids = sorted(classes)
+    changed = []
+    abc_changed = []
+    for offset in range(0, len(product_ids), FORECAST_BATCH_SIZE):
+        for product in Product.objects.filter(
+            id__in=product_ids[offset:offset + FORECAST_BATCH_SIZE]
+        ).only('id', 'abc_class', 'xyz_class'):
+            abc_class, xyz_class = classes[product.id]
+            if (product.abc_class, product.xyz_class) != (abc_class, xyz_class):
+                if product.abc_class != abc_class:
+                    abc_changed.append(product.id)
+                product.abc_class, product.xyz_class = abc_class, xyz_class
+                product.updated_at = now
+                changed.append(product)
+
+    with transaction.atomic():
+        Product.objects.bulk_update(
+            changed, ['abc_class', 'xyz_class', 'updated_at'], batch_size=FORECAST_BATCH_SIZE
+        )
+        cleared = (
+            Product.objects.filter(is_active=False).exclude(abc_class='', xyz_class='')
+            .update(abc_class='', xyz_class='', updated_at=now)
+        )
+        # Reorder alert priority follows the ABC class
+        events.stock_changed(abc_changed, 'classification')
+    return len(changed) + cleared
@@ -0,0 +1,25 @@
+"""Outbox consumers owned by the inventory app (see dashboard.events)"""
+from dashboard import events
+
+from . import alerts, costing
+
+
+@events.consumer('inventory_alerts', event_types=['stock_changed', 'alerts_refresh_requested'])
+def evaluate_stock_alerts(batch):
+    """Re-evaluate alerts once for every product whose stock changed in the batch
+
+    A refresh requested from the alerts dashboard reconciles every product
+    instead, once per batch however many requests were queued.
+    """
+    if any(event.event_type == 'alerts_refresh_requested' for event in batch):
+        alerts.reconcile_all()
+        return
+    product_ids = {pk for event in batch for pk in event.payload.get('product_ids', ())}
+    alerts.evaluate_product_ids(product_ids)
+
+
+@events.consumer('costing', event_types=['stock_changed'])
+def cost_stock_movements(batch):
+    """Cost the new stock movements of every product whose stock changed in the batch"""
+    product_ids = {pk for event in batch for pk in event.payload.get('product_ids', ())}
+    costing.cost_all_pending(product_ids)
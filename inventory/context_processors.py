@@ -0,0 +1,9 @@
+from django.utils.functional import SimpleLazyObject
+from .models import ShopSettings
+
+
+def shop_settings(request):
+    """Expose the cached shop settings to all templates as `shop_settings`"""
+    return {
+        'shop_settings': SimpleLazyObject(ShopSettings.get_settings),
+    }
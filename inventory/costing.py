@@ -0,0 +1,305 @@
+"""
+Inventory costing from the stock movement ledger.
+
+Each product's `StockMovement` rows are costed once, in id order:
+
+* inbound movements (purchases, customer returns, positive adjustments) add
+  stock at the movement's unit cost - customer returns at the current
+  average cost - and, in FIFO mode, open a `CostLayer`;
+* outbound movements (sales, supplier returns, damage, losses, negative
+  adjustments) are costed from the oldest open layers (FIFO) or at the
+  running average cost (`average`); stock sold beyond the layers is costed
+  at the average.
+
+`ProductCost` holds the running quantity, value and average cost. Costing
+a movement stores the value it moved in `StockMovement.cost_amount`, so
+`cost_products()` only ever looks at movements where it is still empty. An
+id cursor would skip a movement whose transaction committed after a later
+id had been costed; such a movement is costed on the next run instead, after
+the later ones. A sale's cost is the sum of its costed movements, written to
+its sale items as `SaleItem.cogs`, with `SaleItem.cost_price` set to the unit
+cost actually consumed; the sale's `updated_at` is bumped so the accounting
+feed (`reports.feed`) sends it again. The method is
+`settings.INVENTORY_COSTING_METHOD`.
+
+The `costing` outbox consumer (`inventory.consumers`) runs this for the
+products in `stock_changed` events; `rebuild_cost_layers` replays the whole
+ledger in chunks.
+"""
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Abs
+from django.utils import timezone
+
+METHODS = ('fifo', 'average')
+COSTING_BATCH_SIZE = 500
+MOVEMENT_CHUNK_SIZE = 2000
+
+INBOUND_TYPES = {'purchase', 'return_in'}
+OUTBOUND_TYPES = {'sale', 'return_out', 'damaged', 'lost'}
+
+CENT = Decimal('0.01')
+UNIT_COST = Decimal('0.0001')
+
+
+def costing_method():
+    method = getattr(settings, 'INVENTORY_COSTING_METHOD', 'fifo')
+    if method not in METHODS:
+        raise ValueError(f"INVENTORY_COSTING_METHOD must be one of {', '.join(METHODS)}")
+    return method
+
+
+def signed_quantity(movement):
+    """Stock change of a movement: positive in, negative out, 0 for transfers"""
+    if movement.movement_type in INBOUND_TYPES:
+        return abs(movement.quantity)
+    if movement.movement_type in OUTBOUND_TYPES:
+        return -abs(movement.quantity)
+    if movement.movement_type == 'adjustment':
+        return movement.quantity
+    return 0
+
+
+def signed_quantity_expression():
+    """`signed_quantity()` as a database expression, for grouped sums"""
+    return Case(
+        When(movement_type__in=INBOUND_TYPES, then=Abs('quantity')),
+        When(movement_type__in=OUTBOUND_TYPES, then=-Abs('quantity')),
+        When(movement_type='adjustment', then=F('quantity')),
+        default=Value(0), output_field=IntegerField(),
+    )
+
+
+class _Ledger:
+    """Costing state of one product while its new movements are applied"""
+
+    def __init__(self, state, layers, method):
+        self.state = state
+        self.layers = layers
+        self.method = method
+        self.new_layers = []
+        self.touched_layers = set()
+
+    def receive(self, movement, quantity, unit_cost):
+        from .models import CostLayer
+
+        state = self.state
+        if state.on_hand < 0:
+            # Receipts first cover stock sold short, which was already costed at the average
+            covered = min(quantity, -state.on_hand)
+            state.on_hand += covered
+            quantity -= covered
+        if quantity <= 0:
+            return
+        if self.method == 'fifo':
+            layer = CostLayer(
+                product_id=state.product_id, movement=movement, received_at=movement.created_at,
+                quantity=quantity, remaining_quantity=quantity, unit_cost=unit_cost,
+            )
+            self.layers.append(layer)
+            self.new_layers.append(layer)
+        state.on_hand += quantity
+        state.inventory_value += quantity * unit_cost
+        state.average_cost = (state.inventory_value / state.on_hand).quantize(UNIT_COST)
+
+    def issue(self, quantity, fallback_cost):
+        """Cost of taking `quantity` out of stock"""
+        state = self.state
+        average = state.average_cost or fallback_cost
+        cost = Decimal(0)
+        remaining = quantity
+        if self.method == 'fifo':
+            for layer in self.layers:
+                if remaining <= 0:
+                    break
+                if layer.remaining_quantity <= 0:
+                    continue
+                taken = min(layer.remaining_quantity, remaining)
+                layer.remaining_quantity -= taken
+                cost += taken * layer.unit_cost
+                remaining -= taken
+                if layer.pk:
+                    self.touched_layers.add(layer)
+            self.layers = [layer for layer in self.layers if layer.remaining_quantity > 0]
+        cost += remaining * average
+
+        state.on_hand -= quantity
+        if state.on_hand > 0:
+            state.inventory_value -= cost
+            state.average_cost = (state.inventory_value / state.on_hand).quantize(UNIT_COST)
+        else:
+            # Nothing (or less than nothing) left: keep the last average for stock sold short
+            state.inventory_value = Decimal(0)
+            state.average_cost = average
+        return cost.quantize(CENT, rounding=ROUND_HALF_UP)
+
+    def apply(self, movement):
+        """Cost `movement`; returns the value it added to or took out of stock"""
+        quantity = signed_quantity(movement)
+        cost = Decimal(0)
+        if quantity > 0:
+            unit_cost = Decimal(movement.unit_cost or 0)
+            if movement.movement_type == 'return_in' or not unit_cost:
+                unit_cost = self.state.average_cost or unit_cost
+            self.receive(movement, quantity, unit_cost)
+            cost = (quantity * unit_cost).quantize(CENT, rounding=ROUND_HALF_UP)
+        elif quantity < 0:
+            cost = self.issue(-quantity, Decimal(movement.unit_cost or 0))
+        self.state.last_movement_id = max(self.state.last_movement_id, movement.id)
+        return cost
+
+
+def _sale_ids(movements):
+    """Sale id per sale movement, from reference_id or the sale number"""
+    from sales.models import Sale
+
+    by_number = {m.reference_number for m in movements if not (m.reference_model == 'Sale' and m.reference_id)}
+    numbers = dict(
+        Sale.objects.filter(sale_number__in=by_number).values_list('sale_number', 'id')
+    ) if by_number else {}
+    return {
+        m.id: m.reference_id if m.reference_model == 'Sale' and m.reference_id else numbers.get(m.reference_number)
+        for m in movements
+    }
+
+
+def _write_sale_costs(movements):
+    """
+    Recompute the cogs of the sales of the given sale movements from all of
+    their costed movements, spread over each (sale, product)'s items in id
+    order; a sale whose movements were costed in different chunks gets the
+    cost of all of them. The sales' `updated_at` is bumped with the items.
+    """
+    from sales.models import Sale, SaleItem
+    from .models import StockMovement
+
+    sale_ids = {pk for pk in _sale_ids(movements).values() if pk}
+    if not sale_ids:
+        return 0
+    product_ids = {m.product_id for m in movements}
+    numbers = list(Sale.objects.filter(id__in=sale_ids).values_list('sale_number', flat=True))
+    costed = list(
+        StockMovement.objects.filter(
+            Q(reference_model='Sale', reference_id__in=sale_ids) | Q(reference_number__in=numbers),
+            movement_type='sale', product_id__in=product_ids, cost_amount__isnull=False,
+        ).only('id', 'product_id', 'quantity', 'cost_amount', 'reference_model', 'reference_id', 'reference_number')
+    )
+    by_id = {m.id: m for m in costed}
+    sale_costs = {}
+    for movement_id, sale_id in _sale_ids(costed).items():
+        if sale_id not in sale_ids:
+            continue
+        movement = by_id[movement_id]
+        key = (sale_id, movement.product_id)
+        quantity, total = sale_costs.get(key, (0, Decimal(0)))
+        sale_costs[key] = (quantity + abs(movement.quantity), total + movement.cost_amount)
+
+    items = defaultdict(list)
+    for item in SaleItem.objects.filter(sale_id__in=sale_ids, product_id__in=product_ids).order_by('id'):
+        items[(item.sale_id, item.product_id)].append(item)
+
+    changed = []
+    for key, (quantity, cost) in sale_costs.items():
+        unit_cost = cost / quantity if quantity else Decimal(0)
+        lines = items.get(key, [])
+        for index, item in enumerate(lines):
+            if index == len(lines) - 1:
+                # The last line takes the rounding remainder
+                item.cogs = cost - sum((line.cogs for line in lines[:-1]), Decimal(0))
+            else:
+                item.cogs = (unit_cost * item.quantity).quantize(CENT, rounding=ROUND_HALF_UP)
+            item.cost_price = unit_cost.quantize(CENT, rounding=ROUND_HALF_UP)
+            changed.append(item)
+    SaleItem.objects.bulk_update(changed, ['cogs', 'cost_price'], batch_size=COSTING_BATCH_SIZE)
+    Sale.objects.filter(id__in={item.sale_id for item in changed}).update(updated_at=timezone.now())
+    return len(changed)
+
+
+def cost_products(product_ids, chunk_size=MOVEMENT_CHUNK_SIZE):
+    """
+    Cost the movements of `product_ids` not costed yet, at most `chunk_size`
+    movements per product batch in one transaction; returns the number of
+    movements costed (call again while it equals what was available).
+    """
+    from .models import CostLayer, ProductCost, StockMovement
+
+    method = costing_method()
+    product_ids = sorted(set(product_ids))
+    costed = 0
+    for offset in range(0, len(product_ids), COSTING_BATCH_SIZE):
+        ids = product_ids[offset:offset + COSTING_BATCH_SIZE]
+        with transaction.atomic():
+            ProductCost.objects.bulk_create(
+                [ProductCost(product_id=pk) for pk in ids], ignore_conflicts=True
+            )
+            states = {
+                state.product_id: state
+                for state in ProductCost.objects.select_for_update().filter(product_id__in=ids)
+            }
+            movements = list(
+                StockMovement.objects.filter(product_id__in=ids, cost_amount__isnull=True)
+                .order_by('id')[:chunk_size]
+            )
+            if not movements:
+                continue
+
+            layers = defaultdict(list)
+            if method == 'fifo':
+                for layer in CostLayer.objects.filter(
+                    product_id__in={m.product_id for m in movements}, remaining_quantity__gt=0
+                ).order_by('received_at', 'id'):
+                    layers[layer.product_id].append(layer)
+            ledgers = {}
+            for movement in movements:
+                ledger = ledgers.get(movement.product_id)
+                if ledger is None:
+                    ledger = ledgers[movement.product_id] = _Ledger(
+                        states[movement.product_id], layers[movement.product_id], method
+                    )
+                movement.cost_amount = ledger.apply(movement)
+
+            CostLayer.objects.bulk_create(
+                [layer for ledger in ledgers.values() for layer in ledger.new_layers],
+                batch_size=COSTING_BATCH_SIZE,
+            )
+            CostLayer.objects.bulk_update(
+                [layer for ledger in ledgers.values() for layer in ledger.touched_layers],
+                ['remaining_quantity'], batch_size=COSTING_BATCH_SIZE,
+            )
+            for state in states.values():
+                state.inventory_value = state.inventory_value.quantize(CENT, rounding=ROUND_HALF_UP)
+            ProductCost.objects.bulk_update(
+                [ledger.state for ledger in ledgers.values()],
+                ['on_hand', 'average_cost', 'inventory_value', 'last_movement_id'],
+                batch_size=COSTING_BATCH_SIZE,
+            )
+            StockMovement.objects.bulk_update(movements, ['cost_amount'], batch_size=COSTING_BATCH_SIZE)
+            _write_sale_costs([m for m in movements if m.movement_type == 'sale'])
+            costed += len(movements)
+    return costed
+
+
+def cost_all_pending(product_ids, chunk_size=MOVEMENT_CHUNK_SIZE):
+    """Cost every pending movement of `product_ids`, chunk by chunk"""
+    total = 0
+    while True:
+        costed = cost_products(product_ids, chunk_size)
+        total += costed
+        if costed == 0:
+            return total
+
+
+def reset(product_ids):
+    """Forget the costing of `product_ids` so their ledger is replayed from the start"""
+    from .models import CostLayer, ProductCost, StockMovement
+
+    with transaction.atomic():
+        CostLayer.objects.filter(product_id__in=product_ids).delete()
+        ProductCost.objects.filter(product_id__in=product_ids).delete()
+        StockMovement.objects.filter(product_id__in=product_ids, cost_amount__isnull=False).update(
+            cost_amount=None
+        )
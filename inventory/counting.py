@@ -0,0 +1,332 @@
+"""
+Physical stock counts.
+
+`start()` opens a count of one location for the whole catalog (or one
+category) and freezes every active product's stock there as its expected
+quantity, with bulk inserts. Handheld scanners then upload their scans in batches through
+`record_scans()`: codes are resolved through the scan index, summed per
+product and applied to the count lines with one bulk update per batch. A
+batch id already seen on the count is reported as a duplicate and ignored,
+so a retried upload is never counted twice.
+
+The shelf keeps moving while the count runs, so a line's expected quantity
+is re-read from the location balance whenever the line is scanned: a sale
+made before the scan is already missing from both the shelf and the
+expected quantity. Uncounted lines posted as zero (`zero_uncounted`) are
+re-read at posting.
+
+Variances are counted minus expected, read with one annotated query over the
+lines (`variances()`). `post()` books the approved ones in one transaction:
+bulk-created `adjustment` stock movements at the counted location, their
+location balances, and a single UPDATE per batch of products that adds the
+variance to `current_stock`. Adding the variance, rather than overwriting
+the stock with the counted quantity, keeps the sales and receipts recorded
+between a line's scan and the posting.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import locations, scan
+
+COUNT_BATCH_SIZE = 500
+# Maximum number of scans accepted in one upload
+MAX_SCANS_PER_UPLOAD = 5000
+
+SCAN_MODES = ('add', 'set')
+
+
+class StockCountError(Exception):
+    pass
+
+
+def _open_count(count_id):
+    from .models import StockCount
+
+    try:
+        count = StockCount.objects.select_for_update().get(id=count_id)
+    except StockCount.DoesNotExist:
+        raise StockCountError('Stock count not found')
+    if count.status != 'counting':
+        raise StockCountError(f'Stock count {count.count_number} is {count.get_status_display().lower()}')
+    return count
+
+
+def start(user, category=None, location=None, notes=''):
+    """Open a count of `location` (default: the default location) and freeze the expected quantities"""
+    from dashboard.models import ActivityLog
+    from sales.batch import allocate_numbers
+    from .models import Product, StockBalance, StockCount, StockCountLine
+
+    location = location or locations.default_location()
+    products = Product.objects.filter(is_active=True)
+    if category is not None:
+        products = products.filter(category=category)
+
+    with transaction.atomic():
+        count = StockCount.objects.create(
+            count_number=allocate_numbers(StockCount, 'count_number', 'CNT', 1)[0],
+            category=category,
+            location=location,
+            notes=notes,
+            started_by=user,
+        )
+        on_hand = dict(
+            StockBalance.objects.filter(location=location, product__in=products)
+            .values_list('product_id', 'quantity').iterator(chunk_size=2000)
+        )
+        lines = []
+        for product_id, cost_price in (
+            products.order_by('id').values_list('id', 'cost_price').iterator(chunk_size=2000)
+        ):
+            lines.append(StockCountLine(
+                count=count, product_id=product_id, expected_quantity=on_hand.get(product_id, 0),
+                unit_cost=cost_price,
+            ))
+            if len(lines) == COUNT_BATCH_SIZE:
+                StockCountLine.objects.bulk_create(lines)
+                lines = []
+        StockCountLine.objects.bulk_create(lines)
+        ActivityLog.objects.create(
+            user=user,
+            action='create',
+            description=f'Started stock count {count.count_number}',
+            content_object=count,
+        )
+    return count
+
+
+def _location_balances(location, product_ids):
+    """{product_id: stock at `location`} for `product_ids` (missing: 0)"""
+    from .models import StockBalance
+
+    return dict(
+        StockBalance.objects.filter(location=location, product_id__in=product_ids)
+        .values_list('product_id', 'quantity')
+    )
+
+
+def record_scans(count_id, scans, user, batch_id=None, mode='add'):
+    """
+    Apply one uploaded batch of `scans` (`{'code', 'quantity'}` dicts; the
+    quantity defaults to 1) to the count. `add` adds to what was counted so
+    far, `set` replaces it. Returns a summary dict; codes that are unknown or
+    not part of the count are listed, not counted.
+    """
+    from .models import StockCountLine, StockCountUpload
+
+    if mode not in SCAN_MODES:
+        raise StockCountError(f"Unknown mode {mode!r}; choose from {', '.join(SCAN_MODES)}")
+
+    quantities = {}
+    for data in scans:
+        if not isinstance(data, dict) or not str(data.get('code') or '').strip():
+            raise StockCountError('Each scan needs a code')
+        try:
+            quantity = int(data.get('quantity', 1))
+        except (TypeError, ValueError):
+            raise StockCountError(f"Invalid quantity for {data['code']}")
+        if quantity < 0:
+            raise StockCountError(f"Negative quantity for {data['code']}")
+        code = scan.normalize_code(data['code'])
+        quantities[code] = quantities.get(code, 0) + quantity
+
+    products = scan.lookup_many(quantities)
+    unknown = [code for code, product in products.items() if product is None]
+    per_product = {}
+    for code, product in products.items():
+        if product is not None:
+            per_product[product['id']] = per_product.get(product['id'], 0) + quantities[code]
+
+    with transaction.atomic():
+        count = _open_count(count_id)
+        if batch_id:
+            try:
+                with transaction.atomic():
+                    StockCountUpload.objects.create(
+                        count=count, batch_id=batch_id, scan_count=len(scans), uploaded_by=user
+                    )
+            except IntegrityError:
+                return {'batch_id': batch_id, 'status': 'duplicate', 'lines': 0, 'unknown': [], 'not_in_count': []}
+
+        now = timezone.now()
+        lines = list(count.lines.select_for_update().filter(product_id__in=per_product))
+        on_hand = _location_balances(count.location, [line.product_id for line in lines])
+        for line in lines:
+            quantity = per_product[line.product_id]
+            line.counted_quantity = quantity if mode == 'set' else (line.counted_quantity or 0) + quantity
+            line.expected_quantity = on_hand.get(line.product_id, 0)
+            line.counted_at = now
+        StockCountLine.objects.bulk_update(
+            lines, ['counted_quantity', 'expected_quantity', 'counted_at'], batch_size=COUNT_BATCH_SIZE
+        )
+
+    in_count = {line.product_id for line in lines}
+    return {
+        'batch_id': batch_id,
+        'status': 'applied',
+        'lines': len(lines),
+        'unknown': unknown,
+        'not_in_count': [
+            code for code, product in products.items()
+            if product is not None and product['id'] not in in_count
+        ],
+    }
+
+
+def _variance(zero_uncounted):
+    counted = Coalesce('counted_quantity', 0) if zero_uncounted else F('counted_quantity')
+    return ExpressionWrapper(counted - F('expected_quantity'), output_field=IntegerField())
+
+
+def variances(count, zero_uncounted=False):
+    """
+    Count lines with a variance, annotated with `variance`; uncounted lines
+    are left out unless `zero_uncounted` (nothing found: variance -expected).
+    """
+    lines = count.lines.annotate(variance=_variance(zero_uncounted))
+    if not zero_uncounted:
+        lines = lines.filter(counted_quantity__isnull=False)
+    return lines.exclude(variance=0)
+
+
+def _summary_aggregates(zero_uncounted, prefix=''):
+    """summary() totals as aggregates over count lines reached through `prefix`"""
+    counted = F(f'{prefix}counted_quantity')
+    if zero_uncounted:
+        counted = Coalesce(counted, 0)
+    variance = ExpressionWrapper(counted - F(f'{prefix}expected_quantity'), output_field=IntegerField())
+    is_counted = Q(**{f'{prefix}counted_quantity__isnull': False})
+    differs = is_counted & ~Q(**{f'{prefix}counted_quantity': F(f'{prefix}expected_quantity')})
+    if zero_uncounted:
+        differs |= ~is_counted & ~Q(**{f'{prefix}expected_quantity': 0})
+    value = DecimalField(max_digits=14, decimal_places=2)
+    return {
+        'lines': Count(f'{prefix}id'),
+        'counted': Count(f'{prefix}id', filter=is_counted),
+        'variance_lines': Count(f'{prefix}id', filter=differs),
+        'variance_units': Coalesce(Sum(variance), 0),
+        'variance_value': Coalesce(
+            Sum(ExpressionWrapper(variance * F(f'{prefix}unit_cost'), output_field=value)),
+            Value(0), output_field=value,
+        ),
+    }
+
+
+def summary(count, zero_uncounted=False):
+    """Line counts and net variance (units and value at the frozen cost) of a count"""
+    totals = count.lines.aggregate(**_summary_aggregates(zero_uncounted))
+    totals['uncounted'] = totals['lines'] - totals['counted']
+    return totals
+
+
+def with_summaries(counts, zero_uncounted=False):
+    """
+    Annotate a StockCount queryset with the summary() totals of each count as
+    `summary_<key>`, in one grouped query; read them with `annotated_summary()`.
+    """
+    return counts.annotate(**{
+        f'summary_{key}': aggregate
+        for key, aggregate in _summary_aggregates(zero_uncounted, prefix='lines__').items()
+    })
+
+
+def annotated_summary(count):
+    """summary() of a count read from `with_summaries()`"""
+    totals = {
+        key: getattr(count, f'summary_{key}')
+        for key in ('lines', 'counted', 'variance_lines', 'variance_units', 'variance_value')
+    }
+    totals['uncounted'] = totals['lines'] - totals['counted']
+    return totals
+
+
+def post(count_id, user, line_ids=None, zero_uncounted=False):
+    """
+    Book the variances of the count (only `line_ids` if given) as adjustment
+    movements plus a bulk stock update, and close the count. Returns the
+    number of products adjusted.
+    """
+    from dashboard import events
+    from dashboard.models import ActivityLog
+    from .models import Product, StockCountLine, StockMovement
+
+    with transaction.atomic():
+        count = _open_count(count_id)
+        if zero_uncounted:
+            uncounted = list(count.lines.select_for_update().filter(counted_quantity__isnull=True))
+            on_hand = _location_balances(count.location, [line.product_id for line in uncounted])
+            for line in uncounted:
+                line.expected_quantity = on_hand.get(line.product_id, 0)
+            StockCountLine.objects.bulk_update(uncounted, ['expected_quantity'], batch_size=COUNT_BATCH_SIZE)
+        lines = variances(count, zero_uncounted)
+        if line_ids is not None:
+            lines = lines.filter(id__in=line_ids)
+        adjustments = list(lines.values_list('id', 'product_id', 'variance', 'unit_cost'))
+
+        movements = [
+            StockMovement(
+                product_id=product_id,
+                movement_type='adjustment',
+                quantity=variance,
+                unit_cost=unit_cost,
+                reference_number=count.count_number,
+                reference_model='StockCount',
+                reference_id=count.id,
+                location_id=count.location_id,
+                notes=f'Stock count {count.count_number}',
+                created_by=user,
+            )
+            for line_id, product_id, variance, unit_cost in adjustments
+        ]
+        StockMovement.objects.bulk_create(movements, batch_size=COUNT_BATCH_SIZE)
+        locations.apply(movements)
+
+        now = timezone.now()
+        for offset in range(0, len(adjustments), COUNT_BATCH_SIZE):
+            batch = adjustments[offset:offset + COUNT_BATCH_SIZE]
+            # One UPDATE per batch; updated_at is set so the offline catalog delta sees the stock
+            Product.objects.filter(id__in=[product_id for _, product_id, _, _ in batch]).update(
+                current_stock=F('current_stock') + Case(
+                    *[When(id=product_id, then=Value(variance)) for _, product_id, variance, _ in batch],
+                    output_field=IntegerField(),
+                ),
+                updated_at=now,
+            )
+            count.lines.filter(id__in=[line_id for line_id, _, _, _ in batch]).update(
+                adjustment_quantity=_variance(zero_uncounted)
+            )
+
+        count.status = 'posted'
+        count.posted_by = user
+        count.posted_at = now
+        count.save(update_fields=['status', 'posted_by', 'posted_at'])
+
+        product_ids = [product_id for _, product_id, _, _ in adjustments]
+        events.stock_changed(product_ids, 'stock_count', count.count_number)
+        transaction.on_commit(lambda: scan.product_changed(product_ids))
+        ActivityLog.objects.create(
+            user=user,
+            action='update',
+            description=f'Posted stock count {count.count_number}: {len(adjustments)} products adjusted',
+            content_object=count,
+        )
+    return len(adjustments)
+
+
+def cancel(count_id, user):
+    """Close the count without touching stock"""
+    from dashboard.models import ActivityLog
+
+    with transaction.atomic():
+        count = _open_count(count_id)
+        count.status = 'cancelled'
+        count.save(update_fields=['status'])
+        ActivityLog.objects.create(
+            user=user,
+            action='update',
+            description=f'Cancelled stock count {count.count_number}',
+            content_object=count,
+        )
+    return count
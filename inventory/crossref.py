@@ -0,0 +1,149 @@
+"""
+Part-number / OEM cross-reference lookup.
+
+Numbers are stored under a normalized key (uppercase, separators stripped)
+so "15400-PLM-A02", "15400PLMA02" and "15400 plm a02" all resolve through a
+single indexed equality lookup.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS
+
+NON_ALNUM_RE = re.compile(r'[\W_]+')
+
+# Product fields mirrored into the cross-reference table
+PRODUCT_NUMBER_FIELDS = {
+    'part_number': 'part',
+    'oem_number': 'oem',
+}
+
+
+def normalize_part_number(value):
+    """Uppercase a part number and drop spaces, dashes, dots and slashes"""
+    if not value:
+        return ''
+    return NON_ALNUM_RE.sub('', str(value)).upper()[:100]
+
+
+def lookup(number, using=DEFAULT_DB_ALIAS):
+    """Cross-reference rows matching `number`, with their products"""
+    from .models import PartCrossReference
+    key = normalize_part_number(number)
+    if not key:
+        return PartCrossReference.objects.none()
+    return (
+        PartCrossReference.objects.using(using)
+        .filter(normalized_key=key)
+        .select_related('product', 'product__brand', 'product__unit')
+    )
+
+
+def sync_product_numbers(product_rows, model=None, using=DEFAULT_DB_ALIAS):
+    """
+    Mirror `Product.part_number` / `Product.oem_number` into the table.
+
+    `product_rows` are dicts with `id`, `part_number` and `oem_number`.
+    """
+    if model is None:
+        from .models import PartCrossReference
+        model = PartCrossReference
+    product_rows = list(product_rows)
+    if not product_rows:
+        return
+    manager = model.objects.using(using)
+    manager.filter(
+        product_id__in=[row['id'] for row in product_rows], source='product'
+    ).delete()
+
+    references = []
+    for row in product_rows:
+        for field, reference_type in PRODUCT_NUMBER_FIELDS.items():
+            key = normalize_part_number(row.get(field))
+            if key:
+                references.append(model(
+                    product_id=row['id'],
+                    number=row[field],
+                    normalized_key=key,
+                    reference_type=reference_type,
+                    source='product',
+                ))
+    manager.bulk_create(references, batch_size=1000, ignore_conflicts=True)
+
+
+def import_cross_references(rows, supplier=None, batch_size=1000, using=DEFAULT_DB_ALIAS):
+    """
+    Bulk import a supplier cross-reference list.
+
+    Each row is a dict with `number` plus either `sku` (our product) or
+    `match_number` (a number already cross-referenced to our products), and
+    optional `reference_type` and `manufacturer`. Returns a summary dict with
+    the number of `imported` references (references that already exist are
+    skipped) and a list of `errors` as (row_number, message).
+    """
+    from .models import PartCrossReference, Product
+
+    sku_map = dict(Product.objects.using(using).values_list('sku', 'id'))
+    key_map = {}
+    # (product_id, normalized_key, reference_type) already stored or queued
+    seen = set()
+    for product_id, key, reference_type in PartCrossReference.objects.using(using).values_list(
+        'product_id', 'normalized_key', 'reference_type'
+    ):
+        key_map.setdefault(key, set()).add(product_id)
+        seen.add((product_id, key, reference_type))
+
+    valid_types = dict(PartCrossReference.REFERENCE_TYPE_CHOICES)
+    pending = []
+    imported = 0
+    errors = []
+
+    def flush():
+        nonlocal imported
+        if pending:
+            # Existing references are filtered out while reading the rows; the
+            # database still drops any added concurrently
+            PartCrossReference.objects.using(using).bulk_create(
+                pending, batch_size=batch_size, ignore_conflicts=True
+            )
+            imported += len(pending)
+            pending.clear()
+
+    for row_number, row in enumerate(rows, start=1):
+        number = (row.get('number') or '').strip()
+        key = normalize_part_number(number)
+        if not key:
+            errors.append((row_number, 'Missing number'))
+            continue
+
+        reference_type = (row.get('reference_type') or 'aftermarket').strip().lower()
+        if reference_type not in valid_types:
+            errors.append((row_number, f'Unknown reference type: {reference_type}'))
+            continue
+
+        sku = (row.get('sku') or '').strip()
+        if sku:
+            product_ids = {sku_map[sku]} if sku in sku_map else set()
+        else:
+            product_ids = key_map.get(normalize_part_number(row.get('match_number')), set())
+        if not product_ids:
+            errors.append((row_number, 'No matching product'))
+            continue
+
+        for product_id in product_ids:
+            if (product_id, key, reference_type) in seen:
+                continue
+            seen.add((product_id, key, reference_type))
+            pending.append(PartCrossReference(
+                product_id=product_id,
+                number=number[:100],
+                normalized_key=key,
+                reference_type=reference_type,
+                manufacturer=(row.get('manufacturer') or '').strip()[:100],
+                supplier=supplier,
+                source='import',
+            ))
+        if len(pending) >= batch_size:
+            flush()
+
+    flush()
+    return {'imported': imported, 'errors': errors}
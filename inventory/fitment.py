@@ -0,0 +1,255 @@
+"""
+Vehicle fitment index.
+
+`Product.compatible_vehicles` is free text such as
+"Bajaj Boxer 150 2012-2018، TVS King, Honda Civic (2006-2011), Accord 2008+".
+`parse_compatible_vehicles` turns it into (make, model, year range) specs,
+`backfill_fitments` stores them as `ProductFitment` rows and
+`parts_for_vehicle` answers "parts for vehicle X in category Y" through
+indexed lookups instead of LIKE scans.
+"""
+import re
+from collections import namedtuple
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+from .search import normalize_text, tokenize
+
+FitmentSpec = namedtuple('FitmentSpec', ['make', 'vehicle_type', 'model', 'year_from', 'year_to'])
+
+# Aliases (English and Arabic) -> (canonical make, default vehicle type)
+KNOWN_MAKES = {
+    'bajaj': ('Bajaj', 'motorcycle'), 'باجاج': ('Bajaj', 'motorcycle'),
+    'tvs': ('TVS', 'motorcycle'),
+    'hero': ('Hero', 'motorcycle'), 'هيرو': ('Hero', 'motorcycle'),
+    'yamaha': ('Yamaha', 'motorcycle'), 'ياماها': ('Yamaha', 'motorcycle'),
+    'haojue': ('Haojue', 'motorcycle'),
+    'dayun': ('Dayun', 'motorcycle'), 'دايون': ('Dayun', 'motorcycle'),
+    'piaggio': ('Piaggio', 'tuktuk'), 'بياجيو': ('Piaggio', 'tuktuk'),
+    'honda': ('Honda', 'car'), 'هوندا': ('Honda', 'car'),
+    'suzuki': ('Suzuki', 'car'), 'سوزوكي': ('Suzuki', 'car'),
+    'toyota': ('Toyota', 'car'), 'تويوتا': ('Toyota', 'car'),
+    'hyundai': ('Hyundai', 'car'), 'هيونداي': ('Hyundai', 'car'),
+    'kia': ('Kia', 'car'), 'كيا': ('Kia', 'car'),
+    'nissan': ('Nissan', 'car'), 'نيسان': ('Nissan', 'car'),
+    'chevrolet': ('Chevrolet', 'car'), 'شيفروليه': ('Chevrolet', 'car'),
+    'daewoo': ('Daewoo', 'car'), 'دايو': ('Daewoo', 'car'),
+    'fiat': ('Fiat', 'car'), 'فيات': ('Fiat', 'car'),
+    'peugeot': ('Peugeot', 'car'), 'بيجو': ('Peugeot', 'car'),
+    'renault': ('Renault', 'car'), 'رينو': ('Renault', 'car'),
+    'mitsubishi': ('Mitsubishi', 'car'), 'ميتسوبيشي': ('Mitsubishi', 'car'),
+    'skoda': ('Skoda', 'car'), 'سكودا': ('Skoda', 'car'),
+    'opel': ('Opel', 'car'), 'اوبل': ('Opel', 'car'),
+    'lada': ('Lada', 'car'), 'لادا': ('Lada', 'car'),
+    'chery': ('Chery', 'car'), 'شيري': ('Chery', 'car'),
+    'geely': ('Geely', 'car'), 'جيلي': ('Geely', 'car'),
+    'byd': ('BYD', 'car'),
+    'mg': ('MG', 'car'),
+    'mercedes': ('Mercedes', 'car'), 'مرسيدس': ('Mercedes', 'car'),
+    'bmw': ('BMW', 'car'),
+    'volkswagen': ('Volkswagen', 'car'), 'vw': ('Volkswagen', 'car'), 'فولكس': ('Volkswagen', 'car'),
+}
+
+CHUNK_SPLIT_RE = re.compile(r'[,;\n،؛|]+')
+YEAR_RANGE_RE = re.compile(r'\b((?:19|20)\d{2})\s*(?:-|–|/|to|الى|حتى)\s*((?:19|20)?\d{2})\b')
+YEAR_OPEN_RE = re.compile(r'\b((?:19|20)\d{2})\s*\+')
+YEAR_SINGLE_RE = re.compile(r'\b((?:19|20)\d{2})\b')
+BRACKETS_RE = re.compile(r'[()\[\]{}]')
+
+
+def normalize_model_name(name):
+    return ' '.join(tokenize(name))[:100]
+
+
+def normalize_digits(text):
+    return text.translate(str.maketrans('٠١٢٣٤٥٦٧٨٩', '0123456789'))
+
+
+def make_aliases(extra_makes=()):
+    """Normalized alias -> (make, vehicle type), including makes stored in the database"""
+    aliases = {normalize_text(alias): value for alias, value in KNOWN_MAKES.items()}
+    for name, vehicle_type in extra_makes:
+        aliases.setdefault(normalize_text(name), (name, vehicle_type))
+    return aliases
+
+
+def _extract_years(chunk):
+    """Return (year_from, year_to, chunk without the years)"""
+    match = YEAR_RANGE_RE.search(chunk)
+    if match:
+        year_from = int(match.group(1))
+        year_to = match.group(2)
+        if len(year_to) == 2:
+            year_to = year_from // 100 * 100 + int(year_to)
+        year_to = int(year_to)
+        if year_to < year_from:
+            year_from, year_to = year_to, year_from
+        return year_from, year_to, chunk[:match.start()] + ' ' + chunk[match.end():]
+
+    match = YEAR_OPEN_RE.search(chunk)
+    if match:
+        return int(match.group(1)), None, chunk[:match.start()] + ' ' + chunk[match.end():]
+
+    match = YEAR_SINGLE_RE.search(chunk)
+    if match:
+        year = int(match.group(1))
+        return year, year, chunk[:match.start()] + ' ' + chunk[match.end():]
+
+    return None, None, chunk
+
+
+def parse_compatible_vehicles(text, aliases=None):
+    """
+    Parse free-text compatibility into `FitmentSpec`s.
+
+    Returns (specs, unparsed_chunks). A chunk without a make inherits the
+    make of the previous chunk ("Honda Civic 2006-2011, Accord 2008").
+    """
+    if aliases is None:
+        aliases = make_aliases()
+    specs = []
+    unparsed = []
+    current_make = None
+
+    for raw_chunk in CHUNK_SPLIT_RE.split(text or ''):
+        chunk = raw_chunk.strip()
+        if not chunk:
+            continue
+        # Arabic-Indic digits -> ASCII before year matching
+        year_from, year_to, rest = _extract_years(normalize_digits(chunk))
+        words = BRACKETS_RE.sub(' ', rest).split()
+
+        if words and normalize_text(words[0]) in aliases:
+            current_make = aliases[normalize_text(words[0])]
+            words = words[1:]
+
+        model = ' '.join(words).strip(' -_.')
+        if current_make is None or not normalize_model_name(model):
+            unparsed.append(chunk)
+            continue
+
+        specs.append(FitmentSpec(current_make[0], current_make[1], model[:100], year_from, year_to))
+
+    return specs, unparsed
+
+
+def backfill_fitments(product_queryset, batch_size=500, dry_run=False, preload=True,
+                      using=DEFAULT_DB_ALIAS):
+    """
+    Rebuild parsed fitments for the products in `product_queryset`.
+
+    Manual fitments are left untouched. With `preload` all vehicle models are
+    read once up front (for bulk backfills); otherwise they are looked up as
+    needed (for single-product saves). Returns a stats dict.
+    """
+    from .models import ProductFitment, VehicleMake, VehicleModel
+
+    makes = {make.name: make for make in VehicleMake.objects.using(using).all()}
+    aliases = make_aliases((make.name, make.vehicle_type) for make in makes.values())
+    models_cache = {}
+    if preload:
+        models_cache = {
+            (model.make_id, model.normalized_name): model
+            for model in VehicleModel.objects.using(using).all()
+        }
+    stats = {'products': 0, 'fitments': 0, 'unparsed': 0}
+
+    queryset = product_queryset.using(using).order_by('id')
+    last_id = 0
+    while True:
+        rows = list(
+            queryset.filter(id__gt=last_id)
+            .values('id', 'compatible_vehicles', 'category__vehicle_type')[:batch_size]
+        )
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+
+        fitments = []
+        for row in rows:
+            specs, unparsed = parse_compatible_vehicles(row['compatible_vehicles'], aliases)
+            stats['products'] += 1
+            stats['unparsed'] += len(unparsed)
+            if dry_run:
+                stats['fitments'] += len(specs)
+                continue
+
+            for spec in specs:
+                make = makes.get(spec.make)
+                if make is None:
+                    make = VehicleMake.objects.using(using).create(name=spec.make, vehicle_type=spec.vehicle_type)
+                    makes[spec.make] = make
+
+                normalized_name = normalize_model_name(spec.model)
+                vehicle_model = models_cache.get((make.id, normalized_name))
+                if vehicle_model is None:
+                    vehicle_type = row['category__vehicle_type']
+                    if not vehicle_type or vehicle_type == 'general':
+                        vehicle_type = make.vehicle_type
+                    vehicle_model, created = VehicleModel.objects.using(using).get_or_create(
+                        make=make, normalized_name=normalized_name,
+                        defaults={'name': spec.model, 'vehicle_type': vehicle_type}
+                    )
+                    models_cache[(make.id, normalized_name)] = vehicle_model
+
+                fitments.append(ProductFitment(
+                    product_id=row['id'],
+                    vehicle_model=vehicle_model,
+                    year_from=spec.year_from,
+                    year_to=spec.year_to,
+                    source='parsed',
+                ))
+
+        if not dry_run:
+            ProductFitment.objects.using(using).filter(
+                product_id__in=[row['id'] for row in rows], source='parsed'
+            ).delete()
+            ProductFitment.objects.using(using).bulk_create(fitments, batch_size=1000)
+            stats['fitments'] += len(fitments)
+
+    return stats
+
+
+def resolve_make(name):
+    """Canonical make name for user input such as "باجاج" or "bajaj" """
+    alias = make_aliases().get(normalize_text(name))
+    return alias[0] if alias else name.strip()
+
+
+def parts_for_vehicle(queryset, make=None, model=None, year=None, category=None,
+                      vehicle_type=None, using=DEFAULT_DB_ALIAS):
+    """
+    Filter a product queryset to parts fitting a vehicle.
+
+    `model` matches by normalized prefix ("boxer" finds "Boxer 150"). Fitments
+    without a year range fit every year. `vehicle_type` matches the product
+    category's vehicle type, with 'general' categories fitting every type.
+    """
+    from .models import ProductFitment, VehicleModel
+
+    if make or model:
+        vehicle_models = VehicleModel.objects.using(using).all()
+        if make:
+            vehicle_models = vehicle_models.filter(make__name__iexact=resolve_make(make))
+        if model:
+            vehicle_models = vehicle_models.filter(normalized_name__startswith=normalize_model_name(model))
+        model_ids = list(vehicle_models.values_list('id', flat=True))
+        if not model_ids:
+            return queryset.none()
+
+        fitments = ProductFitment.objects.using(using).filter(vehicle_model_id__in=model_ids)
+        if year:
+            fitments = fitments.filter(
+                Q(year_from__isnull=True) | Q(year_from__lte=year),
+                Q(year_to__isnull=True) | Q(year_to__gte=year),
+            )
+        queryset = queryset.filter(id__in=fitments.values('product_id'))
+
+    if category:
+        queryset = queryset.filter(Q(category=category) | Q(category__parent_category=category))
+
+    if vehicle_type:
+        queryset = queryset.filter(category__vehicle_type__in=[vehicle_type, 'general'])
+
+    return queryset
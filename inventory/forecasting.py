@@ -0,0 +1,214 @@
+"""
+Demand forecasting for stock thresholds.
+
+Daily demand per product is read with one grouped query per batch of
+products (sold quantities from `SaleItem`, less customer returns recorded as
+`return_in` stock movements) and laid out as a products x days NumPy matrix.
+Forecasts are computed for the whole batch at once:
+
+* ``ses`` - simple exponential smoothing; the one-step-ahead errors give the
+  demand deviation,
+* ``ma`` - moving average and standard deviation of the last `window` days.
+
+Thresholds follow from the daily forecast ``d``, its deviation ``s`` and the
+supplier lead time ``L`` (preferred `ProductSupplier`, else the default):
+
+    safety stock   = z * s * sqrt(L)          -> minimum_stock
+    reorder level  = d * L + safety stock
+    maximum stock  = reorder level + d * review_days
+
+`propose()` returns the proposals; `apply()` writes them with bulk updates
+and publishes `stock_changed` so alerts follow. The `forecast_demand`
+command wraps both with a dry-run report.
+"""
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from sales.models import Sale
+
+FORECAST_BATCH_SIZE = 500
+
+METHODS = ('ses', 'ma')
+DEFAULT_HISTORY_DAYS = 180
+DEFAULT_ALPHA = 0.3
+DEFAULT_WINDOW = 28
+DEFAULT_SERVICE_LEVEL = 0.95
+DEFAULT_REVIEW_DAYS = 30
+
+
+THRESHOLD_FIELDS = ['minimum_stock', 'reorder_level', 'maximum_stock']
+
+
+def demand_matrix(product_ids, start, days):
+    """Daily net demand, shape (len(product_ids), days), for the days from `start`"""
+    from sales.models import SaleItem
+    from .models import StockMovement
+
+    matrix = np.zeros((len(product_ids), days))
+    row_of = {product_id: row for row, product_id in enumerate(product_ids)}
+    end = start + timedelta(days=days)
+
+    sold = (
+        SaleItem.objects.filter(
+            product_id__in=product_ids,
+            sale__sale_date__date__gte=start, sale__sale_date__date__lt=end,
+        )
+        .exclude(sale__status__in=Sale.VOID_STATUSES)
+        .annotate(day=TruncDate('sale__sale_date'))
+        .values('product_id', 'day').annotate(quantity=Sum('quantity')).order_by()
+    )
+    returned = (
+        StockMovement.objects.filter(
+            product_id__in=product_ids, movement_type='return_in',
+            created_at__date__gte=start, created_at__date__lt=end,
+        )
+        .annotate(day=TruncDate('created_at'))
+        .values('product_id', 'day').annotate(quantity=Sum('quantity')).order_by()
+    )
+    for rows, sign in ((sold, 1), (returned, -1)):
+        rows = list(rows)
+        if not rows:
+            continue
+        index = np.array([row_of[row['product_id']] for row in rows])
+        offset = np.array([(row['day'] - start).days for row in rows])
+        quantity = np.array([abs(row['quantity']) for row in rows], dtype=float)
+        np.add.at(matrix, (index, offset), sign * quantity)
+    return np.clip(matrix, 0, None)
+
+
+def exponential_smoothing(demand, alpha=DEFAULT_ALPHA):
+    """(level, deviation) per row; deviation is the RMS of the one-step-ahead errors"""
+    level = demand[:, 0].copy()
+    squared_errors = np.zeros(demand.shape[0])
+    for t in range(1, demand.shape[1]):
+        error = demand[:, t] - level
+        squared_errors += error ** 2
+        level += alpha * error
+    steps = max(demand.shape[1] - 1, 1)
+    return level, np.sqrt(squared_errors / steps)
+
+
+def moving_average(demand, window=DEFAULT_WINDOW):
+    """(mean, standard deviation) per row over the last `window` days"""
+    recent = demand[:, -window:]
+    ddof = 1 if recent.shape[1] > 1 else 0
+    return recent.mean(axis=1), recent.std(axis=1, ddof=ddof)
+
+
+def _lead_times(product_ids):
+    from purchases.replenishment import DEFAULT_LEAD_TIME_DAYS
+    from .models import ProductSupplier
+
+    lead_times = {}
+    for product_id, lead_time in (
+        ProductSupplier.objects.filter(product_id__in=product_ids, supplier__is_active=True)
+        .order_by('-is_preferred', '-last_purchased_at', 'id')
+        .values_list('product_id', 'lead_time_days')
+    ):
+        lead_times.setdefault(product_id, lead_time)
+    return np.array(
+        [lead_times.get(product_id, DEFAULT_LEAD_TIME_DAYS) for product_id in product_ids], dtype=float
+    )
+
+
+def propose(products=None, history_days=DEFAULT_HISTORY_DAYS, method='ses', alpha=DEFAULT_ALPHA,
+            window=DEFAULT_WINDOW, service_level=DEFAULT_SERVICE_LEVEL, review_days=DEFAULT_REVIEW_DAYS):
+    """
+    Threshold proposals for `products` (default: all active products).
+
+    Products without demand in the history window keep their thresholds and
+    are left out. Each proposal is a dict with `product`, `daily_demand`,
+    `deviation`, `lead_time_days`, `current` and `proposed` (both
+    `{field: value}` for THRESHOLD_FIELDS) and `changed`.
+    """
+    from .models import Product
+
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}; choose from {', '.join(METHODS)}")
+    if not 0 < service_level < 1:
+        raise ValueError('Service level must be between 0 and 1')
+
+    if products is None:
+        products = Product.objects.filter(is_active=True)
+    products = products.order_by('id').only('id', 'name', 'sku', *THRESHOLD_FIELDS)
+    z = NormalDist().inv_cdf(service_level)
+    start = timezone.localdate() - timedelta(days=history_days)
+
+    proposals = []
+    product_ids = list(products.values_list('id', flat=True))
+    for offset in range(0, len(product_ids), FORECAST_BATCH_SIZE):
+        batch = list(products.filter(id__in=product_ids[offset:offset + FORECAST_BATCH_SIZE]))
+        ids = [product.id for product in batch]
+        demand = demand_matrix(ids, start, history_days)
+        if method == 'ses':
+            daily, deviation = exponential_smoothing(demand, alpha)
+        else:
+            daily, deviation = moving_average(demand, window)
+        lead_time = _lead_times(ids)
+
+        safety = z * deviation * np.sqrt(lead_time)
+        reorder = daily * lead_time + safety
+        maximum = reorder + daily * review_days
+        thresholds = np.ceil(np.stack([safety, reorder, maximum], axis=1)).astype(int)
+        has_demand = demand.sum(axis=1) > 0
+
+        for row, product in enumerate(batch):
+            if not has_demand[row]:
+                continue
+            minimum_stock, reorder_level, maximum_stock = (int(value) for value in thresholds[row])
+            # Keep the thresholds ordered and the maximum above the reorder point
+            reorder_level = max(reorder_level, minimum_stock)
+            maximum_stock = max(maximum_stock, reorder_level + 1)
+            current = {field: getattr(product, field) for field in THRESHOLD_FIELDS}
+            proposed = {
+                'minimum_stock': minimum_stock,
+                'reorder_level': reorder_level,
+                'maximum_stock': maximum_stock,
+            }
+            proposals.append({
+                'product': product,
+                'daily_demand': round(float(daily[row]), 3),
+                'deviation': round(float(deviation[row]), 3),
+                'lead_time_days': int(lead_time[row]),
+                'current': current,
+                'proposed': proposed,
+                'changed': current != proposed,
+            })
+    return proposals
+
+
+def apply(proposals, user=None):
+    """Write the changed proposals with bulk updates; returns the number of products updated"""
+    from dashboard import events
+    from dashboard.models import ActivityLog
+    from .models import Product
+
+    now = timezone.now()
+    changed = []
+    for proposal in proposals:
+        if not proposal['changed']:
+            continue
+        product = proposal['product']
+        for field, value in proposal['proposed'].items():
+            setattr(product, field, value)
+        product.updated_at = now
+        changed.append(product)
+    if not changed:
+        return 0
+
+    with transaction.atomic():
+        Product.objects.bulk_update(changed, THRESHOLD_FIELDS + ['updated_at'], batch_size=FORECAST_BATCH_SIZE)
+        events.stock_changed([product.id for product in changed], 'thresholds')
+        if user is not None:
+            ActivityLog.objects.create(
+                user=user,
+                action='update',
+                description=f'Applied forecast stock thresholds to {len(changed)} products',
+            )
+    return len(changed)
+
@@ -1,6 +1,6 @@
 from django import forms
 from django.core.exceptions import ValidationError
-from .models import Product, Category, Brand, Customer, Supplier, StockMovement, Unit, ShopSettings, Invoice, InvoiceItem
+from .models import Product, Category, Brand, Customer, Supplier, StockMovement, Unit, ShopSettings, Invoice, InvoiceItem, VehicleMake, ProductImport
 import re
 
 class ProductForm(forms.ModelForm):
@@ -308,6 +308,44 @@ class ProductFilterForm(forms.Form):
         required=False,
         widget=forms.Select(attrs={'class': 'form-control'})
     )
+    
+    abc_class = forms.ChoiceField(
+        choices=[('', 'All ABC Classes')] + Product.ABC_CLASS_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    
+    xyz_class = forms.ChoiceField(
+        choices=[('', 'All XYZ Classes')] + Product.XYZ_CLASS_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    
+    vehicle_make = forms.ModelChoiceField(
+        queryset=VehicleMake.objects.all(),
+        required=False,
+        empty_label="All Makes",
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    
+    vehicle_model = forms.CharField(
+        max_length=100,
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Vehicle model...'
+        })
+    )
+    
+    vehicle_year = forms.IntegerField(
+        min_value=1900,
+        max_value=2100,
+        required=False,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Year'
+        })
+    )
 
 class BulkActionForm(forms.Form):
     """Form for bulk actions on products"""
@@ -342,6 +380,28 @@ class BulkActionForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-control'})
     )
 
+class ProductImportForm(forms.Form):
+    """Upload of a product catalog file for a bulk import"""
+
+    file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+    mode = forms.ChoiceField(
+        choices=ProductImport.MODE_CHOICES,
+        initial='upsert',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        if not file.name.lower().endswith(('.csv', '.xlsx', '.xlsm')):
+            raise ValidationError('Upload a CSV or XLSX file.')
+        return file
+
 class UnitForm(forms.ModelForm):
     """Form for creating and updating units"""
 
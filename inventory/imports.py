@@ -0,0 +1,412 @@
+"""
+Bulk product import from CSV or XLSX files.
+
+An upload becomes a `ProductImport` job that a worker runs in the
+background (`import_products --worker`). The file is streamed twice: a
+first pass reads the header and counts the rows, for the progress bar; the
+second parses and validates row by row and writes every `IMPORT_BATCH_SIZE`
+valid rows with one `bulk_update` and one `bulk_create`, each batch in its
+own transaction. Progress and rejected rows (`ProductImportError`) are
+saved with each batch, so a job can be followed while it runs and its error
+report downloaded afterwards.
+
+Nothing is looked up per row: categories, brands and units are resolved by
+name through dicts read up front, and SKU and barcode uniqueness is checked
+against in-memory key sets of the catalog that are updated as rows are
+accepted, so duplicates inside the file are caught as well.
+
+Columns are matched by header (case-insensitive, spaces as underscores);
+only `sku` is required, plus `name`, `category`, `unit`, `cost_price` and
+`selling_price` to create a product. Blank cells leave an existing
+product's field unchanged. A new product without a barcode gets its SKU as
+barcode. `current_stock` is the opening stock of new products, booked as an
+`INITIAL` adjustment like a product created by hand; the stock of existing
+products only changes through stock movements, so the column is ignored
+for them. Selling price changes of existing products go to the price
+history (`inventory.pricing`), and threshold or active flag changes publish
+`stock_changed` so their alerts are re-evaluated.
+"""
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import alerts, locations, pricing
+
+IMPORT_BATCH_SIZE = 500
+
+TEXT_FIELDS = {
+    'name': 200,
+    'barcode': 100,
+    'description': None,
+    'part_number': 100,
+    'oem_number': 100,
+    'compatible_vehicles': None,
+}
+DECIMAL_FIELDS = ('cost_price', 'selling_price', 'wholesale_price')
+INTEGER_FIELDS = ('current_stock', 'minimum_stock', 'maximum_stock', 'reorder_level')
+REFERENCE_FIELDS = ('category', 'brand', 'unit')
+COLUMNS = {'sku', 'is_active', *TEXT_FIELDS, *DECIMAL_FIELDS, *INTEGER_FIELDS, *REFERENCE_FIELDS}
+REQUIRED_FOR_CREATE = ('name', 'category', 'unit', 'cost_price', 'selling_price')
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'نعم'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'لا'}
+
+
+class ImportFileError(Exception):
+    pass
+
+
+class RowError(Exception):
+    pass
+
+
+def detect_format(filename):
+    """'xlsx' or 'csv' from a file name"""
+    return 'xlsx' if str(filename).lower().endswith(('.xlsx', '.xlsm')) else 'csv'
+
+
+def _column(header):
+    return str(header or '').strip().lower().replace(' ', '_')
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Excel stores whole numbers (barcodes, quantities) as floats
+        value = int(value)
+    return str(value).strip()
+
+
+def read_rows(file, file_format):
+    """
+    Yield `(row_number, {column: text})` from an open binary file, one row
+    at a time; the header is row 1 and blank rows are skipped.
+    """
+    if file_format == 'xlsx':
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportFileError('Reading XLSX files needs the openpyxl package; upload a CSV file instead')
+        try:
+            workbook = load_workbook(file, read_only=True, data_only=True)
+        except Exception as e:
+            raise ImportFileError(f'Not a readable XLSX file: {e}')
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            columns = [_column(header) for header in next(rows, ())]
+            for row_number, values in enumerate(rows, start=2):
+                row = {column: _cell(value) for column, value in zip(columns, values) if column}
+                if any(row.values()):
+                    yield row_number, row
+        finally:
+            workbook.close()
+        return
+
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.reader(text)
+        columns = [_column(header) for header in next(reader, [])]
+        for row_number, values in enumerate(reader, start=2):
+            row = {column: value.strip() for column, value in zip(columns, values) if column}
+            if any(row.values()):
+                yield row_number, row
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportFileError(f'Not a readable UTF-8 CSV file: {e}')
+    finally:
+        text.detach()
+
+
+def scan_file(file, file_format):
+    """Columns found and number of data rows, in one streaming pass"""
+    columns = set()
+    total = 0
+    for _, row in read_rows(file, file_format):
+        columns.update(row)
+        total += 1
+    return columns, total
+
+
+def load_references():
+    """Name -> id dicts for categories, brands and units (units also by Arabic name and abbreviation)"""
+    from .models import Brand, Category, Unit
+
+    references = {
+        'category': {name.strip().lower(): pk for pk, name in Category.objects.values_list('id', 'name')},
+        'brand': {name.strip().lower(): pk for pk, name in Brand.objects.values_list('id', 'name')},
+        'unit': {},
+    }
+    for pk, *names in Unit.objects.values_list('id', 'name', 'name_arabic', 'abbreviation'):
+        for name in names:
+            if name:
+                references['unit'].setdefault(name.strip().lower(), pk)
+    return references
+
+
+def parse_row(row, references):
+    """Typed product field values of the non-blank cells of `row`; raises RowError"""
+    values = {}
+    for field, max_length in TEXT_FIELDS.items():
+        if row.get(field):
+            if max_length and len(row[field]) > max_length:
+                raise RowError(f'{field} is longer than {max_length} characters')
+            values[field] = row[field]
+    for field in DECIMAL_FIELDS:
+        if row.get(field):
+            try:
+                value = Decimal(row[field].replace(',', '')).quantize(Decimal('0.01'))
+            except InvalidOperation:
+                raise RowError(f'Invalid {field}: {row[field]}')
+            if value < 0 or value >= Decimal('100000000'):
+                raise RowError(f'Invalid {field}: {row[field]}')
+            values[field] = value
+    for field in INTEGER_FIELDS:
+        if row.get(field):
+            try:
+                value = Decimal(row[field])
+            except InvalidOperation:
+                value = None
+            if value is None or value != value.to_integral_value() or value < 0:
+                raise RowError(f'Invalid {field}: {row[field]}')
+            values[field] = int(value)
+    for field in REFERENCE_FIELDS:
+        if row.get(field):
+            pk = references[field].get(row[field].lower())
+            if pk is None:
+                raise RowError(f'Unknown {field}: {row[field]}')
+            values[f'{field}_id'] = pk
+    if row.get('is_active'):
+        flag = row['is_active'].lower()
+        if flag not in TRUE_VALUES | FALSE_VALUES:
+            raise RowError(f"Invalid is_active: {row['is_active']}")
+        values['is_active'] = flag in TRUE_VALUES
+    return values
+
+
+class _Catalog:
+    """SKU and barcode keys of the catalog, updated as rows are accepted"""
+
+    def __init__(self):
+        from .models import Product
+
+        self.sku_ids = {}
+        self.barcodes = {}
+        self.sku_barcodes = {}
+        for pk, sku, barcode in Product.objects.values_list('id', 'sku', 'barcode').iterator(chunk_size=5000):
+            self.sku_ids[sku] = pk
+            if barcode:
+                self.barcodes[barcode] = sku
+                self.sku_barcodes[sku] = barcode
+        self.seen = {}
+
+    def accept(self, row_number, sku, values, mode):
+        """Check `sku`/`values` against the keys and claim them; raises RowError"""
+        if sku in self.seen:
+            raise RowError(f'Duplicate SKU in file (row {self.seen[sku]})')
+        exists = sku in self.sku_ids
+        if exists and mode == 'create':
+            raise RowError('SKU already exists')
+        if not exists and mode == 'update':
+            raise RowError('Unknown SKU')
+        if exists:
+            values.pop('current_stock', None)
+        else:
+            missing = [field for field in REQUIRED_FOR_CREATE if field not in values and f'{field}_id' not in values]
+            if missing:
+                raise RowError(f"Missing {', '.join(missing)}")
+            values.setdefault('barcode', sku)
+
+        barcode = values.get('barcode')
+        if barcode:
+            owner = self.barcodes.get(barcode)
+            if owner is not None and owner != sku:
+                raise RowError(f'Barcode {barcode} is already used by {owner}')
+            previous = self.sku_barcodes.get(sku)
+            if previous and previous != barcode:
+                del self.barcodes[previous]
+            self.barcodes[barcode] = sku
+            self.sku_barcodes[sku] = barcode
+        self.seen[sku] = row_number
+        return exists
+
+
+def _save_batch(rows, catalog, product_import):
+    """Write one batch of accepted `(row_number, sku, values, exists)` rows; returns (created, updated)"""
+    from dashboard import events
+    from .models import Product, StockMovement
+    from .signals import refresh_product_indexes
+
+    now = timezone.now()
+    updates = [(sku, values) for _, sku, values, exists in rows if exists]
+    creates = [(sku, values) for _, sku, values, exists in rows if not exists]
+
+    # Updates first, so a barcode given up by an existing product is free for a new one
+    if updates:
+        products = Product.objects.in_bulk([catalog.sku_ids[sku] for sku, _ in updates])
+        fields = {'updated_at'}
+        price_changes = []
+        threshold_changes = []
+        for sku, values in updates:
+            product = products[catalog.sku_ids[sku]]
+            if 'selling_price' in values:
+                price_changes.append((product.id, product.selling_price, values['selling_price']))
+            if any(field in values and values[field] != getattr(product, field) for field in alerts.PRODUCT_FIELDS):
+                threshold_changes.append(product.id)
+            for field, value in values.items():
+                setattr(product, field, value)
+            product.updated_at = now
+            fields.update(values)
+        Product.objects.bulk_update(products.values(), sorted(fields), batch_size=IMPORT_BATCH_SIZE)
+        pricing.record(price_changes, 'import', product_import.created_by, now)
+        events.stock_changed(threshold_changes, 'thresholds')
+
+    if creates:
+        Product.objects.bulk_create(
+            [Product(sku=sku, **values) for sku, values in creates], batch_size=IMPORT_BATCH_SIZE
+        )
+        # Not every backend returns the new ids from bulk_create
+        catalog.sku_ids.update(
+            Product.objects.filter(sku__in=[sku for sku, _ in creates]).values_list('sku', 'id')
+        )
+        location = locations.default_location()
+        movements = [
+            StockMovement(
+                product_id=catalog.sku_ids[sku],
+                movement_type='adjustment',
+                quantity=values['current_stock'],
+                unit_cost=values['cost_price'],
+                reference_number='INITIAL',
+                location=location,
+                notes=f'Initial stock entry (product import #{product_import.pk})',
+                created_by=product_import.created_by,
+            )
+            for sku, values in creates if values.get('current_stock')
+        ]
+        StockMovement.objects.bulk_create(movements, batch_size=IMPORT_BATCH_SIZE)
+        locations.apply(movements)
+        events.stock_changed([movement.product_id for movement in movements], 'initial_stock')
+
+    # bulk writes skip the product signals
+    refresh_product_indexes([catalog.sku_ids[sku] for _, sku, _, _ in rows])
+    return len(creates), len(updates)
+
+
+def _flush(product_import, rows, errors, catalog):
+    from .models import ProductImportError
+
+    with transaction.atomic():
+        created = updated = 0
+        if rows and not product_import.dry_run:
+            try:
+                with transaction.atomic():
+                    created, updated = _save_batch(rows, catalog, product_import)
+            except IntegrityError as e:
+                # A product saved elsewhere since the keys were read; report the batch
+                errors.extend((row_number, sku, f'Not saved: {e}') for row_number, sku, _, _ in rows)
+                for _, sku, _, exists in rows:
+                    if not exists:
+                        catalog.sku_ids.pop(sku, None)
+                # Counted once, as errors
+                rows.clear()
+        elif rows:
+            created = sum(1 for row in rows if not row[3])
+            updated = len(rows) - created
+
+        ProductImportError.objects.bulk_create([
+            ProductImportError(product_import=product_import, row_number=row_number, sku=sku[:100], message=message)
+            for row_number, sku, message in errors
+        ], batch_size=IMPORT_BATCH_SIZE)
+        product_import.processed_rows += len(rows) + len(errors)
+        product_import.created_count += created
+        product_import.updated_count += updated
+        product_import.error_count += len(errors)
+        product_import.save(update_fields=['processed_rows', 'created_count', 'updated_count', 'error_count'])
+    rows.clear()
+    errors.clear()
+
+
+def _import_rows(product_import, batch_size):
+    references = load_references()
+    catalog = _Catalog()
+    rows, errors = [], []
+    with product_import.file.open('rb') as file:
+        for row_number, row in read_rows(file, product_import.file_format):
+            sku = row.get('sku', '')
+            try:
+                if not sku:
+                    raise RowError('Missing SKU')
+                if len(sku) > 100:
+                    raise RowError('SKU is longer than 100 characters')
+                values = parse_row(row, references)
+                exists = catalog.accept(row_number, sku, values, product_import.mode)
+            except RowError as e:
+                errors.append((row_number, sku, str(e)))
+            else:
+                rows.append((row_number, sku, values, exists))
+            if len(rows) + len(errors) >= batch_size:
+                _flush(product_import, rows, errors, catalog)
+    _flush(product_import, rows, errors, catalog)
+
+
+def run(product_import, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Run a pending import to the end and return it refreshed. Jobs already
+    claimed by another worker are left alone.
+    """
+    from dashboard.models import ActivityLog
+    from .models import ProductImport
+
+    claimed = ProductImport.objects.filter(id=product_import.pk, status='pending').update(
+        status='running', started_at=timezone.now()
+    )
+    product_import.refresh_from_db()
+    if not claimed:
+        return product_import
+
+    try:
+        with product_import.file.open('rb') as file:
+            columns, product_import.total_rows = scan_file(file, product_import.file_format)
+        if 'sku' not in columns:
+            raise ImportFileError('The file has no sku column')
+        if product_import.mode == 'create':
+            missing = [column for column in REQUIRED_FOR_CREATE if column not in columns]
+            if missing:
+                raise ImportFileError(f"The file has no {', '.join(missing)} column")
+        product_import.save(update_fields=['total_rows'])
+        _import_rows(product_import, batch_size)
+        product_import.status = 'completed'
+    except (ImportFileError, OSError) as e:
+        product_import.status = 'failed'
+        product_import.message = str(e)
+    except Exception as e:
+        # Leave no job stuck as running; the batches saved so far stay saved
+        product_import.status = 'failed'
+        product_import.message = f'Stopped after {product_import.processed_rows} rows: {e}'
+    product_import.finished_at = timezone.now()
+    product_import.save(update_fields=['status', 'message', 'finished_at'])
+
+    prefix = 'Validated' if product_import.dry_run else 'Imported'
+    ActivityLog.objects.create(
+        user=product_import.created_by,
+        action='create',
+        description=(
+            f'{prefix} products from {product_import.file.name}: {product_import.created_count} created, '
+            f'{product_import.updated_count} updated, {product_import.error_count} rejected'
+            + (f' ({product_import.message})' if product_import.message else '')
+        ),
+        content_object=product_import,
+    )
+    return product_import
+
+
+def run_pending(batch_size=IMPORT_BATCH_SIZE):
+    """Run every pending import, oldest first; returns the jobs run"""
+    from .models import ProductImport
+
+    return [
+        run(product_import, batch_size)
+        for product_import in ProductImport.objects.filter(status='pending').order_by('created_at')
+    ]
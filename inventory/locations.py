@@ -0,0 +1,191 @@
+"""
+Stock locations.
+
+A product's stock is split over locations (the shop, the back warehouse) in
+`StockBalance` rows. `Product.current_stock` remains the total over all
+locations: it is written in the same transaction as the balances, indexed,
+and is what the product list, alerts and reports read, so none of them sum
+balances per row.
+
+Every stock movement targets a location - the default one unless the sale,
+receipt, count or transfer names another - and `apply()` moves the balances
+of a batch of movements with one upsert and one UPDATE per location.
+Transfers move stock between locations without changing the total: a
+`StockTransfer` document with its lines, and two signed `transfer`
+movements per line (out of the source, into the destination).
+
+Sales only check the total stock, so a location can go negative when goods
+are sold from the shop before being transferred from the warehouse;
+transfers refuse to take more than the source location holds.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .costing import signed_quantity
+
+LOCATION_BATCH_SIZE = 500
+# Maximum number of lines in one transfer
+MAX_TRANSFER_LINES = 2000
+
+
+class LocationError(Exception):
+    pass
+
+
+def default_location():
+    """The default location (created on first use)"""
+    from .models import Location
+
+    location = Location.objects.filter(is_default=True).first()
+    if location is None:
+        location, _ = Location.objects.get_or_create(
+            code='SHOP', defaults={'name': 'المحل', 'location_type': 'shop', 'is_default': True}
+        )
+    return location
+
+
+def resolve(location_id=None):
+    """Active location `location_id`, or the default location when empty"""
+    from .models import Location
+
+    if not location_id:
+        return default_location()
+    try:
+        return Location.objects.get(id=location_id, is_active=True)
+    except (Location.DoesNotExist, ValueError, TypeError):
+        raise LocationError('Unknown or inactive location')
+
+
+def location_quantity(movement):
+    """Stock change of a movement at its location; transfers are signed per side"""
+    if movement.movement_type == 'transfer':
+        return movement.quantity
+    return signed_quantity(movement)
+
+
+def add(deltas):
+    """Add `{(location_id, product_id): quantity}` to the balances, creating missing rows"""
+    from .models import StockBalance
+
+    deltas = {key: quantity for key, quantity in deltas.items() if quantity}
+    if not deltas:
+        return
+    StockBalance.objects.bulk_create(
+        [StockBalance(location_id=location_id, product_id=product_id) for location_id, product_id in deltas],
+        ignore_conflicts=True, batch_size=LOCATION_BATCH_SIZE,
+    )
+    by_location = defaultdict(list)
+    for (location_id, product_id), quantity in sorted(deltas.items()):
+        by_location[location_id].append((product_id, quantity))
+    now = timezone.now()
+    for location_id, rows in by_location.items():
+        for offset in range(0, len(rows), LOCATION_BATCH_SIZE):
+            batch = rows[offset:offset + LOCATION_BATCH_SIZE]
+            StockBalance.objects.filter(
+                location_id=location_id, product_id__in=[product_id for product_id, _ in batch]
+            ).update(
+                quantity=F('quantity') + Case(
+                    *[When(product_id=product_id, then=Value(quantity)) for product_id, quantity in batch],
+                    output_field=IntegerField(),
+                ),
+                updated_at=now,
+            )
+
+
+def apply(movements):
+    """Move the location balances for saved `movements` (no location: the default one)"""
+    deltas = defaultdict(int)
+    default_id = None
+    for movement in movements:
+        location_id = movement.location_id
+        if location_id is None:
+            default_id = default_id or default_location().id
+            location_id = default_id
+        deltas[(location_id, movement.product_id)] += location_quantity(movement)
+    add(deltas)
+
+
+def transfer(from_location, to_location, lines, user, notes=''):
+    """
+    Move `lines` (`(product_id, quantity)` pairs) from one location to
+    another in one transaction; raises LocationError, moving nothing, if
+    the source holds too little of any product. Returns the transfer.
+    """
+    from dashboard import events
+    from dashboard.models import ActivityLog
+    from sales.batch import allocate_numbers
+    from .models import Product, StockBalance, StockMovement, StockTransfer, StockTransferItem
+
+    if from_location.id == to_location.id:
+        raise LocationError('Source and destination must differ')
+    quantities = defaultdict(int)
+    for product_id, quantity in lines:
+        if quantity <= 0:
+            raise LocationError('Quantities must be positive')
+        quantities[product_id] += quantity
+    if not quantities:
+        raise LocationError('A transfer needs at least one line')
+    if len(quantities) > MAX_TRANSFER_LINES:
+        raise LocationError(f'At most {MAX_TRANSFER_LINES} products per transfer')
+
+    with transaction.atomic():
+        products = dict(Product.objects.filter(id__in=quantities).values_list('id', 'sku'))
+        missing = set(quantities) - set(products)
+        if missing:
+            raise LocationError(f'Unknown products: {", ".join(str(pk) for pk in sorted(missing))}')
+        available = dict(
+            StockBalance.objects.select_for_update()
+            .filter(location=from_location, product_id__in=quantities)
+            .values_list('product_id', 'quantity')
+        )
+        short = [
+            f'{products[product_id]} ({available.get(product_id, 0)} < {quantity})'
+            for product_id, quantity in sorted(quantities.items())
+            if available.get(product_id, 0) < quantity
+        ]
+        if short:
+            raise LocationError(f'Not enough stock at {from_location.name}: {", ".join(short)}')
+
+        stock_transfer = StockTransfer.objects.create(
+            transfer_number=allocate_numbers(StockTransfer, 'transfer_number', 'TRF', 1)[0],
+            from_location=from_location,
+            to_location=to_location,
+            notes=notes,
+            created_by=user,
+        )
+        StockTransferItem.objects.bulk_create([
+            StockTransferItem(transfer=stock_transfer, product_id=product_id, quantity=quantity)
+            for product_id, quantity in sorted(quantities.items())
+        ], batch_size=LOCATION_BATCH_SIZE)
+        movements = [
+            StockMovement(
+                product_id=product_id,
+                movement_type='transfer',
+                quantity=sign * quantity,
+                location=location,
+                reference_number=stock_transfer.transfer_number,
+                reference_model='StockTransfer',
+                reference_id=stock_transfer.id,
+                notes=f'{from_location.code} -> {to_location.code}',
+                created_by=user,
+            )
+            for product_id, quantity in sorted(quantities.items())
+            for location, sign in ((from_location, -1), (to_location, 1))
+        ]
+        StockMovement.objects.bulk_create(movements, batch_size=LOCATION_BATCH_SIZE)
+        apply(movements)
+
+        events.stock_changed(quantities, 'transfer', stock_transfer.transfer_number)
+        ActivityLog.objects.create(
+            user=user,
+            action='create',
+            description=(
+                f'Stock transfer {stock_transfer.transfer_number}: {len(quantities)} products '
+                f'from {from_location.name} to {to_location.name}'
+            ),
+            content_object=stock_transfer,
+        )
+    return stock_transfer
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from inventory.fitment import backfill_fitments
+from inventory.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Parse Product.compatible_vehicles into structured vehicle fitment records'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of products processed per batch',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Parse and report without writing fitments',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Backfilling vehicle fitment...'))
+
+        products = Product.objects.exclude(compatible_vehicles='')
+        with transaction.atomic():
+            stats = backfill_fitments(
+                products, batch_size=options['batch_size'], dry_run=options['dry_run']
+            )
+
+        prefix = 'Dry run: ' if options['dry_run'] else ''
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}Processed {stats['products']} products, "
+                f"{stats['fitments']} fitments, {stats['unparsed']} unparsed entries"
+            )
+        )
@@ -0,0 +1,77 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory import classification
+
+
+class Command(BaseCommand):
+    help = 'Compute ABC (value Pareto) and XYZ (demand variability) classes for all active products'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--basis',
+            choices=classification.BASES,
+            default='revenue',
+            help='Rank ABC classes by sales revenue or gross margin (default: revenue)',
+        )
+        parser.add_argument(
+            '--history-days',
+            type=int,
+            default=classification.DEFAULT_HISTORY_DAYS,
+            help='Days of sales history to use',
+        )
+        parser.add_argument(
+            '--a-share',
+            type=float,
+            default=classification.DEFAULT_A_SHARE,
+            help='Cumulative value share covered by class A',
+        )
+        parser.add_argument(
+            '--b-share',
+            type=float,
+            default=classification.DEFAULT_B_SHARE,
+            help='Cumulative value share covered by classes A and B',
+        )
+        parser.add_argument(
+            '--x-cv',
+            type=float,
+            default=classification.DEFAULT_X_CV,
+            help='Maximum coefficient of variation of weekly demand for class X',
+        )
+        parser.add_argument(
+            '--y-cv',
+            type=float,
+            default=classification.DEFAULT_Y_CV,
+            help='Maximum coefficient of variation of weekly demand for class Y',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the class distribution without storing it',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Classifying inventory...'))
+
+        try:
+            classes = classification.classify(
+                history_days=options['history_days'],
+                basis=options['basis'],
+                a_share=options['a_share'],
+                b_share=options['b_share'],
+                x_cv=options['x_cv'],
+                y_cv=options['y_cv'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        distribution = Counter(abc_class + xyz_class for abc_class, xyz_class in classes.values())
+        for key in sorted(distribution):
+            self.stdout.write(f'{key}: {distribution[key]}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Dry run: classified {len(classes)} products, nothing stored'))
+            return
+
+        updated = classification.store(classes)
+        self.stdout.write(self.style.SUCCESS(f'Classified {len(classes)} products, {updated} changed'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from inventory import metrics
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute last sale, sales velocity, days of cover, turnover and dead stock value '
+        'for every active product. Run nightly.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--slow-days',
+            type=int,
+            default=metrics.DEFAULT_SLOW_DAYS,
+            help='Days without a sale after which stock counts as slow moving',
+        )
+        parser.add_argument(
+            '--dead-days',
+            type=int,
+            default=metrics.DEFAULT_DEAD_DAYS,
+            help='Days without a sale after which stock counts as dead',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Computing stock metrics...'))
+
+        try:
+            counts = metrics.compute(slow_days=options['slow_days'], dead_days=options['dead_days'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Stock metrics computed. '
+                + ', '.join(f'{key}: {count}' for key, count in counts.items())
+            )
+        )
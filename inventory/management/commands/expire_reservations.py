@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from inventory import reservations
+
+
+class Command(BaseCommand):
+    help = 'Mark stock reservations past their expiry as expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=reservations.RESERVATION_BATCH_SIZE,
+            help='Number of reservations expired per UPDATE',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep sweeping instead of exiting',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60.0,
+            help='Seconds to sleep between sweeps with --loop',
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help=f'Delete inactive reservations older than {reservations.RETENTION_DAYS} days afterwards',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            expired = reservations.expire(batch_size=options['batch_size'])
+            if expired or not options['loop']:
+                self.stdout.write(f'Expired {expired} reservations')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        if options['prune']:
+            deleted = reservations.prune()
+            self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} reservations'))
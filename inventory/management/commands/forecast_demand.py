@@ -0,0 +1,132 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory import forecasting
+from inventory.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Forecast daily demand from sales history and propose minimum stock, reorder level '
+        'and maximum stock for every active product. Reports only unless --apply is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--method',
+            choices=forecasting.METHODS,
+            default='ses',
+            help='ses: exponential smoothing, ma: moving average (default: ses)',
+        )
+        parser.add_argument(
+            '--history-days',
+            type=int,
+            default=forecasting.DEFAULT_HISTORY_DAYS,
+            help='Days of sales history to use',
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=forecasting.DEFAULT_ALPHA,
+            help='Smoothing factor for ses',
+        )
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=forecasting.DEFAULT_WINDOW,
+            help='Window in days for ma',
+        )
+        parser.add_argument(
+            '--service-level',
+            type=float,
+            default=forecasting.DEFAULT_SERVICE_LEVEL,
+            help='Target probability of not stocking out during the lead time',
+        )
+        parser.add_argument(
+            '--review-days',
+            type=int,
+            default=forecasting.DEFAULT_REVIEW_DAYS,
+            help='Days of demand to cover above the reorder level',
+        )
+        parser.add_argument(
+            '--sku',
+            action='append',
+            help='Only forecast this SKU (repeatable)',
+        )
+        parser.add_argument(
+            '--report',
+            help='Write the proposals to this CSV file',
+        )
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Write the proposed thresholds to the products',
+        )
+
+    def handle(self, *args, **options):
+        if options['history_days'] < 2:
+            raise CommandError('--history-days must be at least 2')
+        if not 0 < options['alpha'] <= 1:
+            raise CommandError('--alpha must be in (0, 1]')
+
+        products = Product.objects.filter(is_active=True)
+        if options['sku']:
+            products = products.filter(sku__in=options['sku'])
+
+        try:
+            proposals = forecasting.propose(
+                products,
+                history_days=options['history_days'],
+                method=options['method'],
+                alpha=options['alpha'],
+                window=options['window'],
+                service_level=options['service_level'],
+                review_days=options['review_days'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        changed = [proposal for proposal in proposals if proposal['changed']]
+        for proposal in changed:
+            current = proposal['current']
+            proposed = proposal['proposed']
+            self.stdout.write(
+                f"{proposal['product'].sku}: demand {proposal['daily_demand']}/day "
+                f"(±{proposal['deviation']}), lead time {proposal['lead_time_days']}d | "
+                f"min {current['minimum_stock']}->{proposed['minimum_stock']}, "
+                f"reorder {current['reorder_level']}->{proposed['reorder_level']}, "
+                f"max {current['maximum_stock']}->{proposed['maximum_stock']}"
+            )
+
+        if options['report']:
+            self._write_report(options['report'], proposals)
+
+        if options['apply']:
+            updated = forecasting.apply(changed)
+            self.stdout.write(self.style.SUCCESS(f'Updated thresholds of {updated} products'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Dry run: {len(changed)} of {len(proposals)} forecast products would change; '
+                'use --apply to write them'
+            ))
+
+    def _write_report(self, path, proposals):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([
+                'sku', 'name', 'daily_demand', 'deviation', 'lead_time_days',
+                'minimum_stock', 'proposed_minimum_stock', 'reorder_level', 'proposed_reorder_level',
+                'maximum_stock', 'proposed_maximum_stock', 'changed',
+            ])
+            for proposal in proposals:
+                current = proposal['current']
+                proposed = proposal['proposed']
+                writer.writerow([
+                    proposal['product'].sku, proposal['product'].name, proposal['daily_demand'],
+                    proposal['deviation'], proposal['lead_time_days'],
+                    current['minimum_stock'], proposed['minimum_stock'],
+                    current['reorder_level'], proposed['reorder_level'],
+                    current['maximum_stock'], proposed['maximum_stock'],
+                    proposal['changed'],
+                ])
+        self.stdout.write(f'Report written to {path}')
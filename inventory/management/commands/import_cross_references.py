@@ -0,0 +1,60 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from inventory.crossref import import_cross_references
+from inventory.models import Supplier
+
+
+class Command(BaseCommand):
+    help = ('Import a part-number cross-reference list from CSV. Columns: number, '
+            'sku or match_number, and optional reference_type, manufacturer')
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Path to the cross-reference CSV file')
+        parser.add_argument(
+            '--supplier',
+            type=int,
+            help='ID of the supplier the list came from',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of references inserted per batch',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file without saving anything',
+        )
+
+    def handle(self, *args, **options):
+        supplier = None
+        if options['supplier']:
+            try:
+                supplier = Supplier.objects.get(id=options['supplier'])
+            except Supplier.DoesNotExist:
+                raise CommandError(f"Supplier {options['supplier']} does not exist")
+
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8-sig') as f:
+                with transaction.atomic():
+                    result = import_cross_references(
+                        csv.DictReader(f), supplier=supplier, batch_size=options['batch_size']
+                    )
+                    if options['dry_run']:
+                        transaction.set_rollback(True)
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["csv_file"]}: {e}')
+
+        for row_number, message in result['errors']:
+            self.stdout.write(self.style.WARNING(f'Row {row_number}: {message}'))
+
+        prefix = 'Dry run: ' if options['dry_run'] else ''
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}Imported {result['imported']} cross-references, "
+                f"{len(result['errors'])} rows skipped"
+            )
+        )
@@ -0,0 +1,113 @@
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from inventory import imports
+from inventory.models import ProductImport
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Import or update products from a CSV/XLSX file, or with --worker run the imports '
+        'uploaded through the web interface'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', nargs='?', help='Path to the CSV or XLSX file')
+        parser.add_argument(
+            '--mode',
+            choices=[choice for choice, _ in ProductImport.MODE_CHOICES],
+            default='upsert',
+            help='Create new products, update existing ones, or both (default)',
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded on the import (default: the first superuser)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file and report errors without saving anything',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=imports.IMPORT_BATCH_SIZE,
+            help='Number of rows written per batch',
+        )
+        parser.add_argument(
+            '--worker',
+            action='store_true',
+            help='Run the pending uploaded imports instead of a file',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='With --worker, keep polling for new imports',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to sleep between polls with --loop',
+        )
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            while True:
+                for product_import in imports.run_pending(batch_size=options['batch_size']):
+                    self._report(product_import)
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+            return
+
+        if not options['file']:
+            raise CommandError('Give a file to import, or --worker')
+        user = self._get_user(options['user'])
+        try:
+            with open(options['file'], 'rb') as f:
+                product_import = ProductImport.objects.create(
+                    file=File(f, name=os.path.basename(options['file'])),
+                    file_format=imports.detect_format(options['file']),
+                    mode=options['mode'],
+                    dry_run=options['dry_run'],
+                    created_by=user,
+                )
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["file"]}: {e}')
+
+        product_import = imports.run(product_import, batch_size=options['batch_size'])
+        for row_number, sku, message in product_import.errors.values_list('row_number', 'sku', 'message')[:100]:
+            self.stdout.write(self.style.WARNING(f'Row {row_number} ({sku}): {message}'))
+        if product_import.error_count > 100:
+            self.stdout.write(self.style.WARNING(
+                f'... {product_import.error_count - 100} more; see the error report of import #{product_import.id}'
+            ))
+        self._report(product_import)
+
+    def _report(self, product_import):
+        prefix = 'Dry run: ' if product_import.dry_run else ''
+        summary = (
+            f'{prefix}Import #{product_import.id}: {product_import.created_count} created, '
+            f'{product_import.updated_count} updated, {product_import.error_count} rows rejected'
+        )
+        if product_import.status == 'failed':
+            self.stderr.write(self.style.ERROR(f'{summary}; failed: {product_import.message}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        user = User.objects.filter(is_superuser=True, is_active=True).order_by('id').first()
+        if user is None:
+            raise CommandError('No superuser found; pass --user')
+        return user
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from inventory import catalog
+
+
+class Command(BaseCommand):
+    help = 'Delete product tombstones older than the offline catalog retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=catalog.TOMBSTONE_RETENTION_DAYS,
+            help='Keep tombstones newer than this many days',
+        )
+
+    def handle(self, *args, **options):
+        deleted = catalog.prune_tombstones(days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} product tombstones'))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from inventory import costing
+from inventory.models import Product, ProductCost
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay the stock movement ledger to rebuild cost layers, product costs and sale item COGS '
+        'with the configured costing method. Needed after changing INVENTORY_COSTING_METHOD.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sku',
+            action='append',
+            help='Only rebuild this SKU (repeatable)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=costing.COSTING_BATCH_SIZE,
+            help='Number of products replayed together',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=costing.MOVEMENT_CHUNK_SIZE,
+            help='Number of movements costed per transaction',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            method = costing.costing_method()
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilding cost layers ({method})...'))
+
+        products = Product.objects.all()
+        if options['sku']:
+            products = products.filter(sku__in=options['sku'])
+        product_ids = list(products.order_by('id').values_list('id', flat=True))
+
+        batch_size = options['batch_size']
+        movements = 0
+        for offset in range(0, len(product_ids), batch_size):
+            ids = product_ids[offset:offset + batch_size]
+            costing.reset(ids)
+            movements += costing.cost_all_pending(ids, chunk_size=options['chunk_size'])
+            self.stdout.write(f'{min(offset + batch_size, len(product_ids))}/{len(product_ids)} products')
+
+        value = ProductCost.objects.filter(product_id__in=product_ids).aggregate(
+            total=Sum('inventory_value')
+        )['total'] or 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Costed {movements} movements for {len(product_ids)} products. Inventory value: {value}'
+            )
+        )
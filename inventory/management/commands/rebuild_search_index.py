@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from inventory import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of products indexed per batch',
+        )
+
+    def handle(self, *args, **options):
+        backend = 'FTS5' if search.fts_available() else 'token table'
+        self.stdout.write(f'Rebuilding product search index ({backend})...')
+
+        total = search.rebuild_index(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} products'))
@@ -0,0 +1,117 @@
+import csv
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from inventory import reconciliation
+from inventory.models import Product
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare every product\'s current stock with the balance of its stock movement ledger and '
+        'report the products that drifted. Reports only unless --fix is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            choices=reconciliation.MODES,
+            help='counter: set current stock to the ledger balance; '
+                 'ledger: post adjustment movements so the ledger matches current stock',
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded on the corrections (default: the first superuser)',
+        )
+        parser.add_argument(
+            '--sku',
+            action='append',
+            help='Only reconcile this SKU (repeatable)',
+        )
+        parser.add_argument(
+            '--min-drift',
+            type=int,
+            default=1,
+            help='Ignore products whose counter is off by less than this many units',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=reconciliation.RECONCILE_CHUNK_SIZE,
+            help='Number of products checked (and fixed) per query and transaction',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to wait between chunks, to go easy on a busy database',
+        )
+        parser.add_argument(
+            '--report',
+            help='Write the drifted products to this CSV file',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        if options['min_drift'] < 1:
+            raise CommandError('--min-drift must be at least 1')
+
+        user = None
+        if options['fix']:
+            user = self._get_user(options['user'])
+
+        products = Product.objects.all()
+        if options['sku']:
+            products = products.filter(sku__in=options['sku'])
+
+        drifted = []
+        fixed = 0
+        for index, rows in enumerate(
+            reconciliation.find_drift(products, options['chunk_size'], options['min_drift'])
+        ):
+            if index and options['pause']:
+                time.sleep(options['pause'])
+            for row in rows:
+                self.stdout.write(
+                    f"{row['sku']}: counter {row['counter']}, ledger {row['ledger']}, "
+                    f"drift {row['drift']:+d} ({row['value']:.2f})"
+                )
+            drifted.extend(rows)
+            if options['fix']:
+                fixed += len(reconciliation.fix(rows, options['fix'], user, options['min_drift']))
+
+        if options['report']:
+            self._write_report(options['report'], drifted)
+
+        total = sum(abs(row['drift']) for row in drifted)
+        value = sum(row['value'] for row in drifted)
+        summary = f'{len(drifted)} products drifted by {total} units ({value:.2f} at cost)'
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'{summary}; fixed {fixed} ({options["fix"]})'))
+        elif drifted:
+            self.stdout.write(self.style.WARNING(f'Dry run: {summary}; use --fix to correct them'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Stock counters match the ledger'))
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        user = User.objects.filter(is_superuser=True, is_active=True).order_by('id').first()
+        if user is None:
+            raise CommandError('No superuser found; pass --user')
+        return user
+
+    def _write_report(self, path, rows):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['sku', 'name', 'counter', 'ledger', 'drift', 'value'])
+            for row in rows:
+                writer.writerow([row['sku'], row['name'], row['counter'], row['ledger'], row['drift'], row['value']])
+        self.stdout.write(f'Report written to {path}')
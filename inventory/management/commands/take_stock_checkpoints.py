@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from inventory import balances
+from inventory.models import StockMovement
+
+
+class Command(BaseCommand):
+    help = (
+        'Store per-product stock quantity and value checkpoints at every completed period end '
+        'not checkpointed yet. Run after each period closes (e.g. monthly from cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period',
+            choices=balances.PERIODS,
+            default='month',
+            help='Checkpoint interval (default: month)',
+        )
+        parser.add_argument(
+            '--through',
+            help='Last date to checkpoint, YYYY-MM-DD (default: yesterday)',
+        )
+        parser.add_argument(
+            '--rebuild-from',
+            help='Delete checkpoints from this date, YYYY-MM-DD, and take them again '
+                 '(after back-dated stock corrections)',
+        )
+
+    def _date(self, value, option):
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'{option} must be a date in YYYY-MM-DD format')
+        return day
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        through = self._date(options['through'], '--through') if options['through'] else today - timedelta(days=1)
+        if through >= today:
+            raise CommandError('Only completed days can be checkpointed')
+
+        if options['rebuild_from']:
+            rebuild_from = self._date(options['rebuild_from'], '--rebuild-from')
+            deleted = balances.delete_checkpoints(after=balances.boundary(rebuild_from - timedelta(days=1)))
+            self.stdout.write(self.style.WARNING(f'Deleted {deleted} checkpoint rows'))
+
+        latest = balances.latest_checkpoint()
+        if latest:
+            start = timezone.localtime(latest).date()
+        else:
+            first = StockMovement.objects.aggregate(first=Min('created_at'))['first']
+            if first is None:
+                self.stdout.write('No stock movements to checkpoint')
+                return
+            start = timezone.localtime(first).date()
+
+        days = balances.period_ends(start, through, options['period'])
+        for day in days:
+            as_of = balances.boundary(day)
+            if latest and as_of <= latest:
+                continue
+            rows = balances.take_checkpoint(as_of)
+            self.stdout.write(f'{day}: {rows} products')
+
+        self.stdout.write(self.style.SUCCESS(f'Stock checkpoints up to date through {through}'))
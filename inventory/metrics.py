@@ -0,0 +1,165 @@
+"""
+Stock ageing and velocity metrics.
+
+`compute()` refreshes `ProductStockMetrics` for the whole catalog from two
+grouped queries - sales per product over the metric windows (`SaleItem`)
+and last receipt per product (`StockMovement`) - and writes the rows in
+batches. It is meant to run nightly through the `compute_stock_metrics`
+command; reports then sort and filter on the stored, indexed columns.
+
+    velocity        units sold per day over the window
+    days of cover   current stock / 90-day velocity (empty when nothing sells)
+    turnover ratio  cost of goods sold over 365 days / current stock value
+    dead stock      stock on hand with no sale for `dead_days` (or, if never
+                    sold, a product older than that)
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Max, Q, Sum
+from django.utils import timezone
+
+METRICS_BATCH_SIZE = 500
+
+DEFAULT_SLOW_DAYS = 90
+DEFAULT_DEAD_DAYS = 180
+# More cover than this is slow moving even if the product still sells
+SLOW_COVER_DAYS = 180
+
+METRIC_FIELDS = [
+    'last_sale_at', 'last_received_at', 'days_since_last_sale',
+    'units_sold_30d', 'units_sold_90d', 'units_sold_365d', 'velocity_30d', 'velocity_90d',
+    'days_of_cover', 'turnover_ratio', 'stock_value', 'dead_stock_value', 'movement_class',
+    'computed_at',
+]
+
+
+def _sales(now):
+    from sales.models import Sale, SaleItem
+
+    def sold_since(days):
+        return Sum('quantity', filter=Q(sale__sale_date__gte=now - timedelta(days=days)))
+
+    year = Q(sale__sale_date__gte=now - timedelta(days=365))
+    return {
+        row['product_id']: row
+        for row in SaleItem.objects.exclude(sale__status__in=Sale.VOID_STATUSES)
+        .values('product_id')
+        .annotate(
+            last_sale_at=Max('sale__sale_date'),
+            units_sold_30d=sold_since(30),
+            units_sold_90d=sold_since(90),
+            units_sold_365d=sold_since(365),
+            cogs_365d=Sum(
+                ExpressionWrapper(F('cost_price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+                filter=year,
+            ),
+        )
+        .order_by()
+    }
+
+
+def _receipts():
+    from .models import StockMovement
+    return dict(
+        StockMovement.objects.filter(movement_type='purchase')
+        .values('product_id').annotate(last_received_at=Max('created_at')).order_by()
+        .values_list('product_id', 'last_received_at')
+    )
+
+
+def _quantize(value, places):
+    return Decimal(value).quantize(Decimal(1).scaleb(-places))
+
+
+def build(product, sales, last_received_at, now, slow_days=DEFAULT_SLOW_DAYS, dead_days=DEFAULT_DEAD_DAYS):
+    """Unsaved `ProductStockMetrics` for `product` from its grouped sales row (or None)"""
+    from .models import ProductStockMetrics
+
+    sales = sales or {}
+    last_sale_at = sales.get('last_sale_at')
+    units_30 = sales.get('units_sold_30d') or 0
+    units_90 = sales.get('units_sold_90d') or 0
+    units_365 = sales.get('units_sold_365d') or 0
+    velocity_30 = Decimal(units_30) / 30
+    velocity_90 = Decimal(units_90) / 90
+    stock = max(product.current_stock, 0)
+    stock_value = stock * product.cost_price
+
+    days_since_last_sale = (now - last_sale_at).days if last_sale_at else None
+    # Never sold: age the stock from when the product was created
+    idle_days = days_since_last_sale if last_sale_at else (now - product.created_at).days
+
+    if stock <= 0:
+        days_of_cover = Decimal(0)
+    elif velocity_90 > 0:
+        days_of_cover = _quantize(stock / velocity_90, 1)
+    else:
+        days_of_cover = None
+
+    cogs = sales.get('cogs_365d') or 0
+    turnover_ratio = _quantize(cogs / stock_value, 2) if stock_value > 0 else None
+
+    if stock <= 0:
+        movement_class = 'no_stock'
+    elif idle_days >= dead_days:
+        movement_class = 'dead'
+    elif idle_days >= slow_days or days_of_cover is None or days_of_cover > SLOW_COVER_DAYS:
+        movement_class = 'slow'
+    else:
+        movement_class = 'active'
+
+    return ProductStockMetrics(
+        product_id=product.id,
+        last_sale_at=last_sale_at,
+        last_received_at=last_received_at,
+        days_since_last_sale=days_since_last_sale,
+        units_sold_30d=units_30,
+        units_sold_90d=units_90,
+        units_sold_365d=units_365,
+        velocity_30d=_quantize(velocity_30, 4),
+        velocity_90d=_quantize(velocity_90, 4),
+        days_of_cover=days_of_cover,
+        turnover_ratio=turnover_ratio,
+        stock_value=stock_value,
+        dead_stock_value=stock_value if movement_class == 'dead' else 0,
+        movement_class=movement_class,
+        computed_at=now,
+    )
+
+
+def compute(slow_days=DEFAULT_SLOW_DAYS, dead_days=DEFAULT_DEAD_DAYS):
+    """Refresh the metrics of every active product; returns `{movement_class: count}`"""
+    from .models import Product, ProductStockMetrics
+
+    if not 0 < slow_days <= dead_days:
+        raise ValueError('Slow days must be positive and not more than dead days')
+
+    now = timezone.now()
+    sales = _sales(now)
+    receipts = _receipts()
+    counts = {key: 0 for key, label in ProductStockMetrics.MOVEMENT_CLASS_CHOICES}
+
+    product_ids = list(Product.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+    for offset in range(0, len(product_ids), METRICS_BATCH_SIZE):
+        ids = product_ids[offset:offset + METRICS_BATCH_SIZE]
+        products = Product.objects.filter(id__in=ids).only('id', 'current_stock', 'cost_price', 'created_at')
+        rows = [
+            build(product, sales.get(product.id), receipts.get(product.id), now, slow_days, dead_days)
+            for product in products
+        ]
+        existing = set(ProductStockMetrics.objects.filter(product_id__in=ids).values_list('product_id', flat=True))
+        with transaction.atomic():
+            ProductStockMetrics.objects.bulk_create(
+                [row for row in rows if row.product_id not in existing], batch_size=METRICS_BATCH_SIZE
+            )
+            ProductStockMetrics.objects.bulk_update(
+                [row for row in rows if row.product_id in existing], METRIC_FIELDS, batch_size=METRICS_BATCH_SIZE
+            )
+        for row in rows:
+            counts[row.movement_class] += 1
+
+    # Products deactivated since the last run drop out of the reports
+    ProductStockMetrics.objects.filter(product__is_active=False).delete()
+    return counts
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:47
+
+import re
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+import django.db.models.deletion
+
+# The index as of this migration: the DDL and the tokenizer used for the
+# initial backfill are copied here so that later changes to inventory.search
+# cannot change or break this migration.
+FTS_TABLE = 'product_search_fts'
+INDEXED_FIELDS = ('name', 'sku', 'barcode', 'part_number', 'oem_number', 'brand__name')
+CODE_FIELDS = ('sku', 'barcode', 'part_number', 'oem_number')
+MAX_TOKEN_LENGTH = 100
+ARABIC_DIACRITICS_RE = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06dc\u06df-\u06e8\u06ea-\u06ed\u0640]')
+TOKEN_RE = re.compile(r'\w+')
+ARABIC_CHAR_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ة': 'ه', 'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+
+
+def normalize_text(text):
+    if not text:
+        return ''
+    text = str(text).casefold().translate(ARABIC_CHAR_MAP)
+    return ARABIC_DIACRITICS_RE.sub('', text)
+
+
+def document_tokens(row):
+    tokens = []
+    for field in INDEXED_FIELDS:
+        for token in TOKEN_RE.findall(normalize_text(row.get(field))):
+            token = token[:MAX_TOKEN_LENGTH]
+            if token not in tokens:
+                tokens.append(token)
+    for field in CODE_FIELDS:
+        code = ''.join(TOKEN_RE.findall(normalize_text(row.get(field)))).replace('_', '')[:MAX_TOKEN_LENGTH]
+        if code and code not in tokens:
+            tokens.append(code)
+    return tokens
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    using = connection.alias
+    fts = False
+    if connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"document, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            fts = True
+        except OperationalError:
+            # SQLite built without FTS5: use the portable token table
+            pass
+
+    Product = apps.get_model('inventory', 'Product')
+    rows = list(Product.objects.using(using).values('id', *INDEXED_FIELDS))
+    if not rows:
+        return
+    if fts:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, document) VALUES (%s, %s)',
+                [(row['id'], ' '.join(document_tokens(row))) for row in rows]
+            )
+    else:
+        ProductSearchToken = apps.get_model('inventory', 'ProductSearchToken')
+        ProductSearchToken.objects.using(using).bulk_create(
+            [ProductSearchToken(product_id=row['id'], token=token) for row in rows for token in document_tokens(row)],
+            batch_size=1000
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_invoice_shopsettings_invoiceitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=100)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='inventory.product')),
+            ],
+            options={
+                'verbose_name': 'Product Search Token',
+                'verbose_name_plural': 'Product Search Tokens',
+                'db_table': 'product_search_tokens',
+                'indexes': [models.Index(fields=['token', 'product'], name='product_search_token_idx')],
+                'unique_together': {('product', 'token')},
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
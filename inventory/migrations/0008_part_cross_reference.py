@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:48
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Normalization as of this migration, copied so that later changes to
+# inventory.crossref cannot change or break the backfill
+NON_ALNUM_RE = re.compile(r'[\W_]+')
+PRODUCT_NUMBER_FIELDS = {
+    'part_number': 'part',
+    'oem_number': 'oem',
+}
+
+
+def backfill_product_numbers(apps, schema_editor):
+    Product = apps.get_model('inventory', 'Product')
+    PartCrossReference = apps.get_model('inventory', 'PartCrossReference')
+    using = schema_editor.connection.alias
+    references = []
+    for row in Product.objects.using(using).values('id', 'part_number', 'oem_number'):
+        for field, reference_type in PRODUCT_NUMBER_FIELDS.items():
+            key = NON_ALNUM_RE.sub('', str(row[field] or '')).upper()[:100]
+            if key:
+                references.append(PartCrossReference(
+                    product_id=row['id'],
+                    number=row[field],
+                    normalized_key=key,
+                    reference_type=reference_type,
+                    source='product',
+                ))
+    PartCrossReference.objects.using(using).bulk_create(references, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartCrossReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.CharField(max_length=100)),
+                ('normalized_key', models.CharField(db_index=True, max_length=100)),
+                ('reference_type', models.CharField(choices=[('part', 'Part Number'), ('oem', 'OEM Number'), ('aftermarket', 'Aftermarket Number'), ('supplier', 'Supplier Number')], default='oem', max_length=20)),
+                ('manufacturer', models.CharField(blank=True, max_length=100)),
+                ('source', models.CharField(choices=[('product', 'Product Record'), ('import', 'Imported List'), ('manual', 'Manual Entry')], default='manual', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cross_references', to='inventory.product')),
+                ('supplier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cross_references', to='inventory.supplier')),
+            ],
+            options={
+                'verbose_name': 'Part Cross Reference',
+                'verbose_name_plural': 'Part Cross References',
+                'db_table': 'part_cross_references',
+                'unique_together': {('product', 'normalized_key', 'reference_type')},
+            },
+        ),
+        migrations.RunPython(backfill_product_numbers, migrations.RunPython.noop),
+    ]
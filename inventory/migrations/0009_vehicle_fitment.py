@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_part_cross_reference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleMake',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('vehicle_type', models.CharField(choices=[('motorcycle', 'Motorcycle'), ('car', 'Car'), ('tuktuk', 'Tuk-Tuk'), ('general', 'General')], default='general', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Vehicle Make',
+                'verbose_name_plural': 'Vehicle Makes',
+                'db_table': 'vehicle_makes',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VehicleModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('normalized_name', models.CharField(db_index=True, max_length=100)),
+                ('vehicle_type', models.CharField(choices=[('motorcycle', 'Motorcycle'), ('car', 'Car'), ('tuktuk', 'Tuk-Tuk'), ('general', 'General')], default='general', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('make', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='models', to='inventory.vehiclemake')),
+            ],
+            options={
+                'verbose_name': 'Vehicle Model',
+                'verbose_name_plural': 'Vehicle Models',
+                'db_table': 'vehicle_models',
+                'ordering': ['make__name', 'name'],
+                'unique_together': {('make', 'normalized_name')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductFitment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year_from', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('year_to', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('source', models.CharField(choices=[('parsed', 'Parsed from compatible vehicles'), ('manual', 'Manual Entry')], default='manual', max_length=20)),
+                ('notes', models.CharField(blank=True, max_length=200)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fitments', to='inventory.product')),
+                ('vehicle_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fitments', to='inventory.vehiclemodel')),
+            ],
+            options={
+                'verbose_name': 'Product Fitment',
+                'verbose_name_plural': 'Product Fitments',
+                'db_table': 'product_fitments',
+                'indexes': [models.Index(fields=['vehicle_model', 'year_from', 'year_to'], name='fitment_vehicle_year_idx')],
+            },
+        ),
+    ]
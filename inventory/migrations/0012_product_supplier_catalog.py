@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_offline_catalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSupplier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('supplier_sku', models.CharField(blank=True, max_length=100)),
+                ('is_preferred', models.BooleanField(default=False)),
+                ('last_unit_cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('lead_time_days', models.PositiveIntegerField(default=7)),
+                ('min_order_qty', models.PositiveIntegerField(default=1)),
+                ('pack_size', models.PositiveIntegerField(default=1)),
+                ('last_purchased_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supplier_links', to='inventory.product')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_links', to='inventory.supplier')),
+            ],
+            options={
+                'verbose_name': 'Product Supplier',
+                'verbose_name_plural': 'Product Suppliers',
+                'db_table': 'product_suppliers',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productsupplier',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_preferred', True)), fields=('product',), name='product_single_preferred_supplier'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='productsupplier',
+            unique_together={('product', 'supplier')},
+        ),
+    ]
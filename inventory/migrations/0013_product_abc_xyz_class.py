@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_product_supplier_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='abc_class',
+            field=models.CharField(blank=True, choices=[('A', 'A - High value'), ('B', 'B - Medium value'), ('C', 'C - Low value')], db_index=True, max_length=1),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='xyz_class',
+            field=models.CharField(blank=True, choices=[('X', 'X - Steady demand'), ('Y', 'Y - Variable demand'), ('Z', 'Z - Erratic demand')], db_index=True, max_length=1),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_product_abc_xyz_class'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStockMetrics',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_metrics', serialize=False, to='inventory.product')),
+                ('last_sale_at', models.DateTimeField(blank=True, null=True)),
+                ('last_received_at', models.DateTimeField(blank=True, null=True)),
+                ('days_since_last_sale', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('units_sold_30d', models.PositiveIntegerField(default=0)),
+                ('units_sold_90d', models.PositiveIntegerField(default=0)),
+                ('units_sold_365d', models.PositiveIntegerField(default=0)),
+                ('velocity_30d', models.DecimalField(decimal_places=4, default=0, max_digits=12)),
+                ('velocity_90d', models.DecimalField(decimal_places=4, default=0, max_digits=12)),
+                ('days_of_cover', models.DecimalField(blank=True, db_index=True, decimal_places=1, max_digits=12, null=True)),
+                ('turnover_ratio', models.DecimalField(blank=True, db_index=True, decimal_places=2, max_digits=12, null=True)),
+                ('stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('dead_stock_value', models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=14)),
+                ('movement_class', models.CharField(choices=[('active', 'Active'), ('slow', 'Slow moving'), ('dead', 'Dead stock'), ('no_stock', 'No stock')], db_index=True, max_length=10)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Product Stock Metrics',
+                'verbose_name_plural': 'Product Stock Metrics',
+                'db_table': 'product_stock_metrics',
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_product_stock_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCost',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='costing', serialize=False, to='inventory.product')),
+                ('on_hand', models.IntegerField(default=0)),
+                ('average_cost', models.DecimalField(decimal_places=4, default=0, max_digits=12)),
+                ('inventory_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('last_movement_id', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Product Cost',
+                'verbose_name_plural': 'Product Costs',
+                'db_table': 'product_costs',
+            },
+        ),
+        migrations.CreateModel(
+            name='CostLayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('received_at', models.DateTimeField()),
+                ('quantity', models.IntegerField()),
+                ('remaining_quantity', models.IntegerField()),
+                ('unit_cost', models.DecimalField(decimal_places=4, max_digits=12)),
+                ('movement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='inventory.stockmovement')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='inventory.product')),
+            ],
+            options={
+                'verbose_name': 'Cost Layer',
+                'verbose_name_plural': 'Cost Layers',
+                'db_table': 'cost_layers',
+                'indexes': [models.Index(fields=['product', 'received_at', 'id'], name='cost_layer_fifo_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:12
+
+from django.db import migrations
+
+
+def normalize_movement_types(apps, schema_editor):
+    # Sales and purchase receipts used to be recorded as 'out' / 'in'
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    StockMovement.objects.filter(movement_type='out').update(movement_type='sale')
+    StockMovement.objects.filter(movement_type='in').update(movement_type='purchase')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_stock_checkpoints'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_movement_types, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0017_normalize_movement_types'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count_number', models.CharField(max_length=50, unique=True)),
+                ('status', models.CharField(choices=[('counting', 'Counting'), ('posted', 'Posted'), ('cancelled', 'Cancelled')], default='counting', max_length=20)),
+                ('notes', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('posted_at', models.DateTimeField(blank=True, null=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_counts', to='inventory.category')),
+                ('posted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='stock_counts_posted', to=settings.AUTH_USER_MODEL)),
+                ('started_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_counts_started', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Stock Count',
+                'verbose_name_plural': 'Stock Counts',
+                'db_table': 'stock_counts',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockCountUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.CharField(max_length=100)),
+                ('scan_count', models.PositiveIntegerField(default=0)),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('count', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='inventory.stockcount')),
+                ('uploaded_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_count_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Stock Count Upload',
+                'verbose_name_plural': 'Stock Count Uploads',
+                'db_table': 'stock_count_uploads',
+                'unique_together': {('count', 'batch_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StockCountLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expected_quantity', models.IntegerField()),
+                ('counted_quantity', models.IntegerField(blank=True, null=True)),
+                ('unit_cost', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('adjustment_quantity', models.IntegerField(default=0)),
+                ('counted_at', models.DateTimeField(blank=True, null=True)),
+                ('count', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory.stockcount')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='count_lines', to='inventory.product')),
+            ],
+            options={
+                'verbose_name': 'Stock Count Line',
+                'verbose_name_plural': 'Stock Count Lines',
+                'db_table': 'stock_count_lines',
+                'unique_together': {('count', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,152 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_default_location(apps, schema_editor):
+    # Everything so far was kept in one place: the shop
+    Location = apps.get_model('inventory', 'Location')
+    Product = apps.get_model('inventory', 'Product')
+    StockBalance = apps.get_model('inventory', 'StockBalance')
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+
+    location = Location.objects.create(code='SHOP', name='المحل', location_type='shop', is_default=True)
+    StockMovement.objects.update(location=location)
+    balances = (
+        StockBalance(product_id=product_id, location=location, quantity=quantity)
+        for product_id, quantity in Product.objects.exclude(current_stock=0).values_list('id', 'current_stock').iterator()
+    )
+    StockBalance.objects.bulk_create(balances, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0018_stock_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('location_type', models.CharField(choices=[('shop', 'Shop'), ('warehouse', 'Warehouse')], default='shop', max_length=20)),
+                ('is_default', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Stock Location',
+                'verbose_name_plural': 'Stock Locations',
+                'db_table': 'stock_locations',
+                'ordering': ['-is_default', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Stock Balance',
+                'verbose_name_plural': 'Stock Balances',
+                'db_table': 'stock_balances',
+            },
+        ),
+        migrations.CreateModel(
+            name='StockTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transfer_number', models.CharField(max_length=50, unique=True)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Stock Transfer',
+                'verbose_name_plural': 'Stock Transfers',
+                'db_table': 'stock_transfers',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockTransferItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Stock Transfer Item',
+                'verbose_name_plural': 'Stock Transfer Items',
+                'db_table': 'stock_transfer_items',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'current_stock'], name='product_active_stock_idx'),
+        ),
+        migrations.AddField(
+            model_name='stocktransferitem',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transfer_items', to='inventory.product'),
+        ),
+        migrations.AddField(
+            model_name='stocktransferitem',
+            name='transfer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='inventory.stocktransfer'),
+        ),
+        migrations.AddField(
+            model_name='stocktransfer',
+            name='created_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_transfers', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='stocktransfer',
+            name='from_location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transfers_out', to='inventory.location'),
+        ),
+        migrations.AddField(
+            model_name='stocktransfer',
+            name='to_location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transfers_in', to='inventory.location'),
+        ),
+        migrations.AddField(
+            model_name='stockbalance',
+            name='location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='balances', to='inventory.location'),
+        ),
+        migrations.AddField(
+            model_name='stockbalance',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_balances', to='inventory.product'),
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('is_default',), name='single_default_location'),
+        ),
+        migrations.AddField(
+            model_name='stockcount',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='stock_counts', to='inventory.location'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movements', to='inventory.location'),
+        ),
+        migrations.AddIndex(
+            model_name='stockbalance',
+            index=models.Index(fields=['location', 'quantity'], name='stock_balance_location_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='stockbalance',
+            unique_together={('product', 'location')},
+        ),
+        migrations.RunPython(create_default_location, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0021_product_imports'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rule', models.CharField(choices=[('percentage', 'Percentage change'), ('fixed', 'Fixed amount change'), ('margin', 'Margin over cost')], max_length=20)),
+                ('value', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('rounding_step', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('rounding_mode', models.CharField(choices=[('nearest', 'Nearest'), ('up', 'Up'), ('down', 'Down')], default='nearest', max_length=10)),
+                ('filters', models.JSONField(blank=True, default=dict)),
+                ('description', models.CharField(blank=True, max_length=200)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='price_changes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Price Change',
+                'verbose_name_plural': 'Price Changes',
+                'db_table': 'price_changes',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductPriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('previous_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('selling_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('effective_from', models.DateTimeField()),
+                ('source', models.CharField(choices=[('manual', 'Product edit'), ('reprice', 'Bulk repricing'), ('import', 'Product import')], default='manual', max_length=20)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_history', to=settings.AUTH_USER_MODEL)),
+                ('price_change', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='history', to='inventory.pricechange')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='inventory.product')),
+            ],
+            options={
+                'verbose_name': 'Product Price History',
+                'verbose_name_plural': 'Product Price History',
+                'db_table': 'product_price_history',
+                'indexes': [models.Index(fields=['product', 'effective_from'], name='price_history_lookup_idx')],
+            },
+        ),
+    ]
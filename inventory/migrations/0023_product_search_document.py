@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0022_price_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('rowid', models.IntegerField(primary_key=True, serialize=False)),
+                ('document', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'verbose_name': 'Product Search Document',
+                'verbose_name_plural': 'Product Search Documents',
+                'db_table': 'product_search_fts',
+                'managed': False,
+            },
+        ),
+    ]
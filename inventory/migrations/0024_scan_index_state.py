@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:04
+
+from django.db import migrations, models
+
+
+def create_state(apps, schema_editor):
+    ScanIndexState = apps.get_model('inventory', 'ScanIndexState')
+    ScanIndexState.objects.using(schema_editor.connection.alias).get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0023_product_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanIndexState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('generation', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Scan Index State',
+                'verbose_name_plural': 'Scan Index State',
+                'db_table': 'scan_index_state',
+            },
+        ),
+        migrations.RunPython(create_state, migrations.RunPython.noop),
+    ]
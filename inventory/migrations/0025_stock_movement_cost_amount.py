@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:13
+
+from django.db import migrations, models
+
+
+def reset_costing(apps, schema_editor):
+    # Costing now follows cost_amount instead of ProductCost.last_movement_id, and
+    # every existing movement starts uncosted: drop the derived state so each
+    # product's ledger is replayed from its first movement
+    alias = schema_editor.connection.alias
+    apps.get_model('inventory', 'CostLayer').objects.using(alias).all().delete()
+    apps.get_model('inventory', 'ProductCost').objects.using(alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0024_scan_index_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='cost_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(condition=models.Q(('cost_amount__isnull', True)), fields=['product', 'id'], name='stock_movement_uncosted_idx'),
+        ),
+        migrations.RunPython(reset_costing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0025_stock_movement_cost_amount'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productpricehistory',
+            name='source',
+            field=models.CharField(choices=[('manual', 'Product edit'), ('reprice', 'Bulk repricing'), ('import', 'Product import'), ('api', 'API')], default='manual', max_length=20),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.core.validators import MinValueValidator
 from decimal import Decimal
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.core.cache import cache
 
 class Category(models.Model):
     """Product categories"""
@@ -121,9 +122,24 @@ class Customer(models.Model):
         verbose_name = 'عميل'
         verbose_name_plural = 'العملاء'
         ordering = ['name']
+        indexes = [
+            # Typeahead lookups: active customers by name/phone prefix
+            models.Index(fields=['is_active', 'name'], name='customer_active_name_idx'),
+            models.Index(fields=['phone'], name='customer_phone_idx'),
+        ]
 
 class Product(models.Model):
     """Products/spare parts"""
+    ABC_CLASS_CHOICES = [
+        ('A', 'A - High value'),
+        ('B', 'B - Medium value'),
+        ('C', 'C - Low value'),
+    ]
+    XYZ_CLASS_CHOICES = [
+        ('X', 'X - Steady demand'),
+        ('Y', 'Y - Variable demand'),
+        ('Z', 'Z - Erratic demand'),
+    ]
 
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
@@ -163,6 +179,10 @@ class Product(models.Model):
     is_active = models.BooleanField(default=True)
     is_featured = models.BooleanField(default=False)
     
+    # Classification (set by the classify_inventory command; blank until classified)
+    abc_class = models.CharField(max_length=1, choices=ABC_CLASS_CHOICES, blank=True, db_index=True)
+    xyz_class = models.CharField(max_length=1, choices=XYZ_CLASS_CHOICES, blank=True, db_index=True)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -195,6 +215,270 @@ class Product(models.Model):
         verbose_name = 'منتج'
         verbose_name_plural = 'المنتجات'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['is_active', 'name'], name='product_active_name_idx'),
+            # Offline catalog versions and deltas
+            models.Index(fields=['updated_at'], name='product_updated_at_idx'),
+            # Stock status filters read the rollup over locations
+            models.Index(fields=['is_active', 'current_stock'], name='product_active_stock_idx'),
+        ]
+
+class ProductSearchToken(models.Model):
+    """Normalized search tokens per product (index for non-SQLite backends)"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=100)
+
+    def __str__(self):
+        return f"{self.token} -> {self.product_id}"
+
+    class Meta:
+        db_table = 'product_search_tokens'
+        verbose_name = 'Product Search Token'
+        verbose_name_plural = 'Product Search Tokens'
+        unique_together = ['product', 'token']
+        indexes = [
+            models.Index(fields=['token', 'product'], name='product_search_token_idx'),
+        ]
+
+class ProductSearchDocument(models.Model):
+    """Row of the SQLite FTS5 search table, keyed by product id (created by migration 0007)"""
+    rowid = models.IntegerField(primary_key=True)
+    document = models.TextField()
+    # FTS5 hidden column: bm25 score of the current MATCH, lower is better
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'product_search_fts'
+        verbose_name = 'Product Search Document'
+        verbose_name_plural = 'Product Search Documents'
+
+class PartCrossReference(models.Model):
+    """Part/OEM/aftermarket numbers mapped to products by normalized key"""
+    REFERENCE_TYPE_CHOICES = [
+        ('part', 'Part Number'),
+        ('oem', 'OEM Number'),
+        ('aftermarket', 'Aftermarket Number'),
+        ('supplier', 'Supplier Number'),
+    ]
+
+    SOURCE_CHOICES = [
+        ('product', 'Product Record'),
+        ('import', 'Imported List'),
+        ('manual', 'Manual Entry'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cross_references')
+    number = models.CharField(max_length=100)
+    normalized_key = models.CharField(max_length=100, db_index=True)
+    reference_type = models.CharField(max_length=20, choices=REFERENCE_TYPE_CHOICES, default='oem')
+    manufacturer = models.CharField(max_length=100, blank=True)
+    supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, blank=True, null=True, related_name='cross_references')
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='manual')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.number} -> {self.product_id}"
+
+    class Meta:
+        db_table = 'part_cross_references'
+        verbose_name = 'Part Cross Reference'
+        verbose_name_plural = 'Part Cross References'
+        unique_together = ['product', 'normalized_key', 'reference_type']
+
+class VehicleMake(models.Model):
+    """Vehicle manufacturers used for parts fitment"""
+    name = models.CharField(max_length=100, unique=True)
+    vehicle_type = models.CharField(max_length=20, choices=Category.VEHICLE_TYPE_CHOICES, default='general')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        db_table = 'vehicle_makes'
+        verbose_name = 'Vehicle Make'
+        verbose_name_plural = 'Vehicle Makes'
+        ordering = ['name']
+
+class VehicleModel(models.Model):
+    """Vehicle models per make"""
+    make = models.ForeignKey(VehicleMake, on_delete=models.CASCADE, related_name='models')
+    name = models.CharField(max_length=100)
+    normalized_name = models.CharField(max_length=100, db_index=True)
+    vehicle_type = models.CharField(max_length=20, choices=Category.VEHICLE_TYPE_CHOICES, default='general')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.make.name} {self.name}"
+
+    class Meta:
+        db_table = 'vehicle_models'
+        verbose_name = 'Vehicle Model'
+        verbose_name_plural = 'Vehicle Models'
+        ordering = ['make__name', 'name']
+        unique_together = ['make', 'normalized_name']
+
+class ProductFitment(models.Model):
+    """Which vehicle models (and model years) a product fits"""
+    SOURCE_CHOICES = [
+        ('parsed', 'Parsed from compatible vehicles'),
+        ('manual', 'Manual Entry'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='fitments')
+    vehicle_model = models.ForeignKey(VehicleModel, on_delete=models.CASCADE, related_name='fitments')
+    year_from = models.PositiveSmallIntegerField(blank=True, null=True)
+    year_to = models.PositiveSmallIntegerField(blank=True, null=True)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='manual')
+    notes = models.CharField(max_length=200, blank=True)
+
+    def __str__(self):
+        return f"{self.product_id} fits {self.vehicle_model}"
+
+    class Meta:
+        db_table = 'product_fitments'
+        verbose_name = 'Product Fitment'
+        verbose_name_plural = 'Product Fitments'
+        indexes = [
+            models.Index(fields=['vehicle_model', 'year_from', 'year_to'], name='fitment_vehicle_year_idx'),
+        ]
+
+class ProductTombstone(models.Model):
+    """Deleted products, so offline catalog deltas can tell clients to drop them"""
+    product_id = models.BigIntegerField()
+    sku = models.CharField(max_length=100)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.sku} deleted {self.deleted_at}"
+
+    class Meta:
+        db_table = 'product_tombstones'
+        verbose_name = 'Product Tombstone'
+        verbose_name_plural = 'Product Tombstones'
+
+class ScanIndexState(models.Model):
+    """Change counters of the in-memory scan index, shared by all processes (one row)"""
+    version = models.BigIntegerField(default=0)
+    generation = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Scan index v{self.version} g{self.generation}"
+
+    class Meta:
+        db_table = 'scan_index_state'
+        verbose_name = 'Scan Index State'
+        verbose_name_plural = 'Scan Index State'
+
+class ProductSupplier(models.Model):
+    """Supplier catalog entry: who sells a product, at what cost and in what quantities"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='supplier_links')
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='product_links')
+    supplier_sku = models.CharField(max_length=100, blank=True)
+    is_preferred = models.BooleanField(default=False)
+    last_unit_cost = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    lead_time_days = models.PositiveIntegerField(default=7)
+    min_order_qty = models.PositiveIntegerField(default=1)
+    pack_size = models.PositiveIntegerField(default=1)
+    last_purchased_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product.sku} @ {self.supplier.name}"
+
+    class Meta:
+        db_table = 'product_suppliers'
+        verbose_name = 'Product Supplier'
+        verbose_name_plural = 'Product Suppliers'
+        unique_together = ['product', 'supplier']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product'], condition=models.Q(is_preferred=True),
+                name='product_single_preferred_supplier',
+            ),
+        ]
+
+class ProductStockMetrics(models.Model):
+    """Nightly stock ageing and velocity figures per product (see inventory.metrics)"""
+    MOVEMENT_CLASS_CHOICES = [
+        ('active', 'Active'),
+        ('slow', 'Slow moving'),
+        ('dead', 'Dead stock'),
+        ('no_stock', 'No stock'),
+    ]
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='stock_metrics')
+    last_sale_at = models.DateTimeField(blank=True, null=True)
+    last_received_at = models.DateTimeField(blank=True, null=True)
+    days_since_last_sale = models.PositiveIntegerField(blank=True, null=True, db_index=True)
+    units_sold_30d = models.PositiveIntegerField(default=0)
+    units_sold_90d = models.PositiveIntegerField(default=0)
+    units_sold_365d = models.PositiveIntegerField(default=0)
+    velocity_30d = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    velocity_90d = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    days_of_cover = models.DecimalField(max_digits=12, decimal_places=1, blank=True, null=True, db_index=True)
+    turnover_ratio = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True, db_index=True)
+    stock_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    dead_stock_value = models.DecimalField(max_digits=14, decimal_places=2, default=0, db_index=True)
+    movement_class = models.CharField(max_length=10, choices=MOVEMENT_CLASS_CHOICES, db_index=True)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.product_id} - {self.get_movement_class_display()}"
+
+    class Meta:
+        db_table = 'product_stock_metrics'
+        verbose_name = 'Product Stock Metrics'
+        verbose_name_plural = 'Product Stock Metrics'
+
+class Location(models.Model):
+    """Place stock is kept (shop floor, back warehouse); see inventory.locations"""
+    LOCATION_TYPE_CHOICES = [
+        ('shop', 'Shop'),
+        ('warehouse', 'Warehouse'),
+    ]
+
+    code = models.CharField(max_length=20, unique=True)
+    name = models.CharField(max_length=100)
+    location_type = models.CharField(max_length=20, choices=LOCATION_TYPE_CHOICES, default='shop')
+    is_default = models.BooleanField(default=False)  # Where stock moves when no location is given
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.code})"
+
+    class Meta:
+        db_table = 'stock_locations'
+        verbose_name = 'Stock Location'
+        verbose_name_plural = 'Stock Locations'
+        ordering = ['-is_default', 'name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['is_default'], condition=models.Q(is_default=True), name='single_default_location',
+            ),
+        ]
+
+class StockBalance(models.Model):
+    """Stock of a product at one location; Product.current_stock is the total over locations"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_balances')
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='balances')
+    quantity = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.location_id}: {self.quantity}"
+
+    class Meta:
+        db_table = 'stock_balances'
+        verbose_name = 'Stock Balance'
+        verbose_name_plural = 'Stock Balances'
+        unique_together = ['product', 'location']
+        indexes = [
+            models.Index(fields=['location', 'quantity'], name='stock_balance_location_idx'),
+        ]
 
 class StockMovement(models.Model):
     """Track all stock movements"""
@@ -216,7 +500,12 @@ class StockMovement(models.Model):
     reference_number = models.CharField(max_length=100, blank=True)
     reference_model = models.CharField(max_length=50, blank=True)  # Related model (Sale, Purchase, etc.)
     reference_id = models.PositiveIntegerField(blank=True, null=True)
+    location = models.ForeignKey(
+        Location, on_delete=models.PROTECT, related_name='movements', blank=True, null=True
+    )  # Empty: the default location
     notes = models.TextField(blank=True)
+    # Value the movement added to or took out of stock; empty until inventory.costing costs it
+    cost_amount = models.DecimalField(max_digits=14, decimal_places=2, blank=True, null=True)
     created_by = models.ForeignKey('accounts.User', on_delete=models.PROTECT)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -227,8 +516,341 @@ class StockMovement(models.Model):
         db_table = 'stock_movements'
         verbose_name = 'Stock Movement'
         verbose_name_plural = 'Stock Movements'
+        indexes = [
+            # Period totals for stock checkpoints and as-of queries
+            models.Index(fields=['created_at'], name='stock_movement_created_idx'),
+            # Movements still waiting for inventory.costing
+            models.Index(
+                fields=['product', 'id'], name='stock_movement_uncosted_idx',
+                condition=models.Q(cost_amount__isnull=True),
+            ),
+        ]
+        ordering = ['-created_at']
+
+class CostLayer(models.Model):
+    """Stock received at one unit cost; FIFO costing consumes the oldest layers first"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cost_layers')
+    movement = models.ForeignKey(StockMovement, on_delete=models.CASCADE, related_name='cost_layers')
+    received_at = models.DateTimeField()
+    quantity = models.IntegerField()
+    remaining_quantity = models.IntegerField()
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.remaining_quantity}/{self.quantity} @ {self.unit_cost}"
+
+    class Meta:
+        db_table = 'cost_layers'
+        verbose_name = 'Cost Layer'
+        verbose_name_plural = 'Cost Layers'
+        indexes = [
+            models.Index(fields=['product', 'received_at', 'id'], name='cost_layer_fifo_idx'),
+        ]
+
+class ProductCost(models.Model):
+    """Running costing state per product: quantity and value on hand, and the newest movement costed"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='costing')
+    on_hand = models.IntegerField(default=0)
+    average_cost = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    inventory_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_movement_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.on_hand} @ {self.average_cost}"
+
+    class Meta:
+        db_table = 'product_costs'
+        verbose_name = 'Product Cost'
+        verbose_name_plural = 'Product Costs'
+
+class StockCheckpoint(models.Model):
+    """Quantity and value of a product at a period end (movements before `as_of`); see inventory.balances"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_checkpoints')
+    as_of = models.DateTimeField()
+    quantity = models.IntegerField()
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4)
+    value = models.DecimalField(max_digits=14, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.as_of:%Y-%m-%d}: {self.quantity}"
+
+    class Meta:
+        db_table = 'stock_checkpoints'
+        verbose_name = 'Stock Checkpoint'
+        verbose_name_plural = 'Stock Checkpoints'
+        unique_together = ['as_of', 'product']
+
+class StockCount(models.Model):
+    """Physical stock count; expected quantities are frozen when it starts (see inventory.counting)"""
+    STATUS_CHOICES = [
+        ('counting', 'Counting'),
+        ('posted', 'Posted'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    count_number = models.CharField(max_length=50, unique=True)
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, related_name='stock_counts', blank=True, null=True
+    )  # Empty: the whole catalog
+    location = models.ForeignKey(
+        Location, on_delete=models.PROTECT, related_name='stock_counts', blank=True, null=True
+    )  # Empty: the default location
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='counting')
+    notes = models.TextField(blank=True)
+    started_by = models.ForeignKey('accounts.User', on_delete=models.PROTECT, related_name='stock_counts_started')
+    started_at = models.DateTimeField(auto_now_add=True)
+    posted_by = models.ForeignKey(
+        'accounts.User', on_delete=models.PROTECT, related_name='stock_counts_posted', blank=True, null=True
+    )
+    posted_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.count_number} ({self.get_status_display()})"
+
+    class Meta:
+        db_table = 'stock_counts'
+        verbose_name = 'Stock Count'
+        verbose_name_plural = 'Stock Counts'
+        ordering = ['-started_at']
+
+class StockCountLine(models.Model):
+    """One product of a stock count: expected quantity (as of its last scan), counted quantity and posted adjustment"""
+    count = models.ForeignKey(StockCount, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='count_lines')
+    expected_quantity = models.IntegerField()
+    counted_quantity = models.IntegerField(blank=True, null=True)
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    adjustment_quantity = models.IntegerField(default=0)
+    counted_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.count_id}/{self.product_id}: {self.counted_quantity} of {self.expected_quantity}"
+
+    class Meta:
+        db_table = 'stock_count_lines'
+        verbose_name = 'Stock Count Line'
+        verbose_name_plural = 'Stock Count Lines'
+        unique_together = ['count', 'product']
+
+class StockCountUpload(models.Model):
+    """Scan batches applied to a count, so a handheld retrying an upload is not counted twice"""
+    count = models.ForeignKey(StockCount, on_delete=models.CASCADE, related_name='uploads')
+    batch_id = models.CharField(max_length=100)
+    scan_count = models.PositiveIntegerField(default=0)
+    uploaded_by = models.ForeignKey('accounts.User', on_delete=models.PROTECT, related_name='stock_count_uploads')
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.count_id}/{self.batch_id}"
+
+    class Meta:
+        db_table = 'stock_count_uploads'
+        verbose_name = 'Stock Count Upload'
+        verbose_name_plural = 'Stock Count Uploads'
+        unique_together = ['count', 'batch_id']
+
+class StockTransfer(models.Model):
+    """Stock moved from one location to another in one go"""
+    transfer_number = models.CharField(max_length=50, unique=True)
+    from_location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='transfers_out')
+    to_location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='transfers_in')
+    notes = models.TextField(blank=True)
+    created_by = models.ForeignKey('accounts.User', on_delete=models.PROTECT, related_name='stock_transfers')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.transfer_number}: {self.from_location_id} -> {self.to_location_id}"
+
+    class Meta:
+        db_table = 'stock_transfers'
+        verbose_name = 'Stock Transfer'
+        verbose_name_plural = 'Stock Transfers'
         ordering = ['-created_at']
 
+class StockTransferItem(models.Model):
+    """One product line of a stock transfer"""
+    transfer = models.ForeignKey(StockTransfer, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='transfer_items')
+    quantity = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.transfer_id}/{self.product_id}: {self.quantity}"
+
+    class Meta:
+        db_table = 'stock_transfer_items'
+        verbose_name = 'Stock Transfer Item'
+        verbose_name_plural = 'Stock Transfer Items'
+
+class StockReservation(models.Model):
+    """Stock held for a cart or pending sale until it expires; see inventory.reservations"""
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('committed', 'Committed'),
+        ('released', 'Released'),
+        ('expired', 'Expired'),
+    ]
+
+    hold_key = models.CharField(max_length=100, db_index=True)  # Groups the lines of one cart
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    sale = models.ForeignKey(
+        'sales.Sale', on_delete=models.SET_NULL, related_name='stock_reservations', blank=True, null=True
+    )  # Set when the hold is committed to a sale
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    expires_at = models.DateTimeField()
+    created_by = models.ForeignKey('accounts.User', on_delete=models.PROTECT, related_name='stock_reservations')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.hold_key}/{self.product_id}: {self.quantity} ({self.status})"
+
+    class Meta:
+        db_table = 'stock_reservations'
+        verbose_name = 'Stock Reservation'
+        verbose_name_plural = 'Stock Reservations'
+        indexes = [
+            # Reserved quantity per product for available-to-promise checks
+            models.Index(
+                fields=['product', 'expires_at'], condition=models.Q(status='active'), name='reservation_active_idx',
+            ),
+            # Sweeper of expired holds
+            models.Index(
+                fields=['expires_at'], condition=models.Q(status='active'), name='reservation_expiry_idx',
+            ),
+        ]
+
+class PriceChange(models.Model):
+    """One bulk repricing run: the products it selected and the rule it applied (see inventory.pricing)"""
+    RULE_CHOICES = [
+        ('percentage', 'Percentage change'),
+        ('fixed', 'Fixed amount change'),
+        ('margin', 'Margin over cost'),
+    ]
+    ROUNDING_CHOICES = [
+        ('nearest', 'Nearest'),
+        ('up', 'Up'),
+        ('down', 'Down'),
+    ]
+
+    rule = models.CharField(max_length=20, choices=RULE_CHOICES)
+    value = models.DecimalField(max_digits=10, decimal_places=2)
+    rounding_step = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    rounding_mode = models.CharField(max_length=10, choices=ROUNDING_CHOICES, default='nearest')
+    filters = models.JSONField(default=dict, blank=True)  # category, brand, vehicle_type
+    description = models.CharField(max_length=200, blank=True)
+    product_count = models.PositiveIntegerField(default=0)
+    created_by = models.ForeignKey('accounts.User', on_delete=models.PROTECT, related_name='price_changes')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.get_rule_display()} {self.value} ({self.product_count} products)"
+
+    class Meta:
+        db_table = 'price_changes'
+        verbose_name = 'Price Change'
+        verbose_name_plural = 'Price Changes'
+        ordering = ['-created_at']
+
+class ProductPriceHistory(models.Model):
+    """Selling price of a product from `effective_from` on, with the price it replaced"""
+    SOURCE_CHOICES = [
+        ('manual', 'Product edit'),
+        ('reprice', 'Bulk repricing'),
+        ('import', 'Product import'),
+        ('api', 'API'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_history')
+    previous_price = models.DecimalField(max_digits=10, decimal_places=2)
+    selling_price = models.DecimalField(max_digits=10, decimal_places=2)
+    effective_from = models.DateTimeField()
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='manual')
+    price_change = models.ForeignKey(
+        PriceChange, on_delete=models.SET_NULL, related_name='history', blank=True, null=True
+    )
+    changed_by = models.ForeignKey(
+        'accounts.User', on_delete=models.SET_NULL, related_name='price_history', blank=True, null=True
+    )
+
+    def __str__(self):
+        return f"{self.product_id}: {self.previous_price} -> {self.selling_price} @ {self.effective_from:%Y-%m-%d}"
+
+    class Meta:
+        db_table = 'product_price_history'
+        verbose_name = 'Product Price History'
+        verbose_name_plural = 'Product Price History'
+        indexes = [
+            # Effective price of a product at a date
+            models.Index(fields=['product', 'effective_from'], name='price_history_lookup_idx'),
+        ]
+
+class ProductImport(models.Model):
+    """Bulk product import job from an uploaded CSV/XLSX file; see inventory.imports"""
+    FILE_FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel (XLSX)'),
+    ]
+    MODE_CHOICES = [
+        ('create', 'Create new products only'),
+        ('update', 'Update existing products only'),
+        ('upsert', 'Create and update'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    file = models.FileField(upload_to='imports/')
+    file_format = models.CharField(max_length=10, choices=FILE_FORMAT_CHOICES, default='csv')
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES, default='upsert')
+    dry_run = models.BooleanField(default=False)  # Validate and report without saving
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    message = models.TextField(blank=True)  # Why a failed import stopped
+    created_by = models.ForeignKey('accounts.User', on_delete=models.PROTECT, related_name='product_imports')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Import #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def progress(self):
+        if not self.total_rows:
+            return 100 if self.status in ('completed', 'failed') else 0
+        return min(100, self.processed_rows * 100 // self.total_rows)
+
+    class Meta:
+        db_table = 'product_imports'
+        verbose_name = 'Product Import'
+        verbose_name_plural = 'Product Imports'
+        ordering = ['-created_at']
+
+class ProductImportError(models.Model):
+    """A rejected row of a product import"""
+    product_import = models.ForeignKey(ProductImport, on_delete=models.CASCADE, related_name='errors')
+    row_number = models.PositiveIntegerField()
+    sku = models.CharField(max_length=100, blank=True)
+    message = models.TextField()
+
+    def __str__(self):
+        return f"{self.product_import_id}/{self.row_number}: {self.message}"
+
+    class Meta:
+        db_table = 'product_import_errors'
+        verbose_name = 'Product Import Error'
+        verbose_name_plural = 'Product Import Errors'
+        ordering = ['row_number']
+
 class InventoryAlert(models.Model):
     """Inventory alerts for low stock, etc."""
     ALERT_TYPE_CHOICES = [
@@ -311,9 +933,31 @@ class ShopSettings(models.Model):
         verbose_name = 'إعدادات المحل'
         verbose_name_plural = 'إعدادات المحل'
 
+    CACHE_KEY = 'shop_settings'
+    CACHE_TIMEOUT = 60 * 60  # Bounds staleness for per-process cache backends
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Invalidate the cached copy so the next read picks up the change
+        self.clear_cache()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.clear_cache()
+        return result
+
+    @classmethod
+    def clear_cache(cls):
+        """Drop the cached shop settings"""
+        cache.delete(cls.CACHE_KEY)
+
     @classmethod
     def get_settings(cls):
-        """Get or create shop settings"""
+        """Get shop settings from the cache, creating them on first use"""
+        settings = cache.get(cls.CACHE_KEY)
+        if settings is not None:
+            return settings
+
         settings, created = cls.objects.get_or_create(
             id=1,
             defaults={
@@ -324,6 +968,7 @@ class ShopSettings(models.Model):
                 'city': '',
             }
         )
+        cache.set(cls.CACHE_KEY, settings, cls.CACHE_TIMEOUT)
         return settings
 
 class Invoice(models.Model):
@@ -0,0 +1,250 @@
+"""
+Bulk repricing and selling price history.
+
+A repricing selects products by category (with its subcategories), brand
+and vehicle type, and computes every new price in the database from one
+rule:
+
+* ``percentage`` - selling price plus `value` percent (negative to cut);
+* ``fixed`` - selling price plus `value`;
+* ``margin`` - cost price plus `value` percent, the margin shown on the
+  product page;
+
+optionally rounded to a multiple of `rounding_step` (nearest, up or down).
+
+`preview()` reports what a rule would do with one aggregate query.
+`apply()` writes it set-based in one transaction: a single
+``INSERT ... SELECT`` records the old and new price of every product that
+changes in `ProductPriceHistory`, then a single UPDATE copies the new prices
+from those history rows onto the products. Product edits, imports and API
+writes record their price changes in the same table.
+
+`effective_price()` is the selling price in force at a moment, looked up
+through the (product, effective_from) index: the latest change at or before
+it, or for a moment before the first recorded change the price that change
+replaced, or the current price of a product never repriced.
+"""
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+from django.db.models import (
+    Avg, Count, DecimalField, ExpressionWrapper, F, IntegerField, Max, Min, OuterRef, Q, Subquery, Sum, Value,
+)
+from django.db.models.functions import Ceil, Coalesce, Floor, NullIf, Round
+from django.utils import timezone
+
+RULES = ('percentage', 'fixed', 'margin')
+ROUNDING_MODES = ('nearest', 'up', 'down')
+# Products listed as a sample in a preview
+PREVIEW_SAMPLE_SIZE = 20
+
+PRICE = DecimalField(max_digits=10, decimal_places=2)
+CENT = Decimal('0.01')
+
+
+class PricingError(Exception):
+    pass
+
+
+def category_subtree(category_id):
+    """Ids of `category_id` and all categories below it"""
+    from .models import Category
+
+    children = {}
+    for pk, parent_id in Category.objects.values_list('id', 'parent_category_id'):
+        children.setdefault(parent_id, []).append(pk)
+    ids, pending = [], [category_id]
+    while pending:
+        pk = pending.pop()
+        if pk not in ids:
+            ids.append(pk)
+            pending.extend(children.get(pk, []))
+    return ids
+
+
+def select_products(category=None, brand=None, vehicle_type=None, include_inactive=False):
+    """Products a repricing applies to; returns (queryset, filters dict to store with it)"""
+    from .models import Product
+
+    products = Product.objects.all() if include_inactive else Product.objects.filter(is_active=True)
+    filters = {}
+    if category is not None:
+        products = products.filter(category_id__in=category_subtree(category.id))
+        filters['category'] = category.id
+    if brand is not None:
+        products = products.filter(brand=brand)
+        filters['brand'] = brand.id
+    if vehicle_type:
+        products = products.filter(category__vehicle_type=vehicle_type)
+        filters['vehicle_type'] = vehicle_type
+    if include_inactive:
+        filters['include_inactive'] = True
+    return products, filters
+
+
+def new_price_expression(rule, value, rounding_step=None, rounding_mode='nearest'):
+    """Database expression of a product's new selling price under the rule"""
+    if rule not in RULES:
+        raise PricingError(f"Unknown rule {rule!r}; choose from {', '.join(RULES)}")
+    if rounding_mode not in ROUNDING_MODES:
+        raise PricingError(f"Unknown rounding {rounding_mode!r}; choose from {', '.join(ROUNDING_MODES)}")
+    value = Value(Decimal(value), output_field=PRICE)
+    if rule == 'percentage':
+        price = F('selling_price') + F('selling_price') * value / Value(100, output_field=PRICE)
+    elif rule == 'fixed':
+        price = F('selling_price') + value
+    else:
+        price = F('cost_price') + F('cost_price') * value / Value(100, output_field=PRICE)
+    price = ExpressionWrapper(price, output_field=PRICE)
+    if rounding_step:
+        step = Value(Decimal(rounding_step), output_field=PRICE)
+        rounded = {'nearest': Round, 'up': Ceil, 'down': Floor}[rounding_mode](price / step)
+        price = ExpressionWrapper(rounded * step, output_field=PRICE)
+    return Round(price, 2, output_field=PRICE)
+
+
+def _changes(products, expression):
+    # Prices that would not move, or would drop to zero or below, are left out
+    return (
+        products.annotate(new_price=expression)
+        .filter(new_price__gt=0).exclude(new_price=F('selling_price'))
+    )
+
+
+def preview(products, rule, value, rounding_step=None, rounding_mode='nearest'):
+    """Aggregate effect of the rule on `products`, plus a sample of the changes"""
+    changes = _changes(products, new_price_expression(rule, value, rounding_step, rounding_mode))
+    change = ExpressionWrapper(F('new_price') - F('selling_price'), output_field=PRICE)
+    stats = changes.aggregate(
+        products=Count('id'),
+        increased=Count('id', filter=Q(new_price__gt=F('selling_price'))),
+        decreased=Count('id', filter=Q(new_price__lt=F('selling_price'))),
+        below_cost=Count('id', filter=Q(new_price__lt=F('cost_price'))),
+        average_change=Avg(change),
+        average_change_percent=Avg(ExpressionWrapper(
+            change * Value(100, output_field=PRICE) / NullIf('selling_price', Value(0, output_field=PRICE)),
+            output_field=PRICE,
+        )),
+        smallest_change=Min(change),
+        largest_change=Max(change),
+        stock_value_change=Coalesce(
+            Sum(ExpressionWrapper(change * F('current_stock'), output_field=DecimalField(max_digits=14, decimal_places=2))),
+            Value(0), output_field=DecimalField(max_digits=14, decimal_places=2),
+        ),
+    )
+    # SQLite hands computed decimals back unscaled
+    for key in ('average_change', 'average_change_percent', 'smallest_change', 'largest_change', 'stock_value_change'):
+        if stats[key] is not None:
+            stats[key] = Decimal(stats[key]).quantize(CENT)
+    stats['unchanged'] = products.count() - stats['products']
+    stats['sample'] = [
+        {**row, 'new_price': Decimal(row['new_price']).quantize(CENT)}
+        for row in changes.order_by('name').values(
+            'id', 'sku', 'name', 'cost_price', 'selling_price', 'new_price'
+        )[:PREVIEW_SAMPLE_SIZE]
+    ]
+    return stats
+
+
+def _insert_history(changes, price_change, user, now):
+    """Record the changes of `changes` (annotated with new_price) with one INSERT ... SELECT; returns the row count"""
+    from .models import ProductPriceHistory
+
+    # Model fields first, then the annotations in the same order, so the SELECT matches the column list
+    source = changes.order_by().annotate(
+        history_effective_from=Value(now, output_field=ProductPriceHistory._meta.get_field('effective_from')),
+        history_source=Value('reprice'),
+        history_price_change=Value(price_change.id, output_field=IntegerField()),
+        history_changed_by=Value(user.id, output_field=IntegerField()),
+    ).values_list(
+        'id', 'selling_price', 'new_price', 'history_effective_from', 'history_source',
+        'history_price_change', 'history_changed_by',
+    )
+    select_sql, params = source.query.sql_with_params()
+    using = router.db_for_write(ProductPriceHistory)
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {ProductPriceHistory._meta.db_table} '
+            '(product_id, previous_price, selling_price, effective_from, source, price_change_id, changed_by_id) '
+            f'{select_sql}',
+            params,
+        )
+        return cursor.rowcount
+
+
+def apply(products, rule, value, user, rounding_step=None, rounding_mode='nearest', filters=None, description=''):
+    """Reprice `products` with the rule in one transaction; returns the PriceChange"""
+    from dashboard import events
+    from dashboard.models import ActivityLog
+    from . import scan
+    from .models import PriceChange, Product, ProductPriceHistory
+
+    expression = new_price_expression(rule, value, rounding_step, rounding_mode)
+    now = timezone.now()
+    with transaction.atomic():
+        price_change = PriceChange.objects.create(
+            rule=rule, value=value, rounding_step=rounding_step or None, rounding_mode=rounding_mode,
+            filters=filters or {}, description=description, created_by=user,
+        )
+        # Lock the selected products so the prices recorded are the prices replaced
+        list(Product.objects.select_for_update().filter(id__in=products.values('id')).values_list('id', flat=True))
+        price_change.product_count = _insert_history(_changes(products, expression), price_change, user, now)
+        price_change.save(update_fields=['product_count'])
+
+        history = ProductPriceHistory.objects.filter(price_change=price_change)
+        Product.objects.filter(id__in=history.values('product_id')).update(
+            selling_price=Subquery(history.filter(product=OuterRef('pk')).values('selling_price')[:1]),
+            updated_at=now,
+        )
+
+        events.publish(
+            'prices_changed',
+            {'price_change_id': price_change.id, 'rule': rule, 'value': str(value),
+             'products': price_change.product_count},
+            aggregate=price_change,
+        )
+        ActivityLog.objects.create(
+            user=user,
+            action='update',
+            description=f'Repriced {price_change.product_count} products: {price_change}',
+            content_object=price_change,
+        )
+        # The update skips the product signals; the scan index shows prices
+        product_ids = list(history.values_list('product_id', flat=True))
+        transaction.on_commit(lambda: scan.product_changed(product_ids))
+    return price_change
+
+
+def record(changes, source, user=None, now=None):
+    """Record `(product_id, previous_price, selling_price)` changes made row by row (edits, imports)"""
+    from .models import ProductPriceHistory
+
+    now = now or timezone.now()
+    ProductPriceHistory.objects.bulk_create([
+        ProductPriceHistory(
+            product_id=product_id, previous_price=previous, selling_price=price, effective_from=now,
+            source=source, changed_by=user,
+        )
+        for product_id, previous, price in changes if previous != price
+    ], batch_size=500)
+
+
+def effective_price(when):
+    """Expression: a product's selling price in force at `when` (annotate Product querysets with it)"""
+    from .models import ProductPriceHistory
+
+    history = ProductPriceHistory.objects.filter(product=OuterRef('pk'))
+    in_force = history.filter(effective_from__lte=when).order_by('-effective_from', '-id').values('selling_price')[:1]
+    replaced = history.filter(effective_from__gt=when).order_by('effective_from', 'id').values('previous_price')[:1]
+    return Coalesce(Subquery(in_force), Subquery(replaced), F('selling_price'), output_field=PRICE)
+
+
+def prices_on(product_ids, when):
+    """{product_id: selling price in force at `when`}"""
+    from .models import Product
+
+    return {
+        product_id: Decimal(price).quantize(CENT)
+        for product_id, price in Product.objects.filter(id__in=product_ids)
+        .annotate(price=effective_price(when)).values_list('id', 'price')
+    }
@@ -0,0 +1,146 @@
+"""
+Reconciliation of `Product.current_stock` against the stock movement ledger.
+
+The counter on the product is kept up to date by the views as stock moves;
+the ledger balance is the sum of the product's signed `StockMovement`
+quantities (directions as in `inventory.costing`). When a code path updates
+one without the other they drift apart.
+
+`find_drift()` walks the catalog in id chunks with one grouped query over
+each chunk's movements and yields the products whose counter differs from
+the ledger. `fix()` corrects one chunk of them, either way:
+
+* ``counter`` - set `current_stock` to the ledger balance;
+* ``ledger`` - post an `adjustment` movement for the difference, so the
+  counter (what was counted and sold against) stands and costing follows.
+
+`fix()` locks the chunk's products and recomputes their balances before
+writing, so a sale recorded since the report is not "corrected" away. Each
+chunk is its own short transaction; the `reconcile_stock` command pauses
+between chunks so it can run while the shop is trading.
+"""
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import locations, scan
+from .costing import signed_quantity_expression
+
+RECONCILE_CHUNK_SIZE = 500
+MODES = ('counter', 'ledger')
+
+
+def ledger_balances(product_ids):
+    """{product_id: ledger balance} for `product_ids` (products without movements are left out)"""
+    from .models import StockMovement
+
+    return dict(
+        StockMovement.objects.filter(product_id__in=product_ids)
+        .values('product_id').annotate(balance=Sum(signed_quantity_expression())).order_by()
+        .values_list('product_id', 'balance')
+    )
+
+
+def _drift_rows(products, balances, min_drift):
+    rows = []
+    for product in products:
+        ledger = balances.get(product.id) or 0
+        drift = product.current_stock - ledger
+        if abs(drift) >= min_drift:
+            rows.append({
+                'product_id': product.id,
+                'sku': product.sku,
+                'name': product.name,
+                'counter': product.current_stock,
+                'ledger': ledger,
+                'drift': drift,
+                'value': abs(drift) * product.cost_price,
+            })
+    return rows
+
+
+def find_drift(products=None, chunk_size=RECONCILE_CHUNK_SIZE, min_drift=1):
+    """
+    Yield, chunk by chunk of `products` (default: the whole catalog), the
+    list of drift rows: dicts with `product_id`, `sku`, `name`, `counter`,
+    `ledger`, `drift` (counter - ledger) and `value` (|drift| at cost price).
+    """
+    from .models import Product
+
+    if products is None:
+        products = Product.objects.all()
+    products = products.only('id', 'sku', 'name', 'current_stock', 'cost_price').order_by('id')
+    last_id = 0
+    while True:
+        chunk = list(products.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        last_id = chunk[-1].id
+        yield _drift_rows(chunk, ledger_balances([product.id for product in chunk]), min_drift)
+
+
+def fix(rows, mode, user, min_drift=1):
+    """
+    Correct the products of `rows` (one chunk from `find_drift()`) in `mode`;
+    returns the rows actually corrected, with the balances found under lock.
+    """
+    from dashboard import events
+    from dashboard.models import ActivityLog
+    from .models import Product, StockMovement
+
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}; choose from {', '.join(MODES)}")
+    if not rows:
+        return []
+
+    now = timezone.now()
+    with transaction.atomic():
+        products = list(
+            Product.objects.select_for_update()
+            .filter(id__in=[row['product_id'] for row in rows]).order_by('id')
+        )
+        fixed = _drift_rows(products, ledger_balances([product.id for product in products]), min_drift)
+        if not fixed:
+            return []
+
+        if mode == 'counter':
+            by_id = {product.id: product for product in products}
+            changed = []
+            for row in fixed:
+                product = by_id[row['product_id']]
+                product.current_stock = row['ledger']
+                product.updated_at = now
+                changed.append(product)
+            Product.objects.bulk_update(changed, ['current_stock', 'updated_at'], batch_size=RECONCILE_CHUNK_SIZE)
+            # Location balances add up to current_stock; the default location takes the correction
+            default_id = locations.default_location().id
+            locations.add({(default_id, row['product_id']): -row['drift'] for row in fixed})
+            # bulk_update skips the product signals; the scan index shows stock
+            changed_ids = [product.id for product in changed]
+            transaction.on_commit(lambda: scan.product_changed(changed_ids))
+        else:
+            costs = {product.id: product.cost_price for product in products}
+            location = locations.default_location()
+            movements = [
+                StockMovement(
+                    product_id=row['product_id'],
+                    movement_type='adjustment',
+                    quantity=row['drift'],
+                    unit_cost=costs[row['product_id']],
+                    reference_number='RECONCILIATION',
+                    location=location,
+                    notes=f"Ledger reconciled to stock counter ({row['ledger']} -> {row['counter']})",
+                    created_by=user,
+                )
+                for row in fixed
+            ]
+            # The location balances already add up to the counter: only the ledger moves
+            StockMovement.objects.bulk_create(movements, batch_size=RECONCILE_CHUNK_SIZE)
+
+        events.stock_changed([row['product_id'] for row in fixed], 'reconciliation')
+        ActivityLog.objects.create(
+            user=user,
+            action='update',
+            description=f'Reconciled stock of {len(fixed)} products ({mode})',
+        )
+    return fixed
@@ -0,0 +1,165 @@
+"""
+Stock reservations.
+
+A cart being rung up, or a pending credit sale waiting for approval, holds
+its stock with `StockReservation` rows grouped by a `hold_key`. Holds expire
+on their own: only active rows with `expires_at` in the future count, so a
+cart abandoned at a till stops blocking stock after `DEFAULT_HOLD_MINUTES`
+even before the sweeper has marked it expired.
+
+Available-to-promise is `current_stock` minus the active reservations of
+other holds. It is computed, never stored, with a correlated subquery over
+the partial `reservation_active_idx` index, so checking a whole cart is one
+query that also locks the cart's product rows:
+
+* `reserve()` - check and (re)place the hold of a cart, replacing its lines;
+* `check()` - check a cart about to be sold, inside the sale's transaction;
+* `commit()` - attach the hold to the sale that consumed the stock;
+* `release()` - drop the hold of an abandoned cart;
+* `expire()` - mark lapsed holds expired in batches (`expire_reservations`).
+"""
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+DEFAULT_HOLD_MINUTES = 15
+# Longest hold a client may ask for
+MAX_HOLD_MINUTES = 24 * 60
+# Maximum number of products in one hold
+MAX_HOLD_LINES = 200
+RESERVATION_BATCH_SIZE = 500
+# Released, expired and committed holds are kept this long for auditing
+RETENTION_DAYS = 30
+
+
+class ReservationError(Exception):
+    pass
+
+
+def reserved_quantity(exclude_hold=None):
+    """Expression: quantity of a product held by active reservations (other than `exclude_hold`)"""
+    from .models import StockReservation
+
+    holds = StockReservation.objects.filter(
+        product=OuterRef('pk'), status='active', expires_at__gt=timezone.now()
+    )
+    if exclude_hold:
+        holds = holds.exclude(hold_key=exclude_hold)
+    total = holds.order_by().values('product').annotate(total=Sum('quantity')).values('total')
+    return Coalesce(Subquery(total), Value(0))
+
+
+def available(product_ids, exclude_hold=None):
+    """{product_id: available-to-promise quantity} for `product_ids`"""
+    from .models import Product
+
+    return {
+        product_id: stock - reserved
+        for product_id, stock, reserved in Product.objects.filter(id__in=product_ids)
+        .annotate(reserved=reserved_quantity(exclude_hold))
+        .values_list('id', 'current_stock', 'reserved')
+    }
+
+
+def check(quantities, hold_key=None):
+    """
+    Lock the products of a cart (`{product_id: quantity}`) and raise
+    ReservationError unless all of them are available; the cart's own hold
+    does not count against it. Call inside the transaction that sells it.
+    """
+    from .models import Product
+
+    rows = list(
+        Product.objects.select_for_update().filter(id__in=quantities)
+        .annotate(reserved=reserved_quantity(hold_key))
+        .values_list('id', 'name', 'current_stock', 'reserved')
+    )
+    missing = set(quantities) - {row[0] for row in rows}
+    if missing:
+        raise ReservationError(f'Unknown products: {", ".join(str(pk) for pk in sorted(missing))}')
+    short = [
+        f'{name} (available {stock - reserved}, requested {quantities[product_id]})'
+        for product_id, name, stock, reserved in rows
+        if quantities[product_id] > stock - reserved
+    ]
+    if short:
+        raise ReservationError(f'Not enough stock: {", ".join(short)}')
+
+
+def reserve(quantities, user, hold_key=None, minutes=DEFAULT_HOLD_MINUTES):
+    """
+    Hold `{product_id: quantity}` for `minutes`, replacing the lines already
+    held under `hold_key` (a new key is generated when empty). Raises
+    ReservationError, holding nothing new, if any product is short.
+    Returns `(hold_key, expires_at)`.
+    """
+    from .models import StockReservation
+
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity}
+    if any(quantity < 0 for quantity in quantities.values()):
+        raise ReservationError('Quantities must be positive')
+    if len(quantities) > MAX_HOLD_LINES:
+        raise ReservationError(f'At most {MAX_HOLD_LINES} products per hold')
+    if not 0 < minutes <= MAX_HOLD_MINUTES:
+        raise ReservationError(f'A hold lasts between 1 and {MAX_HOLD_MINUTES} minutes')
+    hold_key = hold_key or uuid.uuid4().hex
+    expires_at = timezone.now() + timedelta(minutes=minutes)
+
+    with transaction.atomic():
+        check(quantities, hold_key)
+        StockReservation.objects.filter(hold_key=hold_key, status='active').delete()
+        StockReservation.objects.bulk_create([
+            StockReservation(
+                hold_key=hold_key, product_id=product_id, quantity=quantity,
+                expires_at=expires_at, created_by=user,
+            )
+            for product_id, quantity in sorted(quantities.items())
+        ], batch_size=RESERVATION_BATCH_SIZE)
+    return hold_key, expires_at
+
+
+def commit(hold_key, sale):
+    """Mark the hold as consumed by `sale`; returns the number of lines committed"""
+    from .models import StockReservation
+
+    if not hold_key:
+        return 0
+    return StockReservation.objects.filter(hold_key=hold_key, status='active').update(
+        status='committed', sale=sale
+    )
+
+
+def release(hold_key):
+    """Give the stock of an abandoned hold back; returns the number of lines released"""
+    from .models import StockReservation
+
+    return StockReservation.objects.filter(hold_key=hold_key, status='active').update(status='released')
+
+
+def expire(now=None, batch_size=RESERVATION_BATCH_SIZE):
+    """Mark active holds past their expiry as expired, in batches; returns how many"""
+    from .models import StockReservation
+
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        ids = list(
+            StockReservation.objects.filter(status='active', expires_at__lte=now)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return expired
+        expired += StockReservation.objects.filter(id__in=ids, status='active').update(status='expired')
+
+
+def prune(days=RETENTION_DAYS):
+    """Delete holds that stopped being active more than `days` ago"""
+    from .models import StockReservation
+
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = StockReservation.objects.exclude(status='active').filter(expires_at__lt=cutoff).delete()
+    return deleted
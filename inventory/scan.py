@@ -0,0 +1,169 @@
+"""
+In-memory barcode/SKU index for POS scanning.
+
+Each process keeps a dict of normalized barcode/SKU -> product entry so a
+scan is a dict lookup instead of a query. The index is warmed when the WSGI
+application starts (see `sparesmart.wsgi`) and kept current through the
+product signals in `inventory.signals`:
+
+* the writing process patches its own dict after commit, and
+* a shared version counter tells other processes to pull the rows changed
+  since their last sync (by `Product.updated_at`). Deletions and unit renames
+  bump a generation counter instead, which forces a full reload.
+
+`updated_at` is stamped before the writing transaction commits, so each pull
+reaches `SYNC_OVERLAP_SECONDS` back past the latest row seen: a product that
+commits after a later-stamped one is still picked up. Re-applying the rows
+of the overlap is harmless.
+
+The counters live in the single `ScanIndexState` row rather than the cache,
+which is per process unless a shared backend is configured; a scan reads
+them with one primary-key query.
+
+Bulk `QuerySet.update()` calls bypass signals; call `invalidate()` after them.
+"""
+import threading
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+
+STATE_ID = 1
+# How far an incremental pull reaches back for rows that committed late
+SYNC_OVERLAP_SECONDS = 5
+
+ENTRY_FIELDS = (
+    'id', 'name', 'sku', 'barcode', 'selling_price', 'current_stock',
+    'is_active', 'updated_at', 'unit__name_arabic',
+)
+
+_lock = threading.Lock()
+_state = {
+    'codes': None,      # normalized code -> entry
+    'product_codes': {},  # product id -> codes it is indexed under
+    'version': None,
+    'generation': None,
+    'synced_at': None,  # latest updated_at seen
+}
+
+
+def normalize_code(code):
+    return str(code or '').strip().upper()
+
+
+def _entry(row):
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'sku': row['sku'],
+        'barcode': row['barcode'],
+        'price': str(row['selling_price']),
+        'stock': row['current_stock'],
+        'unit': row['unit__name_arabic'],
+    }
+
+
+def _state_rows(using):
+    from .models import ScanIndexState
+    return ScanIndexState.objects.using(using).filter(pk=STATE_ID)
+
+
+def _counters(using=DEFAULT_DB_ALIAS):
+    """Shared (version, generation)"""
+    return _state_rows(using).values_list('version', 'generation').first() or (0, 0)
+
+
+def _bump(field, using=DEFAULT_DB_ALIAS):
+    """Increment a shared counter; returns its new value"""
+    from .models import ScanIndexState
+    with transaction.atomic(using=using):
+        if not _state_rows(using).update(**{field: F(field) + 1}):
+            ScanIndexState.objects.using(using).get_or_create(pk=STATE_ID)
+            _state_rows(using).update(**{field: F(field) + 1})
+        return _state_rows(using).values_list(field, flat=True).get()
+
+
+def _apply(rows, codes, product_codes, synced_at=None):
+    """Patch `codes`/`product_codes` with fresh product rows; returns the latest updated_at"""
+    for row in rows:
+        for code in product_codes.pop(row['id'], ()):
+            codes.pop(code, None)
+        if row['is_active']:
+            entry = _entry(row)
+            keys = {normalize_code(row['sku']), normalize_code(row['barcode'])} - {''}
+            for code in keys:
+                codes[code] = entry
+            product_codes[row['id']] = keys
+        if synced_at is None or row['updated_at'] > synced_at:
+            synced_at = row['updated_at']
+    return synced_at
+
+
+def warm(using=DEFAULT_DB_ALIAS):
+    """(Re)build the whole index; returns the number of codes indexed"""
+    from .models import Product
+    version, generation = _counters(using)
+    codes, product_codes = {}, {}
+    rows = Product.objects.using(using).filter(is_active=True).values(*ENTRY_FIELDS)
+    synced_at = _apply(rows.iterator(chunk_size=2000), codes, product_codes)
+    # Swap in the finished dicts so concurrent scans never see a partial index
+    with _lock:
+        _state.update(
+            codes=codes, product_codes=product_codes, synced_at=synced_at,
+            version=version, generation=generation,
+        )
+    return len(codes)
+
+
+def _sync(using=DEFAULT_DB_ALIAS):
+    """Bring this process's index up to date with the shared counters"""
+    from .models import Product
+    version, generation = _counters(using)
+    if _state['codes'] is None or generation != _state['generation']:
+        warm(using)
+        return
+    if version == _state['version']:
+        return
+    with _lock:
+        changed = Product.objects.using(using).values(*ENTRY_FIELDS)
+        if _state['synced_at'] is not None:
+            since = _state['synced_at'] - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+            changed = changed.filter(updated_at__gte=since)
+        _state['synced_at'] = _apply(
+            changed, _state['codes'], _state['product_codes'], _state['synced_at']
+        )
+        _state['version'] = version
+
+
+def lookup(code, using=DEFAULT_DB_ALIAS):
+    """Product entry for a scanned barcode or SKU, or None"""
+    _sync(using)
+    return _state['codes'].get(normalize_code(code))
+
+
+def lookup_many(codes, using=DEFAULT_DB_ALIAS):
+    """Resolve several scanned codes at once: {code: entry or None}"""
+    _sync(using)
+    index = _state['codes']
+    return {code: index.get(normalize_code(code)) for code in codes}
+
+
+def product_changed(product_ids, using=DEFAULT_DB_ALIAS):
+    """Patch this process's index and tell the others (run after commit)"""
+    from .models import Product
+    new_version = _bump('version', using)
+    if _state['codes'] is None:
+        return
+    rows = Product.objects.using(using).filter(id__in=list(product_ids)).values(*ENTRY_FIELDS)
+    with _lock:
+        _state['synced_at'] = _apply(
+            rows, _state['codes'], _state['product_codes'], _state['synced_at']
+        )
+        # Only skip the next incremental pull if no other process wrote meanwhile
+        if _state['version'] is not None and new_version == _state['version'] + 1:
+            _state['version'] = new_version
+
+
+def invalidate(using=DEFAULT_DB_ALIAS):
+    """Force every process to reload the index on its next scan"""
+    _bump('generation', using)
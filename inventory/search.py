@@ -0,0 +1,302 @@
+"""
+Product search index.
+
+Products are indexed as normalized Arabic/Latin tokens so that spelling
+variants (أ/إ/آ/ا, ة/ه, ى/ي, tashkeel, tatweel) match each other. On SQLite
+the tokens live in an FTS5 virtual table ranked with bm25; other database
+backends fall back to the prefix-indexed `ProductSearchToken` table.
+
+The index is kept in sync by the signal handlers in `inventory.signals`;
+use the `rebuild_search_index` management command after bulk `update()`
+calls or raw imports that bypass them.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import (
+    Case, Count, Exists, F, FloatField, IntegerField, Lookup, Max, OuterRef, Q, Subquery, Sum, When,
+)
+
+from .crossref import lookup
+
+FTS_TABLE = 'product_search_fts'
+
+# Token index ranking: one exact token match outweighs any number of prefix hits
+RANK_EXACT_WEIGHT = 1000
+
+# Fields that make up a product's search document
+INDEXED_FIELDS = ('name', 'sku', 'barcode', 'part_number', 'oem_number', 'brand__name')
+
+# Code-like fields also get a compact token with separators stripped,
+# so "15400-PLM-A02" is found by "15400plma02"
+CODE_FIELDS = ('sku', 'barcode', 'part_number', 'oem_number')
+
+MAX_TOKEN_LENGTH = 100
+
+ARABIC_DIACRITICS_RE = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06dc\u06df-\u06e8\u06ea-\u06ed\u0640]')
+TOKEN_RE = re.compile(r'\w+')
+
+ARABIC_CHAR_MAP = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ئ': 'ي',
+    'ؤ': 'و',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+
+
+def normalize_text(text):
+    """Fold case and Arabic spelling variants, strip tashkeel and tatweel"""
+    if not text:
+        return ''
+    text = str(text).casefold().translate(ARABIC_CHAR_MAP)
+    return ARABIC_DIACRITICS_RE.sub('', text)
+
+
+def tokenize(text):
+    """Split text into unique normalized tokens, preserving order"""
+    tokens = []
+    for token in TOKEN_RE.findall(normalize_text(text)):
+        token = token[:MAX_TOKEN_LENGTH]
+        if token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def compact_code(value):
+    """Normalize a part/OEM/SKU code by dropping everything but letters and digits"""
+    return ''.join(TOKEN_RE.findall(normalize_text(value))).replace('_', '')
+
+
+def document_tokens(row):
+    """Build the token list for a product row from `INDEXED_FIELDS` values"""
+    tokens = []
+    for field in INDEXED_FIELDS:
+        for token in tokenize(row.get(field)):
+            if token not in tokens:
+                tokens.append(token)
+    for field in CODE_FIELDS:
+        code = compact_code(row.get(field))[:MAX_TOKEN_LENGTH]
+        if code and code not in tokens:
+            tokens.append(code)
+    return tokens
+
+
+class Match(Lookup):
+    """`column MATCH query` against an FTS5 table"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class FTS5Backend:
+    """SQLite FTS5 index keyed by product id (rowid)"""
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def index(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(row['id'],) for row in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, document) VALUES (%s, %s)',
+                [(row['id'], ' '.join(document_tokens(row))) for row in rows]
+            )
+
+    def remove(self, product_ids):
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(product_id,) for product_id in product_ids]
+            )
+
+    def clear(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def matches(self, terms):
+        """Search table rows matching every term"""
+        from .models import ProductSearchDocument
+        # Tokens are \w+ only, so quoting them is enough to escape FTS syntax
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return ProductSearchDocument.objects.using(self.using).filter(Match(F('document'), match))
+
+    def matching_ids(self, terms):
+        return self.matches(terms).values('rowid')
+
+    def rank(self, terms):
+        return Subquery(
+            self.matches(terms).filter(rowid=OuterRef('pk')).values('rank')[:1],
+            output_field=FloatField(),
+        )
+
+
+class TokenTableBackend:
+    """Portable index over the `ProductSearchToken` table"""
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, token_model=None):
+        self.using = using
+        if token_model is None:
+            from .models import ProductSearchToken
+            token_model = ProductSearchToken
+        self.token_model = token_model
+
+    def index(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        manager = self.token_model.objects.using(self.using)
+        manager.filter(product_id__in=[row['id'] for row in rows]).delete()
+        manager.bulk_create(
+            [
+                self.token_model(product_id=row['id'], token=token)
+                for row in rows
+                for token in document_tokens(row)
+            ],
+            batch_size=1000
+        )
+
+    def remove(self, product_ids):
+        self.token_model.objects.using(self.using).filter(product_id__in=product_ids).delete()
+
+    def clear(self):
+        self.token_model.objects.using(self.using).all().delete()
+
+    def matches(self, terms):
+        """Per-product token stats of the products matching every term"""
+        # Every term must prefix-match one of the product's tokens; exact
+        # token matches rank above prefix-only matches.
+        prefix_filter = Q()
+        annotations = {}
+        for i, term in enumerate(terms):
+            prefix_filter |= Q(token__startswith=term)
+            annotations[f'term_{i}'] = Max(Case(
+                When(token__startswith=term, then=1), default=0, output_field=IntegerField()
+            ))
+        rows = (
+            self.token_model.objects.using(self.using)
+            .filter(prefix_filter)
+            .values('product_id')
+            .annotate(
+                exact=Sum(Case(
+                    When(token__in=terms, then=1), default=0, output_field=IntegerField()
+                )),
+                hits=Count('id'),
+                **annotations
+            )
+        )
+        for name in annotations:
+            rows = rows.filter(**{name: 1})
+        return rows.order_by()
+
+    def matching_ids(self, terms):
+        return self.matches(terms).values('product_id')
+
+    def rank(self, terms):
+        rows = self.matches(terms).filter(product_id=OuterRef('pk')).annotate(
+            rank=-(F('exact') * RANK_EXACT_WEIGHT + F('hits'))
+        )
+        return Subquery(rows.values('rank')[:1], output_field=FloatField())
+
+
+_fts_available = {}
+
+
+def fts_available(using=DEFAULT_DB_ALIAS):
+    """Whether the FTS5 table exists on this database"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    key = (using, str(connection.settings_dict['NAME']))
+    # Only a found table is remembered: it may be created by a later migrate
+    if not _fts_available.get(key):
+        with connection.cursor() as cursor:
+            _fts_available[key] = FTS_TABLE in connection.introspection.table_names(cursor)
+    return _fts_available[key]
+
+
+def get_backend(using=DEFAULT_DB_ALIAS):
+    if fts_available(using):
+        return FTS5Backend(using)
+    return TokenTableBackend(using)
+
+
+def product_rows(queryset):
+    """Fetch the values needed to index a product queryset"""
+    return queryset.values('id', *INDEXED_FIELDS)
+
+
+def index_products(product_ids, using=DEFAULT_DB_ALIAS):
+    """(Re)index the given products"""
+    from .models import Product
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    get_backend(using).index(
+        product_rows(Product.objects.using(using).filter(id__in=product_ids))
+    )
+
+
+def remove_products(product_ids, using=DEFAULT_DB_ALIAS):
+    """Drop the given products from the index"""
+    product_ids = list(product_ids)
+    if product_ids:
+        get_backend(using).remove(product_ids)
+
+
+def rebuild_index(batch_size=1000, using=DEFAULT_DB_ALIAS):
+    """Rebuild the whole index in batches; returns the number of products indexed"""
+    from .models import Product
+    backend = get_backend(using)
+    backend.clear()
+    queryset = Product.objects.using(using).order_by('id')
+    last_id = 0
+    total = 0
+    while True:
+        rows = list(product_rows(queryset.filter(id__gt=last_id))[:batch_size])
+        if not rows:
+            break
+        backend.index(rows)
+        last_id = rows[-1]['id']
+        total += len(rows)
+    return total
+
+
+def search_products(queryset, query):
+    """
+    Filter a product queryset to matches of `query`, best match first.
+
+    Exact part/OEM cross-reference hits rank above text matches. Matching
+    and ranking stay in the database, so the result can be paginated and
+    filtered further like any other queryset.
+    """
+    if not query or not query.strip():
+        return queryset
+    terms = tokenize(query)
+    if not terms:
+        return queryset.none()
+    backend = get_backend(queryset.db)
+    cross_references = lookup(query, using=queryset.db).values('product_id')
+    return (
+        queryset
+        .filter(Q(id__in=cross_references) | Q(id__in=backend.matching_ids(terms)))
+        .annotate(
+            search_cross_reference=Exists(cross_references.filter(product_id=OuterRef('pk'))),
+            search_rank=backend.rank(terms),
+        )
+        .order_by('-search_cross_reference', F('search_rank').asc(nulls_last=True), 'id')
+    )
@@ -0,0 +1,63 @@
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Product, Brand, Unit, ProductTombstone
+from . import crossref, fitment, scan, search
+
+# Product fields read by the search, cross-reference and fitment indexes
+INDEXED_PRODUCT_FIELDS = frozenset({
+    'name', 'sku', 'barcode', 'part_number', 'oem_number', 'brand', 'category', 'compatible_vehicles',
+})
+
+
+def refresh_product_indexes(product_ids, using=DEFAULT_DB_ALIAS):
+    """
+    Re-sync the search index, part-number cross-references, fitments and
+    scan index for `product_ids`. Call after bulk writes that bypass signals.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    products = Product.objects.using(using).filter(pk__in=product_ids)
+    search.index_products(product_ids, using=using)
+    crossref.sync_product_numbers(products.values('id', 'part_number', 'oem_number'), using=using)
+    fitment.backfill_fitments(products, preload=len(product_ids) > 1, using=using)
+    transaction.on_commit(lambda: scan.product_changed(product_ids, using=using), using=using)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    """Keep the search index, part-number cross-references and fitments in sync with product writes"""
+    if raw:
+        return
+    if update_fields is not None and not INDEXED_PRODUCT_FIELDS.intersection(update_fields):
+        # Stock and price saves: only the scan index shows them
+        product_ids = [instance.pk]
+        transaction.on_commit(lambda: scan.product_changed(product_ids, using=using), using=using)
+        return
+    refresh_product_indexes([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, using=None, **kwargs):
+    search.remove_products([instance.pk], using=using)
+    ProductTombstone.objects.using(using).create(product_id=instance.pk, sku=instance.sku)
+    transaction.on_commit(scan.invalidate, using=using)
+
+
+@receiver(post_save, sender=Brand)
+def reindex_brand_products(sender, instance, created=False, raw=False, using=None, **kwargs):
+    """Brand names are part of the search document"""
+    if raw or created:
+        return
+    search.index_products(
+        instance.products.using(using).values_list('id', flat=True), using=using
+    )
+
+
+@receiver(post_save, sender=Unit)
+def invalidate_scan_index(sender, instance, created=False, raw=False, using=None, **kwargs):
+    """Unit names are part of the scan index entries"""
+    if raw or created:
+        return
+    transaction.on_commit(scan.invalidate, using=using)
@@ -1,3 +1,1120 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from importlib.util import find_spec
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+from django.forms.models import model_to_dict
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from dashboard import events
+from dashboard.models import OutboxEvent
+from purchases.models import Purchase, PurchaseItem
+from sales.models import Sale, SaleItem
+from sales.batch import submit_sales
+from . import (
+    alerts, balances, catalog, costing, counting, crossref, fitment, imports, locations, metrics, pricing,
+    reconciliation, reservations, scan,
+)
+from .context_processors import shop_settings
+from .forms import ProductForm
+from .models import (
+    Brand, Category, CostLayer, Customer, InventoryAlert, Location, PartCrossReference, Product, ProductCost,
+    ProductFitment, ProductImport, ProductPriceHistory, ProductStockMetrics, ShopSettings, StockBalance, StockCount,
+    StockMovement, StockReservation, StockTransfer, Supplier, Unit,
+)
+from .search import TokenTableBackend, search_products
+
+
+class InventoryTestCase(TestCase):
+    def setUp(self):
+        # The scan index is per process; rebuild it from this test's rows
+        scan._state['codes'] = None
+        self.addCleanup(scan._state.update, codes=None)
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.unit, _ = Unit.objects.get_or_create(name='piece', defaults={'name_arabic': 'قطعة', 'abbreviation': 'pc'})
+        self.category = Category.objects.create(name='Filters', vehicle_type='car')
+
+    def product(self, sku='OF-1', **fields):
+        defaults = {
+            'name': f'Part {sku}', 'sku': sku, 'barcode': f'B{sku}', 'unit': self.unit,
+            'category': self.category, 'cost_price': Decimal('40.00'), 'selling_price': Decimal('60.00'),
+            'current_stock': 10, 'minimum_stock': 2, 'reorder_level': 3, 'maximum_stock': 100,
+        }
+        defaults.update(fields)
+        return Product.objects.create(**defaults)
+
+
+class AlertRefreshTests(InventoryTestCase):
+    def test_refresh_is_queued_for_the_alerts_consumer(self):
+        product = self.product()
+        events.run_consumer('inventory_alerts')
+        # A stock change that bypassed the outbox
+        Product.objects.filter(pk=product.pk).update(current_stock=0)
+        self.client.force_login(self.user)
+
+        response = self.client.post(reverse('inventory:refresh_alerts'))
+
+        self.assertRedirects(response, reverse('inventory:alerts_dashboard'), fetch_redirect_response=False)
+        self.assertTrue(OutboxEvent.objects.filter(event_type='alerts_refresh_requested').exists())
+        self.assertFalse(InventoryAlert.objects.exists())
+
+        self.assertEqual(events.run_consumer('inventory_alerts')['error'], None)
+        self.assertEqual(InventoryAlert.objects.get(product=product, status='active').alert_type, 'out_of_stock')
+
+
+class AlertEvaluationTests(InventoryTestCase):
+    def test_acknowledged_alert_is_kept_open(self):
+        product = self.product(current_stock=0)
+        alerts.evaluate_product_ids([product.id])
+        InventoryAlert.objects.update(status='acknowledged')
+        Product.objects.filter(pk=product.pk).update(current_stock=-1)
+
+        stats = alerts.evaluate_product_ids([product.id])
+
+        self.assertEqual(stats, {'created': 0, 'updated': 1, 'resolved': 0})
+        alert = InventoryAlert.objects.get()
+        self.assertEqual((alert.status, alert.current_stock), ('acknowledged', -1))
+
+    def test_recovery_resolves_active_and_acknowledged_alerts(self):
+        product = self.product(current_stock=0, is_active=False)
+        for status in ('active', 'acknowledged'):
+            InventoryAlert.objects.create(
+                product=product, alert_type='out_of_stock', message='', current_stock=0, status=status,
+            )
+
+        self.assertEqual(alerts.reconcile_all()['resolved'], 2)
+        self.assertEqual(set(InventoryAlert.objects.values_list('status', flat=True)), {'resolved'})
+
+
+class AlertPriorityTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.delete(alerts.SUMMARY_CACHE_KEY)
+        self.addCleanup(cache.delete, alerts.SUMMARY_CACHE_KEY)
+
+    def alert(self, product, alert_type, status='active'):
+        return InventoryAlert.objects.create(
+            product=product, alert_type=alert_type, message='', current_stock=product.current_stock, status=status,
+        )
+
+    def test_class_a_reorders_are_high_priority(self):
+        reorder = self.product(current_stock=3)
+        for abc_class, priority in (('A', 'High'), ('B', 'Medium'), ('', 'Medium')):
+            reorder.abc_class = abc_class
+            alert_type, message, action = alerts.classify(reorder)
+            self.assertEqual(alert_type, 'reorder')
+            self.assertTrue(action.startswith(f'{priority} Priority'))
+
+        low = self.product(sku='OF-2', current_stock=2, abc_class='C')
+        self.assertEqual(alerts.classify(low)[0], 'low_stock')
+        self.assertTrue(alerts.classify(low)[2].startswith('High Priority'))
+
+    def test_priority_order_ranks_severity_then_abc_class(self):
+        reorder_c = self.alert(self.product(sku='C', abc_class='C'), 'reorder')
+        reorder_a = self.alert(self.product(sku='A', abc_class='A'), 'reorder')
+        reorder_none = self.alert(self.product(sku='N'), 'reorder')
+        out = self.alert(self.product(sku='O', current_stock=0), 'out_of_stock')
+        low = self.alert(self.product(sku='B', abc_class='B'), 'low_stock')
+
+        self.assertEqual(
+            list(InventoryAlert.objects.order_by(*alerts.priority_order())),
+            [out, low, reorder_a, reorder_c, reorder_none],
+        )
+
+    def test_summary_counts_open_alerts_and_is_cached(self):
+        other = Category.objects.create(name='Brakes', vehicle_type='car')
+        self.alert(self.product(sku='A', current_stock=0), 'out_of_stock')
+        self.alert(self.product(sku='B', current_stock=3, category=other), 'reorder')
+        self.alert(self.product(sku='C', current_stock=2), 'low_stock', status='acknowledged')
+        self.alert(self.product(sku='D'), 'overstock', status='resolved')
+
+        data = alerts.summary()
+
+        self.assertEqual((data['total'], data['critical']), (2, 1))
+        self.assertEqual((data['counts']['out_of_stock'], data['counts']['reorder']), (1, 1))
+        self.assertEqual(data['status_counts'], {'active': 2, 'acknowledged': 1})
+        # Only the reorder product has stock: 3 at 40
+        self.assertEqual(data['affected_value'], Decimal('120.00'))
+        self.assertEqual(
+            [(group['name'], group['count']) for group in data['categories']], [('Brakes', 1), ('Filters', 1)]
+        )
+        self.assertEqual(data['age_distribution'][0]['count'], 2)
+        with self.assertNumQueries(0):
+            alerts.summary()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            alerts.evaluate_product_ids([self.product(sku='E', current_stock=0).id])
+        self.assertEqual(alerts.summary()['total'], 3)
+
+
+@skipUnless(find_spec('numpy'), 'numpy is not installed')
+class ForecastingTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        import numpy as np
+        from . import forecasting
+        self.np, self.forecasting = np, forecasting
+
+    def sell(self, product, quantities):
+        """One sale per day ending yesterday, oldest first"""
+        customer = Customer.objects.create(name='Walk-in')
+        today = timezone.localdate()
+        for days_ago, quantity in zip(range(len(quantities), 0, -1), quantities):
+            sale = Sale.objects.create(
+                sale_number=f'SAL-T-{product.pk}-{days_ago}', customer=customer, created_by=self.user,
+                sale_date=timezone.make_aware(datetime.combine(today - timedelta(days=days_ago), time(12))),
+            )
+            SaleItem.objects.create(
+                sale=sale, product=product, quantity=quantity, unit_price=product.selling_price,
+                total_price=product.selling_price * quantity,
+            )
+
+    def test_exponential_smoothing_tracks_level_and_one_step_errors(self):
+        level, deviation = self.forecasting.exponential_smoothing(self.np.array([[2.0, 4.0, 4.0]]), alpha=0.5)
+
+        # Levels 2 -> 3 -> 3.5; one-step errors 2 and 1
+        self.assertAlmostEqual(level[0], 3.5)
+        self.assertAlmostEqual(deviation[0], (5 / 2) ** 0.5)
+
+    def test_moving_average_uses_the_last_window_days(self):
+        mean, deviation = self.forecasting.moving_average(self.np.array([[100.0, 2.0, 3.0, 7.0]]), window=3)
+
+        self.assertAlmostEqual(mean[0], 4.0)
+        self.assertAlmostEqual(deviation[0], 7 ** 0.5)
+
+    def test_proposed_thresholds_include_safety_stock(self):
+        product = self.product()
+        idle = self.product(sku='OF-2')
+        self.sell(product, [1, 3, 1, 3])
+
+        [proposal] = self.forecasting.propose(history_days=4, method='ma', window=4, service_level=0.95)
+
+        self.assertEqual(proposal['product'], product)
+        self.assertEqual((proposal['daily_demand'], proposal['lead_time_days']), (2.0, 7))
+        # Safety stock 1.645 * 1.155 * sqrt(7) = 5.03; reorder 2 * 7 + 5.03; maximum reorder + 2 * 30
+        self.assertEqual(proposal['proposed'], {'minimum_stock': 6, 'reorder_level': 20, 'maximum_stock': 80})
+        self.assertTrue(proposal['changed'])
+
+        self.assertEqual(self.forecasting.apply([proposal], user=self.user), 1)
+        product.refresh_from_db()
+        self.assertEqual((product.minimum_stock, product.reorder_level, product.maximum_stock), (6, 20, 80))
+        idle.refresh_from_db()
+        self.assertEqual(idle.reorder_level, 3)
+
+
+@skipUnless(find_spec('numpy'), 'numpy is not installed')
+class ClassificationTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        import numpy as np
+        from . import classification
+        self.np, self.classification = np, classification
+
+    def abc(self, values, **shares):
+        return list(self.classification.abc_classes(self.np.array(values, dtype=float), **shares))
+
+    def xyz(self, *rows):
+        return list(self.classification.xyz_classes(self.np.array(rows, dtype=float)))
+
+    def test_abc_ranks_by_cumulative_share_before_each_product(self):
+        # Shares before each product: 0, .5, .8, .95, 1
+        self.assertEqual(self.abc([5, 50, 0, 30, 15]), ['C', 'A', 'C', 'A', 'B'])
+
+    def test_abc_without_sales_value_is_all_c(self):
+        self.assertEqual(self.abc([0, 0]), ['C', 'C'])
+        self.assertEqual(self.abc([-5, 0]), ['C', 'C'])
+
+    def test_abc_ties_keep_catalog_order(self):
+        self.assertEqual(self.abc([10, 10, 0], a_share=0.5), ['A', 'B', 'C'])
+
+    def test_xyz_grades_weekly_demand_variability(self):
+        self.assertEqual(
+            self.xyz([5, 5, 5, 5], [2, 6, 2, 6], [0, 8, 0, 8], [0, 0, 0, 12], [0, 0, 0, 0]),
+            # cv 0, .5, 1, 1.73 and no demand at all
+            ['X', 'X', 'Y', 'Z', 'Z'],
+        )
+
+    def test_store_writes_changes_and_clears_inactive_products(self):
+        product = self.product(sku='A')
+        retired = self.product(sku='B', is_active=False, abc_class='A', xyz_class='X')
+
+        self.assertEqual(self.classification.store({product.id: ('A', 'Y')}), 2)
+        self.assertEqual(self.classification.store({product.id: ('A', 'Y')}), 0)
+
+        product.refresh_from_db()
+        retired.refresh_from_db()
+        self.assertEqual((product.abc_class, product.xyz_class), ('A', 'Y'))
+        self.assertEqual((retired.abc_class, retired.xyz_class), ('', ''))
+
+    def test_abc_changes_reprioritize_alerts(self):
+        product = self.product(sku='A', current_stock=3, abc_class='B')
+        alerts.evaluate_product_ids([product.id])
+
+        self.classification.store({product.id: ('A', 'Z')})
+        self.classification.store({product.id: ('A', 'X')})
+
+        [event] = OutboxEvent.objects.filter(event_type='stock_changed')
+        self.assertEqual(event.payload, {'product_ids': [product.id], 'reason': 'classification'})
+        events.run_consumer('inventory_alerts')
+        self.assertTrue(InventoryAlert.objects.get().recommended_action.startswith('High Priority'))
+
+    def test_classify_checks_its_arguments(self):
+        with self.assertRaises(ValueError):
+            self.classification.classify(basis='volume')
+        with self.assertRaises(ValueError):
+            self.classification.classify(a_share=0.9, b_share=0.8)
+
+
+class StockMetricsTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+
+    def build(self, sales=None, current_stock=10, age_days=10):
+        product = Product(
+            id=1, current_stock=current_stock, cost_price=Decimal('40.00'),
+            created_at=self.now - timedelta(days=age_days),
+        )
+        return metrics.build(product, sales, None, self.now)
+
+    def sold(self, days_ago, units_90, units_365=None, cogs=0):
+        return {
+            'last_sale_at': self.now - timedelta(days=days_ago), 'units_sold_30d': 0, 'units_sold_90d': units_90,
+            'units_sold_365d': units_365 or units_90, 'cogs_365d': Decimal(cogs),
+        }
+
+    def test_never_sold_stock_ages_from_creation(self):
+        young = self.build(age_days=10)
+        self.assertEqual(young.movement_class, 'slow')
+        self.assertEqual((young.days_since_last_sale, young.days_of_cover), (None, None))
+
+        old = self.build(age_days=200)
+        self.assertEqual((old.movement_class, old.dead_stock_value), ('dead', Decimal('400.00')))
+
+    def test_no_stock(self):
+        row = self.build(self.sold(2, 90), current_stock=0)
+
+        self.assertEqual((row.movement_class, row.days_of_cover, row.turnover_ratio), ('no_stock', 0, None))
+
+    def test_selling_stock_is_active_with_cover_and_turnover(self):
+        row = self.build(self.sold(2, 90, units_365=200, cogs=8000))
+
+        self.assertEqual(row.movement_class, 'active')
+        self.assertEqual((row.velocity_90d, row.days_of_cover), (Decimal('1.0000'), Decimal('10.0')))
+        # 8000 of cost sold over a year against 400 on hand
+        self.assertEqual(row.turnover_ratio, Decimal('20.00'))
+        self.assertEqual(row.dead_stock_value, 0)
+
+    def test_slow_by_idle_days_or_cover(self):
+        self.assertEqual(self.build(self.sold(100, 0)).movement_class, 'slow')
+        # Sold yesterday, but 10 on hand at 1 unit per 90 days is 900 days of cover
+        self.assertEqual(self.build(self.sold(1, 1)).movement_class, 'slow')
+        self.assertEqual(self.build(self.sold(200, 0)).movement_class, 'dead')
+
+    def test_compute_refreshes_active_products(self):
+        selling = self.product(sku='A')
+        self.product(sku='B', current_stock=0)
+        retired = self.product(sku='C', is_active=False)
+        ProductStockMetrics.objects.create(product=retired, movement_class='dead', computed_at=self.now)
+        sale = Sale.objects.create(
+            sale_number='SAL-T-1', customer=Customer.objects.create(name='Walk-in'), created_by=self.user,
+            sale_date=self.now - timedelta(days=5),
+        )
+        SaleItem.objects.create(
+            sale=sale, product=selling, quantity=9, unit_price=Decimal('60.00'), total_price=Decimal('540.00'),
+            cost_price=Decimal('40.00'),
+        )
+
+        self.assertEqual(metrics.compute(), {'active': 1, 'slow': 0, 'dead': 0, 'no_stock': 1})
+        self.assertEqual(metrics.compute()['active'], 1)
+
+        row = ProductStockMetrics.objects.get(product=selling)
+        self.assertEqual((row.units_sold_30d, row.days_since_last_sale, row.days_of_cover), (9, 5, Decimal('100.0')))
+        self.assertEqual(row.turnover_ratio, Decimal('0.90'))
+        self.assertFalse(ProductStockMetrics.objects.filter(product=retired).exists())
+        with self.assertRaises(ValueError):
+            metrics.compute(slow_days=200, dead_days=100)
+
+
+class CostingTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.part = self.product(current_stock=0)
+        self.customer = Customer.objects.create(name='Walk-in')
+
+    def move(self, movement_type, quantity, unit_cost=0, **fields):
+        return StockMovement.objects.create(
+            product=self.part, movement_type=movement_type, quantity=quantity, unit_cost=unit_cost,
+            created_by=self.user, **fields
+        )
+
+    def sell(self, *quantities):
+        """A sale with one item and one stock movement per quantity"""
+        sale = Sale.objects.create(
+            sale_number=f'SAL-T-{Sale.objects.count() + 1}', customer=self.customer, created_by=self.user,
+        )
+        for quantity in quantities:
+            SaleItem.objects.create(
+                sale=sale, product=self.part, quantity=quantity, unit_price=Decimal('60.00'),
+                total_price=Decimal('60.00') * quantity,
+            )
+            self.move('sale', quantity, reference_model='Sale', reference_id=sale.pk, reference_number=sale.sale_number)
+        return sale
+
+    def cogs(self, sale):
+        return list(SaleItem.objects.filter(sale=sale).order_by('id').values_list('cogs', flat=True))
+
+    def state(self):
+        return ProductCost.objects.get(product=self.part)
+
+    @override_settings(INVENTORY_COSTING_METHOD='fifo')
+    def test_fifo_consumes_the_oldest_layers_first(self):
+        self.move('purchase', 5, Decimal('10.00'))
+        self.move('purchase', 5, Decimal('20.00'))
+        sale = self.sell(7)
+
+        self.assertEqual(costing.cost_all_pending([self.part.pk]), 3)
+
+        self.assertEqual(self.cogs(sale), [Decimal('90.00')])
+        state = self.state()
+        self.assertEqual((state.on_hand, state.inventory_value), (3, Decimal('60.00')))
+        self.assertEqual(
+            list(CostLayer.objects.filter(product=self.part).order_by('id').values_list('remaining_quantity', flat=True)),
+            [0, 3],
+        )
+        self.assertFalse(StockMovement.objects.filter(cost_amount__isnull=True).exists())
+
+    @override_settings(INVENTORY_COSTING_METHOD='average')
+    def test_average_costs_sales_at_the_running_average(self):
+        self.move('purchase', 5, Decimal('10.00'))
+        self.move('purchase', 5, Decimal('20.00'))
+        sale = self.sell(7)
+
+        costing.cost_all_pending([self.part.pk])
+
+        self.assertEqual(self.cogs(sale), [Decimal('105.00')])
+        state = self.state()
+        self.assertEqual((state.on_hand, state.average_cost, state.inventory_value), (3, Decimal('15'), Decimal('45.00')))
+        self.assertFalse(CostLayer.objects.exists())
+
+    @override_settings(INVENTORY_COSTING_METHOD='fifo')
+    def test_sale_split_across_chunks_gets_its_full_cost(self):
+        self.move('purchase', 3, Decimal('10.00'))
+        self.move('purchase', 10, Decimal('20.00'))
+        sale = self.sell(3, 4)
+
+        # The first chunk ends between the sale's two movements
+        self.assertEqual(costing.cost_products([self.part.pk], chunk_size=3), 3)
+        self.assertEqual(self.cogs(sale)[0], Decimal('30.00'))
+        self.assertEqual(costing.cost_products([self.part.pk], chunk_size=3), 1)
+
+        # 3 @ 10 + 4 @ 20, spread over both lines at the sale's unit cost
+        self.assertEqual(self.cogs(sale), [Decimal('47.14'), Decimal('62.86')])
+        self.assertEqual(
+            list(SaleItem.objects.filter(sale=sale).values_list('cost_price', flat=True)),
+            [Decimal('15.71')] * 2,
+        )
+
+    @override_settings(INVENTORY_COSTING_METHOD='fifo')
+    def test_costed_sales_are_restamped_for_the_accounting_feed(self):
+        self.move('purchase', 5, Decimal('10.00'))
+        sale = self.sell(2)
+        stamped = timezone.now() - timedelta(hours=1)
+        Sale.objects.filter(pk=sale.pk).update(updated_at=stamped)
+
+        costing.cost_all_pending([self.part.pk])
+
+        sale.refresh_from_db()
+        self.assertGreater(sale.updated_at, stamped)
+
+    @override_settings(INVENTORY_COSTING_METHOD='fifo')
+    def test_movement_committed_late_is_still_costed(self):
+        self.move('purchase', 5, Decimal('10.00'))
+        late = self.move('purchase', 5, Decimal('20.00'))
+        self.move('return_out', 2, Decimal('10.00'))
+        # The middle id belongs to a transaction that has not committed yet
+        StockMovement.objects.filter(pk=late.pk).delete()
+
+        costing.cost_all_pending([self.part.pk])
+        self.assertEqual(self.state().on_hand, 3)
+
+        StockMovement.objects.bulk_create([late])
+        self.assertEqual(costing.cost_all_pending([self.part.pk]), 1)
+
+        state = self.state()
+        self.assertEqual((state.on_hand, state.inventory_value), (8, Decimal('130.00')))
+        self.assertEqual(StockMovement.objects.get(pk=late.pk).cost_amount, Decimal('100.00'))
+
+    @override_settings(INVENTORY_COSTING_METHOD='fifo')
+    def test_reset_replays_the_ledger(self):
+        self.move('purchase', 5, Decimal('10.00'))
+        sale = self.sell(2)
+        costing.cost_all_pending([self.part.pk])
+
+        costing.reset([self.part.pk])
+        self.assertFalse(StockMovement.objects.filter(cost_amount__isnull=False).exists())
+        self.assertEqual(costing.cost_all_pending([self.part.pk]), 2)
+
+        self.assertEqual(self.cogs(sale), [Decimal('20.00')])
+        self.assertEqual(self.state().on_hand, 3)
+
+
+class BalanceTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.part = self.product(current_stock=0)
+        self.today = timezone.localdate()
+
+    def move(self, days_ago, movement_type, quantity, unit_cost=0):
+        movement = StockMovement.objects.create(
+            product=self.part, movement_type=movement_type, quantity=quantity, unit_cost=unit_cost,
+            created_by=self.user,
+        )
+        created_at = timezone.make_aware(datetime.combine(self.today - timedelta(days=days_ago), time(12)))
+        StockMovement.objects.filter(pk=movement.pk).update(created_at=created_at)
+
+    def end_of(self, days_ago):
+        return balances.boundary(self.today - timedelta(days=days_ago))
+
+    def test_checkpoint_rolls_forward_at_the_period_average(self):
+        self.move(3, 'purchase', 10, Decimal('10.00'))
+        self.move(2, 'sale', 4)
+        self.assertEqual(balances.take_checkpoint(self.end_of(2)), 1)
+        self.move(1, 'purchase', 6, Decimal('20.00'))
+        self.move(1, 'sale', 2)
+
+        checkpoint = self.part.stock_checkpoints.get()
+        self.assertEqual((checkpoint.quantity, checkpoint.value), (6, Decimal('60.00')))
+        # 6 carried in at 60 plus 6 received for 120: 12 units at 15
+        self.assertEqual(balances.balances_as_of(self.end_of(1)), {
+            self.part.id: {'quantity': 10, 'unit_cost': Decimal('15.0000'), 'value': Decimal('150.00')},
+        })
+
+    def test_as_of_before_any_checkpoint_replays_the_movements(self):
+        self.move(3, 'purchase', 10, Decimal('10.00'))
+        self.move(2, 'sale', 4)
+        balances.take_checkpoint(self.end_of(2))
+
+        self.assertEqual(balances.balances_as_of(self.end_of(3)), {
+            self.part.id: {'quantity': 10, 'unit_cost': Decimal('10.0000'), 'value': Decimal('100.00')},
+        })
+        self.assertEqual(balances.balances_as_of(self.end_of(4)), {})
+
+    def test_checkpoints_are_taken_in_order(self):
+        self.move(3, 'purchase', 10, Decimal('10.00'))
+        balances.take_checkpoint(self.end_of(2))
+
+        with self.assertRaises(ValueError):
+            balances.take_checkpoint(self.end_of(3))
+
+    def test_products_with_nothing_on_hand_are_left_out(self):
+        self.move(3, 'purchase', 4, Decimal('10.00'))
+        self.move(2, 'sale', 4)
+
+        self.assertEqual(balances.take_checkpoint(self.end_of(2)), 0)
+        self.assertEqual(balances.balances_as_of(self.end_of(1)), {})
+
+
+class StockCountSummaryTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        for sku in ('A', 'B', 'C'):
+            self.product(sku=sku)
+        self.count = counting.start(self.user)
+        lines = self.count.lines.order_by('product__sku')
+        lines.update(expected_quantity=5)
+        for line, counted in zip(lines, (7, 5, None)):
+            line.counted_quantity = counted
+            line.save(update_fields=['counted_quantity'])
+        self.empty = counting.start(self.user, category=Category.objects.create(name='Empty', vehicle_type='car'))
+
+    def test_summary_totals(self):
+        self.assertEqual(counting.summary(self.count), {
+            'lines': 3, 'counted': 2, 'uncounted': 1,
+            'variance_lines': 1, 'variance_units': 2, 'variance_value': Decimal('80.00'),
+        })
+        totals = counting.summary(self.count, zero_uncounted=True)
+        self.assertEqual(
+            (totals['variance_lines'], totals['variance_units'], totals['variance_value']), (2, -3, Decimal('-120.00'))
+        )
+
+    def test_list_summaries_come_from_one_grouped_query(self):
+        with self.assertNumQueries(1):
+            counts = list(counting.with_summaries(StockCount.objects.order_by('id')))
+
+        for zero_uncounted in (False, True):
+            for count in counting.with_summaries(StockCount.objects.all(), zero_uncounted):
+                self.assertEqual(
+                    counting.annotated_summary(count), counting.summary(count, zero_uncounted), count.count_number
+                )
+        self.assertEqual([count.summary_lines for count in counts], [3, 0])
+
+        self.client.force_login(self.user)
+        data = self.client.get(reverse('inventory:stock_count_list')).json()
+        self.assertTrue(data['success'])
+        summaries = {count['id']: count['summary'] for count in data['counts']}
+        self.assertEqual(Decimal(summaries[self.count.id]['variance_value']), Decimal('80.00'))
+        self.assertEqual(summaries[self.empty.id]['lines'], 0)
+
+
+class StockCountPostingTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = Customer.objects.create(name='Walk-in')
+        self.location = locations.default_location()
+        self.parts = {}
+        for sku in ('A', 'B', 'C'):
+            part = self.parts[sku] = self.product(sku=sku, current_stock=10)
+            StockBalance.objects.create(product=part, location=self.location, quantity=10)
+        self.count = counting.start(self.user)
+
+    def sell(self, sku, quantity):
+        [result] = submit_sales([{
+            'idempotency_key': f'{sku}-{quantity}', 'customer_id': self.customer.id,
+            'items': [{'product_id': self.parts[sku].id, 'quantity': quantity}],
+        }], self.user)
+        self.assertEqual(result['status'], 'created')
+
+    def scan(self, sku, quantity):
+        counting.record_scans(self.count.id, [{'code': self.parts[sku].barcode, 'quantity': quantity}], self.user)
+
+    def stock(self, sku):
+        part = Product.objects.get(pk=self.parts[sku].pk)
+        balance = StockBalance.objects.get(product=part, location=self.location).quantity
+        self.assertEqual(balance, part.current_stock)
+        return part.current_stock
+
+    def test_sales_during_the_count_are_not_booked_twice(self):
+        # Sold before its scan: the shelf and the expected quantity both miss it
+        self.sell('A', 2)
+        self.scan('A', 8)
+        # Sold after its scan: the posted variance is added to the lower stock
+        self.scan('B', 9)
+        self.sell('B', 1)
+
+        self.assertEqual(counting.post(self.count.id, self.user), 1)
+
+        self.assertEqual((self.stock('A'), self.stock('B'), self.stock('C')), (8, 8, 10))
+        self.assertEqual(self.count.lines.get(product=self.parts['B']).adjustment_quantity, -1)
+
+    def test_uncounted_lines_posted_as_zero_use_the_stock_at_posting(self):
+        self.scan('A', 10)
+        self.scan('B', 10)
+        self.sell('C', 3)
+
+        counting.post(self.count.id, self.user, zero_uncounted=True)
+
+        self.assertEqual((self.stock('A'), self.stock('B'), self.stock('C')), (10, 10, 0))
+
+
+class ReconciliationTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = Customer.objects.create(name='Walk-in')
+        self.location = locations.default_location()
+        # 10 on the counter, 8 on the ledger
+        self.part = self.product(sku='A', current_stock=10)
+        StockBalance.objects.create(product=self.part, location=self.location, quantity=10)
+        StockMovement.objects.create(
+            product=self.part, movement_type='purchase', quantity=8, unit_cost=Decimal('40.00'), created_by=self.user,
+        )
+
+    def sell(self, quantity):
+        [result] = submit_sales([{
+            'idempotency_key': f'A-{quantity}', 'customer_id': self.customer.id,
+            'items': [{'product_id': self.part.id, 'quantity': quantity}],
+        }], self.user)
+        self.assertEqual(result['status'], 'created')
+
+    def stock(self):
+        part = Product.objects.get(pk=self.part.pk)
+        balance = StockBalance.objects.get(product=part, location=self.location).quantity
+        return part.current_stock, reconciliation.ledger_balances([part.id])[part.id], balance
+
+    def test_drift_is_reported_chunk_by_chunk(self):
+        self.product(sku='B', current_stock=0)
+        drifted = self.product(sku='C', current_stock=3)
+
+        chunks = list(reconciliation.find_drift(chunk_size=2))
+
+        self.assertEqual(chunks, [
+            [{'product_id': self.part.id, 'sku': 'A', 'name': 'Part A', 'counter': 10, 'ledger': 8, 'drift': 2,
+              'value': Decimal('80.00')}],
+            [{'product_id': drifted.id, 'sku': 'C', 'name': 'Part C', 'counter': 3, 'ledger': 0, 'drift': 3,
+              'value': Decimal('120.00')}],
+        ])
+        self.assertEqual(
+            [[row['sku'] for row in rows] for rows in reconciliation.find_drift(min_drift=3)], [['C']]
+        )
+
+    def test_counter_fix_uses_the_ledger_found_under_lock(self):
+        [rows] = reconciliation.find_drift()
+        # Sold between the report and the fix: both sides moved by 3
+        self.sell(3)
+
+        [row] = reconciliation.fix(rows, 'counter', self.user)
+
+        self.assertEqual((row['counter'], row['ledger']), (7, 5))
+        self.assertEqual(self.stock(), (5, 5, 5))
+        event = OutboxEvent.objects.filter(event_type='stock_changed').latest('id')
+        self.assertEqual(event.payload, {'product_ids': [self.part.id], 'reason': 'reconciliation'})
+
+    def test_ledger_fix_posts_the_difference_as_an_adjustment(self):
+        [rows] = reconciliation.find_drift()
+        self.sell(3)
+
+        reconciliation.fix(rows, 'ledger', self.user)
+
+        self.assertEqual(self.stock(), (7, 7, 7))
+        adjustment = StockMovement.objects.get(movement_type='adjustment')
+        self.assertEqual((adjustment.quantity, adjustment.location), (2, self.location))
+
+    def test_drift_corrected_since_the_report_is_left_alone(self):
+        [rows] = reconciliation.find_drift()
+        Product.objects.filter(pk=self.part.pk).update(current_stock=8)
+
+        for mode in reconciliation.MODES:
+            self.assertEqual(reconciliation.fix(rows, mode, self.user), [])
+        self.assertFalse(StockMovement.objects.filter(movement_type='adjustment').exists())
+        with self.assertRaises(ValueError):
+            reconciliation.fix(rows, 'both', self.user)
+
+
+class LocationTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.shop = locations.default_location()
+        self.warehouse = Location.objects.create(code='WH', name='Warehouse', location_type='warehouse')
+        self.part = self.product(current_stock=10)
+        StockBalance.objects.create(product=self.part, location=self.shop, quantity=10)
+
+    def balances(self):
+        return dict(StockBalance.objects.filter(product=self.part).values_list('location__code', 'quantity'))
+
+    def current_stock(self):
+        return Product.objects.get(pk=self.part.pk).current_stock
+
+    def test_transfer_moves_stock_without_changing_the_total(self):
+        stock_transfer = locations.transfer(self.shop, self.warehouse, [(self.part.id, 3), (self.part.id, 1)], self.user)
+
+        self.assertEqual(self.balances(), {'SHOP': 6, 'WH': 4})
+        self.assertEqual(self.current_stock(), 10)
+        self.assertEqual(stock_transfer.items.get().quantity, 4)
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(movement_type='transfer').values_list('location__code', 'quantity')),
+            [('SHOP', -4), ('WH', 4)],
+        )
+        self.assertEqual(reconciliation.ledger_balances([self.part.id]), {self.part.id: 0})
+
+    def test_transfer_refuses_to_overdraw_the_source(self):
+        with self.assertRaisesMessage(locations.LocationError, 'Not enough stock at Warehouse: OF-1 (0 < 1)'):
+            locations.transfer(self.warehouse, self.shop, [(self.part.id, 1)], self.user)
+        with self.assertRaises(locations.LocationError):
+            locations.transfer(self.shop, self.warehouse, [(self.part.id, 11)], self.user)
+        with self.assertRaises(locations.LocationError):
+            locations.transfer(self.shop, self.shop, [(self.part.id, 1)], self.user)
+
+        self.assertEqual(self.balances(), {'SHOP': 10})
+        self.assertFalse(StockTransfer.objects.exists())
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_balances_add_up_after_a_sale_and_a_receipt(self):
+        customer = Customer.objects.create(name='Walk-in')
+        [result] = submit_sales([{
+            'idempotency_key': 'A-3', 'customer_id': customer.id,
+            'items': [{'product_id': self.part.id, 'quantity': 3}],
+        }], self.user)
+        self.assertEqual(result['status'], 'created')
+        purchase = Purchase.objects.create(supplier=Supplier.objects.create(name='Parts Co'), created_by=self.user)
+        item = PurchaseItem.objects.create(
+            purchase=purchase, product=self.part, quantity_ordered=5, unit_cost=Decimal('40.00'),
+        )
+        self.client.force_login(self.user)
+
+        self.client.post(reverse('purchases:purchase_receive', args=[purchase.id]), {
+            'location': self.warehouse.id, f'receive_qty_{item.id}': 5, f'quality_check_{item.id}': 'on',
+        })
+
+        self.assertEqual(self.balances(), {'SHOP': 7, 'WH': 5})
+        self.assertEqual(self.current_stock(), 12)
+        self.assertEqual(sum(self.balances().values()), self.current_stock())
+
+
+class OfflineCatalogTests(InventoryTestCase):
+    def test_version_lags_so_late_commits_are_served(self):
+        first = self.product(sku='A')
+        data = catalog.delta(catalog.encode_version(first.updated_at - timedelta(minutes=1)))
+        self.assertEqual([row['id'] for row in data['products']], [first.id])
+        self.assertLessEqual(data['version'], catalog.encode_version(first.updated_at))
+
+        # Stamped just before the first row but committed after that poll
+        late = self.product(sku='B')
+        Product.objects.filter(pk=late.pk).update(updated_at=first.updated_at - timedelta(milliseconds=1))
+
+        again = catalog.delta(data['version'])
+        self.assertIn(late.id, [row['id'] for row in again['products']])
+
+    def test_bulk_actions_reach_the_delta(self):
+        product = self.product()
+        Product.objects.filter(pk=product.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        since = catalog.current_version() + 1
+        self.client.force_login(self.user)
+
+        self.client.post(reverse('inventory:bulk_action'), {
+            'action': 'deactivate', 'selected_products': str(product.id),
+        })
+
+        [row] = catalog.delta(since)['products']
+        self.assertEqual((row['id'], row['is_active']), (product.id, False))
+
+
+class SearchTests(InventoryTestCase):
+    def search(self, query):
+        return list(search_products(Product.objects.all(), query).values_list('sku', flat=True))
+
+    def test_arabic_spelling_variants_match(self):
+        self.product(sku='A', name='إطار أمامي')
+        self.product(sku='B', name='فلتر زيت')
+
+        self.assertEqual(self.search('اطار'), ['A'])
+        self.assertEqual(self.search('فِلتر'), ['B'])
+
+    def test_codes_match_without_separators(self):
+        self.product(sku='A', part_number='15400-PLM-A02')
+
+        self.assertEqual(self.search('15400plma02'), ['A'])
+        self.assertEqual(self.search('15400 PLM A02'), ['A'])
+
+    def test_cross_reference_hits_rank_first(self):
+        self.product(sku='A', name='Filter for 90915')
+        self.product(sku='B', name='Oil filter', oem_number='90915')
+
+        self.assertEqual(self.search('90915'), ['B', 'A'])
+
+    @mock.patch('inventory.search.get_backend', lambda using='default': TokenTableBackend(using))
+    def test_token_index_ranks_exact_tokens_above_prefixes(self):
+        self.product(sku='A', name='Brake housing')
+        self.product(sku='B', name='Brak kit')
+
+        self.assertEqual(self.search('brak'), ['B', 'A'])
+        self.assertEqual(self.search('brake hous'), ['A'])
+
+    def test_blank_and_punctuation_queries(self):
+        self.product(sku='A')
+
+        self.assertEqual(self.search('  '), ['A'])
+        self.assertEqual(self.search('--'), [])
+
+    def test_bulk_brand_change_is_searchable(self):
+        product = self.product(sku='A', brand=Brand.objects.create(name='Generic'))
+        bosch = Brand.objects.create(name='Bosch')
+        self.client.force_login(self.user)
+
+        self.client.post(reverse('inventory:bulk_action'), {
+            'action': 'update_brand', 'selected_products': str(product.id), 'new_brand': bosch.id,
+        })
+
+        self.assertEqual(self.search('bosch'), ['A'])
+        self.assertEqual(self.search('generic'), [])
+
+
+class CrossReferenceTests(InventoryTestCase):
+    def import_csv(self, content, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False) as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command('import_cross_references', f.name, *args, stdout=out)
+        return out.getvalue()
+
+    def test_normalize_part_number(self):
+        self.assertEqual(crossref.normalize_part_number('15400-plm.a02 / x'), '15400PLMA02X')
+        self.assertEqual(crossref.normalize_part_number('w_712'), 'W712')
+        self.assertEqual(crossref.normalize_part_number(None), '')
+        self.assertEqual(crossref.normalize_part_number('--'), '')
+        self.assertEqual(len(crossref.normalize_part_number('9' * 150)), 100)
+
+    def test_import_command(self):
+        oil = self.product(sku='A')
+        air = self.product(sku='B', part_number='15400-PLM-A02')
+        supplier = Supplier.objects.create(name='Parts Co')
+
+        output = self.import_csv(
+            'number,sku,match_number,reference_type\n'
+            'W 712/75,A,,\n'
+            'HU-716,,15400plma02,oem\n'
+            ',A,,\n'
+            'X1,NOPE,,\n'
+            'X2,A,,bogus\n'
+            'W712-75,A,,\n',
+            '--supplier', str(supplier.id),
+        )
+
+        self.assertIn('Imported 2 cross-references, 3 rows skipped', output)
+        self.assertIn('Row 3: Missing number', output)
+        self.assertIn('Row 4: No matching product', output)
+        self.assertIn('Row 5: Unknown reference type: bogus', output)
+        self.assertEqual([ref.product for ref in crossref.lookup('w71275')], [oil])
+        [reference] = crossref.lookup('hu716')
+        self.assertEqual((reference.product, reference.reference_type, reference.supplier), (air, 'oem', supplier))
+
+    def test_import_command_dry_run_and_unknown_supplier(self):
+        self.product(sku='A')
+
+        output = self.import_csv('number,sku\nW 712/75,A\n', '--dry-run')
+
+        self.assertIn('Dry run: Imported 1 cross-references', output)
+        self.assertFalse(PartCrossReference.objects.filter(source='import').exists())
+        with self.assertRaises(CommandError):
+            self.import_csv('number,sku\n', '--supplier', '999')
+
+
+class FitmentTests(InventoryTestCase):
+    def parts(self, **params):
+        self.client.force_login(self.user)
+        return self.client.get(reverse('inventory:vehicle_parts'), params)
+
+    def skus(self, **params):
+        return [row['sku'] for row in self.parts(**params).json()['results']]
+
+    def test_parse_compatible_vehicles(self):
+        specs, unparsed = fitment.parse_compatible_vehicles(
+            'Universal، Bajaj Boxer 150 2012-2018، TVS King, Honda Civic (2006-11), Accord ٢٠٠٨+'
+        )
+
+        self.assertEqual(unparsed, ['Universal'])
+        self.assertEqual(specs, [
+            fitment.FitmentSpec('Bajaj', 'motorcycle', 'Boxer 150', 2012, 2018),
+            fitment.FitmentSpec('TVS', 'motorcycle', 'King', None, None),
+            fitment.FitmentSpec('Honda', 'car', 'Civic', 2006, 2011),
+            fitment.FitmentSpec('Honda', 'car', 'Accord', 2008, None),
+        ])
+
+    def test_parts_for_a_vehicle(self):
+        self.product(sku='A', compatible_vehicles='Bajaj Boxer 150 2012-2018')
+        self.product(sku='B', compatible_vehicles='Bajaj Boxer 2020+')
+        self.product(sku='C', compatible_vehicles='Honda Civic')
+        self.product(sku='D', compatible_vehicles='Bajaj Boxer 150', is_active=False)
+
+        self.assertEqual(self.skus(make='باجاج', model='boxer'), ['A', 'B'])
+        self.assertEqual(self.skus(make='bajaj', model='boxer', year=2015), ['A'])
+        self.assertEqual(self.skus(model='boxer 150', year=2021), [])
+        self.assertEqual(self.skus(make='honda', vehicle_type='car'), ['C'])
+        self.assertEqual(self.skus(make='honda', vehicle_type='motorcycle'), [])
+        other = Category.objects.create(name='Brakes', vehicle_type='car')
+        self.assertEqual(self.skus(make='honda', category=other.id), [])
+
+    def test_parts_need_a_vehicle(self):
+        self.assertEqual(self.parts(year=2015).status_code, 400)
+        self.assertEqual(self.parts(make='bajaj', year='new').json(), {
+            'success': False, 'error': 'Invalid year or category',
+        })
+
+    def test_backfill_command_rebuilds_parsed_fitments(self):
+        product = self.product(sku='A', compatible_vehicles='Universal, Bajaj Boxer 150 2012-2018')
+        self.product(sku='B')
+        manual = ProductFitment.objects.create(product=product, vehicle_model=product.fitments.get().vehicle_model)
+        ProductFitment.objects.filter(source='parsed').delete()
+
+        out = StringIO()
+        call_command('backfill_fitment', '--dry-run', stdout=out)
+        self.assertIn('Dry run: Processed 1 products, 1 fitments, 1 unparsed entries', out.getvalue())
+        self.assertEqual(list(ProductFitment.objects.all()), [manual])
+
+        call_command('backfill_fitment', stdout=out)
+        self.assertEqual(
+            sorted(ProductFitment.objects.values_list('source', 'year_from', 'year_to')),
+            [('manual', None, None), ('parsed', 2012, 2018)],
+        )
+
+
+class ScanIndexTests(InventoryTestCase):
+    def test_late_commit_is_pulled_by_other_processes(self):
+        first = self.product(sku='A')
+        scan.warm()
+        # Stamped before the row already synced, committed after it
+        late = self.product(sku='B')
+        Product.objects.filter(pk=late.pk).update(updated_at=first.updated_at - timedelta(milliseconds=1))
+        scan._bump('version')
+
+        self.assertEqual(scan.lookup(late.barcode)['id'], late.id)
+
+    def test_bulk_deactivation_stops_scanning(self):
+        product = self.product()
+        scan.warm()
+        self.assertIsNotNone(scan.lookup(product.barcode))
+        self.client.force_login(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('inventory:bulk_action'), {
+                'action': 'deactivate', 'selected_products': str(product.id),
+            })
+
+        self.assertIsNone(scan.lookup(product.barcode))
+        event = OutboxEvent.objects.filter(event_type='stock_changed').latest('id')
+        self.assertEqual(event.payload, {'product_ids': [product.id], 'reason': 'thresholds'})
+
+
+class ProductImportTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def run_import(self, content):
+        product_import = ProductImport(created_by=self.user, mode='update')
+        product_import.file.save('products.csv', ContentFile(content.encode()), save=False)
+        product_import.save()
+        return imports.run(product_import)
+
+    def test_threshold_changes_are_published(self):
+        changed = self.product(sku='A')
+        self.product(sku='B')
+        OutboxEvent.objects.all().delete()
+
+        product_import = self.run_import('sku,reorder_level\nA,8\nB,3\n')
+
+        self.assertEqual((product_import.status, product_import.updated_count), ('completed', 2))
+        event = OutboxEvent.objects.get(event_type='stock_changed')
+        self.assertEqual(event.payload, {'product_ids': [changed.id], 'reason': 'thresholds'})
+
+    def test_rejected_batch_is_counted_once(self):
+        self.product(sku='A')
+        self.product(sku='B')
+
+        with mock.patch.object(imports, '_save_batch', side_effect=IntegrityError('conflict')):
+            product_import = self.run_import('sku,name\nA,Renamed\nB,Renamed\n')
+
+        self.assertEqual(product_import.total_rows, 2)
+        self.assertEqual((product_import.processed_rows, product_import.error_count), (2, 2))
+        self.assertEqual((product_import.created_count, product_import.updated_count), (0, 0))
+
+
+class PriceHistoryTests(InventoryTestCase):
+    def test_product_edit_records_the_price_it_replaced(self):
+        product = self.product()
+        data = {
+            key: value for key, value in model_to_dict(product, fields=ProductForm._meta.fields).items()
+            if value is not None and key not in ('image', 'datasheet')
+        }
+        data.update(selling_price='75.00', current_stock=12)
+        self.client.force_login(self.user)
+
+        response = self.client.post(reverse('inventory:product_update', args=[product.id]), data)
+
+        self.assertRedirects(
+            response, reverse('inventory:product_detail', args=[product.id]), fetch_redirect_response=False
+        )
+        history = ProductPriceHistory.objects.get(product=product)
+        self.assertEqual(
+            (history.previous_price, history.selling_price, history.source, history.changed_by),
+            (Decimal('60.00'), Decimal('75.00'), 'manual', self.user),
+        )
+        self.assertEqual(StockMovement.objects.get(product=product, movement_type='adjustment').quantity, 2)
+
+    def test_repricing_records_history_and_effective_prices(self):
+        repriced = self.product(sku='A')
+        other = self.product(sku='B', category=Category.objects.create(name='Brakes', vehicle_type='car'))
+        before = timezone.now()
+
+        products, filters = pricing.select_products(category=self.category)
+        price_change = pricing.apply(products, 'percentage', Decimal('10'), self.user, filters=filters)
+
+        self.assertEqual(price_change.product_count, 1)
+        history = ProductPriceHistory.objects.get()
+        self.assertEqual(
+            (history.product, history.previous_price, history.selling_price, history.source, history.price_change),
+            (repriced, Decimal('60.00'), Decimal('66.00'), 'reprice', price_change),
+        )
+        repriced.refresh_from_db()
+        self.assertEqual(repriced.selling_price, Decimal('66.00'))
+
+        ids = [repriced.id, other.id]
+        self.assertEqual(pricing.prices_on(ids, before), {repriced.id: Decimal('60.00'), other.id: Decimal('60.00')})
+        self.assertEqual(
+            pricing.prices_on(ids, timezone.now()), {repriced.id: Decimal('66.00'), other.id: Decimal('60.00')}
+        )
+
+
+class ReservationTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.part = self.product(current_stock=10)
+
+    def test_hold_reduces_what_other_carts_can_take(self):
+        hold, _ = reservations.reserve({self.part.id: 6}, self.user)
+
+        self.assertEqual(reservations.available([self.part.id]), {self.part.id: 4})
+        self.assertEqual(reservations.available([self.part.id], exclude_hold=hold), {self.part.id: 10})
+        with self.assertRaises(reservations.ReservationError):
+            reservations.reserve({self.part.id: 5}, self.user)
+        # The cart itself may grow into its own hold
+        reservations.check({self.part.id: 8}, hold)
+
+        # Re-reserving replaces the cart's lines
+        self.assertEqual(reservations.reserve({self.part.id: 2}, self.user, hold)[0], hold)
+        self.assertEqual(StockReservation.objects.get(hold_key=hold, status='active').quantity, 2)
+        self.assertEqual(reservations.available([self.part.id]), {self.part.id: 8})
+
+    def test_commit_and_release_end_the_hold(self):
+        sold, _ = reservations.reserve({self.part.id: 3}, self.user)
+        abandoned, _ = reservations.reserve({self.part.id: 4}, self.user)
+        sale = Sale.objects.create(
+            sale_number='SAL-T-1', customer=Customer.objects.create(name='Walk-in'), created_by=self.user,
+        )
+
+        self.assertEqual(reservations.commit(sold, sale), 1)
+        self.assertEqual(reservations.release(abandoned), 1)
+
+        self.assertEqual(StockReservation.objects.get(hold_key=sold).sale, sale)
+        self.assertEqual(reservations.available([self.part.id]), {self.part.id: 10})
+        self.assertEqual(reservations.commit(sold, sale), 0)
+
+    def test_lapsed_holds_stop_counting_and_are_expired(self):
+        hold, _ = reservations.reserve({self.part.id: 6}, self.user, minutes=1)
+        StockReservation.objects.filter(hold_key=hold).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        # No longer held even before the sweep
+        self.assertEqual(reservations.available([self.part.id]), {self.part.id: 10})
+        self.assertEqual(reservations.expire(batch_size=1), 1)
+        self.assertEqual(StockReservation.objects.get(hold_key=hold).status, 'expired')
+        self.assertEqual(reservations.expire(), 0)
+
+
+class ShopSettingsTests(TestCase):
+    def setUp(self):
+        ShopSettings.clear_cache()
+        self.addCleanup(ShopSettings.clear_cache)
+
+    def test_settings_are_read_once_and_cached(self):
+        self.assertEqual(ShopSettings.get_settings().shop_name, 'SpareSmart')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(ShopSettings.get_settings().shop_name, 'SpareSmart')
+
+    def test_saving_invalidates_the_cached_settings(self):
+        settings = ShopSettings.get_settings()
+        context = shop_settings(RequestFactory().get('/'))
+
+        settings.shop_name = 'Cairo Spares'
+        settings.save()
+
+        self.assertEqual(ShopSettings.get_settings().shop_name, 'Cairo Spares')
+        # The template context reads the settings lazily, after the save
+        self.assertEqual(context['shop_settings'].shop_name, 'Cairo Spares')
+
+        settings.delete()
+        self.assertEqual(ShopSettings.get_settings().shop_name, 'SpareSmart')
@@ -10,6 +10,13 @@ urlpatterns = [
     path('products/<int:product_id>/', views.product_detail, name='product_detail'),
     path('products/<int:product_id>/edit/', views.product_update, name='product_update'),
     path('products/bulk-action/', views.bulk_action, name='bulk_action'),
+    path('products/part-lookup/', views.part_number_lookup, name='part_number_lookup'),
+    path('products/fitment/', views.vehicle_parts, name='vehicle_parts'),
+    path('products/reprice/preview/', views.reprice_preview, name='reprice_preview'),
+    path('products/reprice/apply/', views.reprice_apply, name='reprice_apply'),
+    path('products/import/', views.product_import, name='product_import'),
+    path('products/import/<int:import_id>/', views.product_import_status, name='product_import_status'),
+    path('products/import/<int:import_id>/errors/', views.product_import_errors, name='product_import_errors'),
     
     # Categories
     path('categories/', views.category_list, name='category_list'),
@@ -47,6 +54,18 @@ urlpatterns = [
     path('alerts/refresh/', views.refresh_alerts, name='refresh_alerts'),
     path('purchase-requirements/', views.purchase_requirements, name='purchase_requirements'),
 
+    # Stock Locations
+    path('locations/', views.location_list, name='location_list'),
+    path('transfers/create/', views.stock_transfer_create, name='stock_transfer_create'),
+
+    # Stock Counts
+    path('stock-counts/', views.stock_count_list, name='stock_count_list'),
+    path('stock-counts/start/', views.stock_count_start, name='stock_count_start'),
+    path('stock-counts/<int:count_id>/scans/', views.stock_count_scans, name='stock_count_scans'),
+    path('stock-counts/<int:count_id>/variances/', views.stock_count_variances, name='stock_count_variances'),
+    path('stock-counts/<int:count_id>/post/', views.stock_count_post, name='stock_count_post'),
+    path('stock-counts/<int:count_id>/cancel/', views.stock_count_cancel, name='stock_count_cancel'),
+
     # Settings Management
     path('settings/', views.settings_dashboard, name='settings_dashboard'),
     path('settings/shop/', views.shop_settings, name='shop_settings'),
@@ -4,19 +4,27 @@ from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
 from django.core.paginator import Paginator
 from django.db.models import Q, Sum, Count, F
+from django.db.models.functions import Abs
 from django.db import transaction
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from accounts.views import permission_required
-from .models import Product, Category, Brand, Customer, Supplier, StockMovement, InventoryAlert, Unit, ShopSettings, Invoice, InvoiceItem
+from .models import Product, Category, Brand, Customer, Supplier, StockMovement, InventoryAlert, Unit, ShopSettings, Invoice, InvoiceItem, StockCount, Location, StockBalance, ProductImport
 from .forms import (
     ProductForm, CategoryForm, BrandForm, CustomerForm, SupplierForm,
     StockAdjustmentForm, ProductFilterForm, BulkActionForm, UnitForm,
-    ShopSettingsForm, InvoiceForm, InvoiceItemForm
+    ShopSettingsForm, InvoiceForm, InvoiceItemForm, ProductImportForm
 )
+from .search import search_products
+from .signals import refresh_product_indexes
+from . import alerts as alert_service, counting, crossref, imports, locations, pricing, scan
+from .fitment import parts_for_vehicle
+from dashboard import events
 from dashboard.models import ActivityLog
+import csv
 import json
 from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
 from django.utils import timezone
 
 @login_required
@@ -34,15 +42,14 @@ def product_list(request):
         vehicle_type = filter_form.cleaned_data.get('vehicle_type')
         stock_status = filter_form.cleaned_data.get('stock_status')
         is_active = filter_form.cleaned_data.get('is_active')
+        vehicle_make = filter_form.cleaned_data.get('vehicle_make')
+        vehicle_model = filter_form.cleaned_data.get('vehicle_model')
+        vehicle_year = filter_form.cleaned_data.get('vehicle_year')
+        abc_class = filter_form.cleaned_data.get('abc_class')
+        xyz_class = filter_form.cleaned_data.get('xyz_class')
         
         if search:
-            products = products.filter(
-                Q(name__icontains=search) |
-                Q(sku__icontains=search) |
-                Q(barcode__icontains=search) |
-                Q(part_number__icontains=search) |
-                Q(oem_number__icontains=search)
-            )
+            products = search_products(products, search)
         
         if category:
             products = products.filter(category=category)
@@ -66,6 +73,20 @@ def product_list(request):
         
         if is_active:
             products = products.filter(is_active=bool(int(is_active)))
+        
+        if abc_class:
+            products = products.filter(abc_class=abc_class)
+        
+        if xyz_class:
+            products = products.filter(xyz_class=xyz_class)
+        
+        if vehicle_make or vehicle_model:
+            products = parts_for_vehicle(
+                products,
+                make=vehicle_make.name if vehicle_make else None,
+                model=vehicle_model,
+                year=vehicle_year,
+            )
     
     # Pagination
     paginator = Paginator(products, 25)
@@ -95,28 +116,32 @@ def product_create(request):
         form = ProductForm(request.POST, request.FILES)
         if form.is_valid():
             try:
-                product = form.save()
+                with transaction.atomic():
+                    product = form.save()
                 
-                # Log activity
-                ActivityLog.objects.create(
-                    user=request.user,
-                    action='create',
-                    description=f'Created product: {product.name} ({product.sku})',
-                    content_object=product
-                )
-                
-                # Create initial stock movement if current_stock > 0
-                if product.current_stock > 0:
-                    StockMovement.objects.create(
-                        product=product,
-                        movement_type='adjustment',
-                        quantity=product.current_stock,
-                        unit_cost=product.cost_price,
-                        reference_number='INITIAL',
-                        notes='Initial stock entry',
-                        created_by=request.user
+                    # Log activity
+                    ActivityLog.objects.create(
+                        user=request.user,
+                        action='create',
+                        description=f'Created product: {product.name} ({product.sku})',
+                        content_object=product
                     )
                 
+                    # Create initial stock movement if current_stock > 0
+                    if product.current_stock > 0:
+                        movement = StockMovement.objects.create(
+                            product=product,
+                            movement_type='adjustment',
+                            quantity=product.current_stock,
+                            unit_cost=product.cost_price,
+                            reference_number='INITIAL',
+                            location=locations.default_location(),
+                            notes='Initial stock entry',
+                            created_by=request.user
+                        )
+                        locations.apply([movement])
+                        events.stock_changed([product.id], 'initial_stock')
+                
                 messages.success(request, f'Product "{product.name}" created successfully.')
                 return redirect('inventory:product_detail', product_id=product.id)
                 
@@ -150,6 +175,8 @@ def product_detail(request, product_id):
     context = {
         'product': product,
         'recent_movements': recent_movements,
+        'stock_balances': product.stock_balances.select_related('location').order_by('-location__is_default', 'location__name'),
+        'price_history': product.price_history.select_related('changed_by').order_by('-effective_from', '-id')[:10],
         'profit_margin': profit_margin,
         'total_value': product.current_stock * product.cost_price,
     }
@@ -163,40 +190,49 @@ def product_update(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     
     if request.method == 'POST':
+        # Validating the form copies the posted values onto the instance
+        old_stock, old_price = product.current_stock, product.selling_price
         form = ProductForm(request.POST, request.FILES, instance=product)
         if form.is_valid():
             try:
-                old_stock = product.current_stock
-                updated_product = form.save()
+                with transaction.atomic():
+                    updated_product = form.save()
+                    pricing.record([(updated_product.id, old_price, updated_product.selling_price)], 'manual', request.user)
                 
-                # Log activity
-                ActivityLog.objects.create(
-                    user=request.user,
-                    action='update',
-                    description=f'Updated product: {updated_product.name} ({updated_product.sku})',
-                    content_object=updated_product
-                )
+                    # Log activity
+                    ActivityLog.objects.create(
+                        user=request.user,
+                        action='update',
+                        description=f'Updated product: {updated_product.name} ({updated_product.sku})',
+                        content_object=updated_product
+                    )
                 
-                # If stock changed, create stock movement
-                if old_stock != updated_product.current_stock:
-                    movement_type = 'adjustment'
-                    quantity = abs(updated_product.current_stock - old_stock)
-                    if updated_product.current_stock > old_stock:
-                        # Stock increase
-                        pass
-                    else:
-                        # Stock decrease
-                        quantity = -quantity
+                    # If stock changed, create stock movement
+                    if old_stock != updated_product.current_stock:
+                        movement_type = 'adjustment'
+                        quantity = abs(updated_product.current_stock - old_stock)
+                        if updated_product.current_stock > old_stock:
+                            # Stock increase
+                            pass
+                        else:
+                            # Stock decrease
+                            quantity = -quantity
                     
-                    StockMovement.objects.create(
-                        product=updated_product,
-                        movement_type=movement_type,
-                        quantity=quantity,
-                        unit_cost=updated_product.cost_price,
-                        reference_number='ADJUSTMENT',
-                        notes='Stock adjusted via product update',
-                        created_by=request.user
-                    )
+                        movement = StockMovement.objects.create(
+                            product=updated_product,
+                            movement_type=movement_type,
+                            quantity=quantity,
+                            unit_cost=updated_product.cost_price,
+                            reference_number='ADJUSTMENT',
+                            location=locations.default_location(),
+                            notes='Stock adjusted via product update',
+                            created_by=request.user
+                        )
+                        locations.apply([movement])
+                        events.stock_changed([updated_product.id], 'adjustment')
+                    elif {'minimum_stock', 'maximum_stock', 'reorder_level'} & set(form.changed_data):
+                        # Same stock, new thresholds: alerts need re-evaluating too
+                        events.stock_changed([updated_product.id], 'thresholds')
                 
                 messages.success(request, f'Product "{updated_product.name}" updated successfully.')
                 return redirect('inventory:product_detail', product_id=updated_product.id)
@@ -630,12 +666,14 @@ def bulk_action(request):
         try:
             product_ids = [int(pid) for pid in selected_products.split(',')]
             products = Product.objects.filter(id__in=product_ids)
+            # update() skips auto_now; offline catalog clients follow updated_at
+            now = timezone.now()
             
             if action == 'activate':
-                products.update(is_active=True)
+                products.update(is_active=True, updated_at=now)
                 message = f'{products.count()} products activated successfully.'
             elif action == 'deactivate':
-                products.update(is_active=False)
+                products.update(is_active=False, updated_at=now)
                 message = f'{products.count()} products deactivated successfully.'
             elif action == 'delete':
                 count = products.count()
@@ -644,17 +682,24 @@ def bulk_action(request):
             elif action == 'update_category':
                 new_category = form.cleaned_data.get('new_category')
                 if new_category:
-                    products.update(category=new_category)
+                    products.update(category=new_category, updated_at=now)
                     message = f'{products.count()} products updated with new category.'
                 else:
                     message = 'Please select a category.'
             elif action == 'update_brand':
                 new_brand = form.cleaned_data.get('new_brand')
                 if new_brand:
-                    products.update(brand=new_brand)
+                    products.update(brand=new_brand, updated_at=now)
                     message = f'{products.count()} products updated with new brand.'
                 else:
                     message = 'Please select a brand.'
+
+            if action != 'delete':
+                # update() skips the product signals: search and scan indexes, alerts
+                with transaction.atomic():
+                    refresh_product_indexes(product_ids)
+                    if action in ('activate', 'deactivate'):
+                        events.stock_changed(product_ids, 'thresholds')
             
             # Log activity
             ActivityLog.objects.create(
@@ -672,40 +717,95 @@ def bulk_action(request):
     
     return redirect('inventory:product_list')
 
+@login_required
+@permission_required('view_products')
+def part_number_lookup(request):
+    """AJAX endpoint: exact lookup of a part/OEM number in any spelling"""
+    number = request.GET.get('number', '')
+    key = crossref.normalize_part_number(number)
+
+    if not key:
+        return JsonResponse({'success': False, 'error': 'Part number is required'}, status=400)
+
+    results = []
+    for reference in crossref.lookup(number):
+        product = reference.product
+        results.append({
+            'product_id': product.id,
+            'name': product.name,
+            'sku': product.sku,
+            'brand': product.brand.name if product.brand else '',
+            'price': str(product.selling_price),
+            'stock': product.current_stock,
+            'unit': product.unit.name_arabic,
+            'matched_number': reference.number,
+            'reference_type': reference.reference_type,
+            'manufacturer': reference.manufacturer,
+        })
+
+    return JsonResponse({'success': True, 'normalized_key': key, 'results': results})
+
+@login_required
+@permission_required('view_products')
+def vehicle_parts(request):
+    """AJAX endpoint: parts fitting a vehicle (make, model, year), optionally by category"""
+    make = request.GET.get('make', '').strip()
+    model = request.GET.get('model', '').strip()
+    vehicle_type = request.GET.get('vehicle_type', '').strip()
+
+    if not make and not model:
+        return JsonResponse({'success': False, 'error': 'Vehicle make or model is required'}, status=400)
+
+    try:
+        year = int(request.GET['year']) if request.GET.get('year') else None
+        category = int(request.GET['category']) if request.GET.get('category') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid year or category'}, status=400)
+
+    products = parts_for_vehicle(
+        Product.objects.filter(is_active=True).select_related('brand', 'unit'),
+        make=make, model=model, year=year, category=category, vehicle_type=vehicle_type,
+    ).order_by('name')[:50]
+
+    results = [{
+        'id': product.id,
+        'name': product.name,
+        'sku': product.sku,
+        'brand': product.brand.name if product.brand else '',
+        'price': str(product.selling_price),
+        'stock': product.current_stock,
+        'unit': product.unit.name_arabic,
+    } for product in products]
+
+    return JsonResponse({'success': True, 'results': results})
+
 # Enhanced Inventory Alerts Management
 
 @login_required
 @permission_required('view_stock_reports')
 def alerts_dashboard(request):
     """Enhanced inventory alerts dashboard"""
-    # Get active alerts grouped by type
     alerts = InventoryAlert.objects.select_related('product__category', 'product__brand').filter(status='active')
     
-    # Count by نوع التنبيه
-    alert_counts = {
-        'out_of_stock': alerts.filter(alert_type='out_of_stock').count(),
-        'low_stock': alerts.filter(alert_type='low_stock').count(),
-        'reorder': alerts.filter(alert_type='reorder').count(),
-        'overstock': alerts.filter(alert_type='overstock').count(),
-    }
+    # Counts, affected value, categories/brands and ages come from the cached summary
+    summary = alert_service.summary()
     
     # Get recent alerts
-    recent_alerts = alerts.order_by('-created_at')[:20]
+    recent_alerts = list(alerts.order_by('-created_at')[:20])
     
     # Get critical alerts (out of stock and low stock)
-    critical_alerts = alerts.filter(alert_type__in=['out_of_stock', 'low_stock']).order_by('-created_at')
-    
-    # Calculate total value of affected inventory
-    affected_value = 0
-    for alert in alerts:
-        affected_value += alert.product.current_stock * alert.product.cost_price
+    critical_alerts = list(
+        alerts.filter(alert_type__in=['out_of_stock', 'low_stock']).order_by(*alert_service.priority_order())[:10]
+    )
     
     context = {
-        'alert_counts': alert_counts,
+        'summary': summary,
+        'alert_counts': summary['counts'],
         'recent_alerts': recent_alerts,
         'critical_alerts': critical_alerts,
-        'total_alerts': sum(alert_counts.values()),
-        'affected_value': affected_value,
+        'critical_count': summary['critical'],
+        'total_alerts': summary['total'],
+        'affected_value': summary['affected_value'],
     }
     
     return render(request, 'inventory/alerts_dashboard.html', context)
@@ -738,7 +838,7 @@ def alerts_list(request):
     if vehicle_type:
         alerts = alerts.filter(product__category__vehicle_type=vehicle_type)
     
-    alerts = alerts.order_by('-created_at')
+    alerts = alerts.order_by(*alert_service.priority_order())
     
     # Pagination
     paginator = Paginator(alerts, 25)
@@ -747,6 +847,7 @@ def alerts_list(request):
     
     context = {
         'page_obj': page_obj,
+        'summary': alert_service.summary(),
         'alert_types': InventoryAlert.ALERT_TYPE_CHOICES,
         'status_choices': InventoryAlert.STATUS_CHOICES,
         'vehicle_types': Category.VEHICLE_TYPE_CHOICES,
@@ -772,6 +873,7 @@ def acknowledge_alert(request, alert_id):
         alert.acknowledged_by = request.user
         alert.acknowledged_at = timezone.now()
         alert.save()
+        alert_service.invalidate_summary()
         
         # Log activity
         ActivityLog.objects.create(
@@ -798,6 +900,7 @@ def resolve_alert(request, alert_id):
     alert.acknowledged_by = request.user
     alert.acknowledged_at = timezone.now()
     alert.save()
+    alert_service.invalidate_summary()
     
     # Log activity
     ActivityLog.objects.create(
@@ -824,6 +927,7 @@ def bulk_acknowledge_alerts(request):
             acknowledged_by=request.user,
             acknowledged_at=timezone.now()
         )
+        alert_service.invalidate_summary()
         
         # Log activity
         ActivityLog.objects.create(
@@ -839,43 +943,21 @@ def bulk_acknowledge_alerts(request):
 @login_required
 @permission_required('view_stock_reports')
 def purchase_requirements(request):
-    """Generate purchase requirements report based on alerts"""
-    # Get products that need reordering
-    reorder_alerts = InventoryAlert.objects.filter(
-        alert_type__in=['out_of_stock', 'low_stock', 'reorder'],
-        status='active'
-    ).select_related('product__category', 'product__brand')
-    
-    # Group by supplier (if we had supplier in product model)
-    # For now, group by category and brand
-    purchase_requirements = []
-    
-    for alert in reorder_alerts:
-        product = alert.product
-        
-        # Calculate recommended quantity
-        if product.current_stock <= 0:
-            # Out of stock - order to maximum
-            recommended_qty = product.maximum_stock
-        elif product.current_stock <= product.minimum_stock:
-            # Low stock - order to safe level
-            recommended_qty = product.maximum_stock - product.current_stock
-        else:
-            # At إعادة ترتيب المستوى - order standard quantity
-            recommended_qty = product.reorder_level * 2
-        
-        total_cost = recommended_qty * product.cost_price
-        
-        purchase_requirements.append({
-            'product': product,
-            'alert': alert,
-            'recommended_qty': recommended_qty,
-            'total_cost': total_cost,
-            'priority': 'HIGH' if alert.alert_type == 'out_of_stock' else 'MEDIUM'
-        })
-    
-    # Sort by priority and total cost
-    purchase_requirements.sort(key=lambda x: (x['priority'] == 'MEDIUM', -x['total_cost']))
+    """Purchase requirements report: what to order, from whom, net of open purchase orders"""
+    from purchases import replenishment
+    
+    purchase_requirements = replenishment.plan()
+    
+    # Group by supplier; lines without a known supplier are listed last
+    supplier_groups = {}
+    for req in purchase_requirements:
+        key = req['supplier'].id if req['supplier'] else None
+        group = supplier_groups.setdefault(key, {'supplier': req['supplier'], 'items': 0, 'total_cost': 0})
+        group['items'] += 1
+        group['total_cost'] += req['total_cost']
+    supplier_groups = sorted(
+        supplier_groups.values(), key=lambda group: (group['supplier'] is None, -group['total_cost'])
+    )
     
     # Calculate totals
     total_items = len(purchase_requirements)
@@ -884,9 +966,11 @@ def purchase_requirements(request):
     
     context = {
         'purchase_requirements': purchase_requirements,
+        'supplier_groups': supplier_groups,
         'total_items': total_items,
         'total_cost': total_cost,
         'high_priority_count': high_priority_count,
+        'unassigned_count': sum(1 for req in purchase_requirements if req['supplier'] is None),
     }
     
     return render(request, 'inventory/purchase_requirements.html', context)
@@ -894,29 +978,384 @@ def purchase_requirements(request):
 @login_required
 @permission_required('edit_products')
 def refresh_alerts(request):
-    """Manually refresh inventory alerts"""
-    from django.core.management import call_command
-    from io import StringIO
-    
+    """Queue a full inventory alerts reconciliation for the event processor"""
     try:
-        # Capture command output
-        out = StringIO()
-        call_command('check_inventory_alerts', stdout=out)
-        
-        messages.success(request, 'Inventory alerts refreshed successfully.')
-        
+        # The inventory_alerts consumer picks this up on the process_events
+        # worker's next poll; evaluating every product here would hold the request
+        events.publish('alerts_refresh_requested', {'user_id': request.user.id})
+
+        messages.success(request, 'Inventory alerts refresh queued. Alerts will update within a minute.')
+
         # Log activity
         ActivityLog.objects.create(
             user=request.user,
             action='system',
-            description='Manual inventory alerts refresh'
+            description='Manual inventory alerts refresh requested'
         )
-        
+
     except Exception as e:
         messages.error(request, f'Error refreshing alerts: {str(e)}')
-    
+
     return redirect('inventory:alerts_dashboard')
 
+# ==================== STOCK COUNTS ====================
+
+def _count_data(count, zero_uncounted=False, summary=None):
+    if summary is None:
+        summary = counting.summary(count, zero_uncounted)
+    return {
+        'id': count.id,
+        'count_number': count.count_number,
+        'status': count.status,
+        'category': count.category.name if count.category else None,
+        'location': count.location.name if count.location else None,
+        'started_at': count.started_at.isoformat(),
+        'posted_at': count.posted_at.isoformat() if count.posted_at else None,
+        'summary': {
+            key: str(value) if key == 'variance_value' else value
+            for key, value in summary.items()
+        },
+    }
+
+def _json_body(request):
+    data = json.loads(request.body or b'{}')
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    return data
+
+@login_required
+@permission_required('view_stock_reports')
+def stock_count_list(request):
+    """AJAX endpoint: stock counts, open ones first"""
+    counts = StockCount.objects.select_related('category', 'location').order_by(
+        F('posted_at').desc(nulls_first=True), '-started_at'
+    )
+    status = request.GET.get('status')
+    if status:
+        counts = counts.filter(status=status)
+    counts = counting.with_summaries(counts)[:50]
+    return JsonResponse({
+        'success': True,
+        'counts': [_count_data(count, summary=counting.annotated_summary(count)) for count in counts],
+    })
+
+@login_required
+@permission_required('edit_products')
+@require_http_methods(["POST"])
+def stock_count_start(request):
+    """AJAX endpoint: open a stock count, freezing the expected quantities"""
+    category = None
+    category_id = request.POST.get('category')
+    if category_id:
+        category = get_object_or_404(Category, id=category_id)
+    try:
+        location = locations.resolve(request.POST.get('location'))
+    except locations.LocationError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    count = counting.start(
+        request.user, category=category, location=location, notes=request.POST.get('notes', '')
+    )
+    return JsonResponse({'success': True, 'count': _count_data(count)})
+
+@login_required
+@permission_required('edit_products')
+@require_http_methods(["POST"])
+def stock_count_scans(request, count_id):
+    """AJAX endpoint: apply one batch of handheld scans to a stock count"""
+    try:
+        data = _json_body(request)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+
+    scans = data.get('scans')
+    if not isinstance(scans, list) or not scans:
+        return JsonResponse({'success': False, 'error': 'scans must be a non-empty list'}, status=400)
+    if len(scans) > counting.MAX_SCANS_PER_UPLOAD:
+        return JsonResponse(
+            {'success': False, 'error': f'At most {counting.MAX_SCANS_PER_UPLOAD} scans per upload'}, status=400
+        )
+
+    try:
+        result = counting.record_scans(
+            count_id, scans, request.user,
+            batch_id=str(data.get('batch_id') or '')[:100] or None,
+            mode=data.get('mode', 'add'),
+        )
+    except counting.StockCountError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({'success': True, **result})
+
+@login_required
+@permission_required('view_stock_reports')
+def stock_count_variances(request, count_id):
+    """AJAX endpoint: count summary and a page of lines with a variance, largest value (either way) first"""
+    count = get_object_or_404(StockCount, id=count_id)
+    zero_uncounted = request.GET.get('zero_uncounted') == '1'
+
+    lines = counting.variances(count, zero_uncounted).select_related('product').annotate(
+        variance_value=F('variance') * F('unit_cost')
+    ).order_by(Abs('variance_value').desc(), 'id')
+    page_obj = Paginator(lines, 500).get_page(request.GET.get('page'))
+
+    return JsonResponse({
+        'success': True,
+        'count': _count_data(count, zero_uncounted),
+        'page': page_obj.number,
+        'pages': page_obj.paginator.num_pages,
+        'lines': [{
+            'id': line.id,
+            'product_id': line.product_id,
+            'sku': line.product.sku,
+            'name': line.product.name,
+            'expected': line.expected_quantity,
+            'counted': line.counted_quantity,
+            'variance': line.variance,
+            'value': str(line.variance_value),
+        } for line in page_obj],
+    })
+
+@login_required
+@permission_required('edit_products')
+@require_http_methods(["POST"])
+def stock_count_post(request, count_id):
+    """AJAX endpoint: post approved variances (all by default) as stock adjustments"""
+    try:
+        data = _json_body(request)
+        line_ids = data.get('line_ids')
+        if line_ids is not None:
+            line_ids = [int(line_id) for line_id in line_ids]
+    except (ValueError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+
+    try:
+        adjusted = counting.post(
+            count_id, request.user, line_ids=line_ids, zero_uncounted=bool(data.get('zero_uncounted'))
+        )
+    except counting.StockCountError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({'success': True, 'adjusted': adjusted})
+
+@login_required
+@permission_required('edit_products')
+@require_http_methods(["POST"])
+def stock_count_cancel(request, count_id):
+    """AJAX endpoint: cancel an open stock count"""
+    try:
+        counting.cancel(count_id, request.user)
+    except counting.StockCountError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({'success': True})
+
+# ==================== STOCK LOCATIONS ====================
+
+@login_required
+@permission_required('view_stock_reports')
+def location_list(request):
+    """AJAX endpoint: active locations with the products, units and value they hold"""
+    totals = {
+        row['location_id']: row
+        for row in StockBalance.objects.filter(quantity__gt=0).values('location_id').annotate(
+            products=Count('id'),
+            units=Sum('quantity'),
+            value=Sum(F('quantity') * F('product__cost_price')),
+        ).order_by()
+    }
+    return JsonResponse({'success': True, 'locations': [{
+        'id': location.id,
+        'code': location.code,
+        'name': location.name,
+        'location_type': location.location_type,
+        'is_default': location.is_default,
+        'products': totals.get(location.id, {}).get('products', 0),
+        'units': totals.get(location.id, {}).get('units', 0),
+        'value': str(totals.get(location.id, {}).get('value') or 0),
+    } for location in Location.objects.filter(is_active=True)]})
+
+@login_required
+@permission_required('edit_products')
+@require_http_methods(["POST"])
+def stock_transfer_create(request):
+    """AJAX endpoint: move many products between two locations in one transfer"""
+    try:
+        data = _json_body(request)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+
+    lines = data.get('lines')
+    if not isinstance(lines, list) or not lines or not all(isinstance(line, dict) for line in lines):
+        return JsonResponse({'success': False, 'error': 'lines must be a non-empty list of objects'}, status=400)
+
+    # Lines name a product id or a scanned barcode/SKU
+    codes = {scan.normalize_code(line['code']) for line in lines if line.get('code')}
+    found = scan.lookup_many(codes) if codes else {}
+    unknown = sorted(code for code, product in found.items() if product is None)
+    if unknown:
+        return JsonResponse({'success': False, 'error': 'Unknown codes', 'unknown': unknown}, status=400)
+
+    try:
+        transfer_lines = []
+        for line in lines:
+            if line.get('code'):
+                product_id = found[scan.normalize_code(line['code'])]['id']
+            else:
+                product_id = int(line['product_id'])
+            transfer_lines.append((product_id, int(line['quantity'])))
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Each line needs a product and a quantity'}, status=400)
+
+    try:
+        stock_transfer = locations.transfer(
+            locations.resolve(data.get('from_location')),
+            locations.resolve(data.get('to_location')),
+            transfer_lines,
+            request.user,
+            notes=str(data.get('notes') or ''),
+        )
+    except locations.LocationError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'transfer_number': stock_transfer.transfer_number,
+        'lines': stock_transfer.items.count(),
+    })
+
+# ==================== BULK REPRICING ====================
+
+def _reprice_request(data):
+    """Products, filters and rule arguments of a repricing request; raises PricingError"""
+    try:
+        category = Category.objects.get(id=data['category']) if data.get('category') else None
+        brand = Brand.objects.get(id=data['brand']) if data.get('brand') else None
+        value = Decimal(str(data['value']))
+        rounding_step = Decimal(str(data['rounding_step'])) if data.get('rounding_step') else None
+    except (Category.DoesNotExist, Brand.DoesNotExist):
+        raise pricing.PricingError('Unknown category or brand')
+    except (KeyError, TypeError, ValueError, InvalidOperation):
+        raise pricing.PricingError('value (and rounding_step) must be numbers')
+    if rounding_step is not None and rounding_step <= 0:
+        raise pricing.PricingError('rounding_step must be positive')
+    vehicle_type = data.get('vehicle_type') or None
+    if vehicle_type and vehicle_type not in dict(Category.VEHICLE_TYPE_CHOICES):
+        raise pricing.PricingError(f'Unknown vehicle type: {vehicle_type}')
+    products, filters = pricing.select_products(
+        category, brand, vehicle_type, include_inactive=bool(data.get('include_inactive'))
+    )
+    rule = {
+        'rule': data.get('rule'),
+        'value': value,
+        'rounding_step': rounding_step,
+        'rounding_mode': data.get('rounding_mode') or 'nearest',
+    }
+    return products, filters, rule
+
+@login_required
+@permission_required('edit_products')
+@require_http_methods(["POST"])
+def reprice_preview(request):
+    """AJAX endpoint: what a repricing rule would do to the selected products"""
+    try:
+        products, filters, rule = _reprice_request(_json_body(request))
+        stats = pricing.preview(products, **rule)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+    except pricing.PricingError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({'success': True, 'filters': filters, **stats})
+
+@login_required
+@permission_required('edit_products')
+@require_http_methods(["POST"])
+def reprice_apply(request):
+    """AJAX endpoint: reprice the selected products and record the price history"""
+    try:
+        data = _json_body(request)
+        products, filters, rule = _reprice_request(data)
+        price_change = pricing.apply(
+            products, user=request.user, filters=filters, description=str(data.get('description') or '')[:200], **rule
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+    except pricing.PricingError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({
+        'success': True,
+        'price_change': price_change.id,
+        'products': price_change.product_count,
+    })
+
+# ==================== PRODUCT IMPORTS ====================
+
+def _import_data(product_import):
+    return {
+        'id': product_import.id,
+        'file': product_import.file.name,
+        'mode': product_import.mode,
+        'dry_run': product_import.dry_run,
+        'status': product_import.status,
+        'total_rows': product_import.total_rows,
+        'processed_rows': product_import.processed_rows,
+        'progress': product_import.progress,
+        'created': product_import.created_count,
+        'updated': product_import.updated_count,
+        'errors': product_import.error_count,
+        'message': product_import.message,
+        'created_at': product_import.created_at.isoformat(),
+        'finished_at': product_import.finished_at.isoformat() if product_import.finished_at else None,
+    }
+
+@login_required
+@permission_required('add_products')
+def product_import(request):
+    """Upload a product catalog file; the import runs in the background (import_products --worker)"""
+    if request.method == 'POST':
+        form = ProductImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            job = ProductImport.objects.create(
+                file=upload,
+                file_format=imports.detect_format(upload.name),
+                mode=form.cleaned_data['mode'],
+                dry_run=form.cleaned_data['dry_run'],
+                created_by=request.user,
+            )
+            messages.success(request, f'Import #{job.id} queued.')
+            return redirect('inventory:product_import')
+    else:
+        form = ProductImportForm()
+
+    context = {
+        'form': form,
+        'imports': ProductImport.objects.select_related('created_by')[:20],
+        'columns': sorted(imports.COLUMNS),
+        'required_columns': imports.REQUIRED_FOR_CREATE,
+        'title': 'استيراد المنتجات',
+    }
+    return render(request, 'inventory/product_import.html', context)
+
+@login_required
+@permission_required('add_products')
+def product_import_status(request, import_id):
+    """AJAX endpoint: progress of an import"""
+    job = get_object_or_404(ProductImport, id=import_id)
+    return JsonResponse({'success': True, 'import': _import_data(job)})
+
+@login_required
+@permission_required('add_products')
+def product_import_errors(request, import_id):
+    """Download the rejected rows of an import as CSV"""
+    job = get_object_or_404(ProductImport, id=import_id)
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="product_import_{job.id}_errors.csv"'
+    writer = csv.writer(response)
+    writer.writerow(['row', 'sku', 'error'])
+    for row in job.errors.values_list('row_number', 'sku', 'message').iterator(chunk_size=2000):
+        writer.writerow(row)
+    return response
+
 # ==================== UNITS MANAGEMENT ====================
 
 @login_required
@@ -0,0 +1,10 @@
+"""Outbox consumers owned by the purchases app (see dashboard.events)"""
+from dashboard import events
+
+from . import replenishment
+
+
+@events.consumer('supplier_catalog', event_types=['purchase_received'])
+def record_supplier_costs(batch):
+    """Keep product/supplier catalog costs current from received purchases"""
+    replenishment.update_supplier_catalog({event.aggregate_id for event in batch})
@@ -3,7 +3,7 @@ from django.forms import inlineformset_factory
 from django.core.exceptions import ValidationError
 from decimal import Decimal
 from .models import Purchase, PurchaseItem, PurchasePayment
-from inventory.models import Product, Supplier
+from inventory.models import Location, Product, Supplier
 
 
 class PurchaseForm(forms.ModelForm):
@@ -211,6 +211,14 @@ class PurchaseReceivingForm(forms.Form):
         super().__init__(*args, **kwargs)
         self.purchase = purchase
         
+        self.fields['location'] = forms.ModelChoiceField(
+            label='موقع الاستلام',
+            queryset=Location.objects.filter(is_active=True),
+            required=False,
+            empty_label='Default location',
+            widget=forms.Select(attrs={'class': 'form-select'})
+        )
+        
         # Create fields for each purchase item
         for item in purchase.items.all():
             pending_qty = item.quantity_pending
@@ -331,6 +339,7 @@ class PurchaseFilterForm(forms.Form):
     
     STATUS_CHOICES = [
         ('', 'All Statuses'),
+        ('draft', 'Draft'),
         ('pending', 'Pending'),
         ('ordered', 'Ordered'),
         ('partial_received', 'Partially Received'),
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_created_at(apps, schema_editor):
+    # Existing payments were last changed when they were recorded
+    apps.get_model('purchases', 'PurchasePayment').objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0002_alter_purchase_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchasepayment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['updated_at', 'id'], name='purchase_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchasepayment',
+            index=models.Index(fields=['updated_at', 'id'], name='purchase_pay_updated_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0003_change_feed_cursor'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='purchase',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('pending', 'Pending'), ('ordered', 'Ordered'), ('partial_received', 'Partially Received'), ('received', 'Received'), ('cancelled', 'Cancelled'), ('returned', 'Returned')], default='pending', max_length=20),
+        ),
+    ]
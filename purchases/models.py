@@ -6,6 +6,7 @@ from django.utils import timezone
 class Purchase(models.Model):
     """Purchase orders and receipts"""
     STATUS_CHOICES = [
+        ('draft', 'Draft'),
         ('pending', 'Pending'),
         ('ordered', 'Ordered'),
         ('partial_received', 'Partially Received'),
@@ -105,6 +106,10 @@ class Purchase(models.Model):
         verbose_name = 'شراء'
         verbose_name_plural = 'المشتريات'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset cursor of the accounting change feed
+            models.Index(fields=['updated_at', 'id'], name='purchase_updated_id_idx'),
+        ]
 
 class PurchaseItem(models.Model):
     """Individual items in a purchase order"""
@@ -182,6 +187,7 @@ class PurchasePayment(models.Model):
     check_number = models.CharField(max_length=50, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Purchase Payment #{self.payment_number} - {self.amount}"
@@ -211,6 +217,9 @@ class PurchasePayment(models.Model):
         verbose_name = 'Purchase Payment'
         verbose_name_plural = 'Purchase Payments'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='purchase_pay_updated_id_idx'),
+        ]
 
 class PurchaseReturn(models.Model):
     """Returns to suppliers"""
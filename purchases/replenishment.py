@@ -0,0 +1,225 @@
+"""
+Supplier-aware replenishment.
+
+`plan()` computes order quantities for every active product at or below its
+reorder level in one annotated query: stock already on open purchase orders
+is subtracted, and the supplier, cost, lead time, minimum order quantity and
+pack size come from the product's `ProductSupplier` catalog entry (preferred
+entry first, then the most recently purchased one). Products without a
+catalog entry fall back to the supplier of their last purchase.
+
+`create_draft_orders()` turns planned lines into one draft `Purchase` per
+supplier with bulk inserts. `update_supplier_catalog()` keeps the catalog's
+last cost and purchase date current from received purchases.
+"""
+import math
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# Purchase statuses whose outstanding quantities count as on order
+OPEN_STATUSES = ['draft', 'pending', 'ordered', 'partial_received']
+
+DEFAULT_LEAD_TIME_DAYS = 7
+
+
+def _on_order():
+    from .models import PurchaseItem
+    return Coalesce(Subquery(
+        PurchaseItem.objects.filter(product=OuterRef('pk'), purchase__status__in=OPEN_STATUSES)
+        .values('product')
+        .annotate(outstanding=Sum(F('quantity_ordered') - F('quantity_received')))
+        .values('outstanding')[:1],
+        output_field=IntegerField(),
+    ), Value(0))
+
+
+def _catalog(field):
+    from inventory.models import ProductSupplier
+    return Subquery(
+        ProductSupplier.objects.filter(product=OuterRef('pk'), supplier__is_active=True)
+        .order_by('-is_preferred', F('last_purchased_at').desc(nulls_last=True), 'id')
+        .values(field)[:1]
+    )
+
+
+def _last_supplier():
+    from .models import PurchaseItem
+    return Subquery(
+        PurchaseItem.objects.filter(product=OuterRef('pk'), purchase__supplier__is_active=True)
+        .exclude(purchase__status__in=['draft', 'cancelled'])
+        .order_by('-purchase__order_date', '-id')
+        .values('purchase__supplier_id')[:1]
+    )
+
+
+def order_quantity(need, min_order_qty=1, pack_size=1):
+    """`need` raised to the minimum order quantity and rounded up to whole packs"""
+    quantity = max(need, min_order_qty or 1)
+    pack_size = pack_size or 1
+    return int(math.ceil(quantity / pack_size)) * pack_size
+
+
+def plan(product_ids=None):
+    """
+    Replenishment lines for products that need ordering, most urgent first.
+
+    Each line is a dict with `product`, `supplier` (or None), `quantity`,
+    `unit_cost`, `total_cost`, `on_order`, `lead_time_days`, `status`
+    (`out_of_stock`/`low_stock`/`reorder`) and `priority`.
+    """
+    from inventory.models import Product, Supplier
+
+    products = (
+        Product.objects.filter(is_active=True)
+        .select_related('category', 'brand', 'unit')
+        .annotate(
+            on_order=_on_order(),
+            link_supplier_id=_catalog('supplier_id'),
+            link_unit_cost=_catalog('last_unit_cost'),
+            link_lead_time=_catalog('lead_time_days'),
+            link_min_order_qty=_catalog('min_order_qty'),
+            link_pack_size=_catalog('pack_size'),
+            last_supplier_id=_last_supplier(),
+        )
+        .filter(current_stock__lte=F('reorder_level') - F('on_order'))
+    )
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+    products = list(products)
+
+    supplier_ids = {p.link_supplier_id or p.last_supplier_id for p in products} - {None}
+    suppliers = Supplier.objects.in_bulk(supplier_ids)
+
+    lines = []
+    for product in products:
+        available = product.current_stock + product.on_order
+        need = max(product.maximum_stock - available, product.reorder_level - available + 1, 1)
+        quantity = order_quantity(need, product.link_min_order_qty, product.link_pack_size)
+        unit_cost = product.link_unit_cost if product.link_unit_cost is not None else product.cost_price
+
+        if product.current_stock <= 0:
+            status = 'out_of_stock'
+        elif product.current_stock <= product.minimum_stock:
+            status = 'low_stock'
+        else:
+            status = 'reorder'
+
+        lines.append({
+            'product': product,
+            'supplier': suppliers.get(product.link_supplier_id or product.last_supplier_id),
+            'quantity': quantity,
+            'unit_cost': unit_cost,
+            'total_cost': unit_cost * quantity,
+            'on_order': product.on_order,
+            'lead_time_days': product.link_lead_time or DEFAULT_LEAD_TIME_DAYS,
+            'status': status,
+            'priority': 'HIGH' if status == 'out_of_stock' else 'MEDIUM',
+        })
+
+    lines.sort(key=lambda line: (line['priority'] == 'MEDIUM', -line['total_cost']))
+    return lines
+
+
+def create_draft_orders(lines, user):
+    """
+    One draft purchase per supplier for `lines` (as returned by `plan()`).
+
+    Lines without a supplier are skipped. Returns the created purchases.
+    """
+    from sales.batch import allocate_numbers
+    from .models import Purchase, PurchaseItem
+
+    by_supplier = {}
+    for line in lines:
+        if line['supplier'] is not None:
+            by_supplier.setdefault(line['supplier'].id, []).append(line)
+    if not by_supplier:
+        return []
+
+    now = timezone.now()
+    numbers = allocate_numbers(Purchase, 'purchase_number', 'PUR', len(by_supplier))
+    purchases = []
+    for number, (supplier_id, supplier_lines) in zip(numbers, by_supplier.items()):
+        total = sum((Decimal(line['total_cost']) for line in supplier_lines), Decimal('0'))
+        lead_time = max(line['lead_time_days'] for line in supplier_lines)
+        purchases.append(Purchase(
+            purchase_number=number,
+            supplier_id=supplier_id,
+            status='draft',
+            payment_status='unpaid',
+            subtotal=total,
+            total_amount=total,
+            balance_amount=total,
+            order_date=now,
+            expected_delivery_date=(now + timedelta(days=lead_time)).date(),
+            notes='Generated from purchase requirements',
+            created_by=user,
+        ))
+    Purchase.objects.bulk_create(purchases)
+    if any(purchase.pk is None for purchase in purchases):
+        # Backends that cannot return ids from bulk inserts
+        ids = dict(Purchase.objects.filter(purchase_number__in=numbers).values_list('purchase_number', 'id'))
+        for purchase in purchases:
+            purchase.pk = ids[purchase.purchase_number]
+
+    PurchaseItem.objects.bulk_create([
+        PurchaseItem(
+            purchase=purchase,
+            product=line['product'],
+            quantity_ordered=line['quantity'],
+            unit_cost=line['unit_cost'],
+            total_cost=line['total_cost'],
+        )
+        for purchase, supplier_lines in zip(purchases, by_supplier.values())
+        for line in supplier_lines
+    ], batch_size=500)
+    return purchases
+
+
+def update_supplier_catalog(purchase_ids):
+    """Record the latest unit cost and purchase date per product/supplier from received purchases"""
+    from inventory.models import ProductSupplier
+    from .models import PurchaseItem
+
+    latest = {}
+    for row in (
+        PurchaseItem.objects.filter(purchase_id__in=purchase_ids, quantity_received__gt=0)
+        .order_by('purchase__order_date', 'id')
+        .values('product_id', 'purchase__supplier_id', 'unit_cost', 'purchase__order_date')
+    ):
+        latest[(row['product_id'], row['purchase__supplier_id'])] = row
+    if not latest:
+        return 0
+
+    existing = {
+        (link.product_id, link.supplier_id): link
+        for link in ProductSupplier.objects.filter(
+            product_id__in={product_id for product_id, supplier_id in latest},
+            supplier_id__in={supplier_id for product_id, supplier_id in latest},
+        )
+    }
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    for key, row in latest.items():
+        link = existing.get(key)
+        if link is None:
+            to_create.append(ProductSupplier(
+                product_id=key[0], supplier_id=key[1],
+                last_unit_cost=row['unit_cost'], last_purchased_at=row['purchase__order_date'],
+            ))
+        elif link.last_purchased_at is None or row['purchase__order_date'] >= link.last_purchased_at:
+            link.last_unit_cost = row['unit_cost']
+            link.last_purchased_at = row['purchase__order_date']
+            link.updated_at = now
+            to_update.append(link)
+
+    ProductSupplier.objects.bulk_create(to_create, batch_size=500)
+    ProductSupplier.objects.bulk_update(
+        to_update, ['last_unit_cost', 'last_purchased_at', 'updated_at'], batch_size=500
+    )
+    return len(to_create) + len(to_update)
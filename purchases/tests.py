@@ -1,3 +1,94 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import User
+from inventory.models import Category, Product, ProductSupplier, Supplier, Unit
+from . import replenishment
+from .models import Purchase, PurchaseItem
+
+
+class ReplenishmentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.unit, _ = Unit.objects.get_or_create(name='piece', defaults={'name_arabic': 'قطعة', 'abbreviation': 'pc'})
+        self.category = Category.objects.create(name='Filters', vehicle_type='car')
+        self.supplier = Supplier.objects.create(name='Parts Co')
+        self.other = Supplier.objects.create(name='Spares Ltd')
+
+    def product(self, sku, **fields):
+        defaults = {
+            'name': f'Part {sku}', 'sku': sku, 'barcode': f'B{sku}', 'unit': self.unit,
+            'category': self.category, 'cost_price': Decimal('40.00'), 'selling_price': Decimal('60.00'),
+            'current_stock': 2, 'minimum_stock': 1, 'reorder_level': 5, 'maximum_stock': 20,
+        }
+        defaults.update(fields)
+        return Product.objects.create(**defaults)
+
+    def order(self, product, ordered, received=0, status='ordered', supplier=None):
+        purchase = Purchase.objects.create(supplier=supplier or self.supplier, status=status, created_by=self.user)
+        PurchaseItem.objects.create(
+            purchase=purchase, product=product, quantity_ordered=ordered, quantity_received=received,
+            unit_cost=Decimal('40.00'),
+        )
+        return purchase
+
+    def planned(self):
+        return {line['product'].sku: line for line in replenishment.plan()}
+
+    def test_open_orders_are_netted(self):
+        short = self.product('A')
+        self.order(short, 10, received=8)
+        self.order(short, 100, status='cancelled')
+        covered = self.product('B')
+        self.order(covered, 10, status='draft')
+
+        [line] = replenishment.plan()
+
+        # 2 in stock and 2 on order, topped up to the maximum of 20
+        self.assertEqual((line['product'], line['on_order'], line['quantity']), (short, 2, 16))
+
+    def test_order_quantity_respects_minimums_and_packs(self):
+        self.assertEqual(replenishment.order_quantity(3, 10), 10)
+        self.assertEqual(replenishment.order_quantity(11, 1, 6), 12)
+        self.assertEqual(replenishment.order_quantity(3, 10, 4), 12)
+        self.assertEqual(replenishment.order_quantity(0, None, None), 1)
+
+    def test_catalog_entry_sets_supplier_cost_and_rounding(self):
+        product = self.product('A')
+        ProductSupplier.objects.create(
+            product=product, supplier=self.supplier, is_preferred=True, last_unit_cost=Decimal('35.00'),
+            lead_time_days=14, min_order_qty=24, pack_size=12,
+        )
+        ProductSupplier.objects.create(product=product, supplier=self.other, last_unit_cost=Decimal('30.00'))
+
+        line = self.planned()['A']
+
+        self.assertEqual(line['supplier'], self.supplier)
+        # 18 needed, raised to the minimum of 24 (two packs of 12)
+        self.assertEqual(line['quantity'], 24)
+        self.assertEqual((line['unit_cost'], line['total_cost']), (Decimal('35.00'), Decimal('840.00')))
+        self.assertEqual(line['lead_time_days'], 14)
+
+    def test_last_purchase_supplier_is_the_fallback(self):
+        product = self.product('A')
+        self.order(product, 5, received=5, status='received', supplier=self.other)
+
+        self.assertEqual(self.planned()['A']['supplier'], self.other)
+
+    def test_one_draft_per_supplier(self):
+        for sku, supplier in (('A', self.supplier), ('B', self.supplier), ('C', self.other)):
+            ProductSupplier.objects.create(product=self.product(sku), supplier=supplier)
+        self.product('D', current_stock=0)
+
+        purchases = replenishment.create_draft_orders(replenishment.plan(), self.user)
+
+        self.assertEqual(len(purchases), 2)
+        drafts = {
+            purchase.supplier: sorted(purchase.items.values_list('product__sku', 'quantity_ordered'))
+            for purchase in Purchase.objects.filter(status='draft')
+        }
+        self.assertEqual(drafts, {self.supplier: [('A', 18), ('B', 18)], self.other: [('C', 18)]})
+        self.assertEqual(Purchase.objects.get(supplier=self.other).total_amount, Decimal('720.00'))
+        # The drafts are on order now; only the product without a supplier is left
+        self.assertEqual(list(self.planned()), ['D'])
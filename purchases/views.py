@@ -5,6 +5,7 @@ from django.core.paginator import Paginator
 from django.db.models import Q, Sum, Count, F
 from django.db import transaction
 from django.http import JsonResponse, HttpResponse
+from django.urls import reverse
 from django.utils import timezone
 from django.template.loader import render_to_string
 from decimal import Decimal
@@ -17,7 +18,9 @@ from .forms import (
     PurchasePaymentForm, PurchaseFilterForm, QuickPurchaseForm
 )
 from inventory.models import Product, Supplier, StockMovement
+from inventory import locations
 from accounts.models import User
+from dashboard import events
 from dashboard.models import ActivityLog
 from accounts.views import permission_required
 
@@ -301,6 +304,9 @@ def purchase_receive(request, purchase_id):
             try:
                 with transaction.atomic():
                     has_updates = False
+                    received_products = []
+                    location = form.cleaned_data.get('location') or locations.default_location()
+                    movements = []
                     
                     for field_name, value in form.cleaned_data.items():
                         if field_name.startswith('receive_qty_') and value and value > 0:
@@ -323,20 +329,27 @@ def purchase_receive(request, purchase_id):
                             # Update product stock if quality check passed
                             if quality_passed:
                                 item.product.current_stock += value
-                                item.product.save()
+                                item.product.save(update_fields=['current_stock', 'updated_at'])
+                                received_products.append(item.product_id)
                                 
                                 # Create stock movement record
-                                StockMovement.objects.create(
+                                movements.append(StockMovement.objects.create(
                                     product=item.product,
-                                    movement_type='in',
+                                    movement_type='purchase',
                                     quantity=value,
-                                    reference=f'Purchase {purchase.purchase_number}',
-                                    user=request.user,
+                                    unit_cost=item.unit_cost,
+                                    reference_number=purchase.purchase_number,
+                                    reference_model='Purchase',
+                                    reference_id=purchase.id,
+                                    location=location,
+                                    created_by=request.user,
                                     notes=f'Received from {purchase.supplier.name}'
-                                )
+                                ))
                             
                             has_updates = True
                     
+                    locations.apply(movements)
+                    
                     if has_updates:
                         # Update purchase status
                         all_received = all(item.is_fully_received for item in purchase.items.all())
@@ -351,6 +364,14 @@ def purchase_receive(request, purchase_id):
                         purchase.received_by = request.user
                         purchase.save()
                         
+                        events.publish(
+                            'purchase_received',
+                            {'purchase_number': purchase.purchase_number, 'supplier_id': purchase.supplier_id,
+                             'status': purchase.status},
+                            aggregate=purchase,
+                        )
+                        events.stock_changed(received_products, 'purchase', purchase.purchase_number)
+                        
                         # Log activity
                         ActivityLog.objects.create(
                             user=request.user,
@@ -377,6 +398,42 @@ def purchase_receive(request, purchase_id):
     return render(request, 'purchases/purchase_receive.html', context)
 
 
+@login_required
+@permission_required('add_purchases')
+def generate_draft_orders(request):
+    """Create draft purchase orders, one per supplier, from the purchase requirements"""
+    from . import replenishment
+    
+    if request.method != 'POST':
+        return redirect('inventory:purchase_requirements')
+    
+    try:
+        with transaction.atomic():
+            lines = replenishment.plan()
+            purchases = replenishment.create_draft_orders(lines, request.user)
+            
+            if purchases:
+                ActivityLog.objects.create(
+                    user=request.user,
+                    action='create',
+                    description=f'Generated {len(purchases)} draft purchase orders: '
+                                f"{', '.join(purchase.purchase_number for purchase in purchases)}"
+                )
+    except Exception as e:
+        messages.error(request, f'Error generating draft orders: {str(e)}')
+        return redirect('inventory:purchase_requirements')
+    
+    skipped = sum(1 for line in lines if line['supplier'] is None)
+    if purchases:
+        messages.success(request, f'{len(purchases)} draft purchase orders created.')
+    else:
+        messages.info(request, 'No purchase requirements with a known supplier.')
+    if skipped:
+        messages.warning(request, f'{skipped} items have no supplier on record and were skipped.')
+    
+    return redirect(f"{reverse('purchases:purchase_list')}?status=draft")
+
+
 @login_required
 @permission_required('view_purchases')
 def purchase_invoice(request, purchase_id):
@@ -439,6 +496,13 @@ def purchase_payment_create(request, purchase_id):
                     purchase.paid_amount = Decimal(str(purchase.paid_amount)) + Decimal(str(payment.amount))
                     purchase.save()  # This will trigger balance calculation in model
                     
+                    events.publish(
+                        'purchase_payment_posted',
+                        {'payment_number': payment.payment_number, 'purchase_id': purchase.id,
+                         'amount': str(payment.amount), 'payment_method': payment.payment_method},
+                        aggregate=payment,
+                    )
+                    
                     # Log activity
                     ActivityLog.objects.create(
                         user=request.user,
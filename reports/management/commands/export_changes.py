@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from reports import feed
+
+
+class Command(BaseCommand):
+    help = 'Write accounting documents changed since a cursor as NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cursor',
+            default='',
+            help='Cursor returned by the previous export (default: export everything)',
+        )
+        parser.add_argument(
+            '--state-file',
+            help='Read the cursor from this file and store the new one there after a successful export',
+        )
+        parser.add_argument(
+            '--types',
+            default='',
+            help=f"Comma separated subset of: {', '.join(feed.FEED_TYPES)}",
+        )
+        parser.add_argument(
+            '--output',
+            help='Write to this file instead of stdout',
+        )
+
+    def handle(self, *args, **options):
+        cursor = options['cursor']
+        state_file = options['state_file']
+        if state_file and not cursor and os.path.exists(state_file):
+            with open(state_file, encoding='utf-8') as f:
+                cursor = f.read().strip()
+
+        try:
+            types = feed.parse_types(options['types'])
+            feed.decode_cursor(cursor)
+        except (ValueError, feed.InvalidCursor) as e:
+            raise CommandError(str(e))
+
+        output = open(options['output'], 'w', encoding='utf-8') if options['output'] else sys.stdout
+        new_cursor = cursor
+        count = 0
+        try:
+            for chunk in feed.iter_ndjson(cursor, types):
+                output.write(chunk)
+                count += chunk.count('\n')
+                # The cursor record is the last line of the feed
+                last_line = chunk.rstrip('\n').rsplit('\n', 1)[-1]
+                record = json.loads(last_line)
+                if record['type'] == 'cursor':
+                    new_cursor = record['cursor']
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        if state_file:
+            with open(state_file, 'w', encoding='utf-8') as f:
+                f.write(new_cursor)
+
+        self.stderr.write(self.style.SUCCESS(f'Exported {count - 1} changes'))
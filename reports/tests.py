@@ -1,3 +1,73 @@
+import csv
+from datetime import timedelta
+from decimal import Decimal
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from inventory.models import Category, Product, StockMovement, Unit
+
+
+class ReportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.unit, _ = Unit.objects.get_or_create(name='piece', defaults={'name_arabic': 'قطعة', 'abbreviation': 'pc'})
+        self.category = Category.objects.create(name='Filters', vehicle_type='car')
+        self.client.force_login(self.user)
+
+    def product(self, sku, **fields):
+        defaults = {
+            'name': f'Part {sku}', 'sku': sku, 'barcode': f'B{sku}', 'unit': self.unit,
+            'category': self.category, 'cost_price': Decimal('40.00'), 'selling_price': Decimal('60.00'),
+            'current_stock': 10,
+        }
+        defaults.update(fields)
+        return Product.objects.create(**defaults)
+
+
+class InventoryReportTests(ReportTestCase):
+    def skus(self, **params):
+        response = self.client.get(reverse('reports:inventory_report'), {'export': 'csv', **params})
+        rows = list(csv.reader(response.content.decode().splitlines()))
+        return [row[0] for row in rows[1:]]
+
+    def test_search_keeps_best_match_first(self):
+        self.product('A', name='Air filter for 90915')
+        self.product('B', name='Oil filter', oem_number='90915')
+
+        self.assertEqual(self.skus(search='90915'), ['B', 'A'])
+        self.assertEqual(self.skus(search='90915', sort_by='name'), ['A', 'B'])
+
+    def test_without_search_sorts_by_name(self):
+        self.product('A', name='Wiper')
+        self.product('B', name='Bulb')
+
+        self.assertEqual(self.skus(), ['B', 'A'])
+
+
+class StockAsOfTests(ReportTestCase):
+    def get(self, **params):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        return self.client.get(reverse('reports:stock_as_of'), {'date': yesterday.isoformat(), **params})
+
+    def test_filters_by_category(self):
+        other = Category.objects.create(name='Brakes', vehicle_type='car')
+        for product in (self.product('A'), self.product('B', category=other)):
+            movement = StockMovement.objects.create(
+                product=product, movement_type='purchase', quantity=5, unit_cost=Decimal('10.00'),
+                created_by=self.user,
+            )
+            StockMovement.objects.filter(pk=movement.pk).update(created_at=timezone.now() - timedelta(days=2))
+
+        data = self.get(category=other.id).json()
+
+        self.assertEqual([line['sku'] for line in data['results']], ['B'])
+        self.assertEqual(data['total_quantity'], 5)
+
+    def test_rejects_a_category_that_is_not_an_id(self):
+        response = self.get(category='abc')
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'success': False, 'error': 'category must be a category id'})
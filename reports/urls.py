@@ -25,4 +25,8 @@ urlpatterns = [
     path('expenses/', views.expenses_report, name='expenses_report'),
     path('profit-loss/', views.profit_loss_report, name='profit_loss_report'),
     path('installments/', views.installments_report, name='installments_report'),
+    path('stock-as-of/', views.stock_as_of, name='stock_as_of'),
+
+    # Accounting integration
+    path('feed/', views.change_feed, name='change_feed'),
 ]
\ No newline at end of file
@@ -2,19 +2,23 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Sum, Count, Avg, Q, F
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.core.paginator import Paginator
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
 from decimal import Decimal
 import json
 import csv
 
 from sales.models import Sale, SaleItem, Payment, Installment, InstallmentPayment
-from inventory.models import Product, Category, Brand, Customer, Supplier
+from inventory.models import Product, Category, Brand, Customer, Supplier, ProductStockMetrics
+from inventory import balances, pricing
+from inventory.search import search_products
 from purchases.models import Purchase, PurchaseItem
 from expenses.models import Expense
 from accounts.views import permission_required
+from . import feed
 
 @login_required
 def reports_home(request):
@@ -103,8 +107,10 @@ def sales_report(request):
     payment_status = request.GET.get('payment_status')
     salesperson_id = request.GET.get('salesperson')
     
-    if customer_id:
+    selected_customer = None
+    if customer_id and customer_id.isdigit():
         sales = sales.filter(customer_id=customer_id)
+        selected_customer = Customer.objects.filter(id=customer_id).first()
     if sale_type:
         sales = sales.filter(sale_type=sale_type)
     if payment_status:
@@ -186,7 +192,9 @@ def sales_report(request):
         'date_from': date_from,
         'date_to': date_to,
         'date_range': date_range,
-        'customers': Customer.objects.filter(is_active=True).order_by('name'),
+        # The customer filter is a typeahead (sales:customer_search); only the
+        # selected customer is needed to render it
+        'selected_customer': selected_customer,
         'salespeople': Customer.objects.none(),  # Will be properly implemented
         'filters': {
             'customer': customer_id,
@@ -254,22 +262,35 @@ def purchases_report(request):
 def inventory_report(request):
     """Comprehensive inventory report"""
     # Filters
+    search = request.GET.get('search')
     category_id = request.GET.get('category')
     brand_id = request.GET.get('brand')
     vehicle_type = request.GET.get('vehicle_type')
     stock_status = request.GET.get('stock_status')
-    sort_by = request.GET.get('sort_by', 'name')
+    abc_class = request.GET.get('abc_class')
+    xyz_class = request.GET.get('xyz_class')
+    movement_class = request.GET.get('movement_class')
+    # A search without an explicit sort keeps search_products()'s best-match order
+    sort_by = request.GET.get('sort_by') or ('relevance' if search else 'name')
     
     # Base queryset
-    products = Product.objects.select_related('category', 'brand').filter(is_active=True)
+    products = Product.objects.select_related('category', 'brand', 'stock_metrics').filter(is_active=True)
     
     # Apply filters
+    if search:
+        products = search_products(products, search)
     if category_id:
         products = products.filter(category_id=category_id)
     if brand_id:
         products = products.filter(brand_id=brand_id)
     if vehicle_type:
         products = products.filter(category__vehicle_type=vehicle_type)
+    if abc_class:
+        products = products.filter(abc_class=abc_class)
+    if xyz_class:
+        products = products.filter(xyz_class=xyz_class)
+    if movement_class:
+        products = products.filter(stock_metrics__movement_class=movement_class)
     if stock_status:
         if stock_status == 'out_of_stock':
             products = products.filter(current_stock=0)
@@ -297,7 +318,16 @@ def inventory_report(request):
         ).order_by('-profit_margin')
     elif sort_by == 'stock_level':
         products = products.order_by('-current_stock')
-    else:
+    # Stock metrics (refreshed nightly by compute_stock_metrics)
+    elif sort_by == 'days_of_cover':
+        products = products.order_by(F('stock_metrics__days_of_cover').desc(nulls_first=True))
+    elif sort_by == 'last_sale':
+        products = products.order_by(F('stock_metrics__days_since_last_sale').desc(nulls_first=True))
+    elif sort_by == 'turnover':
+        products = products.order_by(F('stock_metrics__turnover_ratio').asc(nulls_first=True))
+    elif sort_by == 'dead_stock':
+        products = products.order_by('-stock_metrics__dead_stock_value')
+    elif not (search and sort_by == 'relevance'):
         products = products.order_by('name')
     
     # Calculate summary statistics
@@ -306,7 +336,9 @@ def inventory_report(request):
         total_stock_value=Sum(F('current_stock') * F('cost_price')),
         total_selling_value=Sum(F('current_stock') * F('selling_price')),
         total_items=Sum('current_stock'),
-        avg_profit_margin=Avg((F('selling_price') - F('cost_price')) / F('cost_price') * 100)
+        avg_profit_margin=Avg((F('selling_price') - F('cost_price')) / F('cost_price') * 100),
+        dead_stock_value=Sum('stock_metrics__dead_stock_value'),
+        costed_stock_value=Sum('costing__inventory_value'),
     )
     
     # Stock status breakdown
@@ -342,6 +374,21 @@ def inventory_report(request):
         total_value=Sum(F('current_stock') * F('cost_price'))
     ).order_by('-total_value')[:10]
     
+    # Stock ageing breakdown
+    movement_breakdown = products.filter(stock_metrics__isnull=False).values(
+        'stock_metrics__movement_class'
+    ).annotate(
+        product_count=Count('id'),
+        total_value=Sum('stock_metrics__stock_value')
+    ).order_by('stock_metrics__movement_class')
+    
+    # ABC/XYZ breakdown (classes stored by the classify_inventory command)
+    classification_breakdown = products.values('abc_class', 'xyz_class').annotate(
+        product_count=Count('id'),
+        total_stock=Sum('current_stock'),
+        total_value=Sum(F('current_stock') * F('cost_price'))
+    ).order_by('abc_class', 'xyz_class')
+    
     # Export functionality
     export_format = request.GET.get('export')
     if export_format == 'csv':
@@ -358,21 +405,43 @@ def inventory_report(request):
         'top_products_by_value': top_products_by_value,
         'category_breakdown': category_breakdown,
         'brand_breakdown': brand_breakdown,
+        'classification_breakdown': classification_breakdown,
+        'movement_breakdown': movement_breakdown,
         'page_obj': page_obj,
         'categories': Category.objects.all().order_by('name'),
         'brands': Brand.objects.all().order_by('name'),
         'vehicle_types': Category.VEHICLE_TYPE_CHOICES,
+        'abc_classes': Product.ABC_CLASS_CHOICES,
+        'xyz_classes': Product.XYZ_CLASS_CHOICES,
+        'movement_classes': ProductStockMetrics.MOVEMENT_CLASS_CHOICES,
         'filters': {
+            'search': search,
             'category': category_id,
             'brand': brand_id,
             'vehicle_type': vehicle_type,
             'stock_status': stock_status,
+            'abc_class': abc_class,
+            'xyz_class': xyz_class,
+            'movement_class': movement_class,
             'sort_by': sort_by,
         }
     }
     
     return render(request, 'reports/inventory_report.html', context)
 
+def _metrics_columns(product):
+    try:
+        metrics = product.stock_metrics
+    except ProductStockMetrics.DoesNotExist:
+        return ['', '', '', '', '']
+    return [
+        metrics.last_sale_at.date() if metrics.last_sale_at else '',
+        metrics.units_sold_90d,
+        metrics.days_of_cover if metrics.days_of_cover is not None else '',
+        metrics.turnover_ratio if metrics.turnover_ratio is not None else '',
+        metrics.get_movement_class_display(),
+    ]
+
 def export_inventory_csv(products):
     """Export inventory data to CSV"""
     response = HttpResponse(content_type='text/csv')
@@ -382,7 +451,8 @@ def export_inventory_csv(products):
     writer.writerow([
         'SKU', 'Name', 'فئة', 'Brand', 'Current Stock', 'Min Stock', 
         'إعادة ترتيب المستوى', 'Max Stock', 'Cost Price', 'Selling Price', 
-        'Stock Value', 'Profit Margin %'
+        'Stock Value', 'Profit Margin %', 'ABC', 'XYZ',
+        'Last Sale', 'Units Sold 90d', 'Days of Cover', 'Turnover', 'Movement'
     ])
     
     for product in products:
@@ -402,8 +472,10 @@ def export_inventory_csv(products):
             product.cost_price,
             product.selling_price,
             product.current_stock * product.cost_price,
-            f"{profit_margin:.2f}%"
-        ])
+            f"{profit_margin:.2f}%",
+            product.abc_class,
+            product.xyz_class,
+        ] + _metrics_columns(product))
     
     return response
 
@@ -420,4 +492,81 @@ def profit_loss_report(request):
 @login_required
 def installments_report(request):
     messages.info(request, 'Installments report feature coming soon!')
-    return redirect('reports:reports_home')
\ No newline at end of file
+    return redirect('reports:reports_home')
+
+@login_required
+@permission_required('view_reports')
+def change_feed(request):
+    """NDJSON feed of accounting documents changed since ?cursor= (see reports.feed)"""
+    try:
+        types = feed.parse_types(request.GET.get('types'))
+        cursor = request.GET.get('cursor', '')
+        feed.decode_cursor(cursor)
+    except (ValueError, feed.InvalidCursor) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    response = StreamingHttpResponse(
+        feed.iter_ndjson(cursor, types), content_type='application/x-ndjson; charset=utf-8'
+    )
+    response['Cache-Control'] = 'no-store'
+    return response
+
+@login_required
+@permission_required('view_reports')
+def stock_as_of(request):
+    """Stock quantity, value and selling price in force per product at the end of ?date= (see inventory.balances, inventory.pricing)"""
+    day = parse_date(request.GET.get('date') or '')
+    if day is None:
+        return JsonResponse({'success': False, 'error': 'date must be given as YYYY-MM-DD'}, status=400)
+    if day >= timezone.localdate():
+        return JsonResponse({'success': False, 'error': 'date must be before today'}, status=400)
+
+    products = Product.objects.all()
+    category_id = request.GET.get('category')
+    if category_id:
+        try:
+            category_id = int(category_id)
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'category must be a category id'}, status=400)
+        products = products.filter(category_id=category_id)
+    product_ids = list(products.values_list('id', flat=True)) if category_id else None
+
+    as_of = balances.boundary(day)
+    rows = balances.balances_as_of(as_of, product_ids)
+    names = Product.objects.in_bulk(list(rows))
+    prices = pricing.prices_on(list(rows), as_of)
+    lines = [
+        {
+            'product': product_id,
+            'sku': names[product_id].sku,
+            'name': names[product_id].name,
+            'quantity': balance['quantity'],
+            'unit_cost': balance['unit_cost'],
+            'value': balance['value'],
+            'selling_price': prices[product_id],
+        }
+        for product_id, balance in sorted(rows.items())
+    ]
+    total_quantity = sum(line['quantity'] for line in lines)
+    total_value = sum((line['value'] for line in lines), Decimal('0'))
+
+    if request.GET.get('export') == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="stock_as_of_{day}.csv"'
+        writer = csv.writer(response)
+        writer.writerow(['SKU', 'Name', 'Quantity', 'Unit Cost', 'Value', 'Selling Price'])
+        for line in lines:
+            writer.writerow([
+                line['sku'], line['name'], line['quantity'], line['unit_cost'], line['value'], line['selling_price']
+            ])
+        writer.writerow(['', 'Total', total_quantity, '', total_value])
+        return response
+
+    return JsonResponse({
+        'success': True,
+        'date': day.isoformat(),
+        'checkpoint': balances.latest_checkpoint(before=as_of),
+        'total_quantity': total_quantity,
+        'total_value': total_value,
+        'results': lines,
+    })
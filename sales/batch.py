@@ -0,0 +1,358 @@
+"""
+Batch sale submission for POS terminals.
+
+A terminal that was offline uploads its queued cash sales in one request.
+Each sale carries a client-generated idempotency key; keys already stored in
+`SaleSubmission` are reported as duplicates without touching anything else,
+so replaying a batch costs a single indexed lookup.
+
+New sales in a batch are written in one transaction with set-based writes:
+sales, items, payments, stock movements and submissions are bulk inserted,
+sale/payment numbers are allocated as one block, and stock is decremented
+with a single UPDATE. Stock held by open carts (`inventory.reservations`)
+is not available to queued sales.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from dashboard import events
+from inventory import locations, reservations, scan
+from inventory.models import Customer, Location, Product, StockMovement
+from .models import Payment, Sale, SaleItem, SaleSubmission
+
+# Maximum number of sales accepted in one batch
+MAX_BATCH_SIZE = 100
+
+
+class SaleValidationError(Exception):
+    pass
+
+
+def allocate_numbers(model, field, prefix, count, year=None):
+    """
+    Reserve `count` consecutive document numbers ("SAL-2025-000123").
+
+    Follows the numbering of `Sale.save()`/`Payment.save()` but reads the
+    last number once for the whole block. `year` defaults to the current
+    year; the last number is found by its "PREFIX-YEAR-" prefix, so documents
+    dated in one year but numbered in another cannot cause a collision.
+    """
+    year = year or timezone.localdate().year
+    number_prefix = f'{prefix}-{year}-'
+    last = (
+        model.objects.filter(**{f'{field}__startswith': number_prefix})
+        .order_by(field).values_list(field, flat=True).last()
+    )
+    try:
+        start = int(last.split('-')[-1]) + 1 if last else 1
+    except ValueError:
+        start = 1
+    return [f"{number_prefix}{number:06d}" for number in range(start, start + count)]
+
+
+def _decimal(value, default='0'):
+    try:
+        number = Decimal(str(value if value not in (None, '') else default))
+    except InvalidOperation:
+        raise SaleValidationError(f'Invalid number: {value}')
+    if not number.is_finite():
+        raise SaleValidationError(f'Invalid number: {value}')
+    return number
+
+
+def _quantity(value):
+    """A positive whole quantity; 2 and "2" and 2.0 are accepted, 1.7 is not"""
+    if isinstance(value, bool):
+        raise SaleValidationError
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise SaleValidationError
+    if not number.is_finite() or number != number.to_integral_value() or number < 1:
+        raise SaleValidationError
+    return int(number)
+
+
+def _parse_sale(data, customers, products, available, stock_locations, default_location):
+    """Validate one submitted sale against preloaded rows; returns a plan dict"""
+    customer = customers.get(data.get('customer_id'))
+    if customer is None:
+        raise SaleValidationError('Unknown or inactive customer')
+
+    location = stock_locations.get(data['location_id']) if data.get('location_id') else default_location
+    if location is None:
+        raise SaleValidationError('Unknown or inactive location')
+
+    payment_method = data.get('payment_method') or 'cash'
+    if payment_method not in dict(Payment.PAYMENT_METHOD_CHOICES):
+        raise SaleValidationError(f'Invalid payment method: {payment_method}')
+
+    sale_date = timezone.now()
+    if data.get('sale_date'):
+        try:
+            # None when malformed, ValueError when well formed but impossible (month 13)
+            sale_date = parse_datetime(str(data['sale_date']))
+        except ValueError:
+            sale_date = None
+        if sale_date is None:
+            raise SaleValidationError('Invalid sale_date')
+        if timezone.is_naive(sale_date):
+            sale_date = timezone.make_aware(sale_date)
+
+    items = data.get('items') or []
+    if not isinstance(items, list) or not items:
+        raise SaleValidationError('At least one item is required')
+
+    lines = []
+    requested = {}
+    for item in items:
+        product = products.get(item.get('product_id'))
+        if product is None:
+            raise SaleValidationError(f"Unknown or inactive product: {item.get('product_id')}")
+        try:
+            quantity = _quantity(item.get('quantity'))
+        except SaleValidationError:
+            raise SaleValidationError(f'Invalid quantity for {product.name}')
+
+        unit_price = _decimal(item.get('unit_price'), product.selling_price)
+        discount_pct = _decimal(item.get('discount_percentage'))
+        if unit_price <= 0 or not Decimal('0') <= discount_pct <= Decimal('100'):
+            raise SaleValidationError(f'Invalid price or discount for {product.name}')
+
+        requested[product.id] = requested.get(product.id, 0) + quantity
+        line_subtotal = unit_price * quantity
+        discount_amount = (line_subtotal * discount_pct) / Decimal('100')
+        lines.append({
+            'product': product,
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'discount_percentage': discount_pct,
+            'discount_amount': discount_amount,
+            'total_price': line_subtotal - discount_amount,
+        })
+
+    for product_id, quantity in requested.items():
+        if quantity > available[product_id]:
+            product = products[product_id]
+            raise SaleValidationError(
+                f'Insufficient stock for {product.name}. Available: {available[product_id]}, requested: {quantity}'
+            )
+
+    subtotal = sum((line['total_price'] for line in lines), Decimal('0'))
+    sale_discount_pct = _decimal(data.get('discount_percentage'))
+    if not Decimal('0') <= sale_discount_pct <= Decimal('100'):
+        raise SaleValidationError('Invalid discount percentage')
+    discount_amount = (subtotal * sale_discount_pct) / Decimal('100')
+
+    # Only reserve stock once the whole sale is valid
+    for product_id, quantity in requested.items():
+        available[product_id] -= quantity
+
+    return {
+        'customer': customer,
+        'location': location,
+        'payment_method': payment_method,
+        'sale_date': sale_date,
+        'notes': str(data.get('notes') or ''),
+        'lines': lines,
+        'subtotal': subtotal,
+        'discount_amount': discount_amount,
+        'total_amount': subtotal - discount_amount,
+    }
+
+
+def _write_sales(plans, user):
+    """Bulk insert validated sales and decrement stock; returns the saved sales"""
+    # Sales are numbered in the year of their (possibly backdated) sale date;
+    # payments are dated now
+    sale_numbers = [None] * len(plans)
+    by_year = {}
+    for position, plan in enumerate(plans):
+        by_year.setdefault(timezone.localtime(plan['sale_date']).year, []).append(position)
+    for year, positions in by_year.items():
+        for position, number in zip(positions, allocate_numbers(Sale, 'sale_number', 'SAL', len(positions), year)):
+            sale_numbers[position] = number
+    payment_numbers = allocate_numbers(Payment, 'payment_number', 'PAY', len(plans))
+
+    sales = [
+        Sale(
+            sale_number=number,
+            customer=plan['customer'],
+            location=plan['location'],
+            sale_type='cash',
+            status='completed',
+            payment_status='paid',
+            subtotal=plan['subtotal'],
+            discount_amount=plan['discount_amount'],
+            total_amount=plan['total_amount'],
+            paid_amount=plan['total_amount'],
+            balance_amount=Decimal('0.00'),
+            sale_date=plan['sale_date'],
+            notes=plan['notes'],
+            created_by=user,
+        )
+        for number, plan in zip(sale_numbers, plans)
+    ]
+    Sale.objects.bulk_create(sales)
+    if any(sale.pk is None for sale in sales):
+        # Backends that cannot return ids from bulk inserts
+        ids = dict(Sale.objects.filter(sale_number__in=sale_numbers).values_list('sale_number', 'id'))
+        for sale in sales:
+            sale.pk = ids[sale.sale_number]
+
+    items = []
+    movements = []
+    payments = []
+    sold = {}
+    for sale, plan, payment_number in zip(sales, plans, payment_numbers):
+        for line in plan['lines']:
+            product = line['product']
+            items.append(SaleItem(
+                sale=sale,
+                product=product,
+                quantity=line['quantity'],
+                unit_price=line['unit_price'],
+                discount_percentage=line['discount_percentage'],
+                discount_amount=line['discount_amount'],
+                total_price=line['total_price'],
+                cost_price=product.cost_price,
+            ))
+            movements.append(StockMovement(
+                product=product,
+                movement_type='sale',
+                quantity=line['quantity'],
+                unit_cost=product.cost_price,
+                reference_number=sale.sale_number,
+                reference_model='Sale',
+                reference_id=sale.pk,
+                location=plan['location'],
+                notes=f'Sale to {plan["customer"].name}',
+                created_by=user,
+            ))
+            sold[product.id] = sold.get(product.id, 0) + line['quantity']
+        payments.append(Payment(
+            sale=sale,
+            payment_number=payment_number,
+            amount=plan['total_amount'],
+            payment_method=plan['payment_method'],
+            received_by=user,
+        ))
+
+    SaleItem.objects.bulk_create(items, batch_size=500)
+    Payment.objects.bulk_create(payments, batch_size=500)
+    StockMovement.objects.bulk_create(movements, batch_size=500)
+    locations.apply(movements)
+
+    outbox = []
+    for sale, payment in zip(sales, payments):
+        outbox.append(('sale_completed', {
+            'sale_number': sale.sale_number, 'customer_id': sale.customer_id,
+            'total_amount': str(sale.total_amount),
+        }, sale))
+        outbox.append(('payment_posted', {
+            'payment_number': payment.payment_number, 'sale_id': sale.pk,
+            'amount': str(payment.amount), 'payment_method': payment.payment_method,
+        }, payment if payment.pk else None))
+    events.publish_many(outbox)
+    events.stock_changed(sold, 'sale_batch')
+
+    # One UPDATE for every product in the batch; updated_at is set explicitly
+    # so the offline catalog delta picks the new stock up
+    Product.objects.filter(id__in=sold).update(
+        current_stock=F('current_stock') - Case(
+            *[When(id=product_id, then=Value(quantity)) for product_id, quantity in sold.items()],
+            output_field=IntegerField()
+        ),
+        updated_at=timezone.now(),
+    )
+    sold_ids = list(sold)
+    transaction.on_commit(lambda: scan.product_changed(sold_ids))
+    return sales
+
+
+def _submit(submissions, user):
+    keys = [data['idempotency_key'] for data in submissions]
+    existing = {
+        row['idempotency_key']: row
+        for row in SaleSubmission.objects.filter(idempotency_key__in=keys)
+        .values('idempotency_key', 'sale_id', 'sale__sale_number')
+    }
+    results = {}
+    for key, row in existing.items():
+        results[key] = {
+            'idempotency_key': key, 'status': 'duplicate',
+            'sale_id': row['sale_id'], 'sale_number': row['sale__sale_number'],
+        }
+    pending = [data for data in submissions if data['idempotency_key'] not in existing]
+    if not pending:
+        return [results[key] for key in keys]
+
+    with transaction.atomic():
+        customer_ids = {data.get('customer_id') for data in pending}
+        product_ids = {
+            item.get('product_id')
+            for data in pending for item in (data.get('items') or []) if isinstance(item, dict)
+        }
+        customers = Customer.objects.filter(is_active=True).in_bulk(
+            [pk for pk in customer_ids if isinstance(pk, int)]
+        )
+        products = (
+            Product.objects.select_for_update().filter(is_active=True)
+            .annotate(reserved=reservations.reserved_quantity())
+            .in_bulk([pk for pk in product_ids if isinstance(pk, int)])
+        )
+        # Stock held by carts at the tills is not available to queued sales
+        available = {pk: product.current_stock - product.reserved for pk, product in products.items()}
+        stock_locations = Location.objects.filter(is_active=True).in_bulk()
+        default_location = locations.default_location()
+
+        accepted = []
+        for data in pending:
+            key = data['idempotency_key']
+            try:
+                accepted.append((key, _parse_sale(
+                    data, customers, products, available, stock_locations, default_location
+                )))
+            except SaleValidationError as e:
+                results[key] = {'idempotency_key': key, 'status': 'rejected', 'error': str(e)}
+            except (AttributeError, TypeError):
+                results[key] = {'idempotency_key': key, 'status': 'rejected', 'error': 'Malformed sale'}
+
+        if accepted:
+            sales = _write_sales([plan for key, plan in accepted], user)
+            SaleSubmission.objects.bulk_create([
+                SaleSubmission(idempotency_key=key, sale=sale, created_by=user)
+                for (key, plan), sale in zip(accepted, sales)
+            ])
+            for (key, plan), sale in zip(accepted, sales):
+                results[key] = {
+                    'idempotency_key': key, 'status': 'created',
+                    'sale_id': sale.pk, 'sale_number': sale.sale_number,
+                }
+
+    return [results[key] for key in keys]
+
+
+def submit_sales(submissions, user):
+    """
+    Create the sales in `submissions` that were not submitted before.
+
+    Returns one result per submission, in order, with status `created`,
+    `duplicate` or `rejected`.
+    """
+    keys = [data.get('idempotency_key') for data in submissions]
+    if any(not isinstance(key, str) or not key.strip() or len(key) > 100 for key in keys):
+        raise SaleValidationError('Every sale needs an idempotency_key of at most 100 characters')
+    if len(set(keys)) != len(keys):
+        raise SaleValidationError('Duplicate idempotency_key in batch')
+
+    try:
+        return _submit(submissions, user)
+    except IntegrityError:
+        # A concurrent request stored some of these keys (or numbers) first;
+        # the retry reports those keys as duplicates
+        return _submit(submissions, user)
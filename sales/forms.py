@@ -3,8 +3,9 @@ from django.core.exceptions import ValidationError
 from django.db import transaction
 from decimal import Decimal
 from .models import Sale, SaleItem, Payment, Installment, InstallmentPayment
-from inventory.models import Product, Customer
+from inventory.models import Product, Customer, Location
 from accounts.models import User
+from .widgets import customer_select, product_select
 
 class SaleForm(forms.ModelForm):
     """Form for creating and editing sales"""
@@ -12,11 +13,12 @@ class SaleForm(forms.ModelForm):
     class Meta:
         model = Sale
         fields = [
-            'customer', 'sale_type', 'sale_date', 'due_date', 
+            'customer', 'location', 'sale_type', 'sale_date', 'due_date', 
             'discount_amount', 'notes', 'internal_notes'
         ]
         widgets = {
-            'customer': forms.Select(attrs={'class': 'form-select'}),
+            'customer': customer_select(),
+            'location': forms.Select(attrs={'class': 'form-select'}),
             'sale_type': forms.Select(attrs={'class': 'form-select'}),
             'sale_date': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
             'due_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
@@ -27,8 +29,13 @@ class SaleForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['customer'].queryset = Customer.objects.filter(is_active=True).order_by('name')
+        self.fields['customer'].queryset = Customer.objects.filter(is_active=True)
         self.fields['customer'].empty_label = "Select a customer"
+        self.fields['location'].queryset = Location.objects.filter(is_active=True)
+        self.fields['location'].empty_label = "Default location"
+        if self.instance.pk:
+            # Stock was already taken from this location
+            self.fields['location'].disabled = True
         
         # Make certain fields required
         self.fields['customer'].required = True
@@ -52,7 +59,7 @@ class SaleItemForm(forms.ModelForm):
         model = SaleItem
         fields = ['product', 'quantity', 'unit_price', 'discount_percentage']
         widgets = {
-            'product': forms.Select(attrs={'class': 'form-select'}),
+            'product': product_select(in_stock=True, placeholder='Select a product'),
             'quantity': forms.NumberInput(attrs={'class': 'form-control', 'min': '1'}),
             'unit_price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': '0'}),
             'discount_percentage': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': '0', 'max': '100'}),
@@ -60,7 +67,7 @@ class SaleItemForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['product'].queryset = Product.objects.filter(is_active=True, current_stock__gt=0).order_by('name')
+        self.fields['product'].queryset = Product.objects.filter(is_active=True, current_stock__gt=0)
         self.fields['product'].empty_label = "Select a product"
         
         # Set default values
@@ -207,10 +214,10 @@ class SaleFilterForm(forms.Form):
     )
     
     customer = forms.ModelChoiceField(
-        queryset=Customer.objects.filter(is_active=True).order_by('name'),
+        queryset=Customer.objects.filter(is_active=True),
         required=False,
         empty_label="All Customers",
-        widget=forms.Select(attrs={'class': 'form-select'})
+        widget=customer_select(placeholder='All Customers')
     )
     
     sale_type = forms.ChoiceField(
@@ -261,17 +268,17 @@ class QuickSaleForm(forms.Form):
     """Quick sale form for simple cash transactions"""
     
     customer = forms.ModelChoiceField(
-        queryset=Customer.objects.filter(is_active=True).order_by('name'),
+        queryset=Customer.objects.filter(is_active=True),
         required=True,
         empty_label="Select Customer",
-        widget=forms.Select(attrs={'class': 'form-select'})
+        widget=customer_select(placeholder='Select Customer')
     )
     
     product = forms.ModelChoiceField(
-        queryset=Product.objects.filter(is_active=True).order_by('name'),
+        queryset=Product.objects.filter(is_active=True),
         required=True,
         empty_label="اختر منتج",
-        widget=forms.Select(attrs={'class': 'form-select'})
+        widget=product_select()
     )
     
     quantity = forms.IntegerField(
@@ -303,25 +310,6 @@ class QuickSaleForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-select'})
     )
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-        # Customize product display to show stock information
-        products = Product.objects.filter(is_active=True).order_by('name')
-        product_choices = [('', 'اختر منتج')]
-
-        for product in products:
-            stock_info = f"المخزون: {product.current_stock}"
-            if product.current_stock == 0:
-                stock_info += " (غير متوفر)"
-            elif product.current_stock <= product.reorder_level:
-                stock_info += " (مخزون منخفض)"
-
-            choice_text = f"{product.name} - {stock_info} - {product.selling_price} ج.م"
-            product_choices.append((product.id, choice_text))
-
-        self.fields['product'].choices = product_choices
-    
     def clean(self):
         cleaned_data = super().clean()
         product = cleaned_data.get('product')
@@ -374,7 +362,7 @@ class QuickSaleForm(forms.Form):
             # Update product stock
             product = self.cleaned_data['product']
             product.current_stock -= quantity
-            product.save()
+            product.save(update_fields=['current_stock', 'updated_at'])
             
             return sale
 
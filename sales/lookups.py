@@ -0,0 +1,109 @@
+"""
+Typeahead lookups for sale forms.
+
+Product and customer pickers load their options page by page from these
+lookups instead of rendering every row into the HTML. Results are cached
+for a short time so repeated keystrokes from several cashiers share one
+query, while stock figures stay reasonably fresh.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from inventory.models import Customer, Product
+from inventory.search import search_products
+
+LOOKUP_PAGE_SIZE = 20
+LOOKUP_CACHE_TIMEOUT = 30  # seconds
+
+
+def _cache_key(kind, query, page, *flags):
+    raw = '|'.join([query, str(page)] + [str(flag) for flag in flags])
+    return f'sales_lookup:{kind}:{hashlib.md5(raw.encode("utf-8")).hexdigest()}'
+
+
+def _page(queryset, page, page_size):
+    """Slice one page plus one extra row to tell whether there are more"""
+    offset = (page - 1) * page_size
+    rows = list(queryset[offset:offset + page_size + 1])
+    return rows[:page_size], len(rows) > page_size
+
+
+def product_label(product):
+    """Option label with stock and price, as shown in the quick sale picker"""
+    stock_info = f"المخزون: {product.current_stock}"
+    if product.current_stock <= 0:
+        stock_info += " (غير متوفر)"
+    elif product.current_stock <= product.reorder_level:
+        stock_info += " (مخزون منخفض)"
+    return f"{product.name} - {stock_info} - {product.selling_price} ج.م"
+
+
+def product_option_attrs(product):
+    """Data attributes the sale templates read from a selected product option"""
+    return {
+        'data-price': str(product.selling_price),
+        'data-stock': product.current_stock,
+        'data-cost': str(product.cost_price),
+    }
+
+
+def product_lookup(query='', page=1, in_stock=False, page_size=LOOKUP_PAGE_SIZE):
+    """One page of active products matching `query`, ranked by the search index"""
+    query = (query or '').strip()
+    key = _cache_key('products', query, page, in_stock, page_size)
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    products = Product.objects.filter(is_active=True).select_related('unit')
+    if in_stock:
+        products = products.filter(current_stock__gt=0)
+    if query:
+        products = search_products(products, query)
+    else:
+        products = products.order_by('name')
+
+    rows, more = _page(products, page, page_size)
+    data = {
+        'results': [{
+            'id': product.id,
+            'text': product_label(product),
+            'name': product.name,
+            'sku': product.sku,
+            'price': str(product.selling_price),
+            'cost': str(product.cost_price),
+            'stock': product.current_stock,
+            'unit': product.unit.name_arabic,
+        } for product in rows],
+        'pagination': {'more': more},
+    }
+    cache.set(key, data, LOOKUP_CACHE_TIMEOUT)
+    return data
+
+
+def customer_lookup(query='', page=1, page_size=LOOKUP_PAGE_SIZE):
+    """One page of active customers whose name or phone starts with `query`"""
+    query = (query or '').strip()
+    key = _cache_key('customers', query, page, page_size)
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    customers = Customer.objects.filter(is_active=True)
+    if query:
+        customers = customers.filter(Q(name__istartswith=query) | Q(phone__startswith=query))
+    customers = customers.order_by('name', 'id').only('id', 'name', 'customer_type', 'phone')
+
+    rows, more = _page(customers, page, page_size)
+    data = {
+        'results': [{
+            'id': customer.id,
+            'text': str(customer),
+            'phone': customer.phone,
+        } for customer in rows],
+        'pagination': {'more': more},
+    }
+    cache.set(key, data, LOOKUP_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('sales', '0002_alter_payment_options_alter_sale_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaleSubmission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='sale_submissions', to=settings.AUTH_USER_MODEL)),
+                ('sale', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='submissions', to='sales.sale')),
+            ],
+            options={
+                'verbose_name': 'Sale Submission',
+                'verbose_name_plural': 'Sale Submissions',
+                'db_table': 'sale_submissions',
+            },
+        ),
+    ]
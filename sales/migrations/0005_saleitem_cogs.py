@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0004_change_feed_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saleitem',
+            name='cogs',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+    ]
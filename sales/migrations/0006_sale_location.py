@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0019_stock_locations'),
+        ('sales', '0005_saleitem_cogs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='sales', to='inventory.location'),
+        ),
+    ]
@@ -19,6 +19,8 @@ class Sale(models.Model):
         ('refunded', 'Refunded'),
         ('partial_refund', 'Partial Refund'),
     ]
+    # Sales in these states did not consume stock
+    VOID_STATUSES = ['cancelled', 'refunded']
     
     PAYMENT_STATUS_CHOICES = [
         ('paid', 'Paid'),
@@ -30,6 +32,9 @@ class Sale(models.Model):
     # Basic Information
     sale_number = models.CharField(max_length=50, unique=True)
     customer = models.ForeignKey('inventory.Customer', on_delete=models.PROTECT, related_name='sales')
+    location = models.ForeignKey(
+        'inventory.Location', on_delete=models.PROTECT, related_name='sales', blank=True, null=True
+    )  # Stock is taken from here; empty: the default location
     sale_type = models.CharField(max_length=20, choices=SALE_TYPE_CHOICES, default='cash')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='unpaid')
@@ -107,6 +112,10 @@ class Sale(models.Model):
         verbose_name = 'بيع'
         verbose_name_plural = 'المبيعات'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset cursor of the accounting change feed
+            models.Index(fields=['updated_at', 'id'], name='sale_updated_id_idx'),
+        ]
 
 class SaleItem(models.Model):
     """Individual items in a sale"""
@@ -118,6 +127,8 @@ class SaleItem(models.Model):
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     cost_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # Cost of goods sold from the cost layers (inventory.costing); empty until costed
+    cogs = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
     
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
@@ -154,6 +165,21 @@ class SaleItem(models.Model):
         verbose_name = 'Sale Item'
         verbose_name_plural = 'Sale Items'
 
+class SaleSubmission(models.Model):
+    """Client idempotency keys for submitted sales, so retries never create duplicates"""
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    sale = models.ForeignKey(Sale, on_delete=models.SET_NULL, related_name='submissions', blank=True, null=True)
+    created_by = models.ForeignKey('accounts.User', on_delete=models.PROTECT, related_name='sale_submissions')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.idempotency_key} -> {self.sale_id}"
+    
+    class Meta:
+        db_table = 'sale_submissions'
+        verbose_name = 'Sale Submission'
+        verbose_name_plural = 'Sale Submissions'
+
 class Payment(models.Model):
     """Payment records for sales"""
     PAYMENT_METHOD_CHOICES = [
@@ -187,6 +213,7 @@ class Payment(models.Model):
     check_number = models.CharField(max_length=50, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Payment #{self.payment_number} - {self.amount}"
@@ -216,6 +243,9 @@ class Payment(models.Model):
         verbose_name = 'دفعة'
         verbose_name_plural = 'الدفعات'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='payment_updated_id_idx'),
+        ]
 
 class Installment(models.Model):
     """Installment plans for sales"""
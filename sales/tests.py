@@ -1,3 +1,210 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Permission, RolePermission, User
+from inventory.models import Category, Customer, Product, StockMovement, Unit
+from .batch import SaleValidationError, allocate_numbers, submit_sales
+from .lookups import LOOKUP_PAGE_SIZE
+from .models import Payment, Sale, SaleItem, SaleSubmission
+
+
+class BatchSaleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        unit, _ = Unit.objects.get_or_create(name='piece', defaults={'name_arabic': 'قطعة', 'abbreviation': 'pc'})
+        category = Category.objects.create(name='Filters', vehicle_type='car')
+        self.customer = Customer.objects.create(name='Walk-in')
+        self.product = Product.objects.create(
+            name='Oil filter', sku='OF-1', barcode='1001', unit=unit, category=category,
+            cost_price=Decimal('40.00'), selling_price=Decimal('60.00'), current_stock=10,
+        )
+
+    def sale(self, key, quantity=2, **extra):
+        return {
+            'idempotency_key': key,
+            'customer_id': self.customer.id,
+            'items': [{'product_id': self.product.id, 'quantity': quantity}],
+            **extra,
+        }
+
+    def test_creates_sale_and_decrements_stock(self):
+        [result] = submit_sales([self.sale('till-1-0001')], self.user)
+
+        self.assertEqual(result['status'], 'created')
+        sale = Sale.objects.get(pk=result['sale_id'])
+        self.assertEqual(sale.total_amount, Decimal('120.00'))
+        self.assertEqual(SaleItem.objects.get(sale=sale).quantity, 2)
+        self.assertEqual(Payment.objects.get(sale=sale).amount, Decimal('120.00'))
+        self.assertEqual(StockMovement.objects.get(reference_id=sale.id).quantity, 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 8)
+
+    def test_replayed_idempotency_key_is_a_duplicate(self):
+        [first] = submit_sales([self.sale('till-1-0001')], self.user)
+        second, third = submit_sales([self.sale('till-1-0001'), self.sale('till-1-0002')], self.user)
+
+        self.assertEqual(second, {
+            'idempotency_key': 'till-1-0001', 'status': 'duplicate',
+            'sale_id': first['sale_id'], 'sale_number': first['sale_number'],
+        })
+        self.assertEqual(third['status'], 'created')
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertEqual(SaleSubmission.objects.count(), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 6)
+
+    def test_duplicate_key_within_batch_is_refused(self):
+        with self.assertRaises(SaleValidationError):
+            submit_sales([self.sale('same'), self.sale('same')], self.user)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_rejected_sale_does_not_consume_key(self):
+        [rejected] = submit_sales([self.sale('till-1-0001', quantity=11)], self.user)
+        self.assertEqual(rejected['status'], 'rejected')
+
+        [created] = submit_sales([self.sale('till-1-0001', quantity=1)], self.user)
+        self.assertEqual(created['status'], 'created')
+
+    def test_non_finite_and_fractional_numbers_are_rejected(self):
+        nan_price = self.sale('nan')
+        nan_price['items'][0]['unit_price'] = 'NaN'
+        results = submit_sales([
+            nan_price,
+            self.sale('infinite-discount', discount_percentage='Infinity'),
+            self.sale('fractional', quantity=1.7),
+            self.sale('whole-float', quantity=2.0),
+        ], self.user)
+
+        self.assertEqual(
+            [result['status'] for result in results], ['rejected', 'rejected', 'rejected', 'created']
+        )
+        self.assertEqual(SaleItem.objects.get().quantity, 2)
+
+    def test_backdated_sale_is_numbered_in_its_own_year(self):
+        year = timezone.localdate().year
+        backdated = timezone.make_aware(datetime(year - 1, 12, 31, 23, 30))
+        Sale.objects.create(
+            sale_number=f'SAL-{year - 1}-000007', customer=self.customer, sale_date=backdated,
+            created_by=self.user,
+        )
+        old, new = submit_sales([
+            self.sale('old', sale_date=backdated.isoformat()),
+            self.sale('new'),
+        ], self.user)
+
+        self.assertEqual(old['sale_number'], f'SAL-{year - 1}-000008')
+        self.assertEqual(new['sale_number'], f'SAL-{year}-000001')
+        self.assertEqual(allocate_numbers(Sale, 'sale_number', 'SAL', 2, year - 1), [
+            f'SAL-{year - 1}-000009', f'SAL-{year - 1}-000010',
+        ])
+
+    def test_impossible_sale_date_rejects_only_that_sale(self):
+        bad, good = submit_sales([
+            self.sale('bad-date', sale_date='2024-13-01T00:00:00'),
+            self.sale('good'),
+        ], self.user)
+
+        self.assertEqual((bad['status'], bad['error']), ('rejected', 'Invalid sale_date'))
+        self.assertEqual(good['status'], 'created')
+
+    def test_endpoint_returns_per_sale_results(self):
+        self.client.force_login(self.user)
+        url = reverse('sales:sale_batch_submit')
+        body = json.dumps({'sales': [self.sale('till-1-0001')]})
+
+        first = self.client.post(url, body, content_type='application/json').json()
+        replay = self.client.post(url, body, content_type='application/json').json()
+
+        self.assertTrue(first['success'])
+        self.assertEqual(first['results'][0]['status'], 'created')
+        self.assertEqual(replay['results'][0]['status'], 'duplicate')
+        self.assertEqual(Sale.objects.count(), 1)
+
+
+class LookupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.cashier = User.objects.create_user('cashier', 'cashier@example.com', 'secret', role='cashier')
+        self.unit, _ = Unit.objects.get_or_create(name='piece', defaults={'name_arabic': 'قطعة', 'abbreviation': 'pc'})
+        self.category = Category.objects.create(name='Filters', vehicle_type='car')
+
+    def product(self, sku, **fields):
+        defaults = {
+            'name': f'Part {sku}', 'sku': sku, 'barcode': f'B{sku}', 'unit': self.unit, 'category': self.category,
+            'cost_price': Decimal('40.00'), 'selling_price': Decimal('60.00'), 'current_stock': 10,
+        }
+        defaults.update(fields)
+        return Product.objects.create(**defaults)
+
+    def allow(self, codename='view_sales'):
+        permission = Permission.objects.create(name=codename, codename=codename, module='sales')
+        RolePermission.objects.create(role=self.cashier.role, permission=permission)
+
+    def get(self, name, **params):
+        return self.client.get(reverse(f'sales:{name}'), params)
+
+    def test_lookups_need_the_view_sales_permission(self):
+        for name in ('product_search', 'customer_search'):
+            self.assertEqual(self.get(name).status_code, 302)
+            self.client.force_login(self.cashier)
+            self.assertRedirects(self.get(name), reverse('dashboard:home'), fetch_redirect_response=False)
+            self.client.logout()
+
+        self.allow()
+        self.client.force_login(self.cashier)
+        for name in ('product_search', 'customer_search'):
+            self.assertEqual(self.get(name).json()['success'], True)
+
+    def test_product_results(self):
+        self.allow()
+        self.client.force_login(self.cashier)
+        oil = self.product('OF-1', name='Oil filter', current_stock=2, reorder_level=3)
+        self.product('AF-1', name='Air filter', current_stock=0)
+        self.product('OF-2', name='Oil filter old', is_active=False)
+
+        data = self.get('product_search', q='oil').json()
+
+        self.assertEqual(data, {
+            'success': True,
+            'results': [{
+                'id': oil.id, 'text': 'Oil filter - المخزون: 2 (مخزون منخفض) - 60.00 ج.م', 'name': 'Oil filter',
+                'sku': 'OF-1', 'price': '60.00', 'cost': '40.00', 'stock': 2, 'unit': 'قطعة',
+            }],
+            'pagination': {'more': False},
+        })
+        names = [row['name'] for row in self.get('product_search', q='filter', in_stock='1').json()['results']]
+        self.assertEqual(names, ['Oil filter'])
+
+    def test_product_pages(self):
+        self.allow()
+        self.client.force_login(self.cashier)
+        for number in range(LOOKUP_PAGE_SIZE + 1):
+            self.product(f'P-{number:02}')
+
+        first = self.get('product_search').json()
+        last = self.get('product_search', page=2).json()
+
+        self.assertEqual((len(first['results']), first['pagination']['more']), (LOOKUP_PAGE_SIZE, True))
+        self.assertEqual(([row['sku'] for row in last['results']], last['pagination']['more']), (['P-20'], False))
+        self.assertEqual(self.get('product_search', page='x').json()['results'], first['results'])
+
+    def test_customer_results(self):
+        self.allow()
+        self.client.force_login(self.cashier)
+        ahmed = Customer.objects.create(name='Ahmed Ali', phone='01001234567')
+        Customer.objects.create(name='Mona Ahmed', phone='01209876543')
+        Customer.objects.create(name='Ahmed Old', is_active=False)
 
-# Create your tests here.
+        self.assertEqual(self.get('customer_search', q='ahm').json(), {
+            'success': True,
+            'results': [{'id': ahmed.id, 'text': str(ahmed), 'phone': '01001234567'}],
+            'pagination': {'more': False},
+        })
+        self.assertEqual([row['id'] for row in self.get('customer_search', q='0100').json()['results']], [ahmed.id])
@@ -23,4 +23,13 @@ urlpatterns = [
     
     # AJAX endpoints
     path('api/product-price/', views.get_product_price, name='get_product_price'),
+    path('api/product-search/', views.product_search, name='product_search'),
+    path('api/customer-search/', views.customer_search, name='customer_search'),
+    path('api/scan/', views.scan_product, name='scan_product'),
+    path('api/scan/batch/', views.scan_products, name='scan_products'),
+    path('api/sales/batch/', views.sale_batch_submit, name='sale_batch_submit'),
+    path('api/holds/', views.stock_hold, name='stock_hold'),
+    path('api/holds/<str:hold_key>/release/', views.stock_hold_release, name='stock_hold_release'),
+    path('api/catalog/', views.catalog_snapshot, name='catalog_snapshot'),
+    path('api/catalog/delta/', views.catalog_delta, name='catalog_delta'),
 ]
\ No newline at end of file
@@ -4,20 +4,26 @@ from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
 from django.core.paginator import Paginator
 from django.db.models import Q, Sum, Count, F
-from django.db import transaction
-from django.views.decorators.http import require_http_methods
+from django.db import IntegrityError, transaction
+from django.views.decorators.http import require_http_methods, condition
+from django.views.decorators.gzip import gzip_page
 from django.template.loader import get_template
 from django.utils import timezone
 from accounts.views import permission_required
-from .models import Sale, SaleItem, Payment, Installment, InstallmentPayment
+from .models import Sale, SaleItem, Payment, Installment, InstallmentPayment, SaleSubmission
+from .batch import MAX_BATCH_SIZE, SaleValidationError, submit_sales
 from .forms import (
     SaleForm, SaleItemInlineFormSet, PaymentForm, InstallmentPlanForm,
     SaleFilterForm, QuickSaleForm, InstallmentPaymentForm
 )
-from inventory.models import Product, Customer
+from inventory.models import Product, Customer, Location, StockMovement
+from inventory import catalog, locations, reservations, scan
+from .lookups import customer_lookup, product_lookup
+from dashboard import events
 from dashboard.models import ActivityLog
 from datetime import datetime, timedelta
 import json
+import uuid
 from decimal import Decimal
 
 @login_required
@@ -119,8 +125,18 @@ def sale_create(request):
         if form.is_valid() and formset.is_valid():
             try:
                 with transaction.atomic():
+                    # Other carts' holds count against the stock; this form's own hold does not
+                    hold_key = request.POST.get('hold_key', '')[:100]
+                    requested = {}
+                    for item_form in formset.forms:
+                        data = item_form.cleaned_data
+                        if data and not data.get('DELETE') and data.get('product'):
+                            requested[data['product'].id] = requested.get(data['product'].id, 0) + data['quantity']
+                    reservations.check(requested, hold_key)
+
                     sale = form.save(commit=False)
                     sale.created_by = request.user
+                    sale.location = sale.location or locations.default_location()
                     sale.save()
                     
                     formset.instance = sale
@@ -133,22 +149,35 @@ def sale_create(request):
                     sale.save()
                     
                     # Update product stock
+                    movements = []
                     for item in sale_items:
                         product = item.product
                         product.current_stock -= item.quantity
-                        product.save()
+                        product.save(update_fields=['current_stock', 'updated_at'])
                         
                         # Create stock movement
-                        from inventory.models import StockMovement
-                        StockMovement.objects.create(
+                        movements.append(StockMovement.objects.create(
                             product=product,
-                            movement_type='out',
+                            movement_type='sale',
                             quantity=item.quantity,
                             unit_cost=item.cost_price,
                             reference_number=sale.sale_number,
+                            reference_model='Sale',
+                            reference_id=sale.id,
+                            location=sale.location,
                             notes=f'Sale to {sale.customer.name}',
                             created_by=request.user
-                        )
+                        ))
+                    locations.apply(movements)
+                    reservations.commit(hold_key, sale)
+                    
+                    events.publish(
+                        'sale_completed' if sale.status == 'completed' else 'sale_created',
+                        {'sale_number': sale.sale_number, 'customer_id': sale.customer_id,
+                         'total_amount': str(sale.total_amount)},
+                        aggregate=sale,
+                    )
+                    events.stock_changed([item.product_id for item in sale_items], 'sale', sale.sale_number)
                     
                     # Log activity
                     ActivityLog.objects.create(
@@ -217,11 +246,27 @@ def sale_update(request, sale_id):
             try:
                 with transaction.atomic():
                     # Restore stock for deleted items
+                    restored = []
+                    movements = []
                     for form_item in formset.deleted_forms:
                         if form_item.instance.pk:
                             product = form_item.instance.product
                             product.current_stock += form_item.instance.quantity
-                            product.save()
+                            product.save(update_fields=['current_stock', 'updated_at'])
+                            restored.append(product.id)
+                            movements.append(StockMovement.objects.create(
+                                product=product,
+                                movement_type='adjustment',
+                                quantity=form_item.instance.quantity,
+                                unit_cost=form_item.instance.cost_price,
+                                reference_number=sale.sale_number,
+                                reference_model='Sale',
+                                reference_id=sale.id,
+                                location=sale.location or locations.default_location(),
+                                notes='Sale item removed',
+                                created_by=request.user
+                            ))
+                    locations.apply(movements)
                     
                     updated_sale = form.save(commit=False)
                     updated_sale.updated_by = request.user
@@ -235,6 +280,13 @@ def sale_update(request, sale_id):
                     updated_sale.total_amount = subtotal - updated_sale.discount_amount
                     updated_sale.save()
                     
+                    events.publish(
+                        'sale_updated',
+                        {'sale_number': updated_sale.sale_number, 'total_amount': str(updated_sale.total_amount)},
+                        aggregate=updated_sale,
+                    )
+                    events.stock_changed(restored, 'sale_item_removed', updated_sale.sale_number)
+                    
                     # Log activity
                     ActivityLog.objects.create(
                         user=request.user,
@@ -268,14 +320,9 @@ def sale_invoice(request, sale_id):
     """Generate and display invoice"""
     sale = get_object_or_404(Sale, id=sale_id)
     
+    # Shop details come from the cached `shop_settings` context processor
     context = {
         'sale': sale,
-        'company_info': {
-            'name': 'SpareSmart Store',
-            'address': 'Your Store Address',
-            'phone': 'Your Phone Number',
-            'email': 'info@sparesmart.com',
-        }
     }
     
     return render(request, 'sales/invoice.html', context)
@@ -286,14 +333,9 @@ def sale_print(request, sale_id):
     """Print-friendly invoice view"""
     sale = get_object_or_404(Sale, id=sale_id)
     
+    # Shop details come from the cached `shop_settings` context processor
     context = {
         'sale': sale,
-        'company_info': {
-            'name': 'SpareSmart Store',
-            'address': 'Your Store Address',
-            'phone': 'Your Phone Number',
-            'email': 'info@sparesmart.com',
-        }
     }
     
     return render(request, 'sales/invoice_print.html', context)
@@ -323,6 +365,13 @@ def payment_create(request, sale_id):
                     sale.paid_amount += payment.amount
                     sale.save()  # This will trigger payment status update
                     
+                    events.publish(
+                        'payment_posted',
+                        {'payment_number': payment.payment_number, 'sale_id': sale.id,
+                         'amount': str(payment.amount), 'payment_method': payment.payment_method},
+                        aggregate=payment,
+                    )
+                    
                     # Log activity
                     ActivityLog.objects.create(
                         user=request.user,
@@ -423,6 +472,14 @@ def installment_payment(request, installment_payment_id):
                     payment.received_by = request.user
                     payment.save()
                     
+                    events.publish(
+                        'payment_posted',
+                        {'sale_id': installment_payment.installment_plan.sale_id,
+                         'installment_number': payment.installment_number,
+                         'amount': str(payment.paid_amount)},
+                        aggregate=payment,
+                    )
+                    
                     # Log activity
                     ActivityLog.objects.create(
                         user=request.user,
@@ -462,7 +519,18 @@ def quick_sale(request):
                 messages.error(request, 'يرجى اختيار العميل.')
                 return redirect('sales:quick_sale')
 
+            # A double-click or resubmission reuses the key rendered with the form
+            idempotency_key = request.POST.get('idempotency_key', '')[:100]
+            if idempotency_key:
+                submission = SaleSubmission.objects.filter(
+                    idempotency_key=idempotency_key, sale__isnull=False
+                ).first()
+                if submission:
+                    messages.info(request, f'تم تسجيل هذا البيع بالفعل: {submission.sale.sale_number}')
+                    return redirect('sales:sale_detail', sale_id=submission.sale_id)
+
             customer = Customer.objects.get(id=customer_id)
+            location = locations.resolve(request.POST.get('location'))
 
             # Collect all products from the form
             products_data = []
@@ -499,39 +567,61 @@ def quick_sale(request):
                 return redirect('sales:quick_sale')
 
             # Create the sale with multiple products
+            hold_key = request.POST.get('hold_key', '')[:100]
             with transaction.atomic():
+                # One locking query checks the cart against the stock and the other carts' holds
+                requested = {}
+                for product_data in products_data:
+                    product_id = int(product_data['product_id'])
+                    requested[product_id] = requested.get(product_id, 0) + product_data['quantity']
+                reservations.check(requested, hold_key)
+
                 # Create the sale
                 sale = Sale.objects.create(
                     customer=customer,
+                    location=location,
                     sale_type='cash',
                     status='completed',
                     created_by=request.user
                 )
 
                 subtotal = Decimal('0.00')
+                movements = []
 
                 # Create sale items for each product
                 for product_data in products_data:
                     product = Product.objects.get(id=product_data['product_id'])
 
-                    # Check stock availability
-                    if product_data['quantity'] > product.current_stock:
-                        raise ValueError(f'مخزون غير كافي للمنتج {product.name}. المتاح: {product.current_stock}، المطلوب: {product_data["quantity"]}')
-
                     # Create sale item
                     sale_item = SaleItem.objects.create(
                         sale=sale,
                         product=product,
                         quantity=product_data['quantity'],
                         unit_price=product_data['unit_price'],
-                        discount_percentage=0  # Individual item discount not supported in quick sale
+                        discount_percentage=0,  # Individual item discount not supported in quick sale
+                        cost_price=product.cost_price
                     )
 
                     subtotal += Decimal(str(sale_item.total_price))
 
                     # Update product stock
                     product.current_stock -= product_data['quantity']
-                    product.save()
+                    product.save(update_fields=['current_stock', 'updated_at'])
+
+                    movements.append(StockMovement.objects.create(
+                        product=product,
+                        movement_type='sale',
+                        quantity=product_data['quantity'],
+                        unit_cost=product.cost_price,
+                        reference_number=sale.sale_number,
+                        reference_model='Sale',
+                        reference_id=sale.id,
+                        location=location,
+                        notes=f'Quick sale to {customer.name}',
+                        created_by=request.user
+                    ))
+                locations.apply(movements)
+                reservations.commit(hold_key, sale)
 
                 # Apply overall discount and update sale totals
                 discount_amount = (subtotal * discount_percentage) / Decimal('100')
@@ -550,6 +640,21 @@ def quick_sale(request):
                     received_by=request.user
                 )
 
+                if idempotency_key:
+                    SaleSubmission.objects.create(
+                        idempotency_key=idempotency_key, sale=sale, created_by=request.user
+                    )
+
+                events.publish_many([
+                    ('sale_completed', {'sale_number': sale.sale_number, 'customer_id': customer.id,
+                                        'total_amount': str(total_amount)}, sale),
+                    ('payment_posted', {'payment_number': payment.payment_number, 'sale_id': sale.id,
+                                        'amount': str(total_amount), 'payment_method': payment_method}, payment),
+                ])
+                events.stock_changed(
+                    [product_data['product_id'] for product_data in products_data], 'sale', sale.sale_number
+                )
+
                 # Log activity
                 ActivityLog.objects.create(
                     user=request.user,
@@ -561,6 +666,13 @@ def quick_sale(request):
                 messages.success(request, f'تم إتمام البيع السريع {sale.sale_number} بنجاح.')
                 return redirect('sales:sale_detail', sale_id=sale.id)
 
+        except IntegrityError:
+            # A concurrent submission with the same key won; show its sale
+            submission = SaleSubmission.objects.filter(idempotency_key=idempotency_key).first()
+            if submission and submission.sale_id:
+                messages.info(request, f'تم تسجيل هذا البيع بالفعل: {submission.sale.sale_number}')
+                return redirect('sales:sale_detail', sale_id=submission.sale_id)
+            messages.error(request, 'خطأ في إنشاء البيع السريع، يرجى المحاولة مرة أخرى.')
         except Exception as e:
             messages.error(request, f'خطأ في إنشاء البيع السريع: {str(e)}')
 
@@ -569,6 +681,9 @@ def quick_sale(request):
 
     context = {
         'form': form,
+        'idempotency_key': uuid.uuid4().hex,
+        'hold_key': uuid.uuid4().hex,
+        'locations': Location.objects.filter(is_active=True),
         'title': 'البيع السريع'
     }
 
@@ -587,9 +702,187 @@ def get_product_price(request):
                 'success': True,
                 'price': str(product.selling_price),
                 'stock': product.current_stock,
+                'available': reservations.available(
+                    [product.id], exclude_hold=request.GET.get('hold_key')
+                ).get(product.id, 0),
                 'cost_price': str(product.cost_price)
             })
         except Product.DoesNotExist:
             pass
     
-    return JsonResponse({'success': False})
\ No newline at end of file
+    return JsonResponse({'success': False})
+
+# Maximum number of codes resolved by one batch scan request
+SCAN_BATCH_LIMIT = 200
+
+@login_required
+@permission_required('view_sales')
+def scan_product(request):
+    """AJAX endpoint: resolve a scanned barcode or SKU from the in-memory scan index"""
+    code = request.GET.get('code', '').strip()
+    if not code:
+        return JsonResponse({'success': False, 'error': 'Code is required'}, status=400)
+
+    product = scan.lookup(code)
+    if product is None:
+        return JsonResponse({'success': False, 'code': code, 'error': 'Product not found'}, status=404)
+
+    return JsonResponse({'success': True, 'code': code, 'product': product})
+
+@login_required
+@permission_required('view_sales')
+@require_http_methods(["POST"])
+def scan_products(request):
+    """AJAX endpoint: resolve a list of scanned codes in one call"""
+    try:
+        codes = json.loads(request.body or b'{}').get('codes', [])
+    except (ValueError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+
+    if not isinstance(codes, list) or not codes:
+        return JsonResponse({'success': False, 'error': 'codes must be a non-empty list'}, status=400)
+    if len(codes) > SCAN_BATCH_LIMIT:
+        return JsonResponse(
+            {'success': False, 'error': f'At most {SCAN_BATCH_LIMIT} codes per request'}, status=400
+        )
+
+    products = scan.lookup_many(str(code).strip() for code in codes)
+    return JsonResponse({
+        'success': True,
+        'results': products,
+        'missing': [code for code, product in products.items() if product is None],
+    })
+
+@login_required
+@permission_required('create_sales')
+@require_http_methods(["POST"])
+def sale_batch_submit(request):
+    """AJAX endpoint: submit a queue of POS sales with per-sale idempotency keys"""
+    try:
+        submissions = json.loads(request.body or b'{}').get('sales', [])
+    except (ValueError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+
+    if not isinstance(submissions, list) or not submissions:
+        return JsonResponse({'success': False, 'error': 'sales must be a non-empty list'}, status=400)
+    if len(submissions) > MAX_BATCH_SIZE:
+        return JsonResponse(
+            {'success': False, 'error': f'At most {MAX_BATCH_SIZE} sales per batch'}, status=400
+        )
+    if not all(isinstance(data, dict) for data in submissions):
+        return JsonResponse({'success': False, 'error': 'Each sale must be an object'}, status=400)
+
+    try:
+        results = submit_sales(submissions, request.user)
+    except SaleValidationError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    created = [result for result in results if result['status'] == 'created']
+    if created:
+        ActivityLog.objects.create(
+            user=request.user,
+            action='create',
+            description=f'Batch sale submission: {len(created)} sales created',
+            additional_data={'sale_numbers': [result['sale_number'] for result in created]}
+        )
+
+    return JsonResponse({'success': True, 'results': results})
+
+@login_required
+@permission_required('create_sales')
+@require_http_methods(["POST"])
+def stock_hold(request):
+    """AJAX endpoint: hold the stock of a cart, replacing what the hold had before"""
+    try:
+        data = json.loads(request.body or b'{}')
+        items = data.get('items', [])
+        quantities = {}
+        for item in items:
+            product_id, quantity = int(item['product_id']), int(item['quantity'])
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        minutes = int(data.get('minutes') or reservations.DEFAULT_HOLD_MINUTES)
+    except (ValueError, TypeError, AttributeError, KeyError):
+        return JsonResponse({'success': False, 'error': 'items must be a list of {product_id, quantity}'}, status=400)
+
+    hold_key = str(data.get('hold_key') or '')[:100]
+    try:
+        hold_key, expires_at = reservations.reserve(quantities, request.user, hold_key, minutes)
+    except reservations.ReservationError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'available': reservations.available(quantities, exclude_hold=hold_key),
+        }, status=409)
+
+    return JsonResponse({'success': True, 'hold_key': hold_key, 'expires_at': expires_at.isoformat()})
+
+@login_required
+@permission_required('create_sales')
+@require_http_methods(["POST"])
+def stock_hold_release(request, hold_key):
+    """AJAX endpoint: give the stock of an abandoned cart back"""
+    return JsonResponse({'success': True, 'released': reservations.release(hold_key)})
+
+# Offline catalog for POS clients
+
+def _catalog_version(request):
+    # Computed once per request, for both the ETag and the response body
+    if not hasattr(request, '_catalog_version'):
+        request._catalog_version = catalog.current_version()
+    return request._catalog_version
+
+def _catalog_etag(request):
+    since = request.GET.get('since', '')
+    return f'"catalog-{_catalog_version(request)}-{since}"'
+
+@login_required
+@permission_required('view_sales')
+@gzip_page
+@condition(etag_func=_catalog_etag)
+def catalog_snapshot(request):
+    """Full offline catalog of active products; unchanged polls get 304"""
+    return JsonResponse({'success': True, **catalog.snapshot(_catalog_version(request))})
+
+@login_required
+@permission_required('view_sales')
+@gzip_page
+@condition(etag_func=_catalog_etag)
+def catalog_delta(request):
+    """Products changed or deleted since the client's catalog version"""
+    try:
+        since = int(request.GET['since'])
+        catalog.decode_version(since)
+    except (KeyError, ValueError):
+        return JsonResponse({'success': False, 'error': 'since must be a catalog version'}, status=400)
+
+    data = catalog.delta(since, _catalog_version(request))
+    if data is None:
+        return JsonResponse(
+            {'success': False, 'full_sync_required': True, 'error': 'Version too old, fetch a new snapshot'},
+            status=410
+        )
+    return JsonResponse({'success': True, **data})
+
+def _lookup_page(request):
+    try:
+        return max(int(request.GET.get('page', 1)), 1)
+    except (TypeError, ValueError):
+        return 1
+
+@login_required
+@permission_required('view_sales')
+def product_search(request):
+    """AJAX endpoint: paginated product typeahead, ranked by the search index"""
+    data = product_lookup(
+        request.GET.get('q', ''),
+        page=_lookup_page(request),
+        in_stock=request.GET.get('in_stock') == '1',
+    )
+    return JsonResponse({'success': True, **data})
+
+@login_required
+@permission_required('view_sales')
+def customer_search(request):
+    """AJAX endpoint: paginated customer typeahead by name or phone prefix"""
+    data = customer_lookup(request.GET.get('q', ''), page=_lookup_page(request))
+    return JsonResponse({'success': True, **data})
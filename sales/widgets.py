@@ -0,0 +1,63 @@
+from django import forms
+from django.urls import reverse_lazy
+from django.utils.text import format_lazy
+
+from .lookups import product_label, product_option_attrs
+
+
+class RemoteSelect(forms.Select):
+    """
+    Select that only renders the currently selected option.
+
+    Other options are fetched page by page from `url` by the remote-select
+    script in base.html. The form field still validates the submitted id
+    against its queryset, so only that single row is read on POST.
+    """
+
+    def __init__(self, url, attrs=None, placeholder='', option_label=None, option_attrs=None):
+        self.url = url
+        self.placeholder = placeholder
+        self.option_label = option_label
+        self.option_attrs = option_attrs
+        super().__init__(attrs)
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        widget_attrs = context['widget']['attrs']
+        widget_attrs['data-remote-url'] = str(self.url)
+        if self.placeholder:
+            widget_attrs['data-placeholder'] = self.placeholder
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        # Ignore junk ids from query strings; the field reports them on validation
+        selected = [v for v in value if str(v).isdigit()]
+        options = [self.create_option(name, '', self.placeholder, not selected, 0)]
+
+        queryset = getattr(self.choices, 'queryset', None)
+        if selected and queryset is not None:
+            label_from_instance = self.option_label or self.choices.field.label_from_instance
+            for index, obj in enumerate(queryset.filter(pk__in=selected), start=1):
+                option = self.create_option(name, obj.pk, label_from_instance(obj), True, index)
+                if self.option_attrs:
+                    option['attrs'].update(self.option_attrs(obj))
+                options.append(option)
+
+        return [(None, options, 0)]
+
+
+def product_select(in_stock=False, placeholder='اختر منتج', attrs=None):
+    url = reverse_lazy('sales:product_search')
+    if in_stock:
+        url = format_lazy('{}?in_stock=1', url)
+    return RemoteSelect(
+        url, attrs=attrs or {'class': 'form-select'}, placeholder=placeholder,
+        option_label=product_label, option_attrs=product_option_attrs
+    )
+
+
+def customer_select(placeholder='Select a customer', attrs=None):
+    return RemoteSelect(
+        reverse_lazy('sales:customer_search'), attrs=attrs or {'class': 'form-select'},
+        placeholder=placeholder
+    )
@@ -78,6 +78,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.i18n',  # Added for language support
+                'inventory.context_processors.shop_settings',
             ],
         },
     },
@@ -212,6 +213,10 @@ USE_TZ = True
 # Pagination
 PAGINATE_BY = 20
 
+# Inventory costing (see inventory.costing): 'fifo' or 'average'.
+# Changing it requires `python manage.py rebuild_cost_layers`.
+INVENTORY_COSTING_METHOD = 'fifo'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
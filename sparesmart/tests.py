@@ -0,0 +1,102 @@
+import json
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import APIKey, User
+from dashboard.models import OutboxEvent
+from inventory import pricing
+from inventory.models import Category, Product, ProductPriceHistory, Unit
+
+
+class ProductAPITests(TestCase):
+    url = '/api/v1/products/'
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        _, key = APIKey.generate(self.user, 'tests')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {key}'}
+        self.unit, _ = Unit.objects.get_or_create(name='piece', defaults={'name_arabic': 'قطعة', 'abbreviation': 'pc'})
+        self.category = Category.objects.create(name='Filters', vehicle_type='car')
+
+    def row(self, sku, **fields):
+        return {
+            'name': f'Part {sku}', 'sku': sku, 'barcode': f'B{sku}', 'category': self.category.id,
+            'unit': self.unit.id, 'cost_price': '40.00', 'selling_price': '60.00', **fields,
+        }
+
+    def send(self, method, body, url=None, **extra):
+        return getattr(self.client, method)(
+            url or self.url, json.dumps(body), content_type='application/json', **self.auth, **extra
+        )
+
+    def test_requires_a_valid_key(self):
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 401)
+
+    def test_bulk_create_and_list(self):
+        response = self.send('post', [self.row('A'), self.row('B')])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['sku'] for row in response.json()['results']], ['A', 'B'])
+        listing = self.client.get(self.url, {'fields': 'sku,category_name', 'limit': 1}, **self.auth).json()
+        self.assertEqual(listing['count'], 2)
+        self.assertEqual(
+            listing['results'], [{'id': listing['results'][0]['id'], 'sku': 'A', 'category_name': 'Filters'}]
+        )
+        self.assertIsNotNone(listing['next_cursor'])
+
+    def test_duplicates_within_one_request_are_a_400(self):
+        response = self.send('post', [self.row('A'), self.row('A', barcode='other')])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('sku', response.json()['errors']['1'])
+
+        # Two blank barcodes collide on the unique column as well
+        response = self.send('post', [self.row('A', barcode=''), self.row('B', barcode='')])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('barcode', response.json()['errors']['1'])
+        self.assertFalse(Product.objects.exists())
+
+    def test_invalid_filter_and_rows_are_reported(self):
+        self.assertEqual(self.client.get(self.url, {'category': 'abc'}, **self.auth).status_code, 400)
+
+        response = self.send('post', self.row('A', selling_price='lots'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('selling_price', response.json()['errors']['0'])
+
+    def test_patch_updates_one_product(self):
+        product_id = self.send('post', self.row('A')).json()['results'][0]['id']
+
+        response = self.send('patch', {'name': 'Renamed', 'cost_price': '45.50'}, url=f'{self.url}{product_id}/')
+
+        self.assertEqual(response.json(), {'success': True, 'updated': 1})
+        product = Product.objects.get(pk=product_id)
+        self.assertEqual((product.name, product.cost_price), ('Renamed', Decimal('45.50')))
+
+    def test_threshold_writes_publish_stock_changed(self):
+        first, second = [row['id'] for row in self.send('post', [self.row('A'), self.row('B')]).json()['results']]
+        created = OutboxEvent.objects.get(event_type='stock_changed')
+        self.assertEqual(created.payload, {'product_ids': [first, second], 'reason': 'thresholds'})
+        OutboxEvent.objects.all().delete()
+
+        self.send('patch', [{'id': first, 'reorder_level': 9}, {'id': second, 'name': 'Renamed'}])
+
+        event = OutboxEvent.objects.get(event_type='stock_changed')
+        self.assertEqual(event.payload, {'product_ids': [first], 'reason': 'thresholds'})
+
+    def test_price_changes_are_recorded(self):
+        product_id = self.send('post', self.row('A')).json()['results'][0]['id']
+        self.assertFalse(ProductPriceHistory.objects.exists())
+        before = timezone.now()
+
+        self.send('patch', {'selling_price': '72.50'}, url=f'{self.url}{product_id}/')
+        self.send('patch', {'name': 'Renamed', 'selling_price': '72.50'}, url=f'{self.url}{product_id}/')
+
+        history = ProductPriceHistory.objects.get(product_id=product_id)
+        self.assertEqual(
+            (history.previous_price, history.selling_price, history.source, history.changed_by),
+            (Decimal('60.00'), Decimal('72.50'), 'api', self.user),
+        )
+        self.assertEqual(pricing.prices_on([product_id], before), {product_id: Decimal('60.00')})
+        self.assertEqual(pricing.prices_on([product_id], timezone.now()), {product_id: Decimal('72.50')})
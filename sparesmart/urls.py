@@ -22,6 +22,8 @@ from django.shortcuts import redirect
 from django.conf.urls.i18n import i18n_patterns
 from django.views.i18n import set_language
 
+import api_views
+
 def redirect_to_login(request):
     return redirect('accounts:login')
 
@@ -29,6 +31,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('i18n/', include('django.conf.urls.i18n')),
     path('set_language/', set_language, name='set_language'),
+    path('api/v1/<str:resource>/', api_views.collection, name='api_collection'),
+    path('api/v1/<str:resource>/<int:pk>/', api_views.detail, name='api_detail'),
 ]
 
 urlpatterns += i18n_patterns(
@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sparesmart.settings')
 
 application = get_wsgi_application()
+
+# Warm the per-process barcode/SKU scan index before the first request
+from django.db import DatabaseError  # noqa: E402
+from inventory import scan  # noqa: E402
+
+try:
+    scan.warm()
+except DatabaseError:
+    # Database not migrated yet; the index is built on the first scan instead
+    pass